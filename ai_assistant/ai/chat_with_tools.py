@@ -58,7 +58,8 @@ class ChatWithToolCalling:
             Final response text
         """
         from modules.llm_provider import UnifiedChatInterface
-        
+        from modules.llm_scheduler import INTERACTIVE, get_scheduler, request_context
+
         # Add user message
         self.add_message("user", user_message)
         
@@ -68,28 +69,30 @@ class ChatWithToolCalling:
         # Prepare LLM call
         llm_messages = history.copy()
         
+        context = request_context(self.chat.context_id, INTERACTIVE)
         tool_calls_made = 0
         while tool_calls_made < max_tool_calls:
-            # Get response from LLM
+            # Get response from LLM, holding a provider slot for the call
             try:
-                if use_tools and hasattr(self.chat, 'get_tool_schemas'):
-                    tools = self.chat.get_tool_schemas()
-                    if not tools:
-                        tools = self.tool_executor.get_tool_definitions()
-                    
-                    # Call LLM with tools
-                    response = self.chat.provider.generate_response(
-                        llm_messages,
-                        tools=tools,
-                        temperature=0.7,
-                        max_tokens=2000
-                    )
-                else:
-                    response = self.chat.provider.generate_response(
-                        llm_messages,
-                        temperature=0.7,
-                        max_tokens=2000
-                    )
+                with get_scheduler().slot(self.chat.provider, context["priority"], context["session_id"]):
+                    if use_tools and hasattr(self.chat, 'get_tool_schemas'):
+                        tools = self.chat.get_tool_schemas()
+                        if not tools:
+                            tools = self.tool_executor.get_tool_definitions()
+
+                        # Call LLM with tools
+                        response = self.chat.provider.generate_response(
+                            llm_messages,
+                            tools=tools,
+                            temperature=0.7,
+                            max_tokens=2000
+                        )
+                    else:
+                        response = self.chat.provider.generate_response(
+                            llm_messages,
+                            temperature=0.7,
+                            max_tokens=2000
+                        )
             except Exception as e:
                 logger.error(f"LLM call failed: {e}")
                 return f"Error: {str(e)}"
@@ -121,12 +124,15 @@ class ChatWithToolCalling:
         Yields:
             Response tokens
         """
+        from modules.llm_scheduler import STREAM, get_scheduler, request_context
+
         # Add user message
         self.add_message("user", user_message)
-        
+
         # Get history
         history = self.chat.get_conversation_history()
-        
+        context = request_context(self.chat.context_id, STREAM)
+
         # Stream response
         try:
             if use_tools and hasattr(self.chat, 'get_tool_schemas'):
@@ -137,12 +143,14 @@ class ChatWithToolCalling:
                 tools = None
             
             full_response = ""
-            for token in self.chat.provider.stream_response(
+            tokens = lambda: self.chat.provider.stream_response(
                 history,
                 tools=tools,
                 temperature=0.7,
                 max_tokens=2000
-            ):
+            )
+            for token in get_scheduler().stream(self.chat.provider, tokens, context["priority"],
+                                                context["session_id"]):
                 full_response += token
                 yield token
             
@@ -157,15 +165,17 @@ class ChatWithToolCalling:
         """
         Handle multiple tool calls and return results.
         
+        Calls are independent, so they run concurrently; the turn waits
+        for the slowest tool rather than the sum of all of them.
+        
         Args:
             tool_calls_list: List of tool calls to execute
             
         Returns:
-            List of results
+            List of results, in call order
         """
         results = []
-        for tool_call in tool_calls_list:
-            result = self.tool_executor.execute_tool_call(tool_call)
+        for result in self.tool_executor.execute_tool_calls(tool_calls_list):
             results.append(result.to_dict())
             self.tool_call_history.append(result.to_dict())
         
@@ -180,6 +190,7 @@ class ChatWithToolCalling:
         stats = self.chat.get_stats()
         stats['tool_calls_made'] = len(self.tool_call_history)
         stats['tools_registered'] = len(self.tool_executor.registered_tools)
+        stats['tool_latency'] = self.tool_executor.get_tool_stats()
         return stats
     
     def export_conversation(self, format: str = "json") -> str:
@@ -22,6 +22,39 @@ import re
 import webbrowser
 import subprocess
 
+try:
+    from .intent_router import Intent, IntentRouter
+except ImportError:
+    from modules.intent_router import Intent, IntentRouter
+
+# Command intents. An intent that matches more trigger groups outranks a
+# single keyword; otherwise priority decides, as in the old if-cascade.
+COMMAND_INTENTS = [
+    Intent('settings', [['settings', 'control panel']], priority=8),
+    Intent('settings', [['wifi', 'bluetooth', 'display', 'network', 'sound'], ['open']], priority=8),
+    Intent('open', [['open', 'launch', 'start', 'run']], priority=7),
+    Intent('close', [['close', 'quit', 'exit', 'kill', 'stop']], priority=6),
+    Intent('search', [['google', 'search', 'find', 'look up', 'look for']], priority=5),
+    Intent('play', [['play']], priority=4),
+    Intent('create_document', [['create', 'make', 'generate', 'new'],
+                               ['ppt', 'powerpoint', 'presentation', 'pdf', 'document', 'doc', 'word']], priority=3),
+    Intent('volume', [['volume', 'sound', 'mute']], priority=2),
+    Intent('system', [['shutdown', 'restart', 'sleep', 'lock']], priority=1),
+]
+
+COMMAND_HANDLERS = {
+    'settings': '_execute_settings_command',
+    'open': '_execute_open_command',
+    'close': '_execute_close_command',
+    'search': '_execute_search_command',
+    'play': '_execute_play_command',
+    'create_document': '_execute_create_document',
+    'volume': '_execute_volume_command',
+    'system': '_execute_system_command',
+}
+
+command_router = IntentRouter(COMMAND_INTENTS)
+
 class ConversationState(Enum):
     """Conversation state enumeration."""
     IDLE = "idle"
@@ -474,41 +507,10 @@ class AdvancedConversationalAI:
     def _try_execute_command(self, query: str, query_lower: str):
         """Try to execute actionable commands and return result."""
         try:
-            # PRIORITY 1: System/Settings commands (more specific than generic open)
-            if 'settings' in query_lower or 'control panel' in query_lower or \
-               any(word in query_lower for word in ['wifi', 'bluetooth', 'display', 'network', 'sound']) and 'open' in query_lower:
-                return self._execute_settings_command(query, query_lower)
-            
-            # PRIORITY 2: Opening apps/websites - Most common command
-            if any(word in query_lower for word in ['open', 'launch', 'start', 'run']):
-                return self._execute_open_command(query, query_lower)
-            
-            # PRIORITY 3: Closing apps
-            if any(word in query_lower for word in ['close', 'quit', 'exit', 'kill', 'stop']):
-                return self._execute_close_command(query, query_lower)
-            
-            # PRIORITY 4: Searching - Google, web search
-            if any(word in query_lower for word in ['google', 'search', 'find', 'look up', 'look for']):
-                return self._execute_search_command(query, query_lower)
-            
-            # PRIORITY 5: Playing music
-            if 'play' in query_lower:
-                return self._execute_play_command(query, query_lower)
-            
-            # PRIORITY 6: Creating documents
-            if any(word in query_lower for word in ['create', 'make', 'generate', 'new']) and \
-               any(doc in query_lower for doc in ['ppt', 'powerpoint', 'presentation', 'pdf', 'document', 'doc', 'word']):
-                return self._execute_create_document(query, query_lower)
-            
-            # PRIORITY 7: Volume control
-            if 'volume' in query_lower or 'sound' in query_lower or 'mute' in query_lower:
-                return self._execute_volume_command(query, query_lower)
-            
-            # PRIORITY 8: System commands (shutdown, restart, etc.)
-            if any(word in query_lower for word in ['shutdown', 'restart', 'sleep', 'lock']):
-                return self._execute_system_command(query, query_lower)
-            
-            return None
+            match = command_router.route(query_lower)
+            if match is None:
+                return None
+            return getattr(self, COMMAND_HANDLERS[match.name])(query, query_lower)
             
         except Exception as e:
             import traceback
@@ -4,38 +4,41 @@ This module contains all command execution methods that will be merged
 into the AdvancedConversationalAI class.
 """
 
+try:
+    from .intent_router import Intent, IntentRouter
+except ImportError:
+    from modules.intent_router import Intent, IntentRouter
+
+COMMAND_INTENTS = [
+    Intent('open', [['open']], priority=7),
+    Intent('close', [['close']], priority=6),
+    Intent('search', [['google', 'search for']], priority=5),
+    Intent('play', [['play'], ['music', 'song', 'spotify', 'youtube']], priority=4),
+    Intent('create_document', [['create', 'make', 'generate'],
+                               ['ppt', 'powerpoint', 'pdf', 'document', 'presentation']], priority=3),
+    Intent('volume', [['volume']], priority=2),
+    Intent('settings', [['settings', 'control panel']], priority=1),
+]
+
+COMMAND_HANDLERS = {
+    'open': '_execute_open_command',
+    'close': '_execute_close_command',
+    'search': '_execute_search_command',
+    'play': '_execute_play_command',
+    'create_document': '_execute_create_document',
+    'volume': '_execute_volume_command',
+    'settings': '_execute_settings_command',
+}
+
+command_router = IntentRouter(COMMAND_INTENTS)
+
 def _try_execute_command(self, query: str, query_lower: str):
     """Try to execute actionable commands and return result."""
     try:
-        # Open applications
-        if 'open' in query_lower:
-            return self._execute_open_command(query, query_lower)
-        
-        # Close applications
-        elif 'close' in query_lower:
-            return self._execute_close_command(query, query_lower)
-        
-        # Google search
-        elif 'google' in query_lower or 'search for' in query_lower:
-            return self._execute_search_command(query, query_lower)
-        
-        # Play music
-        elif 'play' in query_lower and any(word in query_lower for word in ['music', 'song', 'spotify', 'youtube']):
-            return self._execute_play_command(query, query_lower)
-        
-        # Create documents
-        elif any(word in query_lower for word in ['create', 'make', 'generate']) and any(doc in query_lower for doc in ['ppt', 'powerpoint', 'pdf', 'document', 'presentation']):
-            return self._execute_create_document(query, query_lower)
-        
-        # Volume control
-        elif 'volume' in query_lower:
-            return self._execute_volume_command(query, query_lower)
-        
-        # System settings
-        elif 'settings' in query_lower or 'control panel' in query_lower:
-            return self._execute_settings_command(query, query_lower)
-        
-        return None
+        match = command_router.route(query_lower)
+        if match is None:
+            return None
+        return getattr(self, COMMAND_HANDLERS[match.name])(query, query_lower)
         
     except Exception as e:
         return f"❌ Error executing command: {str(e)}"
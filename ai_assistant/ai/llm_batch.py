@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Background LLM Request Queue
+Keeps non-interactive LLM work (memory summarization, conversation
+compression) from competing with user chats.
+
+Interactive calls register on a shared TrafficGate while they run.
+Background requests are submitted to a BatchQueue, which holds them while
+interactive calls are in flight, runs them with bounded concurrency, and
+hands large batches to the provider's batch endpoint when it has one.
+Individual requests take a BACKGROUND slot from the LLM scheduler, so
+they only run on provider capacity interactive requests are not using.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+try:
+    from .llm_scheduler import BACKGROUND, LLMOverloadedError, get_scheduler
+except ImportError:
+    from llm_scheduler import BACKGROUND, LLMOverloadedError, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class TrafficGate:
+    """Tracks in-flight interactive LLM calls so background work can yield."""
+
+    def __init__(self):
+        """Initialize gate."""
+        self._active = 0
+        self._idle = threading.Condition()
+
+    @contextmanager
+    def interactive(self):
+        """Mark an interactive call for the duration of the block."""
+        with self._idle:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._active -= 1
+                if not self._active:
+                    self._idle.notify_all()
+
+    @property
+    def active(self) -> int:
+        """Number of interactive calls in flight."""
+        return self._active
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until no interactive call is in flight; False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._active == 0, timeout)
+
+
+# Shared by every chat interface and background queue in the process
+interactive_traffic = TrafficGate()
+
+
+@dataclass
+class BatchRequest:
+    """A queued background request."""
+    messages: List[Dict[str, str]]
+    kwargs: Dict[str, Any]
+    future: Future = field(default_factory=Future)
+    submitted_at: float = field(default_factory=time.time)
+
+
+class BatchQueue:
+    """Runs background LLM requests below interactive priority."""
+
+    def __init__(
+        self,
+        provider,
+        max_concurrency: int = 2,
+        batch_size: int = 100,
+        max_wait: float = 0.5,
+        max_defer: float = 30.0,
+        batch_api_min_size: int = 50,
+        idle_timeout: float = 60.0,
+        gate: Optional[TrafficGate] = None
+    ):
+        """
+        Initialize queue.
+
+        Args:
+            provider: LLM provider the requests are sent to
+            max_concurrency: Background requests in flight at once
+            batch_size: Most requests collected into one dispatch
+            max_wait: Seconds to wait for a batch to fill
+            max_defer: Longest a request waits for interactive traffic to
+                clear before it runs anyway
+            batch_api_min_size: Smallest batch sent to the provider's batch
+                endpoint; smaller batches run as individual requests
+            idle_timeout: Seconds without work before the dispatcher thread exits
+            gate: Interactive traffic gate (defaults to the shared one)
+        """
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_defer = max_defer
+        self.batch_api_min_size = batch_api_min_size
+        self.idle_timeout = idle_timeout
+        self.gate = gate or interactive_traffic
+
+        self._pending: Deque[BatchRequest] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._closed = False
+
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "batches": 0,
+            "batch_api_batches": 0,
+            "deferred": 0,
+            "defer_seconds": 0.0,
+        }
+
+    @property
+    def supports_batch_api(self) -> bool:
+        """Whether the provider has a batch endpoint."""
+        return callable(getattr(self.provider, "generate_batch", None))
+
+    def submit(self, messages: List[Dict[str, str]], **kwargs) -> Future:
+        """
+        Queue a background request.
+
+        Args:
+            messages: Chat messages, as for generate_response
+            **kwargs: Generation options, as for generate_response
+
+        Returns:
+            Future resolving to the response text
+        """
+        request = BatchRequest(messages, kwargs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Batch queue is closed")
+            self._pending.append(request)
+            self.stats["submitted"] += 1
+            self._cond.notify()
+        self._ensure_thread()
+        return request.future
+
+    def map(self, requests: List[List[Dict[str, str]]], timeout: Optional[float] = None, **kwargs) -> List[str]:
+        """Submit several requests and wait up to timeout seconds in total for the responses, in order."""
+        futures = [self.submit(messages, **kwargs) for messages in requests]
+        deadline = None if timeout is None else time.time() + timeout
+        return [future.result(timeout=None if deadline is None else max(0.0, deadline - time.time()))
+                for future in futures]
+
+    @property
+    def pending(self) -> int:
+        """Requests waiting to be dispatched."""
+        return len(self._pending)
+
+    def close(self, wait: bool = True):
+        """Stop accepting requests; pending ones are still dispatched."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        thread = self._thread
+        if wait and thread:
+            thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+
+    def _ensure_thread(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="llm-batch-queue")
+                self._thread.start()
+
+    def _next_batch(self) -> List[BatchRequest]:
+        """Wait for requests, then let the batch fill for up to max_wait."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pending or self._closed, self.idle_timeout):
+                return []
+            deadline = time.time() + self.max_wait
+            while len(self._pending) < self.batch_size and not self._closed:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self.batch_size, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                with self._cond:
+                    if not self._pending:
+                        self._thread = None
+                        return  # Idle or closed; restarted by the next submit
+                continue
+            self.stats["batches"] += 1
+            if self.supports_batch_api and len(batch) >= self.batch_api_min_size:
+                # A provider batch can take hours to finish; keep collecting meanwhile
+                threading.Thread(target=self._dispatch_batch_api, args=(batch,),
+                                 daemon=True, name="llm-batch-api").start()
+            else:
+                self._dispatch_individually(batch)
+
+    def _dispatch_individually(self, batch: List[BatchRequest]):
+        with self._cond:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix="llm-batch"
+                )
+            executor = self._executor
+        for request in batch:
+            try:
+                executor.submit(self._dispatch_one, request)
+            except RuntimeError:  # Closed while a provider batch was running
+                self._dispatch_one(request)
+
+    def _yield_to_interactive(self):
+        """Hold background work while interactive calls are in flight."""
+        if not self.gate.active:
+            return
+        start = time.time()
+        self.stats["deferred"] += 1
+        self.gate.wait_idle(self.max_defer)
+        self.stats["defer_seconds"] += time.time() - start
+
+    @contextmanager
+    def _background_slot(self):
+        """Hold a BACKGROUND slot, backing off while the provider sheds."""
+        scheduler = get_scheduler()
+        while True:
+            try:
+                ticket = scheduler.acquire(self.provider, BACKGROUND, session_id="background")
+                break
+            except LLMOverloadedError as e:
+                self.stats["deferred"] += 1
+                time.sleep(e.retry_after)
+        try:
+            yield
+        finally:
+            scheduler.release(ticket)
+
+    def _dispatch_one(self, request: BatchRequest):
+        self._yield_to_interactive()
+        try:
+            with self._background_slot():
+                result = self.provider.generate_response(request.messages, **request.kwargs)
+        except Exception as e:
+            logger.error(f"Background LLM request failed: {e}")
+            self.stats["failed"] += 1
+            request.future.set_exception(e)
+            return
+        self.stats["completed"] += 1
+        request.future.set_result(result)
+
+    def _dispatch_batch_api(self, batch: List[BatchRequest]):
+        self._yield_to_interactive()
+        try:
+            results = self.provider.generate_batch([(r.messages, r.kwargs) for r in batch])
+        except Exception as e:
+            logger.error(f"Provider batch failed, running requests individually: {e}")
+            self._dispatch_individually(batch)
+            return
+        self.stats["batch_api_batches"] += 1
+        self.stats["completed"] += len(batch)
+        for i, request in enumerate(batch):
+            request.future.set_result(results[i] if i < len(results) else "Error: missing batch result")
+
+
+_queues_lock = threading.Lock()
+
+
+def get_batch_queue(provider, **kwargs) -> BatchQueue:
+    """
+    The background queue for a provider instance, created on first use.
+
+    Args:
+        provider: LLM provider instance
+        **kwargs: BatchQueue options, used only when the queue is created
+    """
+    with _queues_lock:
+        queue = getattr(provider, "_batch_queue", None)
+        if queue is None:
+            queue = BatchQueue(provider, **kwargs)
+            provider._batch_queue = queue
+        return queue
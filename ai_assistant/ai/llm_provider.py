@@ -3,20 +3,59 @@
 LLM Provider Abstraction Layer
 Supports OpenAI (GPT-4, GPT-3.5), Google Gemini, and local models.
 Provides streaming, token counting, and unified interface.
+
+Requests keep a stable prompt prefix (system prompt first, history in
+order) so provider-side prompt caching applies across turns, Gemini chat
+sessions are reused instead of rebuilt from history, and background work
+goes through the batch queue in llm_batch below interactive priority.
 """
 
 import os
 import json
 import time
+import hashlib
 import logging
-from typing import Dict, List, Optional, Generator, Any, Callable
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Generator, Any, Callable, Tuple
 from abc import ABC, abstractmethod
 from datetime import datetime
 import re
 
+try:
+    from .llm_batch import interactive_traffic
+    from .llm_scheduler import INTERACTIVE, STREAM, LLMOverloadedError, get_scheduler, provider_key, request_context
+    from .provider_health import (CircuitBreaker, ProviderUnavailableError, call_with_fallback,
+                                  get_health_monitor, hedged_call, is_error_response)
+except ImportError:
+    from llm_batch import interactive_traffic
+    from llm_scheduler import INTERACTIVE, STREAM, LLMOverloadedError, get_scheduler, provider_key, request_context
+    from provider_health import (CircuitBreaker, ProviderUnavailableError, call_with_fallback,
+                                 get_health_monitor, hedged_call, is_error_response)
+
 logger = logging.getLogger(__name__)
 
 
+def stable_messages(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Order messages so the prompt prefix is identical across turns.
+    
+    System messages go first, in their original order, followed by the
+    conversation. Providers cache prompts by prefix, so a system message
+    inserted mid-history would otherwise invalidate the cache every turn.
+    """
+    system = [m for m in messages if m.get("role") == "system"]
+    if not system or messages[:len(system)] == system:
+        return messages
+    return system + [m for m in messages if m.get("role") != "system"]
+
+
+def prompt_prefix_key(messages: List[Dict[str, str]], model: str = "") -> str:
+    """Key identifying a prompt prefix (model and system prompt) for cache routing."""
+    system = "\n".join(m["content"] for m in messages if m.get("role") == "system")
+    return hashlib.sha1(f"{model}\n{system}".encode("utf-8")).hexdigest()[:16]
+
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers."""
     
@@ -39,20 +78,34 @@ class LLMProvider(ABC):
 class OpenAIProvider(LLMProvider):
     """OpenAI GPT provider."""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo"):
-        """Initialize OpenAI provider."""
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo",
+                 base_url: Optional[str] = None, client: Any = None):
+        """
+        Initialize OpenAI provider.
+        
+        Args:
+            api_key: API key (defaults to OPENAI_API_KEY)
+            model: Model name
+            base_url: API base URL (defaults to OPENAI_BASE_URL, then OpenAI)
+            client: Pre-built OpenAI-compatible client to use instead
+        """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.model = model
+        self.usage = {"requests": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0}
         
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set")
         
-        try:
-            from openai import OpenAI, APIError
-            self.client = OpenAI(api_key=self.api_key)
-            self.APIError = APIError
-        except ImportError:
-            raise ImportError("OpenAI package required: pip install openai")
+        if client is not None:
+            self.client = client
+            self.APIError = getattr(client, "APIError", Exception)
+        else:
+            try:
+                from openai import OpenAI, APIError
+                self.client = OpenAI(api_key=self.api_key, base_url=base_url or os.getenv("OPENAI_BASE_URL"))
+                self.APIError = APIError
+            except ImportError:
+                raise ImportError("OpenAI package required: pip install openai")
         
         # Token counter
         try:
@@ -61,20 +114,51 @@ class OpenAIProvider(LLMProvider):
         except:
             self.encoder = None
     
+    def _request_body(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        """
+        Chat completion parameters with a stable prompt prefix.
+        
+        The prompt_cache_key groups requests sharing a system prompt so
+        OpenAI routes them to the same prompt cache.
+        """
+        messages = stable_messages(messages)
+        body = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": kwargs.get("temperature", 0.7),
+            "max_tokens": kwargs.get("max_tokens", 2000),
+            "top_p": kwargs.get("top_p", 1.0),
+            "presence_penalty": kwargs.get("presence_penalty", 0),
+            "frequency_penalty": kwargs.get("frequency_penalty", 0),
+            "prompt_cache_key": kwargs.get("cache_key") or prompt_prefix_key(messages, self.model),
+        }
+        if kwargs.get("tools"):  # For function calling
+            body["tools"] = kwargs["tools"]
+            if kwargs.get("tool_choice"):
+                body["tool_choice"] = kwargs["tool_choice"]
+        return body
+    
+    def _create(self, body: Dict[str, Any], **extra):
+        """Send a chat completion; the cache key goes in extra_body for older SDKs."""
+        body = dict(body)
+        cache_key = body.pop("prompt_cache_key")
+        return self.client.chat.completions.create(**body, **extra, extra_body={"prompt_cache_key": cache_key})
+    
+    def _record_usage(self, usage):
+        """Track prompt tokens served from the provider's prompt cache."""
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.usage["requests"] += 1
+        self.usage["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        self.usage["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        self.usage["cached_prompt_tokens"] += getattr(details, "cached_tokens", 0) or 0
+    
     def generate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """Generate a complete response from OpenAI."""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=kwargs.get("temperature", 0.7),
-                max_tokens=kwargs.get("max_tokens", 2000),
-                top_p=kwargs.get("top_p", 1.0),
-                presence_penalty=kwargs.get("presence_penalty", 0),
-                frequency_penalty=kwargs.get("frequency_penalty", 0),
-                tools=kwargs.get("tools"),  # For function calling
-                tool_choice=kwargs.get("tool_choice"),
-            )
+            response = self._create(self._request_body(messages, **kwargs))
+            self._record_usage(getattr(response, "usage", None))
             
             return response.choices[0].message.content
         except self.APIError as e:
@@ -87,18 +171,17 @@ class OpenAIProvider(LLMProvider):
     def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> Generator[str, None, None]:
         """Stream response from OpenAI token-by-token."""
         try:
-            stream = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=kwargs.get("temperature", 0.7),
-                max_tokens=kwargs.get("max_tokens", 2000),
-                top_p=kwargs.get("top_p", 1.0),
+            stream = self._create(
+                self._request_body(messages, **kwargs),
                 stream=True,  # Enable streaming
-                tools=kwargs.get("tools"),
-                tool_choice=kwargs.get("tool_choice"),
+                stream_options={"include_usage": True},
             )
             
             for chunk in stream:
+                if not chunk.choices:
+                    # Final usage-only chunk
+                    self._record_usage(getattr(chunk, "usage", None))
+                    continue
                 if chunk.choices[0].delta.content:
                     yield chunk.choices[0].delta.content
         except self.APIError as e:
@@ -108,6 +191,63 @@ class OpenAIProvider(LLMProvider):
             logger.error(f"OpenAI streaming failed: {e}")
             yield f"Error: {str(e)}"
     
+    def generate_batch(
+        self,
+        requests: List[Tuple[List[Dict[str, str]], Dict[str, Any]]],
+        poll_interval: float = 30.0,
+        timeout: float = 24 * 3600
+    ) -> List[str]:
+        """
+        Run requests through the OpenAI Batch API.
+        
+        Batches cost less and have their own rate limits, but complete
+        within hours rather than seconds, so they are only for offline jobs.
+        
+        Args:
+            requests: (messages, kwargs) pairs, as for generate_response
+            poll_interval: Seconds between batch status checks
+            timeout: Seconds to wait before cancelling the batch
+            
+        Returns:
+            Response texts in request order
+        """
+        lines = [json.dumps({
+            "custom_id": f"request-{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": self._request_body(messages, **kwargs),
+        }) for i, (messages, kwargs) in enumerate(requests)]
+        
+        batch_file = self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+        )
+        deadline = time.time() + timeout
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if time.time() > deadline:
+                self.client.batches.cancel(batch.id)
+                raise TimeoutError(f"OpenAI batch {batch.id} did not complete in {timeout}s")
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"OpenAI batch {batch.id} {batch.status}")
+        
+        results = {}
+        for line in self.client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            body = (record.get("response") or {}).get("body") or {}
+            choices = body.get("choices") or []
+            if choices:
+                results[record["custom_id"]] = choices[0]["message"]["content"]
+            else:
+                results[record["custom_id"]] = f"Error: {record.get('error') or 'empty batch response'}"
+        return [results.get(f"request-{i}", "Error: missing batch result") for i in range(len(requests))]
+    
     def count_tokens(self, text: str) -> int:
         """Count tokens using tiktoken."""
         if self.encoder:
@@ -122,10 +262,18 @@ class OpenAIProvider(LLMProvider):
 class GeminiProvider(LLMProvider):
     """Google Gemini provider."""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-pro"):
-        """Initialize Gemini provider."""
+    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-pro", max_sessions: int = 64):
+        """
+        Initialize Gemini provider.
+        
+        Args:
+            api_key: API key (defaults to GEMINI_API_KEY)
+            model: Model name
+            max_sessions: Chat sessions kept for reuse across turns
+        """
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         self.model = model
+        self.max_sessions = max_sessions
         
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY environment variable not set")
@@ -133,28 +281,72 @@ class GeminiProvider(LLMProvider):
         try:
             import google.generativeai as genai
             genai.configure(api_key=self.api_key)
+            self.genai = genai
             self.client = genai.GenerativeModel(model)
         except ImportError:
             raise ImportError("Google Generative AI package required: pip install google-generativeai")
+        
+        # System prompt -> model; the prompt is a fixed system instruction prefix
+        self._models: Dict[str, Any] = {}
+        # Fingerprint of the conversation a session has seen -> chat session
+        self._sessions: "OrderedDict[str, Any]" = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        self.session_stats = {"reused": 0, "created": 0}
+    
+    def _model_for(self, system_prompt: str):
+        """Model with the system prompt as its system instruction."""
+        if not system_prompt:
+            return self.client
+        model = self._models.get(system_prompt)
+        if model is None:
+            model = self.genai.GenerativeModel(self.model, system_instruction=system_prompt)
+            self._models[system_prompt] = model
+        return model
+    
+    @staticmethod
+    def _fingerprint(system_prompt: str, turns: List[Tuple[str, str]]) -> str:
+        return hashlib.sha1(json.dumps([system_prompt, turns]).encode("utf-8")).hexdigest()
+    
+    def _checkout_session(self, messages: List[Dict[str, str]]):
+        """
+        Chat session whose history matches everything but the last message.
+        
+        A session that answered the previous turn is reused as is; otherwise
+        a new one is started from the history.
+        
+        Returns:
+            (chat, system_prompt, turns, last_message)
+        """
+        system_prompt = "\n\n".join(m["content"] for m in messages[:-1] if m["role"] == "system")
+        turns = [("user" if m["role"] == "user" else "model", m["content"])
+                 for m in messages[:-1] if m["role"] != "system"]
+        key = self._fingerprint(system_prompt, turns)
+        
+        # A session serves one request at a time; it is checked back in with its new history
+        with self._sessions_lock:
+            chat = self._sessions.pop(key, None)
+        if chat is not None:
+            self.session_stats["reused"] += 1
+        else:
+            history = [{"role": role, "parts": [content]} for role, content in turns]
+            chat = self._model_for(system_prompt).start_chat(history=history)
+            self.session_stats["created"] += 1
+        return chat, system_prompt, turns, messages[-1]["content"]
+    
+    def _checkin_session(self, chat, system_prompt: str, turns: List[Tuple[str, str]],
+                         last_message: str, reply: str):
+        """Keep a session for the turn that continues its conversation."""
+        key = self._fingerprint(system_prompt, turns + [("user", last_message), ("model", reply)])
+        with self._sessions_lock:
+            self._sessions[key] = chat
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
     
     def generate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """Generate response from Gemini."""
         try:
-            # Convert messages to Gemini format
-            history = []
-            for msg in messages[:-1]:  # Everything except last
-                if msg["role"] == "system":
-                    continue
-                history.append({
-                    "role": "user" if msg["role"] == "user" else "model",
-                    "parts": [msg["content"]]
-                })
-            
-            # Start chat session
-            chat = self.client.start_chat(history=history)
-            
-            # Send last message with generation config
-            last_message = messages[-1]["content"]
+            chat, system_prompt, turns, last_message = self._checkout_session(messages)
             
             # Create generation config
             generation_config = {
@@ -169,6 +361,7 @@ class GeminiProvider(LLMProvider):
                 generation_config=generation_config
             )
             
+            self._checkin_session(chat, system_prompt, turns, last_message, response.text)
             return response.text
         except Exception as e:
             logger.error(f"Gemini generation failed: {e}")
@@ -177,18 +370,7 @@ class GeminiProvider(LLMProvider):
     def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> Generator[str, None, None]:
         """Stream response from Gemini."""
         try:
-            # Convert messages
-            history = []
-            for msg in messages[:-1]:
-                if msg["role"] == "system":
-                    continue
-                history.append({
-                    "role": "user" if msg["role"] == "user" else "model",
-                    "parts": [msg["content"]]
-                })
-            
-            chat = self.client.start_chat(history=history)
-            last_message = messages[-1]["content"]
+            chat, system_prompt, turns, last_message = self._checkout_session(messages)
             
             # Create generation config
             generation_config = {
@@ -204,9 +386,14 @@ class GeminiProvider(LLMProvider):
                 generation_config=generation_config
             )
             
+            reply = ""
             for chunk in response:
                 if chunk.text:
+                    reply += chunk.text
                     yield chunk.text
+            
+            # The session's history is only complete once the stream is consumed
+            self._checkin_session(chat, system_prompt, turns, last_message, reply)
         except Exception as e:
             logger.error(f"Gemini streaming failed: {e}")
             yield f"Error: {str(e)}"
@@ -417,6 +604,12 @@ class LLMFactory:
             provider, model = cls.detect_provider()
             kwargs.setdefault('model', model)
         
+        # Skip a provider whose circuit is open instead of waiting on its timeouts
+        if provider != "offline" and \
+                get_health_monitor().breaker(provider_key(provider)).state == CircuitBreaker.OPEN:
+            logger.warning(f"{provider} circuit is open, using offline provider")
+            return cls.create("offline", **kwargs)
+        
         # Try preferred provider first
         try:
             return cls.create(provider, **kwargs)
@@ -436,7 +629,8 @@ class LLMFactory:
 class UnifiedChatInterface:
     """Unified chat interface that abstracts LLM provider."""
     
-    def __init__(self, provider: Optional[str] = None, model: Optional[str] = None, use_fallback: bool = True):
+    def __init__(self, provider: Optional[str] = None, model: Optional[str] = None, use_fallback: bool = True,
+                 session_id: Optional[str] = None, hedge: Optional[bool] = None):
         """
         Initialize unified chat interface.
         
@@ -444,6 +638,9 @@ class UnifiedChatInterface:
             provider: Preferred LLM provider
             model: Model to use
             use_fallback: Whether to fallback to offline mode
+            session_id: Session charged for this chat's LLM slots
+            hedge: Race the offline provider when a request runs past the
+                provider's p95 latency (defaults to LLM_HEDGE_REQUESTS)
         """
         if provider is None or model is None:
             detected_provider, detected_model = LLMFactory.detect_provider()
@@ -462,6 +659,10 @@ class UnifiedChatInterface:
         self.model = model
         self.conversation_history: List[Dict[str, str]] = []
         self.offline_mode = isinstance(self.provider, OfflineProvider)
+        self.session_id = session_id or f"chat-{id(self)}"
+        self.use_fallback = use_fallback
+        self.hedge = hedge if hedge is not None else os.getenv("LLM_HEDGE_REQUESTS", "false").lower() == "true"
+        self._fallback_provider = None
         
         if self.offline_mode:
             logger.warning("⚠️ Running in offline mode - features may be limited")
@@ -483,15 +684,112 @@ class UnifiedChatInterface:
         self.conversation_history.append({"role": "assistant", "content": content})
     
     def chat(self, user_message: str, stream: bool = False, **kwargs) -> str | Generator[str, None, None]:
-        """Send a chat message and get response."""
+        """
+        Send a chat message and get response.
+        
+        Calls are marked as interactive traffic, so queued background
+        requests wait until they finish, and wait for a provider slot in
+        the LLM scheduler (streams ahead of non-streaming calls).
+        
+        Raises:
+            LLMOverloadedError: If the scheduler sheds the request; the
+                user message is dropped from the history again
+        """
         self.add_user_message(user_message)
         
         if stream:
-            return self.provider.stream_response(self.conversation_history, **kwargs)
-        else:
-            response = self.provider.generate_response(self.conversation_history, **kwargs)
-            self.add_assistant_message(response)
-            return response
+            return self._stream_and_record(**kwargs)
+        context = request_context(self.session_id, INTERACTIVE)
+        try:
+            with interactive_traffic.interactive(), \
+                    get_scheduler().slot(self.provider, context["priority"], context["session_id"]):
+                response = self._generate(self.conversation_history, **kwargs)
+        except LLMOverloadedError:
+            self.conversation_history.pop()
+            raise
+        self.add_assistant_message(response)
+        return response
+    
+    def _stream_and_record(self, **kwargs) -> Generator[str, None, None]:
+        """Stream a response and add it to the history once complete."""
+        context = request_context(self.session_id, STREAM)
+        monitor = get_health_monitor()
+        name, provider = provider_key(self.provider), self.provider
+        fallback = self._fallback()
+        reply = ""
+        recorded = False
+        try:
+            with interactive_traffic.interactive(), \
+                    get_scheduler().slot(self.provider, context["priority"], context["session_id"]):
+                # Only ask the breaker once the slot is ours, so a shed request never takes the half-open trial
+                if fallback is not None and not monitor.breaker(name).allow():
+                    name, provider = "offline", fallback  # Circuit open: don't wait on the provider's timeout
+                start = time.time()
+                for token in provider.stream_response(self.conversation_history, **kwargs):
+                    if not reply:
+                        if is_error_response(token):
+                            monitor.record_failure(name, token)
+                        else:
+                            monitor.record_success(name, time.time() - start)
+                        recorded = True
+                    reply += token
+                    yield token
+        except LLMOverloadedError:
+            self.conversation_history.pop()
+            raise
+        except Exception as e:
+            monitor.record_failure(name, e)
+            recorded = True
+            raise
+        finally:
+            if not recorded:
+                # Abandoned, shed or empty stream: don't leave a half-open circuit waiting on it
+                monitor.breaker(name).release_trial()
+        # Keeping the reply makes the next turn extend this one's prompt prefix
+        self.add_assistant_message(reply)
+    
+    def _fallback(self) -> Optional[LLMProvider]:
+        """Offline provider used while the primary is failing, created on first need."""
+        if not self.use_fallback or self.offline_mode:
+            return None
+        if self._fallback_provider is None:
+            try:
+                self._fallback_provider = LLMFactory.create("offline")
+            except Exception as e:
+                logger.warning(f"Offline fallback unavailable: {e}")
+                return None
+        return self._fallback_provider
+    
+    def _generate(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """
+        Generate through the provider's circuit breaker, falling back to the
+        offline provider when it is failing (or racing it when hedging).
+        """
+        monitor = get_health_monitor()
+        calls = [(provider_key(self.provider), lambda: self.provider.generate_response(messages, **kwargs))]
+        fallback = self._fallback()
+        if fallback is not None:
+            calls.append(("offline", lambda: fallback.generate_response(messages, **kwargs)))
+        try:
+            if self.hedge and len(calls) > 1:
+                return hedged_call(monitor, calls)
+            return call_with_fallback(monitor, calls)
+        except ProviderUnavailableError as e:
+            return f"Error: {e}"
+    
+    def submit_background(self, messages: List[Dict[str, str]], **kwargs):
+        """
+        Queue a non-interactive request (summaries, compression) on this
+        provider's background queue.
+        
+        Returns:
+            Future resolving to the response text
+        """
+        try:
+            from .llm_batch import get_batch_queue
+        except ImportError:
+            from llm_batch import get_batch_queue
+        return get_batch_queue(self.provider).submit(messages, **kwargs)
     
     def reset(self):
         """Reset conversation history."""
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+LLM Provider Health
+One background schedule of health probes for every LLM provider (and
+internet connectivity), with results cached for a TTL so provider
+selection never waits on the network.
+
+Each provider also has a circuit breaker fed by probes and real requests:
+after consecutive failures it opens and requests go straight to the
+fallback provider instead of timing out; after a cool-down it lets a
+single trial request through (half-open) and closes again if it succeeds.
+Slow requests can optionally be hedged to a second provider once they
+pass the primary's usual latency.
+"""
+
+import logging
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Public DNS servers used to detect internet connectivity (Google, Cloudflare, OpenDNS)
+CONNECTIVITY_HOSTS = [("8.8.8.8", 53), ("1.1.1.1", 53), ("208.67.222.222", 53)]
+
+
+class ProviderUnavailableError(Exception):
+    """Raised when every provider for a request is failing or has an open circuit."""
+
+
+def is_error_response(result: Any) -> bool:
+    """Providers report failures as "Error: ..." strings rather than raising."""
+    return isinstance(result, str) and result.startswith("Error:")
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; half-opens after a cool-down."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Initialize breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial request
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a request may go to the provider; half-open lets one trial through."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_started = time.time()
+                return True
+            return False
+
+    def release_trial(self):
+        """Give back a half-open trial that ended without a success or failure."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit closed: provider recovered")
+            self._state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or (state == self.CLOSED and self.failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self.opened_at = time.time()
+                self._trial_in_flight = False
+
+    def half_open(self):
+        """Allow a trial request now (a probe saw the provider recover)."""
+        with self._lock:
+            if self._state == self.OPEN:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            elif (self._state == self.HALF_OPEN and self._trial_in_flight
+                    and time.time() - self._trial_started >= self.reset_timeout):
+                self._trial_in_flight = False  # Trial never reported back; allow another
+
+
+class HealthMonitor:
+    """Background probes, cached health and circuit breakers per provider."""
+
+    def __init__(
+        self,
+        interval: float = 30.0,
+        ttl: float = 90.0,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        latency_window: int = 200
+    ):
+        """
+        Initialize monitor.
+
+        Args:
+            interval: Seconds between probe rounds
+            ttl: Seconds a probe result stays valid
+            failure_threshold: Consecutive failures that open a provider's circuit
+            reset_timeout: Seconds an open circuit waits before a trial request
+            latency_window: Request latencies kept per provider for hedging
+        """
+        self.interval = interval
+        self.ttl = ttl
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency_window = latency_window
+
+        self._probes: Dict[str, Callable[[], Any]] = {}
+        self._health: Dict[str, Dict[str, Any]] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._callbacks: Dict[str, List[Callable[[bool], None]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="health-probe")
+
+    def register(self, name: str, probe: Callable[[], Any]):
+        """
+        Add a health probe.
+
+        Args:
+            name: Provider name (as used by the LLM scheduler: openai, gemini, ollama, ...)
+            probe: Returns a truthy value (kept as the provider's details,
+                e.g. its model list) when healthy; falsy or raising means down
+        """
+        with self._lock:
+            self._probes[name] = probe
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[name]
+
+    def subscribe(self, name: str, callback: Callable[[bool], None]):
+        """Call `callback(healthy)` whenever a provider's probed health changes."""
+        with self._lock:
+            self._callbacks.setdefault(name, []).append(callback)
+
+    # --- Probing ---
+
+    def check(self, name: str) -> bool:
+        """Run a provider's probe now and cache the result."""
+        probe = self._probes.get(name)
+        if probe is None:
+            return True
+        start = time.time()
+        try:
+            value = probe()
+            error = None if value else "probe failed"
+        except Exception as e:
+            value, error = None, str(e)
+        healthy = error is None
+
+        with self._lock:
+            previous = self._health.get(name, {}).get("healthy")
+            self._health[name] = {
+                "healthy": healthy,
+                "value": value,
+                "error": error,
+                "latency": time.time() - start,
+                "checked_at": time.time(),
+            }
+            callbacks = list(self._callbacks.get(name, [])) if previous is not None and previous != healthy else []
+
+        breaker = self.breaker(name)
+        if healthy:
+            breaker.half_open()  # Let real traffic confirm the recovery
+        else:
+            breaker.record_failure()
+        for callback in callbacks:
+            try:
+                callback(healthy)
+            except Exception as e:
+                logger.error(f"Health callback for {name} failed: {e}")
+        return healthy
+
+    def check_all(self):
+        """Probe every provider concurrently, so one slow probe does not delay the rest."""
+        futures = [self._executor.submit(self.check, name) for name in list(self._probes)]
+        wait(futures)
+
+    def start(self):
+        """Start the background probe loop (started automatically on first use)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="provider-health")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.error(f"Provider health loop error: {e}")
+
+    def _entry(self, name: str) -> Optional[Dict[str, Any]]:
+        """Cached probe result, probing synchronously only when it has expired."""
+        self.start()
+        with self._lock:
+            entry = self._health.get(name)
+        if entry is None or time.time() - entry["checked_at"] > self.ttl:
+            self.check(name)
+            with self._lock:
+                entry = self._health.get(name)
+        return entry
+
+    def is_healthy(self, name: str) -> bool:
+        """Whether a provider passed its last probe and its circuit is not open."""
+        entry = self._entry(name)
+        if entry is not None and not entry["healthy"]:
+            return False
+        return self.breaker(name).state != CircuitBreaker.OPEN
+
+    def value(self, name: str) -> Any:
+        """Details returned by a provider's last successful probe."""
+        entry = self._entry(name)
+        return entry["value"] if entry else None
+
+    # --- Request outcomes ---
+
+    def record_success(self, name: str, latency: float):
+        self.breaker(name).record_success()
+        with self._lock:
+            self._latencies.setdefault(name, deque(maxlen=self.latency_window)).append(latency)
+
+    def record_failure(self, name: str, error: Any = None):
+        logger.warning(f"LLM provider {name} failed: {error}")
+        self.breaker(name).record_failure()
+
+    def latency_percentile(self, name: str, fraction: float = 0.95, min_samples: int = 20) -> Optional[float]:
+        """A provider's request latency percentile, once enough requests were seen."""
+        with self._lock:
+            samples = sorted(self._latencies.get(name, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+    def stats(self) -> Dict[str, Any]:
+        """Health, circuit state and latency per provider."""
+        names = set(self._probes) | set(self._breakers)
+        return {
+            name: {
+                "healthy": self._health.get(name, {}).get("healthy"),
+                "error": self._health.get(name, {}).get("error"),
+                "checked_at": self._health.get(name, {}).get("checked_at"),
+                "circuit": self.breaker(name).state,
+                "failures": self.breaker(name).failures,
+                "latency_p95": self.latency_percentile(name, 0.95, min_samples=1),
+            }
+            for name in sorted(names)
+        }
+
+
+def call_with_breaker(monitor: HealthMonitor, name: str, fn: Callable[[], Any]) -> Any:
+    """
+    Run a provider call through its circuit breaker.
+
+    Raises:
+        ProviderUnavailableError: If the circuit is open or the call fails
+    """
+    if not monitor.breaker(name).allow():
+        raise ProviderUnavailableError(f"{name} circuit is open")
+    start = time.time()
+    try:
+        result = fn()
+    except Exception as e:
+        monitor.record_failure(name, e)
+        raise ProviderUnavailableError(f"{name} failed: {e}") from e
+    if is_error_response(result):
+        monitor.record_failure(name, result)
+        raise ProviderUnavailableError(f"{name} failed: {result}")
+    monitor.record_success(name, time.time() - start)
+    return result
+
+
+def call_with_fallback(monitor: HealthMonitor, calls: List[Tuple[str, Callable[[], Any]]]) -> Any:
+    """
+    Try providers in order, skipping open circuits.
+
+    Args:
+        monitor: Health monitor
+        calls: (provider name, call) pairs, preferred first
+
+    Raises:
+        ProviderUnavailableError: If every provider is unavailable
+    """
+    errors = []
+    for name, fn in calls:
+        try:
+            return call_with_breaker(monitor, name, fn)
+        except ProviderUnavailableError as e:
+            errors.append(str(e))
+    raise ProviderUnavailableError("; ".join(errors) or "no providers")
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+
+def hedged_call(
+    monitor: HealthMonitor,
+    calls: List[Tuple[str, Callable[[], Any]]],
+    percentile: float = 0.95,
+    default_delay: float = 2.0
+) -> Any:
+    """
+    Run the preferred provider, and start the next one too if it is slower
+    than its usual `percentile` latency; the first success wins.
+
+    Args:
+        monitor: Health monitor
+        calls: (provider name, call) pairs, preferred first
+        percentile: Primary latency percentile after which to hedge
+        default_delay: Hedge delay before enough latencies are known
+
+    Raises:
+        ProviderUnavailableError: If every provider is unavailable
+    """
+    pending = {}
+    errors = []
+    remaining = list(calls)
+
+    def launch():
+        while remaining:
+            name, fn = remaining.pop(0)
+            if monitor.breaker(name).state == CircuitBreaker.OPEN:
+                errors.append(f"{name} circuit is open")
+                continue
+            pending[_hedge_executor.submit(call_with_breaker, monitor, name, fn)] = name
+            return name
+        return None
+
+    primary = launch()
+    while pending:
+        delay = None
+        if remaining:
+            delay = monitor.latency_percentile(primary, percentile) or default_delay
+        done, _ = wait(list(pending), timeout=delay, return_when=FIRST_COMPLETED)
+        if not done:
+            hedge = launch()  # Primary is slow; race the next provider
+            if hedge:
+                logger.info(f"Hedging slow {primary} request to {hedge}")
+            continue
+        for future in done:
+            pending.pop(future)
+            try:
+                return future.result()
+            except ProviderUnavailableError as e:
+                errors.append(str(e))
+        if not pending:
+            launch()
+    raise ProviderUnavailableError("; ".join(errors) or "no providers")
+
+
+def probe_internet(timeout: float = 3.0) -> bool:
+    """Health probe: whether any public DNS server accepts a connection."""
+    for host, port in CONNECTIVITY_HOSTS:
+        try:
+            socket.create_connection((host, port), timeout=timeout).close()
+            return True
+        except OSError:
+            continue
+    return False
+
+
+_monitor: Optional[HealthMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_health_monitor() -> HealthMonitor:
+    """Returns the process-wide provider health monitor."""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = HealthMonitor()
+            _monitor.register("internet", probe_internet)
+        return _monitor
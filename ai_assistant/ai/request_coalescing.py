@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Chat Request Coalescing
+Singleflight for identical concurrent chat requests.
+
+Dashboards polling the same prompt and mobile clients re-sending a message
+produce several identical chat requests in flight at once, each paying for
+a full generation, web search and memory write. Requests are keyed on the
+normalized message plus a fingerprint of everything else the answer
+depends on (context, attachments, model, conversation); while a key is in
+flight, later requests attach to the leader instead of running again.
+Blocking callers share the leader's result, streaming callers replay the
+tokens produced so far and then follow the live stream.
+
+Scope decides who may share: "user" coalesces only within one user or
+session, "global" also across users for stateless requests (no context or
+conversation), and "off" disables coalescing.
+"""
+
+import contextvars
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ("user", "global", "off")
+
+_TRAILING_PUNCTUATION_RE = re.compile(r"[.!?,;:…]+$")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    """
+    Normalize a chat message for coalescing.
+
+    Only case, whitespace and trailing punctuation are ignored ("What's the
+    weather?" == "what's the  weather"); other symbols change the meaning
+    ("2+2" vs "22", "C++" vs "C") and stay in the key.
+    """
+    key = _WHITESPACE_RE.sub(" ", (message or "").casefold()).strip()
+    return _TRAILING_PUNCTUATION_RE.sub("", key).rstrip()
+
+
+def context_fingerprint(*parts: Any) -> str:
+    """Stable short hash of the request state an answer depends on."""
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+
+
+class _Flight:
+    """One in-flight request: its result, or the tokens streamed so far."""
+
+    def __init__(self, streaming: bool):
+        self.streaming = streaming
+        self.done = threading.Condition()
+        self.finished = False
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.tokens: List[str] = []
+        self.followers = 0
+
+
+class RequestCoalescer:
+    """Deduplicates concurrent identical chat requests per endpoint."""
+
+    def __init__(self, scope: Optional[str] = None):
+        """
+        Initialize the coalescer.
+
+        Args:
+            scope: "user", "global" or "off" (default from CHAT_COALESCE_SCOPE, else "user")
+        """
+        scope = (scope or os.getenv("CHAT_COALESCE_SCOPE", "user")).lower()
+        if scope not in SCOPES:
+            logger.warning(f"Unknown coalescing scope '{scope}', using 'user'")
+            scope = "user"
+        self.scope = scope
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._requests: Counter = Counter()
+        self._coalesced: Counter = Counter()
+
+    def key(self, endpoint: str, message: str, user: Optional[str] = None,
+            context: Any = None, stateless: bool = False) -> Optional[str]:
+        """
+        Build the coalescing key for a request.
+
+        Args:
+            endpoint: Endpoint name; requests only coalesce within one endpoint
+            message: User message
+            user: User or session the request belongs to
+            context: Everything else the answer depends on (fingerprinted)
+            stateless: Whether the answer is independent of the user's state
+
+        Returns:
+            Key, or None when coalescing is off
+        """
+        if self.scope == "off":
+            return None
+        owner = "*" if self.scope == "global" and stateless else (user or "anonymous")
+        return f"{endpoint}|{owner}|{context_fingerprint(context)}|{normalize_message(message)}"
+
+    def _join(self, key: str, endpoint: str, streaming: bool) -> Tuple[_Flight, bool]:
+        """Attach to the flight for key, starting one if none is running."""
+        with self._lock:
+            self._requests[endpoint] += 1
+            flight = self._flights.get(key)
+            if flight is not None and flight.streaming == streaming:
+                flight.followers += 1
+                self._coalesced[endpoint] += 1
+                return flight, False
+            flight = _Flight(streaming)
+            self._flights[key] = flight
+            return flight, True
+
+    def _land(self, key: str, flight: _Flight):
+        """Mark a flight finished and let later requests start a new one."""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        with flight.done:
+            flight.finished = True
+            flight.done.notify_all()
+        if flight.followers:
+            logger.info(f"Coalesced {flight.followers} duplicate chat request(s)")
+
+    def do(self, endpoint: str, key: Optional[str], fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once among concurrent callers with the same key.
+
+        Args:
+            endpoint: Endpoint name for metrics
+            key: Coalescing key from key(); None runs fn directly
+            fn: Produces the response
+
+        Returns:
+            (result, shared) where shared is True for followers, who get a copy
+        """
+        if key is None:
+            return fn(), False
+
+        flight, leader = self._join(key, endpoint, streaming=False)
+        if not leader:
+            with flight.done:
+                flight.done.wait_for(lambda: flight.finished)
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result), True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+        return flight.result, False
+
+    def stream(self, endpoint: str, key: Optional[str],
+               fn: Callable[[], Iterable[str]]) -> Tuple[Generator[str, None, None], bool]:
+        """
+        Stream fn's tokens once among concurrent callers with the same key.
+
+        The leader's tokens are produced on a background thread into a
+        shared buffer, so a client disconnecting does not cut off the
+        others. Followers first get the tokens streamed so far.
+
+        Args:
+            endpoint: Endpoint name for metrics
+            key: Coalescing key from key(); None streams fn directly
+            fn: Returns the token iterator
+
+        Returns:
+            (tokens, shared) where shared is True for followers
+        """
+        if key is None:
+            return iter(fn()), False
+
+        flight, leader = self._join(key, endpoint, streaming=True)
+        if leader:
+            # Run in a copy of this context so scheduler priority and session carry over
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._pump, key, flight, fn),
+                name="chat-coalesce", daemon=True
+            ).start()
+        return self._follow(flight), not leader
+
+    def _pump(self, key: str, flight: _Flight, fn: Callable[[], Iterable[str]]):
+        """Produce the leader's tokens into the flight's buffer."""
+        try:
+            for token in fn():
+                with flight.done:
+                    flight.tokens.append(token)
+                    flight.done.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            self._land(key, flight)
+
+    def _follow(self, flight: _Flight) -> Generator[str, None, None]:
+        """Yield a flight's tokens from the start, then as they arrive."""
+        index = 0
+        while True:
+            with flight.done:
+                flight.done.wait_for(lambda: index < len(flight.tokens) or flight.finished)
+                tokens = flight.tokens[index:]
+                finished = flight.finished
+            index += len(tokens)
+            for token in tokens:
+                yield token
+            if finished and index >= len(flight.tokens):
+                break
+        if flight.error is not None:
+            raise flight.error
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests and coalesced duplicates per endpoint."""
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    "requests": count,
+                    "coalesced": self._coalesced[endpoint],
+                    "coalesced_ratio": round(self._coalesced[endpoint] / count, 3)
+                }
+                for endpoint, count in self._requests.items()
+            }
+            return {
+                "scope": self.scope,
+                "in_flight": len(self._flights),
+                "requests": sum(self._requests.values()),
+                "coalesced": sum(self._coalesced.values()),
+                "endpoints": endpoints
+            }
+
+
+_coalescer: Optional[RequestCoalescer] = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer() -> RequestCoalescer:
+    """Get the process-wide chat request coalescer."""
+    global _coalescer
+    with _coalescer_lock:
+        if _coalescer is None:
+            _coalescer = RequestCoalescer()
+        return _coalescer
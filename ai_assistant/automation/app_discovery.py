@@ -5,65 +5,176 @@ and provides intelligent app launching based on voice commands.
 """
 
 import os
-import winreg
 import json
 import subprocess
 import glob
 from pathlib import Path
 import time
+import math
+import heapq
+import atexit
 import sqlite3
-from typing import Dict, List, Tuple
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime
 
+try:
+    import winreg
+except ImportError:
+    winreg = None
+
+try:
+    from .app_index import AppIndex, IndexedAppDict
+    from .app_inventory import (AppInventory, AppScanner, InventoryChange, directory_fingerprint,
+                                scan_desktop_entries, desktop_entry_directories)
+except ImportError:
+    from app_index import AppIndex, IndexedAppDict
+    from app_inventory import (AppInventory, AppScanner, InventoryChange, directory_fingerprint,
+                               scan_desktop_entries, desktop_entry_directories)
+
 class AppDiscovery:
+    # Pending launches are written to SQLite once this many accumulate
+    # or this many seconds have passed since the last flush
+    USAGE_FLUSH_COUNT = 20
+    USAGE_FLUSH_INTERVAL = 30.0
+    
+    REGISTRY_PATHS = [
+        r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall",
+        r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"
+    ]
+    PROGRAM_DIRS = [
+        r"C:\Program Files",
+        r"C:\Program Files (x86)"
+    ]
+    
     def __init__(self):
         self.apps_cache_file = "discovered_apps.json"
         self.usage_db_file = "app_usage.db"
+        self.inventory_db_file = "app_inventory.db"
+        self._inventory: Optional[AppInventory] = None
+        self._catalog_synced = False
+        self.index = AppIndex()
+        self._usage_counts: Dict[str, int] = {}
+        self._pending_launches: List[Tuple[str, str, bool, str]] = []
+        self._last_usage_flush = time.monotonic()
+        self._usage_lock = threading.Lock()
         self.apps_database = {}
         self.load_cache()
         self._init_usage_database()
+        atexit.register(self.flush_usage)
+    
+    @property
+    def apps_database(self) -> Dict[str, str]:
+        return self._apps_database
+    
+    @apps_database.setter
+    def apps_database(self, apps: Dict[str, str]):
+        # Every mutation of the catalog keeps the lookup index in sync
+        self._apps_database = IndexedAppDict(self.index, apps)
+    
+    @property
+    def inventory(self) -> AppInventory:
+        """Incremental scanner inventory, created on first use"""
+        if self._inventory is None:
+            self._inventory = AppInventory(self._build_scanners(), db_path=self.inventory_db_file)
+            self._inventory.subscribe(self._apply_inventory_change)
+        return self._inventory
+    
+    def _build_scanners(self) -> List[AppScanner]:
+        """Scanners for this platform, in merge order (later ones win)"""
+        if os.name != 'nt':
+            return [AppScanner('desktop_entries',
+                               lambda: scan_desktop_entries(desktop_entry_directories()),
+                               lambda: directory_fingerprint(desktop_entry_directories()))]
+        return [
+            AppScanner('registry', self._scan_registry_programs, self._registry_fingerprint),
+            AppScanner('program_files', self._scan_program_files,
+                       lambda: directory_fingerprint(self.PROGRAM_DIRS, depth=2)),
+            AppScanner('windows_store', self._scan_windows_store_apps,
+                       lambda: directory_fingerprint(self._store_app_dirs(), depth=0)),
+            AppScanner('start_menu', self._scan_start_menu,
+                       lambda: directory_fingerprint(self._start_menu_dirs(), depth=3), needs_com=True),
+            AppScanner('appdata', self._scan_appdata_programs,
+                       lambda: directory_fingerprint(self._appdata_dirs(), depth=2)),
+            AppScanner('system_utilities', self._get_system_utilities, lambda: 'static'),
+        ]
     
-    def scan_installed_applications(self) -> Dict[str, str]:
+    def scan_installed_applications(self, force: bool = False) -> Dict[str, str]:
         """
-        Comprehensive scan of all installed applications on the system
-        """
-        print("🔍 Scanning system for installed applications...")
-        apps = {}
-        
-        # Method 1: Windows Registry - Installed Programs
-        apps.update(self._scan_registry_programs())
+        Comprehensive scan of all installed applications on the system.
         
-        # Method 2: Program Files directories
-        apps.update(self._scan_program_files())
+        Scanners run concurrently and sources that have not changed since
+        the last scan are skipped; only the differences are applied.
         
-        # Method 3: Windows Store apps
-        apps.update(self._scan_windows_store_apps())
-        
-        # Method 4: Start Menu shortcuts
-        apps.update(self._scan_start_menu())
-        
-        # Method 5: User AppData programs
-        apps.update(self._scan_appdata_programs())
-        
-        # Method 6: Common system utilities
-        apps.update(self._get_system_utilities())
-        
-        # Save to cache
-        self.apps_database = apps
-        self.save_cache()
-        
-        print(f"✅ Discovery complete! Found {len(apps)} applications.")
-        return apps
+        Args:
+            force: Rescan every source even if it looks unchanged
+        """
+        print("🔍 Scanning system for installed applications...")
+        change = self.inventory.refresh(force=force)
+        print(f"✅ Discovery complete! Found {len(self.apps_database)} applications ({change.summary()}).")
+        return self.apps_database
+    
+    def scan_in_background(self, force: bool = False) -> Future:
+        """Start a scan without blocking; the database updates when it finishes"""
+        return self.inventory.refresh_async(force=force)
+    
+    def _apply_inventory_change(self, change: InventoryChange):
+        """Apply an inventory diff to the app database and cache"""
+        # Diffs are against the persisted inventory, not this catalog, so the
+        # catalog is seeded from the full inventory on the first change of a
+        # session (it came from the JSON cache) and whenever a diff shows the
+        # two have drifted apart; otherwise only the diff is applied
+        apps = self.apps_database
+        reseed = (change.initial or not self._catalog_synced
+                  or any(name not in apps for name in change.removed)
+                  or any(name in apps for name in change.added)
+                  or any(name not in apps for name in change.changed))
+        if reseed:
+            self.apps_database = self.inventory.apps
+            self._catalog_synced = True
+        else:
+            for name in change.removed:
+                apps.pop(name, None)
+            apps.update(change.added)
+            apps.update(change.changed)
+        if reseed or not change.empty:
+            self.save_cache()
+    
+    def _registry_fingerprint(self) -> Dict[str, List[int]]:
+        """Subkey count and last write time of the uninstall keys"""
+        stamps = {}
+        for reg_path in self.REGISTRY_PATHS:
+            try:
+                with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, reg_path) as key:
+                    info = winreg.QueryInfoKey(key)
+                    stamps[reg_path] = [info[0], info[2]]
+            except OSError:
+                continue
+        return stamps
+    
+    def _store_app_dirs(self) -> List[str]:
+        return [
+            os.path.expandvars(r"%ProgramFiles%\WindowsApps"),
+            os.path.expandvars(r"%LOCALAPPDATA%\Packages")
+        ]
+    
+    def _start_menu_dirs(self) -> List[str]:
+        return [
+            os.path.expandvars(r"%APPDATA%\Microsoft\Windows\Start Menu\Programs"),
+            os.path.expandvars(r"%PROGRAMDATA%\Microsoft\Windows\Start Menu\Programs")
+        ]
+    
+    def _appdata_dirs(self) -> List[str]:
+        return [
+            os.path.expandvars(r"%LOCALAPPDATA%\Programs"),
+            os.path.expandvars(r"%APPDATA%")
+        ]
     
     def _scan_registry_programs(self) -> Dict[str, str]:
         """Scan Windows Registry for installed programs"""
         apps = {}
-        registry_paths = [
-            r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall",
-            r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"
-        ]
-        
-        for reg_path in registry_paths:
+        for reg_path in self.REGISTRY_PATHS:
             try:
                 with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, reg_path) as key:
                     for i in range(winreg.QueryInfoKey(key)[0]):
@@ -93,12 +204,7 @@ class AppDiscovery:
     def _scan_program_files(self) -> Dict[str, str]:
         """Scan Program Files directories"""
         apps = {}
-        program_dirs = [
-            r"C:\Program Files",
-            r"C:\Program Files (x86)"
-        ]
-        
-        for program_dir in program_dirs:
+        for program_dir in self.PROGRAM_DIRS:
             if os.path.exists(program_dir):
                 for folder in os.listdir(program_dir):
                     folder_path = os.path.join(program_dir, folder)
@@ -141,12 +247,7 @@ class AppDiscovery:
     def _scan_start_menu(self) -> Dict[str, str]:
         """Scan Start Menu shortcuts"""
         apps = {}
-        start_menu_paths = [
-            os.path.expandvars(r"%APPDATA%\Microsoft\Windows\Start Menu\Programs"),
-            os.path.expandvars(r"%PROGRAMDATA%\Microsoft\Windows\Start Menu\Programs")
-        ]
-        
-        for start_path in start_menu_paths:
+        for start_path in self._start_menu_dirs():
             if os.path.exists(start_path):
                 for root, dirs, files in os.walk(start_path):
                     for file in files:
@@ -162,12 +263,7 @@ class AppDiscovery:
     def _scan_appdata_programs(self) -> Dict[str, str]:
         """Scan user AppData for installed programs"""
         apps = {}
-        appdata_paths = [
-            os.path.expandvars(r"%LOCALAPPDATA%\Programs"),
-            os.path.expandvars(r"%APPDATA%")
-        ]
-        
-        for appdata_path in appdata_paths:
+        for appdata_path in self._appdata_dirs():
             if os.path.exists(appdata_path):
                 for item in os.listdir(appdata_path):
                     item_path = os.path.join(appdata_path, item)
@@ -340,49 +436,69 @@ class AppDiscovery:
                 """)
                 
                 conn.commit()
+                
+                # Launch counts are served from memory; SQLite is the durable copy
+                counts = dict(conn.execute("SELECT app_name, launch_count FROM app_frequency").fetchall())
+            with self._usage_lock:
+                self._usage_counts = counts
+                self._pending_launches = []
         except Exception as e:
             print(f"Error initializing usage database: {e}")
     
     def track_app_launch(self, app_name: str, app_path: str = "", success: bool = True):
         """Track an application launch for usage statistics."""
+        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+        with self._usage_lock:
+            self._usage_counts[app_name] = self._usage_counts.get(app_name, 0) + 1
+            self._pending_launches.append((app_name, app_path, success, timestamp))
+            due = (len(self._pending_launches) >= self.USAGE_FLUSH_COUNT or
+                   time.monotonic() - self._last_usage_flush >= self.USAGE_FLUSH_INTERVAL)
+        if due:
+            self.flush_usage()
+    
+    def flush_usage(self):
+        """Write pending launches to the usage database in one transaction."""
+        with self._usage_lock:
+            pending, self._pending_launches = self._pending_launches, []
+            self._last_usage_flush = time.monotonic()
+        if not pending:
+            return
         try:
             with sqlite3.connect(self.usage_db_file) as conn:
-                # Record launch
-                conn.execute("""
-                    INSERT INTO app_launches (app_name, app_path, success)
-                    VALUES (?, ?, ?)
-                """, (app_name, app_path, success))
+                # Record launches
+                conn.executemany("""
+                    INSERT INTO app_launches (app_name, app_path, success, timestamp)
+                    VALUES (?, ?, ?, ?)
+                """, pending)
                 
                 # Update frequency table
-                conn.execute("""
+                conn.executemany("""
                     INSERT INTO app_frequency (app_name, launch_count, last_launched)
-                    VALUES (?, 1, CURRENT_TIMESTAMP)
+                    VALUES (?, 1, ?)
                     ON CONFLICT(app_name) DO UPDATE SET
                         launch_count = launch_count + 1,
-                        last_launched = CURRENT_TIMESTAMP
-                """, (app_name,))
+                        last_launched = excluded.last_launched
+                """, [(name, ts) for name, _, _, ts in pending])
                 
                 conn.commit()
         except Exception as e:
             print(f"Error tracking app launch: {e}")
+            with self._usage_lock:
+                self._pending_launches = pending + self._pending_launches
+    
+    def get_usage_count(self, app_name: str) -> int:
+        """Get the launch count for an application (from memory)."""
+        return self._usage_counts.get(app_name, 0)
     
     def get_most_used_apps(self, limit: int = 10) -> List[Tuple[str, int]]:
         """Get most frequently used applications."""
-        try:
-            with sqlite3.connect(self.usage_db_file) as conn:
-                cursor = conn.execute("""
-                    SELECT app_name, launch_count
-                    FROM app_frequency
-                    ORDER BY launch_count DESC
-                    LIMIT ?
-                """, (limit,))
-                return cursor.fetchall()
-        except Exception as e:
-            print(f"Error getting most used apps: {e}")
-            return []
+        with self._usage_lock:
+            counts = list(self._usage_counts.items())
+        return heapq.nlargest(limit, counts, key=lambda item: item[1])
     
     def get_recent_apps(self, limit: int = 10) -> List[Tuple[str, str]]:
         """Get recently launched applications."""
+        self.flush_usage()
         try:
             with sqlite3.connect(self.usage_db_file) as conn:
                 cursor = conn.execute("""
@@ -400,24 +516,95 @@ class AppDiscovery:
     
     def find_app(self, app_name: str) -> str:
         """Find application by name using advanced fuzzy matching with usage-based ranking."""
-        app_name_lower = app_name.lower().strip()
+        matches = self._ranked_matches(app_name.lower().strip(), limit=1)
+        return matches[0][1] if matches else ""
+    
+    def _ranked_matches(self, query: str, limit: int) -> List[Tuple[str, str, int]]:
+        """
+        Return the top matches for a query without scoring the whole catalog.
         
-        # Get usage statistics for ranking boost
-        most_used = {name.lower(): count for name, count in self.get_most_used_apps(100)}
+        The index yields candidates grouped by an upper bound on their
+        _calculate_match_score; groups are scored best-first and the scan
+        stops once the k-th best result beats every remaining bound (ties
+        going to the app inserted first, as in a full scan).
+        """
+        if not query or limit <= 0:
+            return []
         
-        matches = []
+        index = self.index
+        top: List[Tuple[int, int, str]] = []  # min-heap of (score, -order, name)
+        scored = set()
         
-        for db_name, db_path in self.apps_database.items():
-            score = self._calculate_match_score(app_name_lower, db_name, most_used.get(db_name, 0))
+        def consider(db_name: str):
+            scored.add(db_name)
+            usage = self._usage_counts.get(db_name, 0)
+            score = max(self._calculate_match_score(query, alias, usage)
+                        for alias in index.aliases(db_name) or [db_name])
             if score > 0:
-                matches.append((score, db_name, db_path))
-        
-        if not matches:
-            return ""
-        
-        # Sort by score (highest first) and return best match
-        matches.sort(reverse=True, key=lambda x: x[0])
-        return matches[0][2]
+                entry = (score, -index.order(db_name), db_name)
+                if len(top) < limit:
+                    heapq.heappush(top, entry)
+                elif entry > top[0]:
+                    heapq.heapreplace(top, entry)
+        
+        def beaten(bound: int, order: Optional[int] = None) -> bool:
+            """Whether an app scoring at most bound (inserted at order, if known) can't enter the top"""
+            if len(top) < limit:
+                return False
+            score, negative_order, _ = top[0]
+            # Equal scores rank by insertion order, so a tie only loses to an earlier app
+            return score > bound or (score == bound and order is not None and order > -negative_order)
+        
+        # Launched apps get a usage boost on any query, so score them directly
+        for db_name in list(self._usage_counts):
+            if db_name in self._apps_database:
+                consider(db_name)
+        
+        exact = index.exact(query)
+        containing = index.containing(query)
+        within = index.names_within(query)
+        word_total = len(set(query.split()))
+        by_count = index.word_groups(query.split())
+        any_word = set().union(*by_count.values())
+        
+        # Group candidates by bound with set operations rather than per app:
+        # the bound depends on the number of shared words and on membership
+        # in the exact / containing / within sets
+        special = exact | containing | within
+        by_count[0] = special.difference(any_word)
+        
+        bounds: Dict[int, Set[str]] = {}
+        for count, group in by_count.items():
+            parts = [(group - scored, 10 * count + 30 * (count == word_total))]
+            for members, weight in ((exact, 100), (containing, 70), (within, 40)):
+                if members:
+                    parts = [split for subset, bound in parts
+                             for split in ((subset & members, bound + weight), (subset - members, bound))]
+            for part, bound in parts:
+                if part:
+                    bounds.setdefault(bound, set()).update(part)
+        
+        for bound in sorted(bounds, reverse=True):
+            if beaten(bound):
+                break
+            for db_name in sorted(bounds[bound], key=index.order_key):
+                if beaten(bound, index.order(db_name)):
+                    break
+                consider(db_name)
+        
+        # Typo matches score at most 20 and only for apps nothing else matched
+        if not beaten(20):
+            # With the top already at 20, only an identical bigram set can still tie
+            threshold = 0.99 if len(top) >= limit and top[0][0] == 20 else 0.7
+            fuzzy = index.similar(query, threshold) - special - scored
+            fuzzy.difference_update(any_word)
+            for db_name in sorted(fuzzy, key=index.order_key):
+                if beaten(20, index.order(db_name)):
+                    break
+                consider(db_name)
+        
+        ranked = sorted(top, reverse=True)
+        return [(name, self._apps_database[name], score) for score, _, name in ranked]
     
     def _calculate_match_score(self, query: str, app_name: str, usage_count: int = 0) -> int:
         """Calculate match score for fuzzy search with usage-based ranking."""
@@ -459,7 +646,6 @@ class AppDiscovery:
         
         # Boost by usage frequency (logarithmic scale)
         if usage_count > 0:
-            import math
             score += int(math.log(usage_count + 1) * 5)
         
         return score
@@ -486,18 +672,7 @@ class AppDiscovery:
     
     def search_apps(self, query: str, limit: int = 10) -> List[Tuple[str, str, int]]:
         """Search for apps with scoring and ranking."""
-        query_lower = query.lower().strip()
-        most_used = {name.lower(): count for name, count in self.get_most_used_apps(100)}
-        
-        matches = []
-        for db_name, db_path in self.apps_database.items():
-            score = self._calculate_match_score(query_lower, db_name, most_used.get(db_name, 0))
-            if score > 0:
-                matches.append((db_name, db_path, score))
-        
-        # Sort by score and return top matches
-        matches.sort(reverse=True, key=lambda x: x[2])
-        return matches[:limit]
+        return self._ranked_matches(query.lower().strip(), limit)
     
     def get_all_apps(self) -> Dict[str, str]:
         """Get all discovered applications"""
@@ -509,8 +684,7 @@ class AppDiscovery:
         
         for app_name, app_path in self.apps_database.items():
             # Get usage data
-            most_used = dict(self.get_most_used_apps(100))
-            usage_count = most_used.get(app_name, 0)
+            usage_count = self.get_usage_count(app_name)
             
             # Categorize app
             category = self._categorize_app(app_name)
@@ -606,6 +780,10 @@ def smart_open_application(app_name: str) -> str:
                 # Windows Store app - use subprocess for security
                 import subprocess
                 subprocess.Popen(app_path, shell=True)
+            elif not hasattr(os, 'startfile'):
+                # Desktop entry Exec command (Linux)
+                import shlex
+                subprocess.Popen(shlex.split(app_path))
             else:
                 # Regular executable - use os.startfile (safe)
                 os.startfile(app_path)
@@ -0,0 +1,341 @@
+# Application Lookup Index
+"""
+In-memory index used by AppDiscovery to answer "open X" lookups without
+scoring every installed application:
+- Prefix trie over app names and aliases (reverse-substring lookups)
+- Trigram inverted index (substring candidates)
+- Bigram inverted index (fuzzy candidates for typo matching)
+- Word inverted index (word-based matching)
+Names, aliases and n-gram sets are computed once when an app is added.
+"""
+
+import itertools
+import ntpath
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+_SEPARATORS = re.compile(r"[_\s]+")
+
+
+def normalize_app_name(name: str) -> str:
+    """Lowercase and strip an app name (underscores count as spaces)"""
+    return _SEPARATORS.sub(" ", name.lower()).strip()
+
+
+def _ngrams(text: str, n: int) -> Set[str]:
+    return set(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def app_aliases(name: str, path: str = "") -> List[str]:
+    """
+    Alternative names an app can be found by: the raw lowercase key, its
+    normalized form and the executable's file stem (e.g. "winword").
+    """
+    aliases = [name.lower().strip()]
+    normalized = normalize_app_name(name)
+    if normalized not in aliases:
+        aliases.append(normalized)
+    if path and path.lower().endswith(".exe") and " shell:" not in path:
+        stem = ntpath.splitext(ntpath.basename(path))[0].lower()
+        if stem and stem not in aliases:
+            aliases.append(stem)
+    return aliases
+
+
+class _TrieNode:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.terminal: Set[str] = set()
+
+
+class AppIndex:
+    """
+    Candidate index over application names.
+
+    Lookups return the set of app keys that can possibly score above zero
+    with AppDiscovery._calculate_match_score, so the (unchanged) scoring
+    runs only on a handful of apps instead of the whole catalog.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._aliases: Dict[str, List[str]] = {}
+        self._trie = _TrieNode()
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._bigrams: Dict[str, Set[str]] = {}
+        self._words: Dict[str, Set[str]] = {}
+        self._bigram_sizes: Dict[int, Set[str]] = {}
+        self._order: Dict[str, int] = {}
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._aliases)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._aliases
+
+    def aliases(self, key: str) -> List[str]:
+        """Precomputed aliases for an indexed app"""
+        return self._aliases.get(key, [])
+
+    def order(self, key: str) -> int:
+        """Insertion order of an app, used to break score ties like a dict scan would"""
+        return self._order.get(key, 0)
+
+    @property
+    def order_key(self):
+        """Fast sort key for indexed app names (insertion order)"""
+        return self._order.__getitem__
+
+    def rebuild(self, apps: Dict[str, str]):
+        """Replace the index contents with a full catalog"""
+        with self._lock:
+            self._aliases.clear()
+            self._trie = _TrieNode()
+            self._trigrams.clear()
+            self._bigrams.clear()
+            self._words.clear()
+            self._bigram_sizes.clear()
+            self._order.clear()
+            for key, path in apps.items():
+                self.add(key, path)
+
+    def add(self, key: str, path: str = ""):
+        """Index (or re-index) one app"""
+        with self._lock:
+            if key in self._aliases:
+                self.remove(key)
+            aliases = app_aliases(key, path or "")
+            self._aliases[key] = aliases
+            self._order[key] = next(self._sequence)
+            for alias in aliases:
+                self._trie_insert(alias, key)
+                for gram in _ngrams(alias, 3):
+                    self._trigrams.setdefault(gram, set()).add(key)
+                bigrams = _ngrams(alias, 2)
+                for gram in bigrams:
+                    self._bigrams.setdefault(gram, set()).add(key)
+                self._bigram_sizes.setdefault(len(bigrams), set()).add(key)
+                for word in alias.split():
+                    self._words.setdefault(word, set()).add(key)
+
+    def remove(self, key: str):
+        """Drop one app from the index"""
+        with self._lock:
+            aliases = self._aliases.pop(key, None)
+            self._order.pop(key, None)
+            if not aliases:
+                return
+            for alias in aliases:
+                self._trie_remove(alias, key)
+                for gram in _ngrams(alias, 3):
+                    self._discard(self._trigrams, gram, key)
+                bigrams = _ngrams(alias, 2)
+                for gram in bigrams:
+                    self._discard(self._bigrams, gram, key)
+                self._discard(self._bigram_sizes, len(bigrams), key)
+                for word in alias.split():
+                    self._discard(self._words, word, key)
+
+    @staticmethod
+    def _discard(postings: Dict[str, Set[str]], token: str, key: str):
+        keys = postings.get(token)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del postings[token]
+
+    def _trie_insert(self, text: str, key: str):
+        node = self._trie
+        for char in text:
+            node = node.children.setdefault(char, _TrieNode())
+        node.terminal.add(key)
+
+    def _trie_remove(self, text: str, key: str):
+        node = self._trie
+        for char in text:
+            node = node.children.get(char)
+            if node is None:
+                return
+        node.terminal.discard(key)
+
+    def exact(self, query: str) -> Set[str]:
+        """Apps with a name or alias equal to the query"""
+        node = self._trie
+        for char in query:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return set(node.terminal)
+
+    def names_within(self, query: str) -> Set[str]:
+        """Apps whose name or alias occurs as a substring of the query"""
+        found = set()
+        for start in range(len(query)):
+            node = self._trie
+            for char in query[start:]:
+                node = node.children.get(char)
+                if node is None:
+                    break
+                found.update(node.terminal)
+        return found
+
+    def containing(self, query: str) -> Set[str]:
+        """Apps whose name or alias may contain the query as a substring"""
+        if len(query) < 3:
+            if len(query) < 2:
+                # Single characters: every app containing it
+                return {key for key, aliases in self._aliases.items()
+                        if any(query in alias for alias in aliases)}
+            return set(self._bigrams.get(query, ()))
+        result: Optional[Set[str]] = None
+        for gram in sorted(_ngrams(query, 3), key=lambda g: len(self._trigrams.get(g, ()))):
+            postings = self._trigrams.get(gram)
+            if not postings:
+                return set()
+            result = set(postings) if result is None else result & postings
+            if not result:
+                return set()
+        return result or set()
+
+    def word_counts(self, words: Iterable[str]) -> Counter:
+        """Number of the given words each app has in its name or aliases"""
+        counts = Counter()
+        for word in set(words):
+            counts.update(self._words.get(word, ()))
+        return counts
+
+    def word_groups(self, words: Iterable[str]) -> Dict[int, Set[str]]:
+        """
+        Apps grouped by how many of the given words they have. Short queries
+        are split with set operations rather than counting every posting.
+        """
+        postings = [self._words.get(word, set()) for word in set(words)]
+        postings = [keys for keys in postings if keys]
+        groups: Dict[int, Set[str]] = {}
+        if len(postings) > 4:
+            for key, count in Counter(itertools.chain.from_iterable(postings)).items():
+                groups.setdefault(count, set()).add(key)
+            return groups
+        for size in range(len(postings), 0, -1):
+            for chosen in itertools.combinations(range(len(postings)), size):
+                region = set.intersection(*(postings[i] for i in chosen))
+                for i in range(len(postings)):
+                    if region and i not in chosen:
+                        region -= postings[i]
+                if region:
+                    groups.setdefault(size, set()).update(region)
+        return groups
+
+    def similar(self, query: str, threshold: float = 0.7) -> Set[str]:
+        """Apps whose bigram Jaccard similarity with the query can exceed threshold"""
+        query_bigrams = _ngrams(query, 2)
+        if not query_bigrams:
+            return set()
+        size = len(query_bigrams)
+        # Jaccard > t requires |A & B| > t * |B| and t * |B| < |A| < |B| / t
+        minimum = threshold * size
+        # Prefix filter: a match must share one of the rarest size - floor(t*size) bigrams
+        ranked = sorted(query_bigrams, key=lambda g: len(self._bigrams.get(g, ())))
+        prefix: Set[str] = set()
+        for gram in ranked[:size - int(minimum)]:
+            prefix |= self._bigrams.get(gram, set())
+        if not prefix:
+            return set()
+        # Then the size filter; intersecting from the small prefix side keeps
+        # this independent of how many apps have names of a similar length
+        pool: Set[str] = set()
+        for length in range(int(minimum) + 1, int(size / threshold) + 1):
+            pool |= prefix.intersection(self._bigram_sizes.get(length, ()))
+        if not pool:
+            return set()
+        shared = Counter()
+        for gram in query_bigrams:
+            shared.update(self._bigrams.get(gram, set()) & pool)
+        return {key for key, count in shared.items() if count > minimum}
+
+    def candidates(self, query: str) -> Set[str]:
+        """All apps that can match the query by substring, word or fuzzy similarity"""
+        query = query.lower().strip()
+        if not query:
+            return set()
+        with self._lock:
+            found = self.containing(query)
+            found |= self.names_within(query)
+            found.update(self.word_counts(query.split()))
+            found |= self.similar(query)
+            return found
+
+    def prefix_search(self, prefix: str, limit: int = 10) -> List[str]:
+        """App keys with a name or alias starting with prefix"""
+        prefix = prefix.lower().strip()
+        with self._lock:
+            node = self._trie
+            for char in prefix:
+                node = node.children.get(char)
+                if node is None:
+                    return []
+            found: List[str] = []
+            stack: List[_TrieNode] = [node]
+            while stack and len(found) < limit:
+                current = stack.pop()
+                for key in sorted(current.terminal):
+                    if key not in found:
+                        found.append(key)
+                stack.extend(child for _, child in sorted(current.children.items(), reverse=True))
+            return found[:limit]
+
+
+class IndexedAppDict(dict):
+    """
+    Dict of app name -> path that keeps an AppIndex in sync on every
+    mutation, so callers can keep treating apps_database as a plain dict.
+    """
+
+    def __init__(self, index: AppIndex, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.index = index
+        self.index.rebuild(self)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.index.add(key, value)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.index.remove(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        had_key = key in self
+        value = super().pop(key, *default)
+        if had_key:
+            self.index.remove(key)
+        return value
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.index.remove(key)
+        return key, value
+
+    def clear(self):
+        super().clear()
+        self.index.rebuild({})
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+    def copy(self):
+        return dict(self)
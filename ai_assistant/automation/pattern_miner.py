@@ -0,0 +1,245 @@
+# Streaming Pattern Miner
+"""
+Incremental behaviour mining used by PatternDetector:
+- n-gram counts (2-5 actions) updated as each action arrives from a
+  short sliding window, instead of recounting the whole history
+- Space-Saving heavy-hitter sketches keep memory bounded to the top
+  patterns per n-gram length
+- Exponential forward decay so old habits fade (O(1) per update)
+- Compact JSON persistence of the sketch state
+"""
+
+import heapq
+import json
+import math
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# Renormalise stored weights before they grow large enough to lose precision
+_MAX_SCALE = 1e12
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-k sketch: tracks at most `capacity` items; a new item
+    evicts the smallest counter and inherits its count as error bound.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, List[float]] = {}  # item -> [count, error]
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def _push(self, item: Hashable):
+        self._sequence += 1
+        heapq.heappush(self._heap, (self.counts[item][0], self._sequence, item))
+        if len(self._heap) > 4 * self.capacity:
+            # Drop stale entries left behind by increments
+            self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        self._heap = []
+        for item, entry in self.counts.items():
+            self._sequence += 1
+            self._heap.append((entry[0], self._sequence, item))
+        heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[Hashable, List[float]]:
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            entry = self.counts.get(item)
+            if entry is not None and entry[0] == count:
+                return item, entry
+
+    def add(self, item: Hashable, weight: float = 1.0):
+        entry = self.counts.get(item)
+        if entry is not None:
+            entry[0] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = [weight, 0.0]
+        else:
+            evicted, (count, _) = self._pop_min()
+            del self.counts[evicted]
+            self.counts[item] = [count + weight, count]
+        self._push(item)
+
+    def scale(self, factor: float):
+        """Multiply every counter (used when renormalising decay weights)"""
+        for entry in self.counts.values():
+            entry[0] *= factor
+            entry[1] *= factor
+        self._rebuild_heap()
+
+    def top(self, limit: Optional[int] = None) -> List[Tuple[Hashable, float, float]]:
+        """(item, count, error) sorted by count, largest first"""
+        ranked = sorted(((item, c[0], c[1]) for item, c in self.counts.items()),
+                        key=lambda entry: entry[1], reverse=True)
+        return ranked[:limit] if limit else ranked
+
+
+class StreamingPatternMiner:
+    """
+    Maintains decayed counts of action sequences and (hour, weekday) habits.
+
+    Args:
+        min_length / max_length: n-gram lengths to track
+        capacity: Counters kept per sketch
+        half_life_days: Weight of an observation halves after this long
+    """
+
+    def __init__(self, min_length: int = 2, max_length: int = 5, capacity: int = 256,
+                 half_life_days: float = 14.0):
+        self.min_length = min_length
+        self.max_length = max_length
+        self.capacity = capacity
+        self.tau = half_life_days * 86400 / math.log(2)
+        self.epoch: Optional[float] = None
+        self.sequences = {n: SpaceSaving(capacity) for n in range(min_length, max_length + 1)}
+        self.sequence_totals = {n: 0.0 for n in self.sequences}
+        self.time_slots = SpaceSaving(capacity * 4)       # (hour, weekday, action)
+        self.slot_totals: Dict[Tuple[int, int], float] = {}  # at most 168 slots
+        self.window: deque = deque(maxlen=max_length)
+        self.last_timestamp: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _weight(self, timestamp: float) -> float:
+        """Forward-decay weight; renormalises stored counts when it grows large"""
+        if self.epoch is None:
+            self.epoch = timestamp
+        weight = math.exp((timestamp - self.epoch) / self.tau)
+        if weight > _MAX_SCALE:
+            factor = 1.0 / weight
+            for sketch in self.sequences.values():
+                sketch.scale(factor)
+            self.time_slots.scale(factor)
+            self.sequence_totals = {n: t * factor for n, t in self.sequence_totals.items()}
+            self.slot_totals = {k: t * factor for k, t in self.slot_totals.items()}
+            self.epoch = timestamp
+            weight = 1.0
+        return weight
+
+    def _decay_factor(self, now: float) -> float:
+        """Converts stored weights into decayed counts as of now"""
+        if self.epoch is None:
+            return 1.0
+        return math.exp(-(now - self.epoch) / self.tau)
+
+    def add(self, action: str, timestamp: float, hour: int, weekday: int):
+        """Account for one action in O(max_length) time"""
+        with self._lock:
+            weight = self._weight(timestamp)
+            self.window.append(action)
+            actions = tuple(self.window)
+            for n, sketch in self.sequences.items():
+                if len(actions) >= n:
+                    sketch.add(actions[-n:], weight)
+                    self.sequence_totals[n] += weight
+            self.time_slots.add((hour, weekday, action), weight)
+            self.slot_totals[(hour, weekday)] = self.slot_totals.get((hour, weekday), 0.0) + weight
+            self.last_timestamp = timestamp
+
+    def sequence_patterns(self, threshold: float, now: float) -> List[Dict[str, Any]]:
+        patterns = []
+        with self._lock:
+            decay = self._decay_factor(now)
+            for n, sketch in self.sequences.items():
+                total = self.sequence_totals[n] * decay
+                for sequence, count, error in sketch.top():
+                    if int(round(count * decay)) < threshold:
+                        break  # Sorted by count, so no later upper bound can qualify
+                    # Threshold on the guaranteed count: an evicted item's error is
+                    # inherited, so count alone can overstate a newcomer
+                    count = (count - error) * decay
+                    # Compare whole occurrences so a few minutes of decay don't hide a pattern
+                    frequency = int(round(count))
+                    if frequency < threshold:
+                        continue
+                    patterns.append({
+                        "type": "sequence",
+                        "actions": list(sequence),
+                        "frequency": frequency,
+                        "confidence": count / total if total else 0.0
+                    })
+        return patterns
+
+    def time_patterns(self, threshold: float, now: float) -> List[Dict[str, Any]]:
+        best: Dict[Tuple[int, int], Tuple[str, float]] = {}
+        with self._lock:
+            decay = self._decay_factor(now)
+            for (hour, weekday, action), count, error in self.time_slots.top():
+                if int(round(count * decay)) < threshold:
+                    break
+                count = (count - error) * decay  # Guaranteed count, as for sequences
+                if int(round(count)) < threshold:
+                    continue
+                if (hour, weekday) not in best or count > best[(hour, weekday)][1]:
+                    best[(hour, weekday)] = (action, count)
+            slot_totals = {slot: total * decay for slot, total in self.slot_totals.items()}
+        return [{
+            "type": "time_based",
+            "action": action,
+            "hour": hour,
+            "weekday": weekday,
+            "frequency": int(round(count)),
+            "confidence": count / slot_totals[(hour, weekday)] if slot_totals.get((hour, weekday)) else 0.0
+        } for (hour, weekday), (action, count) in best.items()]
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "version": 1,
+                "tau": self.tau,
+                "epoch": self.epoch,
+                "capacity": self.capacity,
+                "window": list(self.window),
+                "last_timestamp": self.last_timestamp,
+                "sequences": {str(n): [[list(seq), round(c[0], 6), round(c[1], 6)]
+                                       for seq, c in sketch.counts.items()]
+                              for n, sketch in self.sequences.items()},
+                "sequence_totals": {str(n): total for n, total in self.sequence_totals.items()},
+                "time_slots": [[h, w, a, round(c[0], 6), round(c[1], 6)]
+                               for (h, w, a), c in self.time_slots.counts.items()],
+                "slot_totals": [[h, w, total] for (h, w), total in self.slot_totals.items()],
+            }
+
+    def load_dict(self, state: Dict[str, Any]):
+        with self._lock:
+            self.tau = state.get("tau", self.tau)
+            self.epoch = state.get("epoch")
+            self.last_timestamp = state.get("last_timestamp")
+            self.window.extend(state.get("window", []))
+            for n_text, entries in state.get("sequences", {}).items():
+                sketch = self.sequences.get(int(n_text))
+                if sketch is None:
+                    continue
+                for sequence, count, error in entries:
+                    sketch.counts[tuple(sequence)] = [count, error]
+                    sketch._push(tuple(sequence))
+            for n_text, total in state.get("sequence_totals", {}).items():
+                if int(n_text) in self.sequence_totals:
+                    self.sequence_totals[int(n_text)] = total
+            for hour, weekday, action, count, error in state.get("time_slots", []):
+                self.time_slots.counts[(hour, weekday, action)] = [count, error]
+                self.time_slots._push((hour, weekday, action))
+            for hour, weekday, total in state.get("slot_totals", []):
+                self.slot_totals[(hour, weekday)] = total
+
+    def save(self, path: str):
+        """Atomically write the sketch state as compact JSON"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        with open(path, 'r', encoding='utf-8') as f:
+            self.load_dict(json.load(f))
+        return True
@@ -16,7 +16,6 @@ Features:
 import json
 import time
 import threading
-import schedule
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Callable, Tuple
 from dataclasses import dataclass, asdict, field
@@ -25,9 +24,19 @@ import sqlite3
 import os
 import re
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import traceback
 import uuid
+from collections import deque
+
+try:
+    from .workflow_scheduler import WorkflowScheduler
+    from .expression_engine import ConditionWatcher, ExpressionError, compile_expression, compile_template
+    from .pattern_miner import StreamingPatternMiner
+except ImportError:
+    from workflow_scheduler import WorkflowScheduler
+    from expression_engine import ConditionWatcher, ExpressionError, compile_expression, compile_template
+    from pattern_miner import StreamingPatternMiner
 
 class WorkflowStatus(Enum):
     """Workflow execution status."""
@@ -73,6 +82,7 @@ class WorkflowTask:
     max_retries: int = 3
     timeout: int = 30
     enabled: bool = True
+    max_concurrency: int = 0  # Concurrent runs of this task across executions (0 = unlimited)
     
     def to_dict(self):
         """Convert to dictionary for serialization."""
@@ -158,28 +168,36 @@ class WorkflowExecution:
 class SmartAutomationEngine:
     """Advanced automation and workflow management system."""
     
-    def __init__(self, db_path: str = "automation_engine.db"):
+    def __init__(self, db_path: str = "automation_engine.db", max_workers: int = 5):
         """Initialize the automation engine."""
         self.db_path = db_path
         self.workflows: Dict[str, WorkflowDefinition] = {}
         self.executions: Dict[str, WorkflowExecution] = {}
         self.running_workflows: Dict[str, threading.Thread] = {}
-        self.scheduler = schedule
-        self.executor = ThreadPoolExecutor(max_workers=5)
+        # Tasks from all running workflows share this pool
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="workflow-task")
+        self._task_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._task_slots_lock = threading.Lock()
+        
+        # Compiled conditions and parameter templates, built once per task
+        self._condition_cache: Dict[str, Tuple[str, Any]] = {}
+        self._parameter_plans: Dict[int, Tuple[Dict[str, Any], List[Tuple[str, Any, Any]]]] = {}
+        # Condition triggers, re-evaluated when the variables they use change
+        self.condition_watcher = ConditionWatcher({'datetime': datetime, 'time': time})
         
         # Function registry for workflow tasks
         self.function_registry = {}
-        self.pattern_detector = PatternDetector()
+        self.pattern_detector = PatternDetector(
+            state_path=f"{os.path.splitext(self.db_path)[0]}_patterns.json")
         
         # Initialize database and load workflows
         self._init_database()
+        self.scheduler = WorkflowScheduler(self._run_scheduled_workflow, self.db_path)
         self._load_workflows()
         self._register_built_in_functions()
         
         # Start scheduler thread
-        self.scheduler_running = True
-        self.scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
-        self.scheduler_thread.start()
+        self.scheduler.start()
         
     def _init_database(self):
         """Initialize SQLite database for workflow storage."""
@@ -330,55 +348,109 @@ class SmartAutomationEngine:
         return execution_id
     
     def _execute_workflow_thread(self, workflow: WorkflowDefinition, execution: WorkflowExecution, params: Dict[str, Any]):
-        """Execute workflow in separate thread."""
+        """
+        Execute workflow in separate thread.
+        
+        Tasks whose dependencies are complete are dispatched together on the
+        shared worker pool; each task's timeout and max_concurrency are enforced
+        and failed tasks are retried with exponential backoff.
+        """
         try:
-            # Build execution graph
-            task_graph = self._build_task_graph(workflow.tasks)
+            tasks = {task.id: task for task in workflow.tasks if task.enabled}
+            if not self._dependencies_resolvable(tasks):
+                execution.error_message = "Circular dependency or missing dependencies detected"
+                execution.status = WorkflowStatus.FAILED
+                execution.add_log("ERROR: Circular dependency detected")
+                return
             
-            # Execute tasks according to dependencies
+            pending = [task.id for task in workflow.tasks if task.id in tasks]
             completed_tasks = set()
             task_results = {}
+            attempts: Dict[str, int] = {}
+            retry_at: Dict[str, float] = {}
+            running = {}  # future -> (task, start time holder set by the worker)
+            timed_out = {}  # task id -> future of an attempt that may still be running
             
-            while len(completed_tasks) < len(workflow.tasks):
-                # Find tasks ready to execute
-                ready_tasks = [
-                    task for task in workflow.tasks
-                    if task.id not in completed_tasks and
-                    all(dep in completed_tasks for dep in task.dependencies) and
-                    task.enabled
-                ]
-                
-                if not ready_tasks:
-                    if len(completed_tasks) == len([t for t in workflow.tasks if t.enabled]):
-                        break  # All enabled tasks completed
-                    else:
-                        execution.error_message = "Circular dependency or missing dependencies detected"
-                        execution.status = WorkflowStatus.FAILED
-                        execution.add_log("ERROR: Circular dependency detected")
-                        return
+            while pending or running:
+                if execution.status == WorkflowStatus.CANCELLED:
+                    return
                 
-                # Execute ready tasks
-                for task in ready_tasks:
+                # Dispatch every task that is ready and has a free slot
+                now = time.monotonic()
+                slot_blocked = False
+                for task_id in list(pending):
+                    task = tasks[task_id]
+                    if retry_at.get(task_id, 0) > now or \
+                            not all(dep in completed_tasks for dep in task.dependencies):
+                        continue
+                    if task_id in timed_out:
+                        if not timed_out[task_id].done():
+                            # Never run a retry alongside the attempt it replaces
+                            slot_blocked = True
+                            continue
+                        del timed_out[task_id]
+                    if not self._acquire_task_slot(workflow.id, task):
+                        slot_blocked = True
+                        continue
+                    pending.remove(task_id)
                     execution.current_task = task.id
                     execution.add_log(f"Executing task: {task.name}")
-                    
-                    try:
-                        result = self._execute_task(task, task_results, params)
+                    started = []
+                    future = self.executor.submit(self._run_task_in_slot, workflow.id, task,
+                                                  dict(task_results), params, started)
+                    running[future] = (task, started)
+                
+                # Sleep until a task finishes, times out or a retry is due. The
+                # timeout clock starts when a worker picks the task up, not while
+                # it waits in the pool queue.
+                deadlines = {future: self._task_deadline(task, started[0])
+                             for future, (task, started) in running.items() if started}
+                wake_times = [deadline for deadline in deadlines.values() if deadline]
+                wake_times += [at for task_id, at in retry_at.items() if task_id in pending]
+                timeout = max(0.0, min(wake_times) - time.monotonic()) if wake_times else None
+                if slot_blocked or len(deadlines) < len(running):
+                    # Freed slots, finished timed-out attempts and queued tasks
+                    # starting do not notify us
+                    timeout = 0.1 if timeout is None else min(timeout, 0.1)
+                if not running:
+                    # Waiting on a retry backoff or a concurrency slot
+                    time.sleep(min(timeout, 0.1) if timeout is not None else 0.1)
+                    continue
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                now = time.monotonic()
+                failures = []
+                for future in list(running):
+                    task, started = running[future]
+                    deadline = self._task_deadline(task, started[0]) if started else None
+                    if future in done:
+                        del running[future]
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            failures.append((task, e))
+                            continue
                         task_results[task.id] = result
                         completed_tasks.add(task.id)
                         execution.task_results[task.id] = result
                         execution.add_log(f"Task {task.name} completed successfully")
-                        
-                    except Exception as e:
-                        if task.retry_count < task.max_retries:
-                            task.retry_count += 1
-                            execution.add_log(f"Task {task.name} failed, retrying ({task.retry_count}/{task.max_retries}): {str(e)}")
-                            time.sleep(2 ** task.retry_count)  # Exponential backoff
-                        else:
-                            execution.error_message = f"Task {task.name} failed: {str(e)}"
-                            execution.status = WorkflowStatus.FAILED
-                            execution.add_log(f"ERROR: Task {task.name} failed permanently: {str(e)}")
-                            return
+                    elif deadline and now >= deadline:
+                        # The worker cannot be killed; its result is discarded
+                        del running[future]
+                        timed_out[task.id] = future
+                        failures.append((task, TimeoutError(f"timed out after {task.timeout}s")))
+                
+                for task, error in failures:
+                    attempts[task.id] = attempts.get(task.id, 0) + 1
+                    if attempts[task.id] <= task.max_retries:
+                        execution.add_log(f"Task {task.name} failed, retrying ({attempts[task.id]}/{task.max_retries}): {str(error)}")
+                        retry_at[task.id] = time.monotonic() + 2 ** attempts[task.id]  # Exponential backoff
+                        pending.append(task.id)
+                    else:
+                        execution.error_message = f"Task {task.name} failed: {str(error)}"
+                        execution.status = WorkflowStatus.FAILED
+                        execution.add_log(f"ERROR: Task {task.name} failed permanently: {str(error)}")
+                        return
             
             # Workflow completed successfully
             execution.status = WorkflowStatus.COMPLETED
@@ -392,11 +464,69 @@ class SmartAutomationEngine:
             execution.add_log(f"ERROR: Workflow failed: {str(e)}")
             
         finally:
+            if execution.completed_at is None and execution.status != WorkflowStatus.RUNNING:
+                execution.completed_at = datetime.now()
             # Save execution results
             self._save_execution(execution)
             if execution.id in self.running_workflows:
                 del self.running_workflows[execution.id]
     
+    def _dependencies_resolvable(self, tasks: Dict[str, WorkflowTask]) -> bool:
+        """Whether every enabled task can run: no cycles, no missing or disabled dependencies."""
+        graph = self._build_task_graph(list(tasks.values()))
+        remaining = {task_id: set(deps) for task_id, deps in graph.items()}
+        if any(dep not in tasks for deps in remaining.values() for dep in deps):
+            return False
+        ready = [task_id for task_id, deps in remaining.items() if not deps]
+        resolved = 0
+        while ready:
+            task_id = ready.pop()
+            resolved += 1
+            for other, deps in remaining.items():
+                if task_id in deps:
+                    deps.discard(task_id)
+                    if not deps:
+                        ready.append(other)
+        return resolved == len(tasks)
+    
+    def _task_deadline(self, task: WorkflowTask, started: float) -> Optional[float]:
+        """Monotonic deadline for a task, or None when it has no timeout."""
+        if not task.timeout or task.timeout <= 0:
+            return None
+        allowance = float(task.timeout)
+        if task.type == TaskType.DELAY:
+            # A delay task's own duration does not count against its timeout
+            allowance += float(task.parameters.get('duration', 1))
+        return started + allowance
+    
+    def _acquire_task_slot(self, workflow_id: str, task: WorkflowTask) -> bool:
+        """Reserve one of the task's concurrency slots without blocking."""
+        if task.max_concurrency <= 0:
+            return True
+        key = f"{workflow_id}:{task.id}"
+        with self._task_slots_lock:
+            slot = self._task_slots.get(key)
+            if slot is None:
+                slot = self._task_slots[key] = threading.BoundedSemaphore(task.max_concurrency)
+        return slot.acquire(blocking=False)
+    
+    def _run_task_in_slot(self, workflow_id: str, task: WorkflowTask,
+                          previous_results: Dict[str, Any], params: Dict[str, Any],
+                          started: Optional[List[float]] = None) -> Any:
+        """
+        Run a task on the worker pool, releasing its concurrency slot afterwards.
+        
+        The start time is appended to started so the caller can time the task
+        from when it actually began running.
+        """
+        if started is not None:
+            started.append(time.monotonic())
+        try:
+            return self._execute_task(task, previous_results, params)
+        finally:
+            if task.max_concurrency > 0:
+                self._task_slots[f"{workflow_id}:{task.id}"].release()
+    
     def _execute_task(self, task: WorkflowTask, previous_results: Dict[str, Any], params: Dict[str, Any]) -> Any:
         """Execute a single task."""
         if task.type == TaskType.ACTION:
@@ -440,10 +570,18 @@ class SmartAutomationEngine:
         }
         
         try:
-            return bool(eval(condition, {"__builtins__": {}}, context))
-        except Exception as e:
+            return bool(self._compiled_condition(task, condition).evaluate(context))
+        except ExpressionError as e:
             raise ValueError(f"Condition evaluation failed: {str(e)}")
     
+    def _compiled_condition(self, task: WorkflowTask, condition: str):
+        """Compiled form of a task's condition, recompiled only if the text changes."""
+        cached = self._condition_cache.get(task.id)
+        if cached is None or cached[0] != condition:
+            cached = (condition, compile_expression(str(condition)))
+            self._condition_cache[task.id] = cached
+        return cached[1]
+    
     def _execute_delay_task(self, task: WorkflowTask, previous_results: Dict[str, Any], params: Dict[str, Any]) -> None:
         """Execute a delay task."""
         duration = task.parameters.get('duration', 1)
@@ -468,29 +606,36 @@ class SmartAutomationEngine:
         """Resolve parameter placeholders."""
         resolved = {}
         
-        for key, value in parameters.items():
-            if isinstance(value, str) and value.startswith('${') and value.endswith('}'):
-                # Parameter placeholder
-                placeholder = value[2:-1]
-                if '.' in placeholder:
-                    # Nested access like ${results.task1.data}
-                    parts = placeholder.split('.')
-                    resolved_value = previous_results if parts[0] == 'results' else params
-                    for part in parts[1:]:
-                        if isinstance(resolved_value, dict) and part in resolved_value:
-                            resolved_value = resolved_value[part]
-                        else:
-                            resolved_value = None
-                            break
-                    resolved[key] = resolved_value
-                else:
-                    # Simple parameter like ${param_name}
-                    resolved[key] = params.get(placeholder) or previous_results.get(placeholder)
-            else:
+        for key, path, value in self._parameter_plan(parameters):
+            if path is None:
                 resolved[key] = value
+            elif len(path) > 1:
+                # Nested access like ${results.task1.data}
+                resolved_value = previous_results if path[0] == 'results' else params
+                for part in path[1:]:
+                    if isinstance(resolved_value, dict) and part in resolved_value:
+                        resolved_value = resolved_value[part]
+                    else:
+                        resolved_value = None
+                        break
+                resolved[key] = resolved_value
+            else:
+                # Simple parameter like ${param_name}
+                resolved[key] = params.get(path[0]) or previous_results.get(path[0])
         
         return resolved
     
+    def _parameter_plan(self, parameters: Dict[str, Any]) -> List[Tuple[str, Any, Any]]:
+        """(key, placeholder path or None, literal value) for each parameter, parsed once."""
+        cached = self._parameter_plans.get(id(parameters))
+        if cached is not None and cached[0] is parameters:
+            return cached[1]
+        plan = [(key, compile_template(value), value) for key, value in parameters.items()]
+        if len(self._parameter_plans) >= 1024:
+            self._parameter_plans.clear()
+        self._parameter_plans[id(parameters)] = (parameters, plan)
+        return plan
+    
     def _build_task_graph(self, tasks: List[WorkflowTask]) -> Dict[str, List[str]]:
         """Build task dependency graph."""
         graph = {}
@@ -675,7 +820,10 @@ class SmartAutomationEngine:
             return False
         
         # Remove from memory
-        del self.workflows[workflow_id]
+        workflow = self.workflows.pop(workflow_id)
+        self.scheduler.remove_workflow(workflow_id)
+        for index in range(len(workflow.triggers)):
+            self.condition_watcher.unwatch(f"{workflow_id}:{index}")
         
         # Remove from database
         with sqlite3.connect(self.db_path) as conn:
@@ -686,44 +834,43 @@ class SmartAutomationEngine:
     
     def _schedule_workflow_triggers(self, workflow: WorkflowDefinition):
         """Schedule workflow triggers."""
-        for trigger in workflow.triggers:
-            if trigger.type == TriggerType.SCHEDULED and trigger.schedule:
-                # Parse cron-like schedule and add to scheduler
+        for index, trigger in enumerate(workflow.triggers):
+            if trigger.type == TriggerType.SCHEDULED and trigger.schedule and trigger.enabled:
                 try:
-                    self._add_scheduled_workflow(workflow.id, trigger.schedule)
+                    self._add_scheduled_workflow(workflow.id, trigger.schedule, f"{workflow.id}:{index}")
                 except Exception as e:
                     print(f"Error scheduling workflow {workflow.name}: {e}")
+            elif trigger.type == TriggerType.CONDITION and trigger.condition and trigger.enabled:
+                try:
+                    self.condition_watcher.watch(f"{workflow.id}:{index}", trigger.condition,
+                                                 lambda workflow_id=workflow.id: self._run_scheduled_workflow(workflow_id))
+                except ExpressionError as e:
+                    print(f"Error registering condition for workflow {workflow.name}: {e}")
     
-    def _add_scheduled_workflow(self, workflow_id: str, schedule_pattern: str):
-        """Add scheduled workflow to scheduler."""
-        # Simple schedule parsing (extend for full cron support)
-        parts = schedule_pattern.split()
-        if len(parts) >= 5:
-            minute, hour, day, month, weekday = parts[:5]
-            
-            if hour != '*' and minute != '*':
-                time_str = f"{hour.zfill(2)}:{minute.zfill(2)}"
-                
-                if weekday == '*':
-                    # Daily
-                    schedule.every().day.at(time_str).do(self.execute_workflow, workflow_id)
-                elif weekday == 'MON-FRI':
-                    # Weekdays
-                    for day_name in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']:
-                        getattr(schedule.every(), day_name).at(time_str).do(self.execute_workflow, workflow_id)
-                elif weekday in ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']:
-                    # Specific day
-                    day_map = {
-                        'MON': 'monday', 'TUE': 'tuesday', 'WED': 'wednesday',
-                        'THU': 'thursday', 'FRI': 'friday', 'SAT': 'saturday', 'SUN': 'sunday'
-                    }
-                    getattr(schedule.every(), day_map[weekday]).at(time_str).do(self.execute_workflow, workflow_id)
+    def update_variables(self, changes: Dict[str, Any]) -> List[str]:
+        """
+        Update state variables used by condition triggers.
+        
+        Only conditions referencing a changed variable are re-evaluated; workflows
+        whose condition becomes true are started.
+        
+        Returns:
+            Keys ("<workflow_id>:<trigger index>") of the triggers that fired
+        """
+        return self.condition_watcher.update(changes)
+    
+    def _add_scheduled_workflow(self, workflow_id: str, schedule_pattern: str, job_id: Optional[str] = None):
+        """Add scheduled workflow to scheduler (standard 5-field cron syntax)."""
+        self.scheduler.add_job(job_id or f"{workflow_id}:0", workflow_id, schedule_pattern)
     
-    def _run_scheduler(self):
-        """Run the scheduler in background thread."""
-        while self.scheduler_running:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
+    def _run_scheduled_workflow(self, workflow_id: str):
+        """Scheduler callback: start a workflow run (non-blocking)."""
+        if workflow_id in self.workflows:
+            self.execute_workflow(workflow_id)
+    
+    def get_scheduled_jobs(self) -> List[Dict[str, Any]]:
+        """Upcoming scheduled runs, soonest first."""
+        return self.scheduler.get_jobs()
     
     def _save_workflow(self, workflow: WorkflowDefinition):
         """Save workflow to database."""
@@ -776,29 +923,55 @@ class SmartAutomationEngine:
     
     def cleanup(self):
         """Cleanup resources."""
-        self.scheduler_running = False
-        if hasattr(self, 'scheduler_thread'):
-            self.scheduler_thread.join(timeout=1)
+        self.scheduler.stop()
         self.executor.shutdown(wait=False)
+        self.pattern_detector.save()
 
 class PatternDetector:
-    """Detects automation patterns from user behavior."""
+    """
+    Detects automation patterns from user behavior.
+    
+    Counts are maintained incrementally as actions arrive (see
+    StreamingPatternMiner), so detection cost does not grow with history.
+    """
     
-    def __init__(self):
-        self.action_history = []
+    SAVE_EVERY = 50  # Persist state after this many new actions
+    
+    def __init__(self, state_path: Optional[str] = None, half_life_days: float = 14.0, capacity: int = 256):
+        self.action_history = deque(maxlen=100)  # Recent actions, for context only
         self.pattern_threshold = 3  # Minimum occurrences to suggest automation
+        self.state_path = state_path
+        self.miner = StreamingPatternMiner(capacity=capacity, half_life_days=half_life_days)
+        self._unsaved = 0
+        if state_path:
+            try:
+                self.miner.load(state_path)
+            except (OSError, ValueError, TypeError) as e:
+                print(f"Error loading pattern state: {e}")
     
-    def record_action(self, action: str, context: Dict[str, Any] = None):
+    def record_action(self, action: str, context: Dict[str, Any] = None, timestamp: Optional[datetime] = None):
         """Record user action for pattern detection."""
+        timestamp = timestamp or datetime.now()
         self.action_history.append({
             "action": action,
-            "timestamp": datetime.now(),
+            "timestamp": timestamp,
             "context": context or {}
         })
+        self.miner.add(action, timestamp.timestamp(), timestamp.hour, timestamp.weekday())
         
-        # Keep history manageable
-        if len(self.action_history) > 1000:
-            self.action_history = self.action_history[-500:]
+        self._unsaved += 1
+        if self.state_path and self._unsaved >= self.SAVE_EVERY:
+            self.save()
+    
+    def save(self):
+        """Persist the pattern sketches, if a state path is configured."""
+        if not self.state_path or not self._unsaved:
+            return
+        try:
+            self.miner.save(self.state_path)
+            self._unsaved = 0
+        except OSError as e:
+            print(f"Error saving pattern state: {e}")
     
     def detect_patterns(self) -> List[Dict[str, Any]]:
         """Detect automation patterns from action history."""
@@ -816,64 +989,11 @@ class PatternDetector:
     
     def _detect_time_patterns(self) -> List[Dict[str, Any]]:
         """Detect time-based patterns."""
-        patterns = []
-        
-        # Group actions by hour and day of week
-        time_groups = {}
-        for action in self.action_history:
-            timestamp = action["timestamp"]
-            time_key = (timestamp.hour, timestamp.weekday())
-            if time_key not in time_groups:
-                time_groups[time_key] = []
-            time_groups[time_key].append(action)
-        
-        # Find recurring patterns
-        for (hour, weekday), actions in time_groups.items():
-            if len(actions) >= self.pattern_threshold:
-                action_types = [a["action"] for a in actions]
-                most_common = max(set(action_types), key=action_types.count)
-                
-                if action_types.count(most_common) >= self.pattern_threshold:
-                    patterns.append({
-                        "type": "time_based",
-                        "action": most_common,
-                        "hour": hour,
-                        "weekday": weekday,
-                        "frequency": action_types.count(most_common),
-                        "confidence": action_types.count(most_common) / len(actions)
-                    })
-        
-        return patterns
+        return self.miner.time_patterns(self.pattern_threshold, time.time())
     
     def _detect_sequence_patterns(self) -> List[Dict[str, Any]]:
         """Detect action sequence patterns."""
-        patterns = []
-        
-        # Look for sequences of 2-5 actions
-        for seq_length in range(2, 6):
-            sequences = {}
-            
-            for i in range(len(self.action_history) - seq_length + 1):
-                sequence = tuple(
-                    action["action"] for action in 
-                    self.action_history[i:i + seq_length]
-                )
-                
-                if sequence not in sequences:
-                    sequences[sequence] = 0
-                sequences[sequence] += 1
-            
-            # Find frequent sequences
-            for sequence, count in sequences.items():
-                if count >= self.pattern_threshold:
-                    patterns.append({
-                        "type": "sequence",
-                        "actions": list(sequence),
-                        "frequency": count,
-                        "confidence": count / (len(self.action_history) - seq_length + 1)
-                    })
-        
-        return patterns
+        return self.miner.sequence_patterns(self.pattern_threshold, time.time())
 
 # Convenience functions for easy integration
 def create_simple_workflow(name: str, actions: List[str], schedule: str = None) -> str:
@@ -7,6 +7,7 @@ to prevent context window thrashing.
 
 import json
 import logging
+import time
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from datetime import datetime
@@ -14,6 +15,12 @@ import sqlite3
 
 logger = logging.getLogger(__name__)
 
+SUMMARY_LENGTH_INSTRUCTIONS = {
+    "brief": "Provide a 1-2 sentence summary",
+    "detailed": "Provide a 3-5 sentence summary with key points",
+    "bullet_points": "Provide 3-5 bullet points summarizing the conversation"
+}
+
 
 @dataclass
 class MessageSummary:
@@ -113,7 +120,9 @@ class ConversationCompressor:
         self,
         messages: List[Dict[str, str]],
         llm_provider,
-        summary_length: str = "brief"
+        summary_length: str = "brief",
+        background: bool = True,
+        timeout: float = 120
     ) -> str:
         """
         Compress messages using LLM summarization.
@@ -122,45 +131,94 @@ class ConversationCompressor:
             messages: Messages to summarize
             llm_provider: LLM provider instance
             summary_length: "brief", "detailed", "bullet_points"
+            background: Send through the provider's background queue, below
+                interactive chats, instead of calling it directly
+            timeout: Seconds to wait for a background summary
             
         Returns:
             Summary text
         """
-        prompt = self._build_summarization_prompt(messages, summary_length)
+        return self.compress_many_with_llm(
+            [messages], llm_provider, summary_length, background, timeout
+        )[0]
+    
+    def compress_many_with_llm(
+        self,
+        segments: List[List[Dict[str, str]]],
+        llm_provider,
+        summary_length: str = "brief",
+        background: bool = True,
+        timeout: float = 120
+    ) -> List[str]:
+        """
+        Summarize several conversation segments in one background batch.
+        
+        Args:
+            segments: Message lists to summarize
+            llm_provider: LLM provider instance
+            summary_length: "brief", "detailed", "bullet_points"
+            background: Send through the provider's background queue
+            timeout: Seconds to wait for all background summaries together
+            
+        Returns:
+            Summary text per segment, in order
+        """
+        requests = [self._build_summarization_messages(messages, summary_length) for messages in segments]
+        options = {"max_tokens": 500, "temperature": 0.5}
         
         try:
-            summary = llm_provider.generate_response(
-                [{"role": "user", "content": prompt}],
-                max_tokens=500,
-                temperature=0.5
-            )
-            return summary
+            if background:
+                try:
+                    from .llm_batch import get_batch_queue
+                except ImportError:
+                    from modules.llm_batch import get_batch_queue
+                queue = get_batch_queue(llm_provider)
+                futures = [queue.submit(request, **options) for request in requests]
+            else:
+                try:
+                    from .llm_scheduler import INTERACTIVE, get_scheduler, request_context
+                except ImportError:
+                    from modules.llm_scheduler import INTERACTIVE, get_scheduler, request_context
+                context = request_context(priority=INTERACTIVE)
         except Exception as e:
-            logger.error(f"LLM summarization failed: {e}")
-            return self._create_simple_summary(messages)
+            logger.error(f"LLM summarization unavailable: {e}")
+            return [self._create_simple_summary(messages) for messages in segments]
+        
+        deadline = time.monotonic() + timeout
+        summaries = []
+        for i, messages in enumerate(segments):
+            try:
+                if background:
+                    summaries.append(futures[i].result(timeout=max(0.0, deadline - time.monotonic())))
+                else:
+                    with get_scheduler().slot(llm_provider, context["priority"], context["session_id"]):
+                        summaries.append(llm_provider.generate_response(requests[i], **options))
+            except Exception as e:
+                logger.error(f"LLM summarization failed: {e}")
+                summaries.append(self._create_simple_summary(messages))
+        return summaries
     
-    def _build_summarization_prompt(
+    def _build_summarization_messages(
         self,
         messages: List[Dict[str, str]],
         summary_length: str
-    ) -> str:
-        """Build prompt for LLM summarization."""
+    ) -> List[Dict[str, str]]:
+        """
+        Build messages for LLM summarization.
+        
+        The instructions are a fixed system message and the conversation is
+        the user message, so every summary request shares a cacheable prefix.
+        """
         conversation = "\n".join([
             f"{m['role'].upper()}: {m['content'][:200]}"
             for m in messages
         ])
         
-        length_instructions = {
-            "brief": "Provide a 1-2 sentence summary",
-            "detailed": "Provide a 3-5 sentence summary with key points",
-            "bullet_points": "Provide 3-5 bullet points summarizing the conversation"
-        }
-        
-        return f"""Summarize the following conversation:
-
-{conversation}
-
-{length_instructions.get(summary_length, 'Provide a brief summary')}"""
+        instructions = SUMMARY_LENGTH_INSTRUCTIONS.get(summary_length, 'Provide a brief summary')
+        return [
+            {"role": "system", "content": f"You summarize conversations. {instructions}."},
+            {"role": "user", "content": f"Summarize the following conversation:\n\n{conversation}"}
+        ]
 
 
 class SemanticHistoryRetrieval:
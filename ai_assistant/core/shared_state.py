@@ -0,0 +1,598 @@
+# Shared State Module
+"""
+State shared by every web worker process.
+
+The web backend keeps chat sessions, rate-limit counters, generated
+secrets and Socket.IO fan-out in process memory, which pins it to a single
+process. This module moves that state into a store every worker can reach:
+a SQLite file (the default - works for workers on one machine with no
+extra service) or a Redis-compatible server. On top of the store it
+provides:
+
+- SQLiteLimiterStorage: Flask-Limiter/limits storage for ``sqlite://``
+  URIs, so rate limits count across workers (``redis://`` URIs use the
+  limits package's own Redis storage).
+- SharedStateManager: a Socket.IO client manager publishing through the
+  SQLite store, so an emit on one worker reaches clients on the others
+  (Redis URIs use python-socketio's RedisManager).
+- ChatSessionStore: chat histories any worker can resume by session id,
+  without sticky sessions.
+
+The store is selected with STATE_STORE_URL (default
+``sqlite:///shared_state.db``).
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Generator, List, Optional
+
+DEFAULT_STATE_STORE_URL = "sqlite:///shared_state.db"
+
+# Published messages are kept this long for workers that poll late
+MESSAGE_RETENTION = 60.0
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+try:
+    from limits.storage import Storage as _LimitsStorage
+    LIMITS_AVAILABLE = True
+except ImportError:
+    LIMITS_AVAILABLE = False
+
+try:
+    from socketio import PubSubManager as _PubSubManager
+    SOCKETIO_AVAILABLE = True
+except ImportError:
+    SOCKETIO_AVAILABLE = False
+
+
+class StateStore(ABC):
+    """
+    Key-value store shared between worker processes.
+
+    Values are JSON-serializable. Keys may carry a TTL in seconds; an
+    expired key reads as missing.
+    """
+
+    url = ""
+
+    @abstractmethod
+    def get(self, key: str, default: Any = None) -> Any:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        pass
+
+    @abstractmethod
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store value only if key is missing; returns True if it was stored."""
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """
+        Atomically add to a counter, creating it at 0.
+
+        The TTL only applies when the counter is created, so a counter
+        expires a fixed time after its first increment.
+        """
+        pass
+
+    @abstractmethod
+    def update(self, key: str, fn: Callable[[Any], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Atomically replace a value with fn(current value or None).
+
+        If fn returns None the value is left unchanged. Returns fn's result;
+        fn may run more than once if another writer gets in first.
+        """
+        pass
+
+    @abstractmethod
+    def expires_at(self, key: str) -> Optional[float]:
+        """Epoch time the key expires, or None if it does not (or is missing)."""
+        pass
+
+    @abstractmethod
+    def keys(self, prefix: str = "") -> List[str]:
+        pass
+
+    @abstractmethod
+    def clear(self, prefix: str = ""):
+        pass
+
+    @abstractmethod
+    def publish(self, channel: str, message: str):
+        pass
+
+    @abstractmethod
+    def listen(self, channel: str) -> Generator[str, None, None]:
+        """Yield messages published on channel from now on, blocking between them."""
+        pass
+
+    @abstractmethod
+    def ping(self) -> bool:
+        pass
+
+
+class SQLiteStateStore(StateStore):
+    """
+    StateStore in a SQLite file, for workers on one machine.
+
+    WAL mode lets readers run alongside the single writer; writes that
+    read-modify-write take the write lock up front (BEGIN IMMEDIATE) so
+    concurrent increments from different processes never lose updates.
+    """
+
+    def __init__(self, path: str = "shared_state.db", poll_interval: float = 0.05):
+        """
+        Args:
+            path: Database file shared by the workers
+            poll_interval: Seconds between checks for published messages
+        """
+        self.path = path
+        self.url = f"sqlite:///{path}"
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._publishes = 0
+        self._init_db()
+
+    def _conn(self) -> sqlite3.Connection:
+        """Connection for this thread (and process - connections do not survive fork)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.OperationalError:
+                pass  # Another worker is switching the new file to WAL right now
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_channel ON messages(channel, id)")
+
+    def _write(self):
+        """Transaction holding the write lock from the start."""
+        store = self
+
+        class _Transaction:
+            def __enter__(self):
+                self.conn = store._conn()
+                self.conn.execute("BEGIN IMMEDIATE")
+                return self.conn
+
+            def __exit__(self, exc_type, exc, tb):
+                self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+                return False
+
+        return _Transaction()
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl else None
+
+    def _row(self, conn: sqlite3.Connection, key: str):
+        return conn.execute(
+            "SELECT value, expires_at FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._row(self._conn(), key)
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), self._expiry(ttl))
+        )
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        with self._write() as conn:
+            if self._row(conn, key):
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), self._expiry(ttl))
+            )
+            return True
+
+    def delete(self, key: str) -> bool:
+        with self._write() as conn:
+            found = self._row(conn, key) is not None
+            conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            return found
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        with self._write() as conn:
+            row = self._row(conn, key)
+            if row:
+                value = json.loads(row[0]) + amount
+                conn.execute("UPDATE kv SET value = ? WHERE key = ?", (json.dumps(value), key))
+            else:
+                value = amount
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), self._expiry(ttl))
+                )
+            return value
+
+    def update(self, key: str, fn: Callable[[Any], Any], ttl: Optional[float] = None) -> Any:
+        with self._write() as conn:
+            row = self._row(conn, key)
+            value = fn(json.loads(row[0]) if row else None)
+            if value is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), self._expiry(ttl))
+                )
+            return value
+
+    def expires_at(self, key: str) -> Optional[float]:
+        row = self._row(self._conn(), key)
+        return row[1] if row else None
+
+    def keys(self, prefix: str = "") -> List[str]:
+        rows = self._conn().execute(
+            "SELECT key FROM kv WHERE substr(key, 1, ?) = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (len(prefix), prefix, time.time())
+        )
+        return [row[0] for row in rows]
+
+    def clear(self, prefix: str = ""):
+        self._conn().execute("DELETE FROM kv WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def publish(self, channel: str, message: str):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO messages (channel, payload, created_at) VALUES (?, ?, ?)",
+            (channel, message, now)
+        )
+        self._publishes += 1
+        if self._publishes % 100 == 0:
+            conn.execute("DELETE FROM messages WHERE created_at < ?", (now - MESSAGE_RETENTION,))
+            conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+
+    def listen(self, channel: str) -> Generator[str, None, None]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+        try:
+            while True:
+                rows = conn.execute(
+                    "SELECT id, payload FROM messages WHERE channel = ? AND id > ? ORDER BY id",
+                    (channel, last_id)
+                ).fetchall()
+                for message_id, payload in rows:
+                    last_id = message_id
+                    yield payload
+                if not rows:
+                    time.sleep(self.poll_interval)
+        finally:
+            conn.close()
+
+    def ping(self) -> bool:
+        try:
+            self._conn().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+
+class RedisStateStore(StateStore):
+    """StateStore on a Redis-compatible server (Redis, Valkey, KeyDB, ...)."""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", namespace: str = "assistant:"):
+        """
+        Args:
+            url: Server URL
+            namespace: Prefix for every key, so the database can be shared
+        """
+        if not REDIS_AVAILABLE:
+            raise ImportError("The redis package is required for a Redis state store (pip install redis)")
+        self.url = url
+        self.namespace = namespace
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def _key(self, key: str) -> str:
+        return self.namespace + key
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.client.get(self._key(key))
+        return json.loads(value) if value is not None else default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.client.set(self._key(key), json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(self._key(key), json.dumps(value), nx=True,
+                                    px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, key: str) -> bool:
+        return self.client.delete(self._key(key)) > 0
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        value = self.client.incrby(self._key(key), amount)
+        if ttl and value == amount:
+            self.client.pexpire(self._key(key), int(ttl * 1000))
+        return value
+
+    def update(self, key: str, fn: Callable[[Any], Any], ttl: Optional[float] = None) -> Any:
+        name = self._key(key)
+
+        def transaction(pipe):
+            current = pipe.get(name)
+            value = fn(json.loads(current) if current is not None else None)
+            if value is not None:
+                pipe.multi()
+                pipe.set(name, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+            return value
+
+        # WATCH/MULTI: retried if another worker writes the key in between
+        return self.client.transaction(transaction, name, value_from_callable=True)
+
+    def expires_at(self, key: str) -> Optional[float]:
+        remaining = self.client.pttl(self._key(key))
+        return time.time() + remaining / 1000 if remaining > 0 else None
+
+    def keys(self, prefix: str = "") -> List[str]:
+        start = len(self.namespace)
+        return [key[start:] for key in self.client.scan_iter(match=self._key(prefix) + "*")]
+
+    def clear(self, prefix: str = ""):
+        for key in self.client.scan_iter(match=self._key(prefix) + "*"):
+            self.client.delete(key)
+
+    def publish(self, channel: str, message: str):
+        self.client.publish(self._key(channel), message)
+
+    def listen(self, channel: str) -> Generator[str, None, None]:
+        pubsub = self.client.pubsub()
+        pubsub.subscribe(self._key(channel))
+        try:
+            for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            pubsub.close()
+
+    def ping(self) -> bool:
+        try:
+            return bool(self.client.ping())
+        except redis.RedisError:
+            return False
+
+
+def create_state_store(url: Optional[str] = None) -> StateStore:
+    """
+    Open the state store for a URL.
+
+    Args:
+        url: ``sqlite:///path`` or ``redis://host:port/db`` (default from
+            STATE_STORE_URL, else a SQLite file in the working directory)
+    """
+    url = url or os.getenv("STATE_STORE_URL", DEFAULT_STATE_STORE_URL)
+    if url.startswith("sqlite:///"):
+        return SQLiteStateStore(url[len("sqlite:///"):])
+    if url.split("://", 1)[0] in ("redis", "rediss", "valkey", "valkeys"):
+        return RedisStateStore(url)
+    raise ValueError(f"Unsupported state store URL: {url}")
+
+
+def shared_secret(store: StateStore, name: str) -> str:
+    """A random secret generated once and shared by every worker."""
+    key = f"secret:{name}"
+    store.add(key, secrets.token_hex(32))
+    return store.get(key)
+
+
+class ChatSessionStore:
+    """
+    Chat histories in the shared store.
+
+    Each save bumps the session's version, so a worker replaces its
+    in-memory history only when another worker has saved since - a request
+    still running locally is never rolled back to the stored copy. Saves
+    compare-and-set on the version: when two workers answer the same
+    session at once, the later save appends its new messages to the
+    stored history instead of overwriting the other worker's turn.
+    """
+
+    def __init__(self, store: StateStore, ttl: float = 7 * 24 * 3600, prefix: str = "chat_session:"):
+        """
+        Args:
+            store: Shared state store
+            ttl: Seconds an idle session is kept
+            prefix: Key prefix for sessions
+        """
+        self.store = store
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Stored session: {"history", "version", "updated_at"}, or None."""
+        return self.store.get(self.prefix + session_id)
+
+    def resume(self, session_id: str, chat) -> bool:
+        """
+        Bring a chat interface up to date with the stored session.
+
+        Returns:
+            True if the stored history was newer and was loaded
+        """
+        stored = self.load(session_id)
+        if stored is None:
+            if getattr(chat, "session_version", 0):
+                # Deleted or expired since this worker last saved it; keep the system prompt
+                history = chat.conversation_history
+                chat.conversation_history = [m for m in history[:1] if m.get("role") == "system"]
+                chat.session_version = 0
+                chat.session_length = None
+            return False
+        if stored["version"] == getattr(chat, "session_version", 0):
+            return False
+        chat.conversation_history = list(stored["history"])
+        chat.session_version = stored["version"]
+        chat.session_length = len(stored["history"])
+        return True
+
+    def save(self, session_id: str, chat) -> bool:
+        """
+        Store a chat interface's history as the session's newest version.
+
+        Returns:
+            False if another worker had saved first; this worker's new
+            messages were then appended to that history (and `chat` updated)
+        """
+        base = getattr(chat, "session_version", 0)
+        history = chat.conversation_history
+        known = getattr(chat, "session_length", None)
+        if known is None:
+            # Never synced: only a leading system prompt can already be stored
+            known = len(history[:1]) if history and history[0].get("role") == "system" else 0
+        rebased = False
+
+        def apply(stored):
+            nonlocal rebased
+            rebased = stored is not None and stored["version"] != base
+            merged = list(stored["history"]) + history[known:] if rebased else history
+            return {
+                "history": merged,
+                "version": (stored["version"] if stored else 0) + 1,
+                "updated_at": time.time()
+            }
+
+        saved = self.store.update(self.prefix + session_id, apply, ttl=self.ttl)
+        chat.conversation_history = list(saved["history"]) if rebased else history
+        chat.session_version = saved["version"]
+        chat.session_length = len(saved["history"])
+        return not rebased
+
+    def delete(self, session_id: str) -> bool:
+        return self.store.delete(self.prefix + session_id)
+
+
+if LIMITS_AVAILABLE:
+    class SQLiteLimiterStorage(_LimitsStorage):
+        """
+        Rate-limit counters in a SQLite state store (fixed-window strategy).
+
+        Registered for ``sqlite:///path`` storage URIs, so Flask-Limiter
+        shares limits across workers with ``storage_uri=STATE_STORE_URL``.
+        """
+
+        STORAGE_SCHEME = ["sqlite"]
+
+        def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **options):
+            super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+            self.store = create_state_store(uri) if uri else create_state_store(DEFAULT_STATE_STORE_URL)
+
+        @property
+        def base_exceptions(self):
+            return sqlite3.Error
+
+        def _key(self, key: str) -> str:
+            return "limit:" + key
+
+        def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+            return self.store.incr(self._key(key), amount, ttl=expiry)
+
+        def get(self, key: str) -> int:
+            return self.store.get(self._key(key), 0)
+
+        def get_expiry(self, key: str) -> float:
+            return self.store.expires_at(self._key(key)) or time.time()
+
+        def check(self) -> bool:
+            return self.store.ping()
+
+        def reset(self) -> Optional[int]:
+            count = len(self.store.keys("limit:"))
+            self.store.clear("limit:")
+            return count
+
+        def clear(self, key: str) -> None:
+            self.store.delete(self._key(key))
+
+
+if SOCKETIO_AVAILABLE:
+    class SharedStateManager(_PubSubManager):
+        """
+        Socket.IO client manager relaying emits through a SQLite state store.
+
+        Every worker publishes its emits, room changes and disconnects to the
+        store and applies the ones published by the others.
+        """
+
+        name = "sqlite"
+
+        def __init__(self, url: Optional[str] = None, channel: str = "socketio",
+                     write_only: bool = False, logger=None):
+            self.store = create_state_store(url)
+            super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+        def _publish(self, data):
+            self.store.publish(self.channel, self.json.dumps(data))
+
+        def _listen(self):
+            for message in self.store.listen(self.channel):
+                yield message
+
+
+def socketio_queue_options(url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Flask-SocketIO keyword arguments that relay events between workers.
+
+    Redis URLs use Flask-SocketIO's own message queue; SQLite stores use
+    SharedStateManager.
+    """
+    url = url or os.getenv("STATE_STORE_URL", DEFAULT_STATE_STORE_URL)
+    if url.startswith("sqlite:///"):
+        return {"client_manager": SharedStateManager(url)}
+    return {"message_queue": url}
+
+
+_store: Optional[StateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """Returns the process-wide state store, opening it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = create_state_store()
+        return _store
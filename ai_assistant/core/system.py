@@ -11,42 +11,35 @@ import shutil
 import os
 import time
 
+try:
+    from .telemetry import get_sampler
+except ImportError:
+    from telemetry import get_sampler
+
 def get_system_status() -> str:
     """
     Gets comprehensive system status including CPU, RAM, disk, and network info.
     """
     print("--- 'Hands' (get_system_status) activated ---")
     try:
-        # CPU Information
-        cpu_percent = psutil.cpu_percent(interval=1)
-        cpu_count = psutil.cpu_count(logical=True)
-        cpu_freq = psutil.cpu_freq()
-        
-        # Memory Information
-        memory = psutil.virtual_memory()
-        swap = psutil.swap_memory()
-        
-        # Disk Information
-        disk_usage = psutil.disk_usage('/')
-        
-        # Network Information
-        network_stats = psutil.net_io_counters()
+        # Served from the shared telemetry sampler instead of a 1s blocking sweep
+        sample = get_sampler().latest()
+        memory = sample['memory']
+        disk_usage = sample['disk'] or {'percent': 0, 'used': 0, 'total': 0}
+        network_stats = sample['network'] or {'bytes_sent': 0, 'bytes_recv': 0}
         
         # Battery Information (if available)
         battery_info = ""
-        try:
-            battery = psutil.sensors_battery()
-            if battery:
-                battery_info = f"\\n🔋 Battery: {battery.percent:.1f}% ({'Charging' if battery.power_plugged else 'Not Charging'})"
-        except:
-            pass
+        battery = sample['battery']
+        if battery:
+            battery_info = f"\\n🔋 Battery: {battery['percent']:.1f}% ({'Charging' if battery['power_plugged'] else 'Not Charging'})"
         
         status_report = f"""📊 SYSTEM STATUS REPORT
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-🖥️  CPU: {cpu_percent}% usage | {cpu_count} cores | {cpu_freq.current:.0f} MHz
-🧠 RAM: {memory.percent}% used ({memory.used // (1024**3):.1f}GB / {memory.total // (1024**3):.1f}GB)
-💾 Disk: {disk_usage.percent}% used ({disk_usage.used // (1024**3):.1f}GB / {disk_usage.total // (1024**3):.1f}GB)
-🌐 Network: ↑{network_stats.bytes_sent // (1024**2):.1f}MB sent | ↓{network_stats.bytes_recv // (1024**2):.1f}MB received{battery_info}
+🖥️  CPU: {sample['cpu_percent']}% usage | {sample['cpu_count']} cores | {sample['cpu_freq_mhz'] or 0:.0f} MHz
+🧠 RAM: {memory['percent']}% used ({memory['used'] // (1024**3):.1f}GB / {memory['total'] // (1024**3):.1f}GB)
+💾 Disk: {disk_usage['percent']}% used ({disk_usage['used'] // (1024**3):.1f}GB / {disk_usage['total'] // (1024**3):.1f}GB)
+🌐 Network: ↑{network_stats['bytes_sent'] // (1024**2):.1f}MB sent | ↓{network_stats['bytes_recv'] // (1024**2):.1f}MB received{battery_info}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"""
         
         return status_report
@@ -61,16 +54,8 @@ def get_running_processes(limit: int = 10) -> str:
     """
     print(f"--- 'Hands' (get_running_processes) activated. Limit: {limit} ---")
     try:
-        processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-            try:
-                proc_info = proc.info
-                processes.append(proc_info)
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        
-        # Sort by CPU usage
-        processes = sorted(processes, key=lambda x: x['cpu_percent'] or 0, reverse=True)[:limit]
+        # Top processes from the sampler's last process table sweep
+        processes = get_sampler().processes(limit)
         
         process_report = "📋 TOP RUNNING PROCESSES\\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\\n"
         for proc in processes:
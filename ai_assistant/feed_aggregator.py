@@ -0,0 +1,306 @@
+# Feed Aggregation Service for YourDaddy Assistant
+"""
+Concurrent RSS/Atom feed fetching used by the web scraping module:
+- Bounded thread pool so a poll costs roughly the slowest feed, not the sum
+- Conditional GET (ETag / Last-Modified) with validators persisted on disk
+- Per-host rate limiting so several feeds on one host are not hammered
+- On-disk cache of parsed entries, served on 304 and on transport errors
+- Incremental "new since last poll" queries
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import calendar
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any
+from urllib.parse import urlparse
+
+import requests
+import feedparser
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = 'YourDaddy Assistant Feed Reader/1.0'
+
+
+@dataclass
+class FeedResult:
+    """Outcome of fetching a single feed"""
+    url: str
+    status: str  # 'updated', 'not_modified', 'cached', 'error'
+    source: str = 'Unknown source'
+    entries: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status != 'error'
+
+
+class HostRateLimiter:
+    """
+    Enforces a minimum interval between requests to the same host.
+    Requests to different hosts never wait on each other.
+    """
+
+    def __init__(self, min_interval: float = 1.0):
+        self.min_interval = min_interval
+        self._next_allowed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str):
+        """Block until a request to the url's host is allowed"""
+        if self.min_interval <= 0:
+            return
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed.get(host, 0.0))
+            self._next_allowed[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FeedCache:
+    """
+    On-disk store of per-feed state: HTTP validators, parsed entries
+    and the ids already returned by incremental polls.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> str:
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def load(self, url: str) -> Dict[str, Any]:
+        """Load cached state for a feed (empty dict if unknown)"""
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, url: str, state: Dict[str, Any]):
+        """Atomically persist state for a feed"""
+        path = self._path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with self._lock:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False, default=str)
+                os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not persist feed cache for {url}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _entry_timestamp(entry: Dict[str, Any]) -> Optional[float]:
+    """Best-effort UTC timestamp for a feed entry"""
+    for key in ('published_parsed', 'updated_parsed'):
+        parsed = entry.get(key)
+        if parsed:
+            try:
+                return float(calendar.timegm(parsed))
+            except (TypeError, ValueError, OverflowError):
+                pass
+    raw = entry.get('published') or entry.get('updated')
+    if isinstance(raw, str) and raw:
+        try:
+            parsed = feedparser._parse_date(raw)
+            if parsed:
+                return float(calendar.timegm(parsed))
+        except Exception:
+            pass
+    return None
+
+
+def normalize_entry(entry: Dict[str, Any], source: str) -> Dict[str, Any]:
+    """Convert a feedparser entry into a plain, JSON-serializable dict"""
+    link = str(entry.get('link', '') or '')
+    title = str(entry.get('title', 'No title') or 'No title')
+    entry_id = entry.get('id') or entry.get('guid') or link or title
+    return {
+        'id': str(entry_id),
+        'title': title,
+        'summary': str(entry.get('summary', 'No summary') or ''),
+        'link': link,
+        'published': str(entry.get('published', 'Unknown date') or 'Unknown date'),
+        'published_ts': _entry_timestamp(entry),
+        'source': source,
+    }
+
+
+class FeedAggregator:
+    """
+    Fetches many feeds concurrently with conditional GET and a local cache.
+
+    Args:
+        session: Shared requests session (one is created if omitted)
+        cache_dir: Directory for persisted feed state
+        max_workers: Upper bound on concurrent fetches
+        timeout: Per-request timeout in seconds
+        min_host_interval: Minimum seconds between requests to one host
+        max_age: Serve from cache without any request if fetched this recently
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None,
+                 cache_dir: str = os.path.join("web_cache", "feeds"),
+                 max_workers: int = 8, timeout: float = 10.0,
+                 min_host_interval: float = 1.0, max_age: float = 0.0):
+        self.session = session or requests.Session()
+        if 'User-Agent' not in self.session.headers:
+            self.session.headers['User-Agent'] = DEFAULT_USER_AGENT
+        self.cache = FeedCache(cache_dir)
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.max_age = max_age
+        self.rate_limiter = HostRateLimiter(min_host_interval)
+        self._feed_locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.stats = {'requests': 0, 'not_modified': 0, 'updated': 0,
+                      'errors': 0, 'bytes': 0}
+        self._stats_lock = threading.Lock()
+
+    def _feed_lock(self, url: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._feed_locks.get(url)
+            if lock is None:
+                lock = self._feed_locks[url] = threading.Lock()
+            return lock
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def fetch_feed(self, url: str) -> FeedResult:
+        """Fetch one feed, revalidating the cached copy when possible"""
+        with self._feed_lock(url):
+            return self._fetch_locked(url)
+
+    def _fetch_locked(self, url: str) -> FeedResult:
+        started = time.monotonic()
+        state = self.cache.load(url)
+        cached_entries = state.get('entries', [])
+        source = state.get('source', 'Unknown source')
+
+        if self.max_age > 0 and state.get('fetched_at') and \
+                time.time() - state['fetched_at'] < self.max_age:
+            return FeedResult(url, 'cached', source, cached_entries,
+                              elapsed=time.monotonic() - started)
+
+        headers = {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+
+        try:
+            self.rate_limiter.acquire(url)
+            self._count('requests')
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            self._count('errors')
+            logger.debug(f"Feed fetch failed for {url}: {e}")
+            status = 'cached' if cached_entries else 'error'
+            return FeedResult(url, status, source, cached_entries, error=str(e),
+                              elapsed=time.monotonic() - started)
+
+        if response.status_code == 304:
+            self._count('not_modified')
+            state['fetched_at'] = time.time()
+            self.cache.save(url, state)
+            return FeedResult(url, 'not_modified', source, cached_entries,
+                              elapsed=time.monotonic() - started)
+
+        if response.status_code != 200:
+            self._count('errors')
+            status = 'cached' if cached_entries else 'error'
+            return FeedResult(url, status, source, cached_entries,
+                              error=f"HTTP {response.status_code}",
+                              elapsed=time.monotonic() - started)
+
+        content = response.content or b''
+        self._count('bytes', len(content))
+        self._count('updated')
+        parsed = feedparser.parse(content)
+        source = str(parsed.feed.get('title', 'Unknown source') or 'Unknown source')
+        entries = [normalize_entry(entry, source) for entry in parsed.entries]
+
+        state.update({
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'source': source,
+            'entries': entries,
+        })
+        self.cache.save(url, state)
+        return FeedResult(url, 'updated', source, entries,
+                          elapsed=time.monotonic() - started)
+
+    def fetch_all(self, urls: List[str]) -> List[FeedResult]:
+        """Fetch feeds concurrently; results are returned in input order"""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return []
+        workers = min(self.max_workers, len(urls))
+        if workers == 1:
+            return [self.fetch_feed(urls[0])]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='feed') as pool:
+            return list(pool.map(self.fetch_feed, urls))
+
+    def poll(self, urls: List[str], max_per_feed: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Return only entries not returned by a previous poll, newest first.
+        The first poll of a feed returns everything currently in it.
+
+        With max_per_feed, each feed returns at most that many of its newest
+        unseen entries; the rest stay unseen for the next poll.
+        """
+        new_entries = []
+        for result in self.fetch_all(urls):
+            if not result.ok:
+                continue
+            with self._feed_lock(result.url):
+                state = self.cache.load(result.url)
+                seen = set(state.get('seen_ids', []))
+                fresh = [e for e in result.entries if e['id'] not in seen]
+                if max_per_feed is not None:
+                    fresh.sort(key=lambda e: e.get('published_ts') or 0, reverse=True)
+                    fresh = fresh[:max_per_feed]
+                if fresh:
+                    # Only ids still present in the feed need remembering
+                    current_ids = {e['id'] for e in result.entries}
+                    state['seen_ids'] = sorted((seen & current_ids) | {e['id'] for e in fresh})
+                    state['last_poll'] = time.time()
+                    self.cache.save(result.url, state)
+            new_entries.extend(fresh)
+        new_entries.sort(key=lambda e: e.get('published_ts') or 0, reverse=True)
+        return new_entries
+
+    def new_since(self, urls: List[str], since: float) -> List[Dict[str, Any]]:
+        """Return entries published after a UNIX timestamp, newest first"""
+        entries = []
+        for result in self.fetch_all(urls):
+            entries.extend(e for e in result.entries
+                           if (e.get('published_ts') or 0) > since)
+        entries.sort(key=lambda e: e.get('published_ts') or 0, reverse=True)
+        return entries
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self.stats)
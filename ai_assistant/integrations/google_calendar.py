@@ -8,6 +8,7 @@ Provides:
 - Create, read, update, delete calendar events
 - Search events
 - Get today's schedule and upcoming events
+- Local event mirror with incremental (syncToken) background sync
 """
 
 import os
@@ -22,6 +23,11 @@ from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+try:
+    from .calendar_sync import CalendarMirror
+except ImportError:
+    from calendar_sync import CalendarMirror
+
 # Calendar scope for read/write access
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
@@ -49,6 +55,8 @@ class CalendarManager:
         self.service = None
         self.credentials_path = Path('credentials.json')
         self.token_path = Path('calendar_token.pickle')
+        self.cache_path = Path('calendar_cache.db')
+        self.mirror = None
         self._initialized = True
     
     def setup_auth(self) -> str:
@@ -137,6 +145,20 @@ Note: You'll need to add yourself as a test user if your app is in testing mode.
                 return None
         return self.service
     
+    def get_mirror(self, service=None) -> Optional[CalendarMirror]:
+        """
+        Get the local calendar mirror, creating it (and its background sync) if needed
+        """
+        service = service or self.get_service()
+        if service is None:
+            return None
+        if self.mirror is None or self.mirror.service is not service:
+            if self.mirror:
+                self.mirror.stop()
+            self.mirror = CalendarMirror(service, str(self.cache_path))
+            self.mirror.start()
+        return self.mirror
+    
     def is_authenticated(self) -> bool:
         """Check if calendar is authenticated"""
         if self.service is None:
@@ -160,6 +182,25 @@ def get_calendar_service():
     return manager.get_service()
 
 
+def get_calendar_mirror():
+    """Helper function to get the locally synced calendar mirror."""
+    service = get_calendar_service()
+    if not service:
+        return None
+    return CalendarManager().get_mirror(service)
+
+
+def _sync_mirror_after_write(event: Dict = None, removed_id: str = ""):
+    """Apply a change made through the API to the mirror right away."""
+    mirror = CalendarManager().mirror
+    if mirror is None:
+        return
+    if event:
+        mirror.apply_event(event)
+    if removed_id:
+        mirror.remove_event(removed_id)
+
+
 def get_upcoming_events(days_ahead: int = 7) -> str:
     """
     Gets upcoming calendar events for the next N days.
@@ -167,27 +208,18 @@ def get_upcoming_events(days_ahead: int = 7) -> str:
     """
     print(f"--- 'Hands' (get_upcoming_events) activated. Days ahead: {days_ahead} ---")
     try:
-        service = get_calendar_service()
-        if not service:
+        mirror = get_calendar_mirror()
+        if not mirror:
             return "❌ Calendar not authenticated. Please run 'setup calendar' first."
         
         # Validate input
         days_ahead = max(1, min(365, days_ahead))
         
-        # Get events for the next N days
-        now = datetime.datetime.utcnow().isoformat() + 'Z'
-        future = (datetime.datetime.utcnow() + datetime.timedelta(days=days_ahead)).isoformat() + 'Z'
-        
-        events_result = service.events().list(
-            calendarId='primary', 
-            timeMin=now, 
-            timeMax=future,
-            maxResults=50, 
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
+        # Get events for the next N days from the local mirror
+        now = datetime.datetime.now()
+        future = now + datetime.timedelta(days=days_ahead)
         
-        events = events_result.get('items', [])
+        events = mirror.events_between(now, future, limit=50)
         
         if not events:
             return f"📅 No upcoming events in the next {days_ahead} days."
@@ -295,6 +327,7 @@ def create_calendar_event(title: str, date: str, time: str = "", duration_hours:
         
         # Create the event
         event = service.events().insert(calendarId='primary', body=event_body).execute()
+        _sync_mirror_after_write(event=event)
         event_link = event.get('htmlLink', '')
         
         result = f"✅ Calendar event created: '{title}' on {date}"
@@ -318,25 +351,16 @@ def get_todays_schedule() -> str:
     """
     print("--- 'Hands' (get_todays_schedule) activated ---")
     try:
-        service = get_calendar_service()
-        if not service:
+        mirror = get_calendar_mirror()
+        if not mirror:
             return "❌ Calendar not authenticated. Please run 'setup calendar' first."
         
         # Get today's events
         today = datetime.date.today()
-        start_of_day = datetime.datetime.combine(today, datetime.time.min).isoformat() + 'Z'
-        end_of_day = datetime.datetime.combine(today, datetime.time.max).isoformat() + 'Z'
-        
-        events_result = service.events().list(
-            calendarId='primary', 
-            timeMin=start_of_day, 
-            timeMax=end_of_day,
-            maxResults=50, 
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
+        start_of_day = datetime.datetime.combine(today, datetime.time.min)
+        end_of_day = start_of_day + datetime.timedelta(days=1)
         
-        events = events_result.get('items', [])
+        events = mirror.events_between(start_of_day, end_of_day, limit=50)
         
         if not events:
             return f"📅 No events scheduled for today ({today.strftime('%A, %B %d, %Y')})."
@@ -377,8 +401,8 @@ def search_calendar_events(query: str, days_back: int = 30, days_ahead: int = 30
     """
     print(f"--- 'Hands' (search_calendar_events) activated. Query: {query} ---")
     try:
-        service = get_calendar_service()
-        if not service:
+        mirror = get_calendar_mirror()
+        if not mirror:
             return "❌ Calendar not authenticated. Please run 'setup calendar' first."
         
         # Validate input
@@ -386,20 +410,11 @@ def search_calendar_events(query: str, days_back: int = 30, days_ahead: int = 30
         days_ahead = max(0, min(365, days_ahead))
         
         # Search in time range
-        past = (datetime.datetime.utcnow() - datetime.timedelta(days=days_back)).isoformat() + 'Z'
-        future = (datetime.datetime.utcnow() + datetime.timedelta(days=days_ahead)).isoformat() + 'Z'
-        
-        events_result = service.events().list(
-            calendarId='primary', 
-            timeMin=past, 
-            timeMax=future,
-            q=query, 
-            maxResults=50, 
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
+        now = datetime.datetime.now()
+        past = now - datetime.timedelta(days=days_back)
+        future = now + datetime.timedelta(days=days_ahead)
         
-        events = events_result.get('items', [])
+        events = mirror.events_between(past, future, query=query, limit=50)
         
         if not events:
             return f"📅 No events found matching '{query}' in the specified time range."
@@ -496,6 +511,7 @@ def delete_calendar_event(event_title: str, date: str = "") -> str:
         # Delete the event
         event = events[0]
         service.events().delete(calendarId='primary', eventId=event['id']).execute()
+        _sync_mirror_after_write(removed_id=event['id'])
         
         return f"✅ Successfully deleted calendar event: '{event_title}'"
         
@@ -579,6 +595,7 @@ def update_calendar_event(event_title: str, date: str = "", **updates) -> str:
             eventId=event['id'],
             body=event
         ).execute()
+        _sync_mirror_after_write(event=updated_event)
         
         return f"✅ Successfully updated event: '{event.get('summary', event_title)}'"
         
@@ -593,6 +610,7 @@ __all__ = [
     'CalendarManager',
     'setup_calendar_auth',
     'get_calendar_service',
+    'get_calendar_mirror',
     'get_upcoming_events',
     'create_calendar_event',
     'get_todays_schedule',
@@ -0,0 +1,294 @@
+# Mobile Sync Module
+"""
+Delta sync for paired mobile devices.
+
+Every sync domain (skills, recent conversations, system status, quick
+actions) is an entry in one monotonically versioned change feed. Devices
+send the cursor from their previous sync and only receive the domains that
+changed since then, get a 304 when nothing changed, and can long-poll or
+subscribe to a server-sent event stream instead of polling on a timer.
+Domain data is collected on its own interval, not once per request, and
+encoded response bodies are shared by every device at the same cursor.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Response, stream_with_context
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+MIN_COMPRESS_BYTES = 1024
+MAX_WAIT_SECONDS = 30
+SSE_HEARTBEAT_SECONDS = 15
+
+
+class SyncFeed:
+    """Versioned change log of the data synced to mobile devices"""
+
+    def __init__(self, log_retention: int = 200, response_cache_size: int = 256):
+        # Cursors are "<epoch>.<version>"; a new epoch after a restart makes
+        # every device fall back to a full sync instead of trusting old versions
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.log_retention = log_retention
+        self.response_cache_size = response_cache_size
+
+        self._snapshots: Dict[str, Tuple[int, str, Any]] = {}  # domain -> (version, digest, value)
+        self._logs: Dict[str, deque] = {}                       # domain -> (version, item) entries
+        self._log_floor: Dict[str, int] = {}                    # newest version evicted from a log
+        self._collectors: Dict[str, Tuple[Callable[[], Any], float]] = {}
+        self._collected_at: Dict[str, float] = {}
+        self._refresh_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._responses: "OrderedDict[tuple, Tuple[str, bytes, Optional[str]]]" = OrderedDict()
+
+        self.stats = {'full': 0, 'delta': 0, 'not_modified': 0, 'collections': 0, 'encodes': 0}
+
+    @property
+    def cursor(self) -> str:
+        return f"{self.epoch}.{self.version}"
+
+    def parse_cursor(self, cursor: Optional[str]) -> Optional[int]:
+        """Version a device cursor refers to, or None if it needs a full sync."""
+        if not cursor:
+            return None
+        epoch, _, version = str(cursor).partition('.')
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        version = int(version)
+        return version if version <= self.version else None
+
+    # --- Writing ---
+
+    def register(self, domain: str, collector: Callable[[], Any], interval: float):
+        """
+        Collect a snapshot domain at most once per interval.
+
+        Args:
+            domain: Domain name used as the key in sync responses
+            collector: Returns the current value of the domain
+            interval: Seconds a collected value is reused for
+        """
+        self._collectors[domain] = (collector, interval)
+
+    def publish(self, domain: str, value: Any) -> bool:
+        """Replace a snapshot domain; returns False if the value did not change."""
+        digest = hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        with self._changed:
+            current = self._snapshots.get(domain)
+            if current and current[1] == digest:
+                return False
+            self.version += 1
+            self._snapshots[domain] = (self.version, digest, value)
+            self._changed.notify_all()
+        return True
+
+    def register_log(self, domain: str):
+        """Declare a log domain so full syncs include it even while empty."""
+        with self._changed:
+            self._logs.setdefault(domain, deque(maxlen=self.log_retention))
+
+    def append(self, domain: str, item: Any):
+        """Append an item to a log domain such as recent conversations."""
+        with self._changed:
+            log = self._logs.setdefault(domain, deque(maxlen=self.log_retention))
+            if len(log) == log.maxlen:
+                self._log_floor[domain] = log[0][0]
+            self.version += 1
+            log.append((self.version, item))
+            self._changed.notify_all()
+
+    def log_items(self, domain: str) -> List[Any]:
+        with self._changed:
+            return [item for _, item in self._logs.get(domain, ())]
+
+    def refresh(self, force: bool = False):
+        """Re-collect snapshot domains whose interval has elapsed."""
+        now = time.time()
+        due = [domain for domain, (_, interval) in self._collectors.items()
+               if force or now - self._collected_at.get(domain, 0) >= interval]
+        if not due:
+            return
+        # One request collects while the others keep serving the current data,
+        # unless there is no data yet
+        first = any(domain not in self._collected_at for domain in due)
+        if not self._refresh_lock.acquire(blocking=force or first):
+            return
+        try:
+            for domain in due:
+                collector, _ = self._collectors[domain]
+                try:
+                    value = collector()
+                except Exception as e:
+                    print(f"Error collecting sync domain {domain}: {e}")
+                    continue
+                finally:
+                    self._collected_at[domain] = time.time()
+                self.stats['collections'] += 1
+                self.publish(domain, value)
+        finally:
+            self._refresh_lock.release()
+
+    def _next_collection_in(self) -> float:
+        now = time.time()
+        return min((self._collected_at.get(domain, 0) + interval - now
+                    for domain, (_, interval) in self._collectors.items()), default=MAX_WAIT_SECONDS)
+
+    # --- Reading ---
+
+    def changes_since(self, since: Optional[int]) -> Dict[str, Any]:
+        """
+        Domains changed after a version.
+
+        Args:
+            since: Version from the device cursor, None for a full sync
+
+        Returns:
+            Dictionary with the new cursor, whether this is a full sync, the
+            changed domains and the log domains to replace rather than extend
+        """
+        with self._changed:
+            full = since is None
+            changes = {'cursor': self.cursor, 'full': full, 'replace': []}
+            for domain, (version, _, value) in self._snapshots.items():
+                if full or version > since:
+                    changes[domain] = value
+            for domain, log in self._logs.items():
+                if full or since < self._log_floor.get(domain, 0):
+                    # The device missed evicted entries; send what is retained
+                    changes[domain] = [item for _, item in log]
+                    if not full:
+                        changes['replace'].append(domain)
+                elif log and log[-1][0] > since:
+                    changes[domain] = [item for version, item in log if version > since]
+            return changes
+
+    def wait(self, since: int, timeout: float) -> bool:
+        """Block until something changes after a version; False on timeout."""
+        deadline = time.time() + timeout
+        while True:
+            self.refresh()
+            with self._changed:
+                if self.version > since:
+                    return True
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._changed.wait(max(0.01, min(remaining, self._next_collection_in())))
+
+    def encoded(self, since: Optional[int], encoding: Optional[str]) -> Tuple[str, bytes, Optional[str]]:
+        """
+        Serialized delta, shared by every device at the same cursor.
+
+        Args:
+            since: Version from the device cursor, None for a full sync
+            encoding: Encoding the device accepts ('br', 'gzip' or None)
+
+        Returns:
+            Tuple of cursor, body and the encoding actually applied
+        """
+        key = (since, self.version, encoding)
+        with self._changed:
+            cached = self._responses.get(key)
+            if cached is not None:
+                self._responses.move_to_end(key)
+                return cached
+        changes = self.changes_since(since)
+        body = json.dumps(changes, default=str).encode('utf-8')
+        # Small deltas cost more to compress than they save
+        if len(body) < MIN_COMPRESS_BYTES:
+            encoding = None
+        elif encoding == 'br':
+            body = brotli.compress(body)
+        elif encoding == 'gzip':
+            body = gzip.compress(body, compresslevel=6)
+        self.stats['encodes'] += 1
+        result = (changes['cursor'], body, encoding)
+        with self._changed:
+            self._responses[key] = result
+            while len(self._responses) > self.response_cache_size:
+                self._responses.popitem(last=False)
+        return result
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred response encoding for an Accept-Encoding header."""
+    accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    if HAS_BROTLI and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def sync_response(feed: SyncFeed, cursor: Optional[str], wait: float = 0,
+                  if_none_match: Optional[str] = None, accept_encoding: str = '') -> Response:
+    """
+    HTTP response for a sync request.
+
+    Args:
+        feed: Change feed to read from
+        cursor: Cursor from the device's previous sync, if any
+        wait: Seconds to long-poll for a change when the device is up to date
+        if_none_match: If-None-Match header value
+        accept_encoding: Accept-Encoding header value
+    """
+    feed.refresh()
+    since = feed.parse_cursor(cursor)
+    if since is not None and since == feed.version and wait > 0:
+        feed.wait(since, min(wait, MAX_WAIT_SECONDS))
+
+    etag = f'"{feed.cursor}"'
+    if since == feed.version or (if_none_match and etag in if_none_match):
+        feed.stats['not_modified'] += 1
+        response = Response(status=304)
+        response.headers['ETag'] = etag
+        return response
+
+    feed.stats['full' if since is None else 'delta'] += 1
+    cursor, body, encoding = feed.encoded(since, choose_encoding(accept_encoding))
+    response = Response(body, mimetype='application/json')
+    response.headers['ETag'] = f'"{cursor}"'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def sync_stream(feed: SyncFeed, cursor: Optional[str],
+                heartbeat: float = SSE_HEARTBEAT_SECONDS) -> Response:
+    """
+    Server-sent event stream of sync deltas.
+
+    Args:
+        feed: Change feed to read from
+        cursor: Cursor to resume from (the Last-Event-ID header on reconnect)
+        heartbeat: Seconds between keep-alive comments when idle
+    """
+    def events():
+        feed.refresh()
+        since = feed.parse_cursor(cursor)
+        while True:
+            if since is None or feed.version > since:
+                changes = feed.changes_since(since)
+                since = feed.parse_cursor(changes['cursor'])
+                yield f"id: {changes['cursor']}\nevent: sync\ndata: {json.dumps(changes, default=str)}\n\n"
+            elif not feed.wait(since, heartbeat):
+                yield ": keepalive\n\n"
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -23,6 +23,7 @@ from dataclasses import dataclass, asdict
 from enum import Enum
 from pathlib import Path
 import base64
+import platform
 
 # Web framework
 from flask import Flask, request, jsonify, render_template_string, send_from_directory
@@ -33,6 +34,16 @@ from flask_cors import CORS
 import speech_recognition as sr
 import pyttsx3
 
+try:
+    from .mobile_sync import SyncFeed, sync_response, sync_stream
+except ImportError:
+    from mobile_sync import SyncFeed, sync_response, sync_stream
+
+try:
+    from .telemetry import get_sampler
+except ImportError:
+    from modules.telemetry import get_sampler
+
 # QR code for mobile pairing
 try:
     import qrcode
@@ -1175,6 +1186,14 @@ class MobileAppBackend:
         self.push_tokens = {}
         self.assistant_instance = None
         
+        # Versioned change feed; each domain is collected on its own interval
+        # instead of on every device poll
+        self.sync_feed = SyncFeed()
+        self.sync_feed.register("skills", self.get_skills_data, interval=60)
+        self.sync_feed.register("system_status", self.get_system_status, interval=5)
+        self.sync_feed.register("quick_actions", self.get_quick_actions, interval=3600)
+        self.sync_feed.register_log("recent_conversations")
+        
         self.setup_mobile_routes()
     
     def setup_mobile_routes(self):
@@ -1224,6 +1243,12 @@ class MobileAppBackend:
             
             try:
                 response = self.process_mobile_command(command, device_id)
+                self.sync_feed.append("recent_conversations", {
+                    "timestamp": datetime.now().isoformat(),
+                    "device_id": device_id,
+                    "command": command,
+                    "response": response
+                })
                 return jsonify({
                     "response": response,
                     "timestamp": datetime.now().isoformat()
@@ -1231,21 +1256,34 @@ class MobileAppBackend:
             except Exception as e:
                 return jsonify({"error": str(e)}), 500
         
-        @self.app.route('/mobile/api/sync', methods=['POST'])
+        @self.app.route('/mobile/api/sync', methods=['GET', 'POST'])
         def sync_data():
             api_key = request.headers.get('Authorization')
             if not self.validate_mobile_api_key(api_key):
                 return jsonify({"error": "Invalid API key"}), 401
             
-            # Sync assistant data with mobile device
-            sync_data = {
-                "skills": self.get_skills_data(),
-                "recent_conversations": self.get_recent_conversations(),
-                "system_status": self.get_system_status(),
-                "quick_actions": self.get_quick_actions()
-            }
+            # Only domains changed since the device's cursor are sent; with
+            # ?wait=<seconds> an up-to-date device long-polls for the next change
+            data = request.get_json(silent=True) or {}
+            cursor = request.args.get('since') or data.get('since')
+            try:
+                wait = float(request.args.get('wait') or data.get('wait') or 0)
+            except (TypeError, ValueError):
+                wait = 0
+            
+            return sync_response(self.sync_feed, cursor, wait=wait,
+                                 if_none_match=request.headers.get('If-None-Match'),
+                                 accept_encoding=request.headers.get('Accept-Encoding', ''))
+        
+        @self.app.route('/mobile/api/sync/stream')
+        def sync_stream_events():
+            # EventSource cannot set headers, so the key may come as a query parameter
+            api_key = request.headers.get('Authorization') or request.args.get('api_key')
+            if not self.validate_mobile_api_key(api_key):
+                return jsonify({"error": "Invalid API key"}), 401
             
-            return jsonify(sync_data)
+            cursor = request.headers.get('Last-Event-ID') or request.args.get('since')
+            return sync_stream(self.sync_feed, cursor)
         
         @self.app.route('/mobile/api/push/send', methods=['POST'])
         def send_push_notification():
@@ -1314,14 +1352,7 @@ class MobileAppBackend:
     
     def get_recent_conversations(self) -> List:
         """Get recent conversations for mobile sync"""
-        # This would come from conversation history
-        return [
-            {
-                "timestamp": datetime.now().isoformat(),
-                "command": "example command",
-                "response": "example response"
-            }
-        ]
+        return self.sync_feed.log_items("recent_conversations")[-20:]
     
     def get_system_status(self) -> Dict:
         """Get system status for mobile display"""
@@ -1339,7 +1370,16 @@ class MobileAppBackend:
             except Exception:
                 pass
         
-        return {"platform": "unknown", "cpu_usage": 0, "memory_usage": 0, "active_processes": 0}
+        try:
+            sample = get_sampler().latest()
+            return {
+                "platform": platform.system().lower(),
+                "cpu_usage": sample["cpu_percent"],
+                "memory_usage": sample["memory_percent"],
+                "active_processes": sample["process_count"]
+            }
+        except Exception:
+            return {"platform": "unknown", "cpu_usage": 0, "memory_usage": 0, "active_processes": 0}
     
     def get_quick_actions(self) -> List:
         """Get quick actions for mobile interface"""
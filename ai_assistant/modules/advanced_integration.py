@@ -30,8 +30,19 @@ else:
     winreg = None
 import signal
 import socket
+import itertools
 from pathlib import Path
 
+try:
+    from .event_sources import EventBatchWriter, FilesystemEventSource, compile_globs
+except ImportError:
+    from event_sources import EventBatchWriter, FilesystemEventSource, compile_globs
+
+try:
+    from .telemetry import get_sampler
+except ImportError:
+    from modules.telemetry import get_sampler
+
 class SystemType(Enum):
     """Supported system types"""
     WINDOWS = "windows"
@@ -223,15 +234,24 @@ class PlatformAdapter:
 class SystemHookManager:
     """Manages system-wide hooks and events"""
     
-    def __init__(self, db_path: str = "system_hooks.db"):
+    # Platform capability backing each hook type; other types only need psutil
+    HOOK_CAPABILITIES = {
+        HookType.FILE_SYSTEM: "fs_monitor",
+        HookType.PROCESS: "process_monitor",
+    }
+    
+    def __init__(self, db_path: str = "system_hooks.db", flush_interval: float = 1.0):
         self.db_path = db_path
         self.adapter = PlatformAdapter()
         self.hooks = {}
         self.event_handlers = {}
         self.monitoring_threads = {}
         self.is_monitoring = False
+        self._event_counter = itertools.count()
         
         self.init_database()
+        # Events are persisted in batches, one transaction per flush interval
+        self.event_writer = EventBatchWriter(db_path, flush_interval=flush_interval)
     
     def init_database(self):
         """Initialize hooks database"""
@@ -249,6 +269,11 @@ class SystemHookManager:
             )
         ''')
         
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_system_events_type_time
+            ON system_events (hook_type, timestamp)
+        ''')
+        
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS hook_configs (
                 hook_name TEXT PRIMARY KEY,
@@ -264,7 +289,8 @@ class SystemHookManager:
     
     def register_hook(self, hook_name: str, hook_type: HookType, config: Dict[str, Any] = None):
         """Register a new system hook"""
-        if not self.adapter.is_capability_supported(hook_type.value):
+        capability = self.HOOK_CAPABILITIES.get(hook_type)
+        if capability and not self.adapter.is_capability_supported(capability):
             raise ValueError(f"Hook type {hook_type.value} not supported on {self.adapter.system_type.value}")
         
         self.hooks[hook_name] = {
@@ -306,19 +332,32 @@ class SystemHookManager:
         """Stop monitoring for a specific hook"""
         if hook_name in self.monitoring_threads:
             # Signal thread to stop
-            self.monitoring_threads[hook_name]["stop"] = True
+            thread_data = self.monitoring_threads[hook_name]
+            thread_data["stop"] = True
+            if thread_data.get("source"):
+                thread_data["source"].stop()
             self.hooks[hook_name]["active"] = False
-    
-    def register_event_handler(self, hook_type: HookType, handler: Callable[[SystemEvent], None]):
-        """Register an event handler for a hook type"""
+        self.event_writer.flush()
+    
+    def register_event_handler(self, hook_type: HookType, handler: Callable[[SystemEvent], None],
+                               patterns: Optional[List[str]] = None):
+        """
+        Register an event handler for a hook type.
+        
+        Args:
+            hook_type: Hook type to subscribe to
+            handler: Called with each matching SystemEvent
+            patterns: Optional glob patterns matched against the event's "path"
+                (e.g. ["*.py", "*/Downloads/*"]); events without a path never match
+        """
         if hook_type not in self.event_handlers:
             self.event_handlers[hook_type] = []
-        self.event_handlers[hook_type].append(handler)
+        self.event_handlers[hook_type].append((handler, compile_globs(patterns)))
     
     def _emit_event(self, hook_type: HookType, data: Dict[str, Any], source: str):
         """Emit a system event"""
         event = SystemEvent(
-            event_id=f"{hook_type.value}_{int(time.time() * 1000)}",
+            event_id=f"{hook_type.value}_{int(time.time() * 1000)}_{next(self._event_counter)}",
             hook_type=hook_type,
             timestamp=datetime.now(),
             data=data,
@@ -330,114 +369,95 @@ class SystemHookManager:
         
         # Call registered handlers
         if hook_type in self.event_handlers:
-            for handler in self.event_handlers[hook_type]:
+            path = data.get("path")
+            for handler, matches in self.event_handlers[hook_type]:
+                if matches and not (path and matches(path)):
+                    continue
                 try:
                     handler(event)
                 except Exception as e:
                     print(f"Error in event handler: {e}")
     
     def _store_event(self, event: SystemEvent):
-        """Store event in database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO system_events (event_id, hook_type, data, source)
-            VALUES (?, ?, ?, ?)
-        ''', (event.event_id, event.hook_type.value, json.dumps(event.data), event.source))
-        conn.commit()
-        conn.close()
+        """Queue event for the next batched database write"""
+        self.event_writer.put((event.event_id, event.hook_type.value,
+                               event.timestamp.isoformat(sep=" "), json.dumps(event.data), event.source))
     
     def _start_filesystem_hook(self, hook_name: str, config: Dict[str, Any]):
         """Start filesystem monitoring hook"""
         watch_paths = config.get("paths", [os.getcwd()])
         
-        def monitor_filesystem():
-            thread_data = {"stop": False}
-            self.monitoring_threads[hook_name] = thread_data
-            
-            # Simple polling-based implementation for cross-platform compatibility
-            last_check = {}
-            
-            while not thread_data["stop"]:
-                for path in watch_paths:
-                    try:
-                        for root, dirs, files in os.walk(path):
-                            for file in files:
-                                filepath = os.path.join(root, file)
-                                try:
-                                    stat = os.stat(filepath)
-                                    mtime = stat.st_mtime
-                                    
-                                    if filepath not in last_check or last_check[filepath] != mtime:
-                                        if filepath in last_check:
-                                            # File was modified
-                                            self._emit_event(HookType.FILE_SYSTEM, {
-                                                "action": "modified",
-                                                "path": filepath,
-                                                "size": stat.st_size,
-                                                "mtime": mtime
-                                            }, hook_name)
-                                        last_check[filepath] = mtime
-                                except (OSError, IOError):
-                                    continue
-                    except (OSError, IOError):
-                        continue
-                
-                time.sleep(config.get("interval", 1))
-        
-        thread = threading.Thread(target=monitor_filesystem, daemon=True)
-        thread.start()
+        def on_change(action: str, path: str, info: Dict[str, Any]):
+            data = {"action": action, "path": path}
+            data.update(info)
+            self._emit_event(HookType.FILE_SYSTEM, data, hook_name)
+        
+        # Kernel notifications where available; bursts are coalesced per path
+        source = FilesystemEventSource(
+            watch_paths, on_change,
+            debounce=config.get("debounce", 0.5),
+            backend=config.get("backend", "auto"),
+            poll_interval=config.get("interval", 1),
+            ignore=config.get("ignore")
+        )
+        self.monitoring_threads[hook_name] = {"stop": False, "source": source}
+        source.start()
     
     def _start_process_hook(self, hook_name: str, config: Dict[str, Any]):
         """Start process monitoring hook"""
+        thread_data = {"stop": False}
+        self.monitoring_threads[hook_name] = thread_data
+        
         def monitor_processes():
-            thread_data = {"stop": False}
-            self.monitoring_threads[hook_name] = thread_data
-            
-            last_processes = set(p.pid for p in psutil.process_iter())
+            # psutil.pids() is a plain listing; details are only read for new processes
+            last_processes = set(psutil.pids())
+            names = {}
             
             while not thread_data["stop"]:
+                time.sleep(config.get("interval", 2))
                 try:
-                    current_processes = set(p.pid for p in psutil.process_iter())
+                    current_processes = set(psutil.pids())
                     
                     # New processes
                     new_processes = current_processes - last_processes
                     for pid in new_processes:
                         try:
                             process = psutil.Process(pid)
-                            self._emit_event(HookType.PROCESS, {
-                                "action": "created",
-                                "pid": pid,
-                                "name": process.name(),
-                                "cmdline": process.cmdline(),
-                                "username": process.username()
-                            }, hook_name)
+                            with process.oneshot():
+                                data = {
+                                    "action": "created",
+                                    "pid": pid,
+                                    "name": process.name(),
+                                    "cmdline": process.cmdline(),
+                                    "username": process.username()
+                                }
+                            names[pid] = data["name"]
+                            self._emit_event(HookType.PROCESS, data, hook_name)
                         except (psutil.NoSuchProcess, psutil.AccessDenied):
                             continue
                     
                     # Terminated processes
                     terminated_processes = last_processes - current_processes
                     for pid in terminated_processes:
-                        self._emit_event(HookType.PROCESS, {
-                            "action": "terminated",
-                            "pid": pid
-                        }, hook_name)
+                        data = {"action": "terminated", "pid": pid}
+                        if pid in names:
+                            data["name"] = names.pop(pid)
+                        self._emit_event(HookType.PROCESS, data, hook_name)
                     
                     last_processes = current_processes
                     
                 except Exception as e:
                     print(f"Process monitoring error: {e}")
-                
-                time.sleep(config.get("interval", 2))
         
         thread = threading.Thread(target=monitor_processes, daemon=True)
         thread.start()
     
     def _start_network_hook(self, hook_name: str, config: Dict[str, Any]):
         """Start network monitoring hook"""
+        thread_data = {"stop": False}
+        self.monitoring_threads[hook_name] = thread_data
+        
         def monitor_network():
-            thread_data = {"stop": False}
-            self.monitoring_threads[hook_name] = thread_data
             
             last_connections = set()
             
@@ -476,9 +496,10 @@ class SystemHookManager:
     
     def _start_power_hook(self, hook_name: str, config: Dict[str, Any]):
         """Start power monitoring hook"""
+        thread_data = {"stop": False}
+        self.monitoring_threads[hook_name] = thread_data
+        
         def monitor_power():
-            thread_data = {"stop": False}
-            self.monitoring_threads[hook_name] = thread_data
             
             last_battery = None
             last_power_plugged = None
@@ -519,6 +540,7 @@ class SystemHookManager:
     
     def get_recent_events(self, hook_type: HookType = None, limit: int = 100) -> List[SystemEvent]:
         """Get recent system events"""
+        self.event_writer.flush()
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -558,9 +580,13 @@ class HardwareMonitor:
     def __init__(self):
         self.monitoring = False
         self.callbacks = {}
+        self.sampler = get_sampler()
+        self._subscription = None
     
     def get_system_info(self) -> Dict[str, Any]:
         """Get comprehensive system information"""
+        # Live figures come from the shared sampler's latest snapshot
+        sample = self.sampler.latest()
         info = {
             "platform": {
                 "system": platform.system(),
@@ -571,20 +597,20 @@ class HardwareMonitor:
             },
             "cpu": {
                 "physical_cores": psutil.cpu_count(logical=False),
-                "logical_cores": psutil.cpu_count(logical=True),
-                "usage_percent": psutil.cpu_percent(interval=1),
+                "logical_cores": sample["cpu_count"],
+                "usage_percent": sample["cpu_percent"],
                 "frequency": psutil.cpu_freq()._asdict() if psutil.cpu_freq() else None
             },
             "memory": {
-                "total": psutil.virtual_memory().total,
-                "available": psutil.virtual_memory().available,
-                "used": psutil.virtual_memory().used,
-                "percentage": psutil.virtual_memory().percent
+                "total": sample["memory"]["total"],
+                "available": sample["memory"]["available"],
+                "used": sample["memory"]["used"],
+                "percentage": sample["memory"]["percent"]
             },
             "disk": [],
             "network": {
                 "interfaces": {},
-                "stats": psutil.net_io_counters()._asdict()
+                "stats": sample["network"] or {}
             }
         }
         
@@ -612,40 +638,35 @@ class HardwareMonitor:
     
     def get_running_processes(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Get information about running processes"""
-        processes = []
-        
-        for proc in psutil.process_iter(['pid', 'name', 'username', 'memory_percent', 'cpu_percent']):
-            try:
-                processes.append(proc.info)
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        
-        # Sort by CPU usage
-        processes.sort(key=lambda x: x.get('cpu_percent', 0), reverse=True)
-        return processes[:limit]
+        return self.sampler.processes(limit)
     
     def monitor_performance(self, callback: Callable[[Dict[str, Any]], None], interval: int = 5):
         """Start performance monitoring"""
-        def monitor():
-            while self.monitoring:
-                stats = {
-                    "timestamp": datetime.now().isoformat(),
-                    "cpu_percent": psutil.cpu_percent(interval=1),
-                    "memory": psutil.virtual_memory()._asdict(),
-                    "disk_io": psutil.disk_io_counters()._asdict() if psutil.disk_io_counters() else None,
-                    "network_io": psutil.net_io_counters()._asdict()
-                }
-                
-                callback(stats)
-                time.sleep(interval)
+        last_sent = [0.0]
+        
+        def on_sample(sample: Dict[str, Any]):
+            # Samples arrive on the sampler's cadence; forward the one nearest each interval
+            if sample["time"] - last_sent[0] < interval - self.sampler.interval / 2:
+                return
+            last_sent[0] = sample["time"]
+            callback({
+                "timestamp": sample["timestamp"],
+                "cpu_percent": sample["cpu_percent"],
+                "memory": sample["memory"],
+                "disk_io": sample["disk_io"],
+                "network_io": sample["network"]
+            })
         
+        self.stop_monitoring()
         self.monitoring = True
-        thread = threading.Thread(target=monitor, daemon=True)
-        thread.start()
+        self._subscription = self.sampler.subscribe(on_sample)
     
     def stop_monitoring(self):
         """Stop performance monitoring"""
         self.monitoring = False
+        if self._subscription is not None:
+            self.sampler.unsubscribe(self._subscription)
+            self._subscription = None
 
 class WindowsRegistryManager:
     """Windows Registry management"""
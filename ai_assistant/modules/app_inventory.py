@@ -0,0 +1,339 @@
+# Application Inventory Module
+"""
+Incremental, concurrent application inventory used by AppDiscovery:
+- Scanners (registry, Program Files, Start Menu, UWP, desktop files, ...)
+  run concurrently on a thread pool
+- Each scanner reports a cheap fingerprint (directory mtimes, registry
+  key write times); unchanged scanners reuse their previous results
+- Results are diffed against the previous inventory and only changed
+  rows are written to SQLite
+- Subscribers receive an InventoryChange event after every refresh
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+@dataclass
+class AppScanner:
+    """A named application source"""
+    name: str
+    scan: Callable[[], Dict[str, str]]
+    # Returns a JSON-serializable value that changes when the source changes.
+    # None means the scanner always runs.
+    fingerprint: Optional[Callable[[], Any]] = None
+    # Force a rescan after this many seconds even if the fingerprint is unchanged
+    max_age: float = 24 * 3600
+    # Scanners that need COM (shortcut resolution) initialize it in their thread
+    needs_com: bool = False
+
+
+@dataclass
+class InventoryChange:
+    """Difference between two inventory refreshes"""
+    added: Dict[str, str] = field(default_factory=dict)
+    removed: Dict[str, str] = field(default_factory=dict)
+    changed: Dict[str, str] = field(default_factory=dict)
+    scanned: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    initial: bool = False
+    duration: float = 0.0
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    def summary(self) -> str:
+        return (f"+{len(self.added)} -{len(self.removed)} ~{len(self.changed)} "
+                f"(scanned {len(self.scanned)}, skipped {len(self.skipped)}, "
+                f"{self.duration:.2f}s)")
+
+
+def directory_fingerprint(roots: Iterable[str], depth: int = 1) -> Dict[str, int]:
+    """
+    Modification times of each root and its subdirectories down to depth.
+    Installing or removing an app adds or removes a directory entry, which
+    bumps the parent's mtime, so this changes whenever a tree does.
+    """
+    mtimes = {}
+    frontier = [(root, 0) for root in roots]
+    while frontier:
+        path, level = frontier.pop()
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        if level >= depth:
+            continue
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        frontier.append((entry.path, level + 1))
+        except OSError:
+            continue
+    return mtimes
+
+
+def _com_initialized(scan: Callable[[], Dict[str, str]]) -> Callable[[], Dict[str, str]]:
+    """Wrap a scan so COM is initialized on the worker thread when available"""
+    def run():
+        try:
+            import pythoncom
+        except ImportError:
+            return scan()
+        pythoncom.CoInitialize()
+        try:
+            return scan()
+        finally:
+            pythoncom.CoUninitialize()
+    return run
+
+
+class AppInventory:
+    """
+    Runs AppScanners and maintains the merged application inventory.
+
+    Results are merged in scanner order, so later scanners override earlier
+    ones for the same app name.
+    """
+
+    def __init__(self, scanners: List[AppScanner], db_path: str = "app_inventory.db",
+                 max_workers: Optional[int] = None):
+        self.scanners = scanners
+        self.db_path = db_path
+        self.max_workers = max_workers or max(1, len(scanners))
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._subscribers: List[Callable[[InventoryChange], None]] = []
+        self._results: Dict[str, Dict[str, str]] = {}
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._init_db()
+        self._load()
+
+    def _init_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS inventory_apps (
+                    scanner TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    PRIMARY KEY (scanner, name)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS scanner_state (
+                    scanner TEXT PRIMARY KEY,
+                    fingerprint TEXT,
+                    scanned_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+
+    def _load(self):
+        """Load the previous inventory from SQLite"""
+        with sqlite3.connect(self.db_path) as conn:
+            for scanner, name, path in conn.execute("SELECT scanner, name, path FROM inventory_apps"):
+                self._results.setdefault(scanner, {})[name] = path
+            for scanner, fingerprint, scanned_at in conn.execute(
+                    "SELECT scanner, fingerprint, scanned_at FROM scanner_state"):
+                self._state[scanner] = {"fingerprint": fingerprint, "scanned_at": scanned_at}
+
+    @property
+    def has_state(self) -> bool:
+        """Whether a previous refresh was recorded"""
+        return bool(self._state)
+
+    @property
+    def apps(self) -> Dict[str, str]:
+        """Merged inventory (name -> launch path)"""
+        with self._lock:
+            return self._merge(self._results)
+
+    def _merge(self, results: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+        merged = {}
+        for scanner in self.scanners:
+            merged.update(results.get(scanner.name, {}))
+        return merged
+
+    def subscribe(self, callback: Callable[[InventoryChange], None]):
+        """Register a callback for inventory change events"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[InventoryChange], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _needs_scan(self, scanner: AppScanner, fingerprint: Optional[str], force: bool) -> bool:
+        state = self._state.get(scanner.name)
+        if force or state is None or scanner.fingerprint is None or fingerprint is None:
+            return True
+        if time.time() - state["scanned_at"] > scanner.max_age:
+            return True
+        return state["fingerprint"] != fingerprint
+
+    def _run_scanner(self, scanner: AppScanner, force: bool):
+        """Returns (status, fingerprint, apps or error) for one scanner"""
+        fingerprint = None
+        if scanner.fingerprint is not None:
+            try:
+                fingerprint = json.dumps(scanner.fingerprint(), sort_keys=True, default=str)
+            except Exception:
+                fingerprint = None
+        if not self._needs_scan(scanner, fingerprint, force):
+            return "skipped", fingerprint, None
+        scan = _com_initialized(scanner.scan) if scanner.needs_com else scanner.scan
+        try:
+            return "scanned", fingerprint, dict(scan())
+        except Exception as e:
+            return "failed", fingerprint, str(e)
+
+    def refresh(self, force: bool = False) -> InventoryChange:
+        """Run changed scanners concurrently, persist the diff and notify subscribers"""
+        with self._refresh_lock:
+            started = time.monotonic()
+            initial = not self.has_state
+            with ThreadPoolExecutor(max_workers=self.max_workers,
+                                    thread_name_prefix="app-scan") as pool:
+                futures = {scanner.name: pool.submit(self._run_scanner, scanner, force)
+                           for scanner in self.scanners}
+                outcomes = {name: future.result() for name, future in futures.items()}
+
+            change = InventoryChange(initial=initial)
+            with self._lock:
+                old_results = {name: dict(apps) for name, apps in self._results.items()}
+                new_results = dict(old_results)
+                for name, (status, fingerprint, payload) in outcomes.items():
+                    if status == "scanned":
+                        new_results[name] = payload
+                        change.scanned.append(name)
+                    elif status == "skipped":
+                        change.skipped.append(name)
+                    else:
+                        change.failed[name] = payload
+
+                self._persist(old_results, new_results, outcomes)
+                self._results = new_results
+                for name, (status, fingerprint, _) in outcomes.items():
+                    if status == "scanned":
+                        self._state[name] = {"fingerprint": fingerprint, "scanned_at": time.time()}
+
+                before, after = self._merge(old_results), self._merge(new_results)
+                for name, path in after.items():
+                    if name not in before:
+                        change.added[name] = path
+                    elif before[name] != path:
+                        change.changed[name] = path
+                for name, path in before.items():
+                    if name not in after:
+                        change.removed[name] = path
+                subscribers = list(self._subscribers)
+
+            change.duration = time.monotonic() - started
+            for callback in subscribers:
+                try:
+                    callback(change)
+                except Exception as e:
+                    print(f"Inventory subscriber error: {e}")
+            return change
+
+    def refresh_async(self, force: bool = False) -> Future:
+        """Refresh on a background thread (e.g. so startup is not blocked)"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="app-inventory")
+            return self._executor.submit(self.refresh, force)
+
+    def _persist(self, old_results: Dict[str, Dict[str, str]],
+                 new_results: Dict[str, Dict[str, str]], outcomes: Dict[str, tuple]):
+        """Write only changed rows and the state of scanners that ran"""
+        upserts, deletes = [], []
+        for scanner, (status, _, _) in outcomes.items():
+            if status != "scanned":
+                continue
+            old_apps = old_results.get(scanner, {})
+            new_apps = new_results.get(scanner, {})
+            upserts.extend((scanner, name, path) for name, path in new_apps.items()
+                           if old_apps.get(name) != path)
+            deletes.extend((scanner, name) for name in old_apps if name not in new_apps)
+
+        now = time.time()
+        states = [(scanner, fingerprint, now)
+                  for scanner, (status, fingerprint, _) in outcomes.items() if status == "scanned"]
+        with sqlite3.connect(self.db_path) as conn:
+            if upserts:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO inventory_apps (scanner, name, path) VALUES (?, ?, ?)",
+                    upserts)
+            if deletes:
+                conn.executemany(
+                    "DELETE FROM inventory_apps WHERE scanner = ? AND name = ?", deletes)
+            conn.executemany(
+                "INSERT OR REPLACE INTO scanner_state (scanner, fingerprint, scanned_at) VALUES (?, ?, ?)",
+                states)
+            conn.commit()
+
+
+def scan_desktop_entries(directories: Iterable[str]) -> Dict[str, str]:
+    """Parse freedesktop .desktop files into name -> Exec command"""
+    apps = {}
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if not file.endswith('.desktop'):
+                    continue
+                entry = _parse_desktop_file(os.path.join(root, file))
+                if entry:
+                    apps[entry[0].lower()] = entry[1]
+    return apps
+
+
+def _parse_desktop_file(path: str) -> Optional[tuple]:
+    values = {}
+    in_entry = False
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('['):
+                    in_entry = line == '[Desktop Entry]'
+                    continue
+                if in_entry and '=' in line:
+                    key, value = line.split('=', 1)
+                    values.setdefault(key.strip(), value.strip())
+    except OSError:
+        return None
+    if values.get('Type', 'Application') != 'Application':
+        return None
+    if values.get('NoDisplay', '').lower() == 'true' or values.get('Hidden', '').lower() == 'true':
+        return None
+    name, command = values.get('Name'), values.get('Exec')
+    if not name or not command:
+        return None
+    # Drop field codes such as %U / %f
+    command = ' '.join(part for part in command.split() if not (len(part) == 2 and part.startswith('%')))
+    return name, command
+
+
+def desktop_entry_directories() -> List[str]:
+    """Standard XDG application directories"""
+    data_home = os.environ.get('XDG_DATA_HOME', os.path.expanduser('~/.local/share'))
+    data_dirs = os.environ.get('XDG_DATA_DIRS', '/usr/local/share:/usr/share').split(':')
+    dirs = [os.path.join(data_home, 'applications')]
+    dirs += [os.path.join(d, 'applications') for d in data_dirs if d]
+    dirs += ['/var/lib/flatpak/exports/share/applications',
+             os.path.expanduser('~/.local/share/flatpak/exports/share/applications'),
+             '/var/lib/snapd/desktop/applications']
+    return list(dict.fromkeys(dirs))
@@ -0,0 +1,370 @@
+# Calendar Sync Module
+"""
+Local Google Calendar mirror for the calendar tools:
+- One full sync into SQLite, then incremental updates with syncToken
+  on a background schedule (expired tokens trigger a fresh full sync)
+- In-memory interval index so range queries ("what's next", today's
+  schedule) never touch the network
+- Bounded staleness: reads refresh the mirror when it is too old, and
+  keep serving cached events through short connectivity drops
+"""
+
+import bisect
+import datetime
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+
+def event_interval(event: Dict[str, Any]) -> Tuple[float, float]:
+    """
+    (start, end) POSIX timestamps of an event.
+
+    All-day events span local midnights; their end date is exclusive.
+    """
+    def parse(value: Optional[Dict[str, Any]]) -> Optional[float]:
+        if not value:
+            return None
+        if 'dateTime' in value:
+            return datetime.datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00')).timestamp()
+        if 'date' in value:
+            return datetime.datetime.fromisoformat(value['date']).timestamp()
+        return None
+
+    start = parse(event.get('start'))
+    end = parse(event.get('end'))
+    if start is None:
+        raise ValueError(f"Event {event.get('id')} has no start time")
+    if end is None or end <= start:
+        # Missing or zero-length end: treat all-day events as one day long
+        end = start + (86400 if 'date' in event['start'] else 0)
+    return start, end
+
+
+class IntervalIndex:
+    """
+    Events sorted by start time plus the longest duration seen, so an
+    overlap query only scans starts in [range_start - longest, range_end).
+    """
+
+    def __init__(self):
+        self._starts: List[Tuple[float, float, str]] = []  # (start, end, event id)
+        self._by_id: Dict[str, Tuple[float, float, str]] = {}
+        self._longest = 0.0
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def add(self, event_id: str, start: float, end: float):
+        self.remove(event_id)
+        entry = (start, end, event_id)
+        bisect.insort(self._starts, entry)
+        self._by_id[event_id] = entry
+        self._longest = max(self._longest, end - start)
+
+    def remove(self, event_id: str):
+        entry = self._by_id.pop(event_id, None)
+        if entry:
+            position = bisect.bisect_left(self._starts, entry)
+            if position < len(self._starts) and self._starts[position] == entry:
+                del self._starts[position]
+
+    def clear(self):
+        self._starts.clear()
+        self._by_id.clear()
+        self._longest = 0.0
+
+    def overlapping(self, range_start: float, range_end: float) -> List[str]:
+        """Ids of events overlapping [range_start, range_end), ordered by start"""
+        low = bisect.bisect_left(self._starts, (range_start - self._longest,))
+        high = bisect.bisect_left(self._starts, (range_end,))
+        return [event_id for start, end, event_id in self._starts[low:high]
+                if end > range_start or (end == start and start >= range_start)]
+
+
+class CalendarMirror:
+    """
+    Keeps a local copy of one calendar in step with Google Calendar.
+
+    Args:
+        service: Authenticated Calendar API service (googleapiclient)
+        db_path: SQLite file for events and the sync token
+        calendar_id: Calendar to mirror
+        refresh_interval: Seconds between background incremental syncs
+        max_staleness: Reads older than this many seconds sync first
+        offline_grace: How long cached events are served while syncs fail
+        history_days: Past events included in a full sync; covers the longest
+            look-back callers query (search_calendar_events allows 365 days)
+    """
+
+    def __init__(self, service, db_path: str = "calendar_cache.db", calendar_id: str = 'primary',
+                 refresh_interval: float = 300, max_staleness: float = 900,
+                 offline_grace: float = 6 * 3600, history_days: int = 365):
+        self.service = service
+        self.db_path = db_path
+        self.calendar_id = calendar_id
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.offline_grace = offline_grace
+        self.history_days = history_days
+        self.index = IntervalIndex()
+        self.events: Dict[str, Dict[str, Any]] = {}
+        self.last_sync = 0.0
+        self.last_error: Optional[str] = None
+        self.stats = {'full_syncs': 0, 'incremental_syncs': 0, 'requests': 0}
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._init_database()
+        self._load()
+
+    def _init_database(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS calendar_events (
+                    id TEXT PRIMARY KEY,
+                    calendar_id TEXT NOT NULL,
+                    start_ts REAL NOT NULL,
+                    end_ts REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_calendar_events_start "
+                         "ON calendar_events (calendar_id, start_ts)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS calendar_sync_state (
+                    calendar_id TEXT PRIMARY KEY,
+                    sync_token TEXT,
+                    last_sync REAL,
+                    covered_from REAL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(calendar_sync_state)")}
+            if 'covered_from' not in columns:
+                conn.execute("ALTER TABLE calendar_sync_state ADD COLUMN covered_from REAL")
+
+    def _load(self):
+        """Rebuild the in-memory index from SQLite"""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute("SELECT id, start_ts, end_ts, data FROM calendar_events WHERE calendar_id = ?",
+                                (self.calendar_id,)).fetchall()
+            state = conn.execute("SELECT last_sync FROM calendar_sync_state WHERE calendar_id = ?",
+                                 (self.calendar_id,)).fetchone()
+        with self._lock:
+            self.index.clear()
+            self.events.clear()
+            for event_id, start, end, data in rows:
+                self.events[event_id] = json.loads(data)
+                self.index.add(event_id, start, end)
+            self.last_sync = (state[0] or 0.0) if state else 0.0
+
+    @property
+    def sync_token(self) -> Optional[str]:
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT sync_token FROM calendar_sync_state WHERE calendar_id = ?",
+                               (self.calendar_id,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def covered_from(self) -> Optional[float]:
+        """Start of the time range the last full sync mirrored"""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT covered_from FROM calendar_sync_state WHERE calendar_id = ?",
+                               (self.calendar_id,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def age(self) -> float:
+        """Seconds since the last successful sync"""
+        return time.time() - self.last_sync if self.last_sync else float('inf')
+
+    # --- syncing ---------------------------------------------------------------
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Fetch changes since the last sync (or everything, the first time).
+
+        Returns:
+            Counts of updated and removed events
+        """
+        with self._sync_lock:
+            return self._sync()
+
+    def refresh(self, max_age: float) -> Optional[Dict[str, int]]:
+        """
+        Sync only if the mirror is older than max_age seconds.
+
+        Checked under the sync lock, so concurrent readers (and the
+        background thread) share one sync instead of each running their own.
+        """
+        with self._sync_lock:
+            if self.age <= max_age:
+                return None
+            return self._sync()
+
+    def _sync(self) -> Dict[str, int]:
+        token = self.sync_token
+        covered_from = self.covered_from
+        if token and (covered_from is None or
+                      covered_from > time.time() - self.history_days * 86400 + 86400):
+            # Mirrored with a shorter history (or before it was recorded): incremental
+            # syncs never reach further back, so start over
+            token = None
+        try:
+            if token:
+                result = self._fetch(sync_token=token)
+            else:
+                result = self._fetch()
+        except HttpError as e:
+            if not token or e.resp.status != 410:
+                self.last_error = str(e)
+                raise
+            # Token expired: Google requires a fresh full sync
+            result = self._fetch()
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        self.last_error = None
+        return result
+
+    def _fetch(self, sync_token: Optional[str] = None) -> Dict[str, int]:
+        params = {'calendarId': self.calendar_id, 'singleEvents': True, 'maxResults': 2500}
+        covered_from = None
+        if sync_token:
+            params['syncToken'] = sync_token
+            self.stats['incremental_syncs'] += 1
+        else:
+            since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=self.history_days)
+            params['timeMin'] = since.isoformat()
+            covered_from = since.timestamp()
+            self.stats['full_syncs'] += 1
+
+        changed, removed, page_token = [], [], None
+        while True:
+            self.stats['requests'] += 1
+            response = self.service.events().list(pageToken=page_token, **params).execute()
+            for event in response.get('items', []):
+                if event.get('status') == 'cancelled':
+                    removed.append(event['id'])
+                else:
+                    changed.append(event)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                next_token = response.get('nextSyncToken')
+                break
+
+        self._apply(changed, removed, full=sync_token is None, sync_token=next_token,
+                    covered_from=covered_from)
+        return {'updated': len(changed), 'removed': len(removed)}
+
+    def _apply(self, changed: List[Dict[str, Any]], removed: List[str], full: bool = False,
+               sync_token: Optional[str] = None, covered_from: Optional[float] = None):
+        rows = []
+        for event in changed:
+            try:
+                start, end = event_interval(event)
+            except (ValueError, TypeError):
+                continue
+            rows.append((event['id'], self.calendar_id, start, end, json.dumps(event)))
+        now = time.time()
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            if full:
+                conn.execute("DELETE FROM calendar_events WHERE calendar_id = ?", (self.calendar_id,))
+                self.events.clear()
+                self.index.clear()
+            conn.executemany("INSERT OR REPLACE INTO calendar_events (id, calendar_id, start_ts, end_ts, data) "
+                             "VALUES (?, ?, ?, ?, ?)", rows)
+            conn.executemany("DELETE FROM calendar_events WHERE id = ?", [(event_id,) for event_id in removed])
+            if sync_token is not None:
+                conn.execute("INSERT OR REPLACE INTO calendar_sync_state "
+                             "(calendar_id, sync_token, last_sync, covered_from) "
+                             "VALUES (?, ?, ?, COALESCE(?, (SELECT covered_from FROM calendar_sync_state "
+                             "WHERE calendar_id = ?)))",
+                             (self.calendar_id, sync_token, now, covered_from, self.calendar_id))
+                self.last_sync = now
+            for event_id, _, start, end, data in rows:
+                self.events[event_id] = json.loads(data)
+                self.index.add(event_id, start, end)
+            for event_id in removed:
+                self.events.pop(event_id, None)
+                self.index.remove(event_id)
+
+    def apply_event(self, event: Dict[str, Any]):
+        """Write-through for events created or updated by this assistant"""
+        if event.get('id'):
+            self._apply([event], [])
+
+    def remove_event(self, event_id: str):
+        self._apply([], [event_id])
+
+    def ensure_fresh(self):
+        """
+        Sync if the mirror is older than max_staleness.
+
+        If the sync fails, cached events keep being served for up to
+        offline_grace seconds; after that (or with no cache) the error is raised.
+        """
+        if self.age <= self.max_staleness:
+            return
+        try:
+            self.refresh(self.max_staleness)
+        except Exception as e:
+            if self.age > self.offline_grace:
+                raise
+            print(f"Calendar sync failed, serving cached events: {e}")
+
+    def start(self):
+        """Start background incremental syncs"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="calendar-sync")
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        delay = 0.0 if self.age > self.refresh_interval else self.refresh_interval - self.age
+        while not self._stop.wait(delay):
+            try:
+                # Skip the round trip if a reader synced in the meantime
+                self.refresh(self.refresh_interval / 2)
+                delay = self.refresh_interval
+            except Exception as e:
+                # Retry sooner while offline, but not in a tight loop
+                delay = min(self.refresh_interval, 30)
+                print(f"Background calendar sync failed: {e}")
+
+    # --- queries ---------------------------------------------------------------
+
+    def events_between(self, start: datetime.datetime, end: datetime.datetime,
+                       query: str = "", limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Events overlapping [start, end), ordered by start time.
+
+        Args:
+            query: Case-insensitive text matched against title, description and location
+            limit: Maximum number of events
+        """
+        self.ensure_fresh()
+        needle = query.lower()
+        results = []
+        with self._lock:
+            for event_id in self.index.overlapping(start.timestamp(), end.timestamp()):
+                event = self.events[event_id]
+                if needle and not any(needle in (event.get(field) or '').lower()
+                                      for field in ('summary', 'description', 'location')):
+                    continue
+                results.append(event)
+                if limit and len(results) >= limit:
+                    break
+        return results
@@ -16,6 +16,7 @@ from typing import Optional
 
 # Import the intelligent app discovery system
 from .app_discovery import smart_open_application, discover_applications, refresh_app_database, list_installed_apps
+from .intent_router import Intent, IntentRouter
 
 # --- Imports for Volume Control ---
 from ctypes import cast, POINTER
@@ -32,6 +33,28 @@ except ImportError:
 
 
 # --- Helper Functions ---
+# Word to number mapping for Hindi/English
+WORD_TO_NUM = {
+    'zero': 0, 'ek': 1, 'one': 1, 'do': 2, 'two': 2, 'teen': 3, 'three': 3,
+    'char': 4, 'four': 4, 'paanch': 5, 'five': 5, 'chhe': 6, 'six': 6,
+    'saat': 7, 'seven': 7, 'aath': 8, 'eight': 8, 'nau': 9, 'nine': 9,
+    'das': 10, 'ten': 10, 'pandrah': 15, 'fifteen': 15, 'bees': 20, 'twenty': 20,
+    'pachees': 25, 'twenty-five': 25, 'tees': 30, 'thirty': 30,
+    'paintees': 35, 'thirty-five': 35, 'chalis': 40, 'forty': 40,
+    'paintalis': 45, 'forty-five': 45, 'pachaas': 50, 'fifty': 50,
+    'pachpan': 55, 'fifty-five': 55, 'saath': 60, 'sixty': 60,
+    'paisath': 65, 'sixty-five': 65, 'sattar': 70, 'seventy': 70,
+    'pachattar': 75, 'seventy-five': 75, 'assi': 80, 'eighty': 80,
+    'pachasi': 85, 'eighty-five': 85, 'nabbe': 90, 'ninety': 90,
+    'panchanan': 95, 'ninety-five': 95, 'sau': 100, 'hundred': 100
+}
+
+# Longest words first so "twenty-five" wins over "twenty"; whole words only,
+# so "one" does not match inside "phone"
+NUMBER_WORD_PATTERN = re.compile(
+    r'\b(' + '|'.join(sorted(map(re.escape, WORD_TO_NUM), key=len, reverse=True)) + r')\b'
+)
+
 def extract_number(text: str) -> Optional[int]:
     """
     Extract a number from text (supports both digits and words).
@@ -44,26 +67,9 @@ def extract_number(text: str) -> Optional[int]:
     if digit_match:
         return int(digit_match.group(1))
     
-    # Word to number mapping for Hindi/English
-    word_to_num = {
-        'zero': 0, 'ek': 1, 'one': 1, 'do': 2, 'two': 2, 'teen': 3, 'three': 3,
-        'char': 4, 'four': 4, 'paanch': 5, 'five': 5, 'chhe': 6, 'six': 6,
-        'saat': 7, 'seven': 7, 'aath': 8, 'eight': 8, 'nau': 9, 'nine': 9,
-        'das': 10, 'ten': 10, 'pandrah': 15, 'fifteen': 15, 'bees': 20, 'twenty': 20,
-        'pachees': 25, 'twenty-five': 25, 'tees': 30, 'thirty': 30,
-        'paintees': 35, 'thirty-five': 35, 'chalis': 40, 'forty': 40,
-        'paintalis': 45, 'forty-five': 45, 'pachaas': 50, 'fifty': 50,
-        'pachpan': 55, 'fifty-five': 55, 'saath': 60, 'sixty': 60,
-        'paisath': 65, 'sixty-five': 65, 'sattar': 70, 'seventy': 70,
-        'pachattar': 75, 'seventy-five': 75, 'assi': 80, 'eighty': 80,
-        'pachasi': 85, 'eighty-five': 85, 'nabbe': 90, 'ninety': 90,
-        'panchanan': 95, 'ninety-five': 95, 'sau': 100, 'hundred': 100
-    }
-    
-    text_lower = text.lower()
-    for word, num in word_to_num.items():
-        if word in text_lower:
-            return num
+    word_match = NUMBER_WORD_PATTERN.search(text.lower())
+    if word_match:
+        return WORD_TO_NUM[word_match.group(1)]
     
     return None
 
@@ -317,6 +323,41 @@ def make_phone_call(contact_name: str = "", phone_number: str = "") -> str:
     return message
 
 
+# --- Hinglish intent definitions (compiled once into a token trie) ---
+VOLUME_WORDS = ['volume', 'awaaz', 'awaz', 'sound']
+APP_ACTION_WORDS = ['kholo', 'open', 'chalu', 'start', 'launch']
+FILLER_WORDS = ['please', 'zara', 'jaldi', 'yaar', 'bhai']
+_FILLER = '(?:' + '|'.join(FILLER_WORDS) + ')'
+
+HINGLISH_INTENTS = [
+    Intent('volume_up', [VOLUME_WORDS, ['up', 'badha', 'badhao', 'zyada', 'jyada', 'increase']], priority=5),
+    Intent('volume_down', [VOLUME_WORDS, ['down', 'kam', 'kum', 'ghata', 'ghatao', 'decrease']], priority=5),
+    Intent('mute', [VOLUME_WORDS, ['mute', 'band', 'chup']], priority=5),
+    Intent('unmute', [VOLUME_WORDS, ['unmute', 'chalu', 'on']], priority=5),
+    Intent('volume', [VOLUME_WORDS], priority=4, slots={'level': [extract_number]}),
+    Intent('make_call', [['call', 'phone', 'dial', 'ring']], priority=3, slots={
+        'phone_number': [re.compile(r'\b\d{10}\b|\b\d{3}-\d{3}-\d{4}\b')],
+        'contact_name': [re.compile(r'(\w+)\s+ko\s+(?:call|phone)')],
+    }),
+    Intent('open_app', [APP_ACTION_WORDS], priority=2, required_slots=['app_name'], slots={
+        # Hinglish puts the app before the verb ("chrome kholo"); English after ("open chrome")
+        # Filler words on either side are not part of the name ("open chrome please")
+        'app_name': [re.compile(r'\b(?:' + _FILLER + r'\s+)?(?!' + _FILLER + r'\b)(\w+(?:\s+\w+)?)\s+(?:'
+                                + '|'.join(APP_ACTION_WORDS) + r')\b'),
+                     re.compile(r'^(?:' + _FILLER + r'\s+)*(?:open|launch|start)\s+(\w+(?:\s+\w+)??)'
+                                r'(?:\s+' + _FILLER + r')*\s*$')],
+    }),
+    Intent('search_youtube', [['youtube']], weight=1.5, priority=1, required_slots=['query'], slots={
+        'query': [re.compile(r'youtube\s+(?:pe|me|par|search|kar|karo)\s+(.+)')],
+    }),
+    Intent('search_google', [['search', 'google', 'dhundo', 'khojo']], priority=1, required_slots=['query'], slots={
+        'query': [re.compile(r'(?:google|search|dhundo|khojo)\s+(?:kar|karo|me|pe)?\s*(.+)')],
+    }),
+]
+
+_hinglish_router = IntentRouter(HINGLISH_INTENTS)
+
+
 def process_hinglish_command(text: str) -> dict:
     """
     Processes Hinglish commands and maps them to appropriate functions.
@@ -326,7 +367,6 @@ def process_hinglish_command(text: str) -> dict:
     """
     print(f"--- 'Hands' (process_hinglish_command) activated. Text: {text} ---")
     
-    text_lower = text.lower()
     result = {
         'detected_command': None,
         'parameters': {},
@@ -335,87 +375,56 @@ def process_hinglish_command(text: str) -> dict:
     }
     
     try:
-        # Volume control patterns
-        if any(word in text_lower for word in ['volume', 'awaaz', 'awaz', 'sound']):
-            if any(word in text_lower for word in ['up', 'badha', 'badhao', 'zyada', 'jyada', 'increase']):
-                result['detected_command'] = 'volume_up'
-                result['execution_result'] = volume_up(10)
-            elif any(word in text_lower for word in ['down', 'kam', 'kum', 'ghata', 'decrease']):
-                result['detected_command'] = 'volume_down'
-                result['execution_result'] = volume_down(10)
-            elif any(word in text_lower for word in ['mute', 'band', 'chup']):
-                result['detected_command'] = 'mute'
-                result['execution_result'] = mute_volume()
-            elif any(word in text_lower for word in ['unmute', 'chalu', 'on']):
-                result['detected_command'] = 'unmute'
-                result['execution_result'] = unmute_volume()
+        match = _hinglish_router.route(text)
+        slots = match.slots if match else {}
+        command = match.name if match else None
+        
+        # Volume control
+        if command == 'volume_up':
+            result['execution_result'] = volume_up(10)
+        elif command == 'volume_down':
+            result['execution_result'] = volume_down(10)
+        elif command == 'mute':
+            result['execution_result'] = mute_volume()
+        elif command == 'unmute':
+            result['execution_result'] = unmute_volume()
+        elif command == 'volume':
+            # Check for specific volume level
+            if slots.get('level') is not None:
+                command = 'set_volume'
+                result['parameters']['level'] = slots['level']
+                result['execution_result'] = set_system_volume(slots['level'])
             else:
-                # Check for specific volume level
-                num = extract_number(text)
-                if num is not None:
-                    result['detected_command'] = 'set_volume'
-                    result['parameters']['level'] = num
-                    result['execution_result'] = set_system_volume(num)
-                else:
-                    result['detected_command'] = 'get_volume'
-                    result['execution_result'] = get_system_volume()
+                command = 'get_volume'
+                result['execution_result'] = get_system_volume()
         
-        # Phone call patterns
-        elif any(word in text_lower for word in ['call', 'phone', 'dial', 'ring']):
-            # Extract phone number
-            phone_match = re.search(r'\b\d{10}\b|\b\d{3}-\d{3}-\d{4}\b', text)
-            
-            # Extract contact name (word before 'ko')
-            contact_match = re.search(r'(\w+)\s+ko\s+(?:call|phone)', text_lower)
-            
-            result['detected_command'] = 'make_call'
-            
-            if phone_match:
-                result['parameters']['phone_number'] = phone_match.group()
-                result['execution_result'] = make_phone_call(phone_number=phone_match.group())
-            elif contact_match:
-                contact_name = contact_match.group(1)
-                result['parameters']['contact_name'] = contact_name
-                result['execution_result'] = make_phone_call(contact_name=contact_name)
+        # Phone call
+        elif command == 'make_call':
+            if slots.get('phone_number'):
+                result['parameters']['phone_number'] = slots['phone_number']
+                result['execution_result'] = make_phone_call(phone_number=slots['phone_number'])
+            elif slots.get('contact_name'):
+                result['parameters']['contact_name'] = slots['contact_name']
+                result['execution_result'] = make_phone_call(contact_name=slots['contact_name'])
             else:
                 result['execution_result'] = make_phone_call()
         
-        # App opening patterns
-        elif any(word in text_lower for word in ['open', 'kholo', 'start', 'chalu', 'launch']):
-            # Extract app name - get the word(s) immediately before the action word
-            app_name = None
-            for word in ['kholo', 'open', 'chalu', 'start', 'launch']:
-                # Try to find word before action
-                pattern = r'(\w+(?:\s+\w+)?)\s+' + word
-                match = re.search(pattern, text_lower)
-                if match:
-                    app_name = match.group(1).strip()
-                    # Remove 'karo' if present
-                    app_name = re.sub(r'\s+karo$', '', app_name)
-                    break
-            
-            if app_name:
-                result['detected_command'] = 'open_app'
-                result['parameters']['app_name'] = app_name
-                result['execution_result'] = open_application(app_name)
-
+        # App opening
+        elif command == 'open_app':
+            # Remove 'karo' if present
+            app_name = re.sub(r'\s+karo$', '', slots['app_name'])
+            result['parameters']['app_name'] = app_name
+            result['execution_result'] = open_application(app_name)
         
-        # Search patterns
-        elif any(word in text_lower for word in ['search', 'google', 'youtube', 'dhundo', 'khojo']):
-            if 'youtube' in text_lower:
-                query_match = re.search(r'youtube\s+(?:pe|me|par|search|kar|karo)\s+(.+)', text_lower)
-                if query_match:
-                    query = query_match.group(1)
-                    result['detected_command'] = 'search_youtube'
-                    result['parameters']['query'] = query
-                    result['execution_result'] = search_youtube(query)
-            else:
-                query_match = re.search(r'(?:google|search|dhundo|khojo)\s+(?:kar|karo|me|pe)?\s*(.+)', text_lower)
-                if query_match:
-                    query = query_match.group(1)
-                    result['detected_command'] = 'search_google'
-                    result['parameters']['query'] = query
-                    result['execution_result'] = search_google(query)
+        # Search
+        elif command == 'search_youtube':
+            result['parameters']['query'] = slots['query']
+            result['execution_result'] = search_youtube(slots['query'])
+        elif command == 'search_google':
+            result['parameters']['query'] = slots['query']
+            result['execution_result'] = search_google(slots['query'])
+        
+        result['detected_command'] = command
         
         # If no command detected
         if result['detected_command'] is None:
@@ -7,6 +7,7 @@ Provides:
 - Read, send, search, and manage emails
 - Quick reply templates
 - Email organization and filtering
+- Local mirror of message metadata with batched, incremental sync
 """
 
 import os
@@ -28,6 +29,11 @@ from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+try:
+    from .mail_sync import GmailSync, MailStore
+except ImportError:
+    from mail_sync import GmailSync, MailStore
+
 # Gmail API scope for full access
 SCOPES = [
     'https://www.googleapis.com/auth/gmail.readonly',
@@ -36,6 +42,9 @@ SCOPES = [
     'https://www.googleapis.com/auth/gmail.modify'
 ]
 
+# Summaries and searches reuse the local mirror if it was synced this recently (seconds)
+MAIL_SYNC_MAX_AGE = 30
+
 
 class GmailManager:
     """
@@ -57,6 +66,8 @@ class GmailManager:
         self.service = None
         self.credentials_path = Path('credentials.json')
         self.token_path = Path('gmail_token.pickle')
+        self.cache_path = Path('gmail_cache.db')
+        self.mail_sync = None
         self._initialized = True
     
     def setup_auth(self) -> str:
@@ -146,6 +157,17 @@ You can reuse the same credentials.json from Google Calendar setup.
                 return None
         return self.service
     
+    def get_mail_sync(self) -> Optional[GmailSync]:
+        """
+        Get the local mail mirror for the authenticated account, creating it if needed
+        """
+        service = self.get_service()
+        if service is None:
+            return None
+        if self.mail_sync is None or self.mail_sync.service is not service:
+            self.mail_sync = GmailSync(service, MailStore(str(self.cache_path)))
+        return self.mail_sync
+    
     def is_authenticated(self) -> bool:
         """Check if Gmail is authenticated"""
         if self.service is None:
@@ -170,6 +192,22 @@ def get_gmail_service():
     return manager.get_service()
 
 
+def get_mail_sync() -> Optional[GmailSync]:
+    """Helper function to get the synced local mail mirror."""
+    manager = GmailManager()
+    return manager.get_mail_sync()
+
+
+def _refresh_mailbox(sync: GmailSync):
+    """Sync the mirror; on failure keep answering from what is already stored."""
+    try:
+        sync.sync(max_age=MAIL_SYNC_MAX_AGE)
+    except Exception as e:
+        if not sync.history_id:
+            raise
+        print(f"Mail sync failed, using cached messages: {e}")
+
+
 def get_inbox_summary(max_emails: int = 10) -> str:
     """
     Gets a summary of recent emails in the inbox.
@@ -177,21 +215,16 @@ def get_inbox_summary(max_emails: int = 10) -> str:
     """
     print(f"--- 'Hands' (get_inbox_summary) activated. Max emails: {max_emails} ---")
     try:
-        service = get_gmail_service()
-        if not service:
+        sync = get_mail_sync()
+        if not sync:
             return "❌ Gmail not authenticated. Please run 'setup email authentication' first."
         
         # Validate input
         max_emails = max(1, min(50, max_emails))
         
-        # Get list of messages
-        results = service.users().messages().list(
-            userId='me', 
-            labelIds=['INBOX'], 
-            maxResults=max_emails
-        ).execute()
-        
-        messages = results.get('messages', [])
+        # Answer from the local mirror after an incremental sync
+        _refresh_mailbox(sync)
+        messages = sync.store.recent('INBOX', max_emails)
         
         if not messages:
             return "📭 Your inbox is empty!"
@@ -199,15 +232,10 @@ def get_inbox_summary(max_emails: int = 10) -> str:
         inbox_report = f"📬 INBOX SUMMARY ({len(messages)} recent emails)\n"
         inbox_report += "━" * 80 + "\n"
         
-        for message in messages[:max_emails]:
-            # Get message details
-            msg = service.users().messages().get(userId='me', id=message['id']).execute()
-            headers = msg['payload'].get('headers', [])
-            
-            # Extract relevant information
-            sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-            date = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date')
+        for msg in messages:
+            sender = msg['sender']
+            subject = msg['subject']
+            date = msg['date']
             
             # Parse date
             try:
@@ -221,8 +249,7 @@ def get_inbox_summary(max_emails: int = 10) -> str:
             sender_name = extract_display_name(sender)
             
             # Check if unread
-            labels = msg.get('labelIds', [])
-            unread_indicator = "🆕" if 'UNREAD' in labels else "📧"
+            unread_indicator = "🆕" if 'UNREAD' in msg['labels'] else "📧"
             
             inbox_report += f"{unread_indicator} [{formatted_date}] **{sender_name}**\n"
             inbox_report += f"   📄 {subject[:60]}{'...' if len(subject) > 60 else ''}\n\n"
@@ -285,17 +312,16 @@ def search_emails(query: str, max_results: int = 10) -> str:
     """
     print(f"--- 'Hands' (search_emails) activated. Query: {query} ---")
     try:
-        service = get_gmail_service()
-        if not service:
+        sync = get_mail_sync()
+        if not sync:
             return "❌ Gmail not authenticated. Please run 'setup email authentication' first."
         
         # Validate input
         max_results = max(1, min(50, max_results))
         
-        # Search for messages
-        results = service.users().messages().list(
-            userId='me', q=query, maxResults=max_results).execute()
-        messages = results.get('messages', [])
+        # Search the local mirror; Gmail is only asked when the mirror can't answer
+        _refresh_mailbox(sync)
+        messages = sync.search(query, max_results)
         
         if not messages:
             return f"🔍 No emails found matching '{query}'"
@@ -303,14 +329,10 @@ def search_emails(query: str, max_results: int = 10) -> str:
         search_report = f"🔍 EMAIL SEARCH RESULTS for '{query}' ({len(messages)} found)\n"
         search_report += "━" * 80 + "\n"
         
-        for message in messages:
-            # Get message details
-            msg = service.users().messages().get(userId='me', id=message['id']).execute()
-            headers = msg['payload'].get('headers', [])
-            
-            sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-            date = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date')
+        for msg in messages:
+            sender = msg['sender']
+            subject = msg['subject']
+            date = msg['date']
             
             # Parse date
             try:
@@ -468,6 +490,10 @@ def mark_email_read(email_id: str = "", sender: str = "", subject_contains: str
             userId='me', id=email_id, 
             body={'removeLabelIds': ['UNREAD']}).execute()
         
+        # Keep the local mirror in step without waiting for the next sync
+        if GmailManager().mail_sync:
+            GmailManager().mail_sync.store.change_labels(email_id, remove=['UNREAD'])
+        
         return f"✅ Email marked as read! ID: {email_id}"
         
     except Exception as e:
@@ -509,6 +535,9 @@ def delete_email(email_id: str = "", sender: str = "", subject_contains: str = "
         # Move to trash
         service.users().messages().trash(userId='me', id=email_id).execute()
         
+        if GmailManager().mail_sync:
+            GmailManager().mail_sync.store.delete([email_id])
+        
         return f"🗑️ Email moved to trash! ID: {email_id}"
         
     except Exception as e:
@@ -599,6 +628,7 @@ __all__ = [
     'GmailManager',
     'setup_email_auth',
     'get_gmail_service',
+    'get_mail_sync',
     'get_inbox_summary',
     'send_email',
     'search_emails',
@@ -0,0 +1,481 @@
+"""
+Event Sources for System Hooks
+
+Kernel-backed change notification for SystemHookManager:
+- inotify (Linux, via ctypes) with recursive directory watches
+- watchdog observers (FSEvents, ReadDirectoryChangesW) where installed
+- os.scandir polling fallback for everything else
+- Debouncing/coalescing of event bursts per path
+- Batched SQLite persistence, one transaction per flush interval
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import os
+import queue
+import re
+import select
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+    WATCHDOG_AVAILABLE = False
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+               IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_EXCL_UNLINK)
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Result of merging a new action into a pending one; None drops the event
+_COALESCE = {
+    ("created", "modified"): "created",
+    ("created", "deleted"): None,
+    ("modified", "created"): "modified",
+    ("modified", "deleted"): "deleted",
+    ("deleted", "created"): "modified",
+    ("deleted", "modified"): "modified",
+}
+
+
+def compile_globs(patterns: Optional[Iterable[str]]) -> Optional[Callable[[str], bool]]:
+    """Build one matcher for a list of glob patterns (None matches everything)"""
+    patterns = list(patterns or [])
+    if not patterns:
+        return None
+    regex = re.compile("|".join(fnmatch.translate(os.path.normcase(p)) for p in patterns))
+    return lambda path: bool(regex.match(os.path.normcase(path)))
+
+
+class EventCoalescer:
+    """
+    Collects file events and releases each path once it has been quiet for
+    `debounce` seconds, with bursts merged into a single net action.
+    """
+
+    def __init__(self, debounce: float = 0.5):
+        self.debounce = debounce
+        self._pending: Dict[str, Tuple[str, float]] = {}  # path -> (action, last seen)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, action: str, path: str, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            previous = self._pending.get(path)
+            if previous:
+                key = (previous[0], action)
+                if key in _COALESCE:
+                    action = _COALESCE[key]
+                elif previous[0] == "created":
+                    action = "created"
+            if action is None:
+                del self._pending[path]
+            else:
+                self._pending[path] = (action, now)
+
+    def due(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """(action, path) pairs that have settled"""
+        now = time.monotonic() if now is None else now
+        ready = []
+        with self._lock:
+            for path, (action, seen) in list(self._pending.items()):
+                if now - seen >= self.debounce:
+                    ready.append((action, path))
+                    del self._pending[path]
+        return ready
+
+    def next_deadline(self) -> Optional[float]:
+        with self._lock:
+            if not self._pending:
+                return None
+            return min(seen for _, seen in self._pending.values()) + self.debounce
+
+
+class InotifyBackend:
+    """Recursive directory watching with Linux inotify"""
+
+    def __init__(self, ignore: Optional[Callable[[str], bool]] = None):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.ignore = ignore
+        self.watches: Dict[int, str] = {}
+
+    def add_tree(self, root: str, emit: Optional[Callable[[str, str], None]] = None):
+        """Watch root and its subdirectories; emit files found (for new trees)"""
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if not (self.ignore and self.ignore(os.path.join(directory, d)))]
+            self._watch(directory)
+            if emit:
+                for name in files:
+                    emit("created", os.path.join(directory, name))
+
+    def _watch(self, directory: str):
+        wd = self._add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                print(f"inotify watch limit reached; not watching {directory}")
+            elif error not in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                print(f"inotify_add_watch failed for {directory}: {os.strerror(error)}")
+            return
+        self.watches[wd] = directory
+
+    def read(self, timeout: float, emit: Callable[[str, str], None]) -> bool:
+        """Wait up to timeout for events; returns False if the queue overflowed"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return True
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return True
+        overflow = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                continue
+            path = os.path.join(directory, name) if name else directory
+            if self.ignore and self.ignore(path):
+                continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path, emit)
+                continue
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                emit("created", path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                emit("deleted", path)
+            elif mask & (IN_MODIFY | IN_CLOSE_WRITE):
+                emit("modified", path)
+        return not overflow
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.watches.clear()
+
+
+class _WatchdogHandler(FileSystemEventHandler):
+    """Forwards watchdog file events to an emit callback"""
+
+    def __init__(self, emit: Callable[[str, str], None]):
+        super().__init__()
+        self.emit = emit
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        if event.event_type == "moved":
+            self.emit("deleted", event.src_path)
+            self.emit("created", event.dest_path)
+        elif event.event_type in ("created", "modified", "deleted"):
+            self.emit(event.event_type, event.src_path)
+
+
+def snapshot_tree(roots: Iterable[str], ignore: Optional[Callable[[str], bool]] = None
+                  ) -> Dict[str, Tuple[float, int]]:
+    """path -> (mtime, size) for every file under roots, using os.scandir"""
+    snapshot = {}
+    stack = list(roots)
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if ignore and ignore(entry.path):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            snapshot[entry.path] = (stat.st_mtime, stat.st_size)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return snapshot
+
+
+def diff_snapshots(old: Dict[str, Tuple[float, int]], new: Dict[str, Tuple[float, int]]
+                   ) -> List[Tuple[str, str]]:
+    changes = [("deleted", path) for path in old.keys() - new.keys()]
+    for path, signature in new.items():
+        previous = old.get(path)
+        if previous is None:
+            changes.append(("created", path))
+        elif previous != signature:
+            changes.append(("modified", path))
+    return changes
+
+
+class FilesystemEventSource:
+    """
+    Watches directory trees and delivers settled, coalesced file events.
+
+    Args:
+        paths: Directories to watch recursively
+        callback: Called with (action, path, info) where action is
+            created/modified/deleted and info holds size/mtime when available
+        debounce: Seconds a path must stay quiet before its event is delivered
+        backend: "auto", "inotify", "watchdog" or "polling"
+        poll_interval: Rescan interval for the polling backend
+        ignore: Glob patterns for paths to skip (e.g. "*/.git*")
+    """
+
+    def __init__(self, paths: Iterable[str], callback: Callable[[str, str, Dict[str, Any]], None],
+                 debounce: float = 0.5, backend: str = "auto", poll_interval: float = 2.0,
+                 ignore: Optional[Iterable[str]] = None):
+        self.paths = [os.path.abspath(p) for p in paths if os.path.isdir(p)]
+        self.callback = callback
+        self.coalescer = EventCoalescer(debounce)
+        self.poll_interval = poll_interval
+        self.ignore = compile_globs(ignore)
+        self.backend = self._choose_backend(backend)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+        self._snapshot: Optional[Dict[str, Tuple[float, int]]] = None
+
+    @staticmethod
+    def _choose_backend(backend: str) -> str:
+        if backend != "auto":
+            return backend
+        if sys.platform.startswith("linux"):
+            return "inotify"
+        return "watchdog" if WATCHDOG_AVAILABLE else "polling"
+
+    def _emit(self, action: str, path: str):
+        self.coalescer.add(action, path)
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        if self.backend == "inotify":
+            try:
+                inotify = InotifyBackend(self.ignore)
+            except (OSError, AttributeError) as e:
+                print(f"inotify unavailable ({e}); falling back to polling")
+                self.backend = "polling"
+            else:
+                for path in self.paths:
+                    inotify.add_tree(path)
+                # Baseline for rescans after a queue overflow; kept current by _deliver
+                self._snapshot = snapshot_tree(self.paths, self.ignore)
+                self._thread = threading.Thread(target=self._run_inotify, args=(inotify,),
+                                                daemon=True, name="fs-events-inotify")
+        if self.backend == "watchdog" and WATCHDOG_AVAILABLE:
+            handler = _WatchdogHandler(self._emit)
+            self._observer = Observer()
+            for path in self.paths:
+                self._observer.schedule(handler, path, recursive=True)
+            self._observer.start()
+            self._thread = threading.Thread(target=self._run_dispatch, daemon=True,
+                                            name="fs-events-watchdog")
+        elif self.backend != "inotify":
+            self.backend = "polling"
+            self._thread = threading.Thread(target=self._run_polling, daemon=True,
+                                            name="fs-events-polling")
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join(timeout)
+            self._observer = None
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _wait_time(self, idle: float) -> float:
+        deadline = self.coalescer.next_deadline()
+        if deadline is None:
+            return idle
+        return max(0.0, min(idle, deadline - time.monotonic()))
+
+    def _deliver(self):
+        for action, path in self.coalescer.due():
+            if self.ignore and self.ignore(path):
+                continue
+            info = {}
+            if action != "deleted":
+                try:
+                    stat = os.stat(path)
+                    info = {"size": stat.st_size, "mtime": stat.st_mtime}
+                except OSError:
+                    action = "deleted"  # Gone again before it settled
+            if self._snapshot is not None:
+                if action == "deleted":
+                    self._snapshot.pop(path, None)
+                else:
+                    self._snapshot[path] = (info["mtime"], info["size"])
+            try:
+                self.callback(action, path, info)
+            except Exception as e:
+                print(f"Filesystem event callback error: {e}")
+
+    def _run_inotify(self, inotify: InotifyBackend):
+        try:
+            while not self._stop.is_set():
+                if not inotify.read(self._wait_time(0.5), self._emit):
+                    print("inotify queue overflowed; rescanning watched directories")
+                    self._rescan(inotify)
+                self._deliver()
+        finally:
+            inotify.close()
+            self._snapshot = None
+
+    def _rescan(self, inotify: InotifyBackend):
+        """Recover events dropped on overflow by diffing against the last known tree"""
+        for path in self.paths:
+            inotify.add_tree(path)  # Directories created while events were dropped
+        current = snapshot_tree(self.paths, self.ignore)
+        for action, path in diff_snapshots(self._snapshot or {}, current):
+            self._emit(action, path)
+        self._snapshot = current
+
+    def _run_dispatch(self):
+        while not self._stop.wait(self._wait_time(0.5)):
+            self._deliver()
+
+    def _run_polling(self):
+        snapshot = snapshot_tree(self.paths, self.ignore)
+        next_scan = time.monotonic() + self.poll_interval
+        while not self._stop.wait(self._wait_time(max(0.0, next_scan - time.monotonic()))):
+            if time.monotonic() >= next_scan:
+                current = snapshot_tree(self.paths, self.ignore)
+                for action, path in diff_snapshots(snapshot, current):
+                    self._emit(action, path)
+                snapshot = current
+                next_scan = time.monotonic() + self.poll_interval
+            self._deliver()
+
+
+class EventBatchWriter:
+    """
+    Persists system events on a background thread, writing everything
+    queued during a flush interval in a single transaction.
+    """
+
+    def __init__(self, db_path: str, flush_interval: float = 1.0, max_batch: int = 500):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def put(self, row: Tuple):
+        """Queue an (event_id, hook_type, timestamp, data, source) row"""
+        self._queue.put(row)
+        if self._queue.qsize() >= self.max_batch:
+            self._wake.set()
+        self._ensure_thread()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is written"""
+        if self._queue.empty() and (self._thread is None or not self._thread.is_alive()):
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        self._wake.set()
+        self._ensure_thread()
+        return done.wait(timeout)
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="event-writer")
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=30)
+            except queue.Empty:
+                # put() queues before checking the thread, so re-check under
+                # the lock or a row landing now would wait for the next put()
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return  # Idle; restarted by the next put()
+                continue
+            if not isinstance(first, threading.Event):
+                # Let a burst accumulate so it lands in one transaction
+                self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            items = [first]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in items if not isinstance(item, threading.Event)]
+            for start in range(0, len(rows), self.max_batch):
+                self._write(rows[start:start + self.max_batch])
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write(self, rows: List[Tuple]):
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.executemany('''
+                    INSERT OR IGNORE INTO system_events (event_id, hook_type, timestamp, data, source)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', rows)
+        except sqlite3.Error as e:
+            print(f"Error storing {len(rows)} system events: {e}")
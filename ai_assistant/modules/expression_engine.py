@@ -0,0 +1,350 @@
+# Automation Expression Engine
+"""
+Safe condition evaluation for SmartAutomationEngine, without eval():
+- Expressions are parsed once into a restricted AST (comparisons, boolean
+  and arithmetic operators, literals, variable lookups, whitelisted calls)
+  and compiled into plain Python closures
+- Compiled expressions know which variables they reference, so watchers
+  re-evaluate a condition only when one of those variables changes
+- ${...} parameter templates are compiled into lookup paths once per task
+"""
+
+import ast
+import operator
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+class ExpressionError(ValueError):
+    """Raised for expressions that are malformed, disallowed or fail to evaluate"""
+
+
+# Functions callable by name from conditions
+SAFE_FUNCTIONS: Dict[str, Callable] = {
+    'len': len, 'min': min, 'max': max, 'abs': abs, 'round': round, 'sum': sum,
+    'any': any, 'all': all, 'int': int, 'float': float, 'str': str, 'bool': bool,
+    'sorted': sorted, 'list': list,
+}
+
+# Methods callable on values (e.g. datetime.now().weekday(), name.lower())
+SAFE_METHODS = {
+    'now', 'today', 'time', 'date', 'weekday', 'isoweekday', 'isoformat', 'timestamp',
+    'lower', 'upper', 'strip', 'startswith', 'endswith', 'split', 'count', 'replace',
+    'get', 'keys', 'values', 'items',
+}
+
+# Longest str/list/tuple a condition may build by repetition ("-" * 20)
+MAX_REPEAT_LENGTH = 10_000
+
+
+def _multiply(left: Any, right: Any) -> Any:
+    """operator.mul, refusing sequence repetition that would build a huge value"""
+    for sequence, count in ((left, right), (right, left)):
+        if isinstance(sequence, (str, bytes, list, tuple)) and isinstance(count, int):
+            if len(sequence) * count > MAX_REPEAT_LENGTH:
+                raise ExpressionError(f"Repetition longer than {MAX_REPEAT_LENGTH} items is not allowed")
+    return left * right
+
+
+_BINARY_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: _multiply,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+}
+_UNARY_OPS = {ast.Not: operator.not_, ast.USub: operator.neg, ast.UAdd: operator.pos}
+_COMPARE_OPS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+    ast.Gt: operator.gt, ast.GtE: operator.ge, ast.Is: operator.is_, ast.IsNot: operator.is_not,
+    ast.In: lambda a, b: a in b, ast.NotIn: lambda a, b: a not in b,
+}
+
+_MISSING = object()
+
+
+def _lookup(value: Any, name: str) -> Any:
+    """Attribute-style access that also reads dict keys (results.task_1)"""
+    if isinstance(value, dict):
+        return value.get(name)
+    attribute = getattr(value, name, _MISSING)
+    if attribute is _MISSING:
+        return None
+    if callable(attribute) and name not in SAFE_METHODS:
+        raise ExpressionError(f"Method '{name}' is not allowed")
+    return attribute
+
+
+class CompiledExpression:
+    """A parsed and validated expression, evaluated against a context dict"""
+
+    def __init__(self, source: str, evaluator: Callable[[Dict[str, Any]], Any], variables: Set[str]):
+        self.source = source
+        self.variables = frozenset(variables)
+        self._evaluator = evaluator
+
+    def evaluate(self, context: Dict[str, Any]) -> Any:
+        try:
+            return self._evaluator(context)
+        except ExpressionError:
+            raise
+        except Exception as e:
+            raise ExpressionError(f"{type(e).__name__}: {e}") from e
+
+    def __repr__(self):
+        return f"CompiledExpression({self.source!r})"
+
+
+class _Compiler:
+    """Turns a restricted Python expression AST into nested closures"""
+
+    def __init__(self):
+        self.variables: Set[str] = set()
+
+    def compile(self, node: ast.AST) -> Callable[[Dict[str, Any]], Any]:
+        method = getattr(self, f"_compile_{type(node).__name__}", None)
+        if method is None:
+            raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+        return method(node)
+
+    def _compile_Expression(self, node):
+        return self.compile(node.body)
+
+    def _compile_Constant(self, node):
+        value = node.value
+        return lambda context: value
+
+    def _compile_Name(self, node):
+        name = node.id
+        if name.startswith('_'):
+            raise ExpressionError(f"Name '{name}' is not allowed")
+        if name in ('True', 'False', 'None'):
+            value = {'True': True, 'False': False, 'None': None}[name]
+            return lambda context: value
+        self.variables.add(name)
+
+        def load(context):
+            if name in context:
+                return context[name]
+            raise ExpressionError(f"Unknown variable '{name}'")
+        return load
+
+    def _compile_Attribute(self, node):
+        if node.attr.startswith('_'):
+            raise ExpressionError(f"Attribute '{node.attr}' is not allowed")
+        target, name = self.compile(node.value), node.attr
+        return lambda context: _lookup(target(context), name)
+
+    def _compile_Subscript(self, node):
+        target, index = self.compile(node.value), self.compile(node.slice)
+
+        def load(context):
+            value, key = target(context), index(context)
+            if isinstance(value, dict):
+                return value.get(key)
+            return value[key]
+        return load
+
+    def _compile_BoolOp(self, node):
+        operands = [self.compile(value) for value in node.values]
+        if isinstance(node.op, ast.And):
+            def evaluate(context):
+                result = True
+                for operand in operands:
+                    result = operand(context)
+                    if not result:
+                        return result
+                return result
+        else:
+            def evaluate(context):
+                result = False
+                for operand in operands:
+                    result = operand(context)
+                    if result:
+                        return result
+                return result
+        return evaluate
+
+    def _compile_UnaryOp(self, node):
+        op = _UNARY_OPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        operand = self.compile(node.operand)
+        return lambda context: op(operand(context))
+
+    def _compile_BinOp(self, node):
+        op = _BINARY_OPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        left, right = self.compile(node.left), self.compile(node.right)
+        return lambda context: op(left(context), right(context))
+
+    def _compile_Compare(self, node):
+        left = self.compile(node.left)
+        steps = []
+        for op_node, comparator in zip(node.ops, node.comparators):
+            op = _COMPARE_OPS.get(type(op_node))
+            if op is None:
+                raise ExpressionError(f"Unsupported comparison: {type(op_node).__name__}")
+            steps.append((op, self.compile(comparator)))
+
+        def evaluate(context):
+            current = left(context)
+            for op, comparator in steps:
+                value = comparator(context)
+                if not op(current, value):
+                    return False
+                current = value
+            return True
+        return evaluate
+
+    def _compile_IfExp(self, node):
+        test, body, orelse = self.compile(node.test), self.compile(node.body), self.compile(node.orelse)
+        return lambda context: body(context) if test(context) else orelse(context)
+
+    def _compile_List(self, node):
+        items = [self.compile(item) for item in node.elts]
+        return lambda context: [item(context) for item in items]
+
+    def _compile_Tuple(self, node):
+        items = [self.compile(item) for item in node.elts]
+        return lambda context: tuple(item(context) for item in items)
+
+    def _compile_Set(self, node):
+        items = [self.compile(item) for item in node.elts]
+        return lambda context: {item(context) for item in items}
+
+    def _compile_Dict(self, node):
+        if any(key is None for key in node.keys):
+            raise ExpressionError("Dict unpacking is not allowed")
+        pairs = [(self.compile(k), self.compile(v)) for k, v in zip(node.keys, node.values)]
+        return lambda context: {k(context): v(context) for k, v in pairs}
+
+    def _compile_Call(self, node):
+        if node.keywords and any(keyword.arg is None for keyword in node.keywords):
+            raise ExpressionError("Keyword unpacking is not allowed")
+        if any(isinstance(arg, ast.Starred) for arg in node.args):
+            raise ExpressionError("Argument unpacking is not allowed")
+        args = [self.compile(arg) for arg in node.args]
+        kwargs = [(keyword.arg, self.compile(keyword.value)) for keyword in node.keywords]
+
+        if isinstance(node.func, ast.Name):
+            function = SAFE_FUNCTIONS.get(node.func.id)
+            if function is None:
+                raise ExpressionError(f"Function '{node.func.id}' is not allowed")
+            return lambda context: function(*[a(context) for a in args],
+                                            **{k: v(context) for k, v in kwargs})
+
+        if isinstance(node.func, ast.Attribute):
+            name = node.func.attr
+            if name not in SAFE_METHODS:
+                raise ExpressionError(f"Method '{name}' is not allowed")
+            target = self.compile(node.func.value)
+
+            def call(context):
+                method = getattr(target(context), name)
+                return method(*[a(context) for a in args], **{k: v(context) for k, v in kwargs})
+            return call
+
+        raise ExpressionError("Only named functions and whitelisted methods can be called")
+
+
+_cache: "OrderedDict[str, CompiledExpression]" = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 512
+
+
+def compile_expression(source: str) -> CompiledExpression:
+    """Parse and compile an expression (results are cached by source text)"""
+    with _cache_lock:
+        compiled = _cache.get(source)
+        if compiled is not None:
+            _cache.move_to_end(source)
+            return compiled
+    try:
+        tree = ast.parse(source.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {e.msg}") from e
+    compiler = _Compiler()
+    compiled = CompiledExpression(source, compiler.compile(tree), compiler.variables)
+    with _cache_lock:
+        _cache[source] = compiled
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
+
+
+def compile_template(value: Any) -> Optional[Tuple[str, ...]]:
+    """Lookup path for a '${a.b.c}' placeholder, or None if value is a literal"""
+    if isinstance(value, str) and value.startswith('${') and value.endswith('}'):
+        return tuple(value[2:-1].split('.'))
+    return None
+
+
+class ConditionWatcher:
+    """
+    Edge-triggered conditions over a shared variable namespace.
+
+    A condition is re-evaluated only when a variable it references changes,
+    and its callback runs when the result goes from false to true.
+    """
+
+    def __init__(self, base_context: Optional[Dict[str, Any]] = None):
+        self.variables: Dict[str, Any] = {}
+        self.base_context = dict(base_context or {})
+        self._watches: Dict[str, Tuple[CompiledExpression, Callable[[], Any], bool]] = {}
+        self._by_variable: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+
+    def _context(self) -> Dict[str, Any]:
+        context = dict(self.base_context)
+        context.update(self.variables)
+        return context
+
+    def _evaluate(self, expression: CompiledExpression) -> bool:
+        try:
+            return bool(expression.evaluate(self._context()))
+        except ExpressionError:
+            # Variables that are not set yet make the condition false
+            return False
+
+    def watch(self, key: str, expression: str, callback: Callable[[], Any]):
+        """Register a condition; raises ExpressionError if it does not compile"""
+        compiled = compile_expression(expression)
+        with self._lock:
+            self.unwatch(key)
+            self._watches[key] = (compiled, callback, self._evaluate(compiled))
+            for name in compiled.variables:
+                self._by_variable.setdefault(name, set()).add(key)
+
+    def unwatch(self, key: str):
+        with self._lock:
+            entry = self._watches.pop(key, None)
+            if entry:
+                for name in entry[0].variables:
+                    keys = self._by_variable.get(name)
+                    if keys:
+                        keys.discard(key)
+                        if not keys:
+                            del self._by_variable[name]
+
+    def update(self, changes: Dict[str, Any]) -> List[str]:
+        """Set variables and fire conditions that just became true; returns their keys"""
+        fired = []
+        with self._lock:
+            changed = {name for name, value in changes.items()
+                       if name not in self.variables or self.variables[name] != value}
+            self.variables.update(changes)
+            affected = set()
+            for name in changed:
+                affected |= self._by_variable.get(name, set())
+            for key in affected:
+                compiled, callback, was_true = self._watches[key]
+                is_true = self._evaluate(compiled)
+                self._watches[key] = (compiled, callback, is_true)
+                if is_true and not was_true:
+                    fired.append((key, callback))
+        for key, callback in fired:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Condition callback error for {key}: {e}")
+        return [key for key, _ in fired]
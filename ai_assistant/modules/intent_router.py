@@ -0,0 +1,153 @@
+# Intent Router Module
+"""
+Compiled intent routing for voice and chat commands.
+
+Intents are declared once as groups of trigger phrases plus slot
+extractors. All trigger phrases are compiled into a single token trie, so
+routing an utterance is one pass over its tokens regardless of how many
+intents exist. Phrases only match whole tokens ("on" no longer fires
+inside "phone"), every intent gets a score, and slot extractors (compiled
+regexes) run only for the intents that are actually considered.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# A slot extractor is a compiled regex (first group, or the whole match) or
+# a callable returning the value (None if absent)
+SlotExtractor = Union["re.Pattern", Callable[[str], Any]]
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+@dataclass
+class Intent:
+    """
+    Declarative intent definition.
+
+    Args:
+        name: Intent name returned to the caller
+        triggers: Groups of trigger phrases; every group must match at least
+            one phrase (AND across groups, OR within a group)
+        weight: Score added per matched group
+        priority: Tie-breaker between intents with equal scores
+        slots: Slot name -> extractors, tried in order
+        required_slots: Slots that must be found for the intent to be chosen
+    """
+    name: str
+    triggers: Sequence[Sequence[str]]
+    weight: float = 1.0
+    priority: int = 0
+    slots: Dict[str, Sequence[SlotExtractor]] = field(default_factory=dict)
+    required_slots: Sequence[str] = ()
+
+
+@dataclass
+class IntentMatch:
+    """A scored intent for one utterance."""
+    name: str
+    score: float
+    matched: List[str]
+    slots: Dict[str, Any] = field(default_factory=dict)
+    intent: Optional[Intent] = field(default=None, repr=False)
+
+
+class _TrieNode:
+    __slots__ = ("children", "outputs")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.outputs: List[Tuple[int, int, str]] = []  # (intent index, group index, phrase)
+
+
+class IntentRouter:
+    """Routes utterances to intents using a trie compiled from all trigger phrases."""
+
+    def __init__(self, intents: Sequence[Intent]):
+        self.intents = list(intents)
+        self._root = _TrieNode()
+        self._max_phrase_tokens = 1
+        for intent_index, intent in enumerate(self.intents):
+            for group_index, group in enumerate(intent.triggers):
+                for phrase in group:
+                    self._insert(phrase, (intent_index, group_index, phrase))
+
+    def _insert(self, phrase: str, output: Tuple[int, int, str]):
+        tokens = tokenize(phrase)
+        if not tokens:
+            raise ValueError(f"Empty trigger phrase for intent {self.intents[output[0]].name}")
+        node = self._root
+        for token in tokens:
+            node = node.children.setdefault(token, _TrieNode())
+        node.outputs.append(output)
+        self._max_phrase_tokens = max(self._max_phrase_tokens, len(tokens))
+
+    def _scan(self, tokens: List[str]) -> Dict[int, Dict[int, List[str]]]:
+        """One pass over the tokens; returns intent -> group -> matched phrases"""
+        hits: Dict[int, Dict[int, List[str]]] = {}
+        for start in range(len(tokens)):
+            node = self._root
+            for token in tokens[start:start + self._max_phrase_tokens]:
+                node = node.children.get(token)
+                if node is None:
+                    break
+                for intent_index, group_index, phrase in node.outputs:
+                    hits.setdefault(intent_index, {}).setdefault(group_index, []).append(phrase)
+        return hits
+
+    def rank(self, text: str, extract_slots: bool = False) -> List[IntentMatch]:
+        """
+        Score every intent whose trigger groups all match, best first.
+
+        Args:
+            text: Utterance
+            extract_slots: Also run slot extractors for each ranked intent
+        """
+        text_lower = text.lower()
+        ranked = []
+        for intent_index, groups in self._scan(tokenize(text_lower)).items():
+            intent = self.intents[intent_index]
+            if len(groups) < len(intent.triggers):
+                continue
+            matched = [phrase for group in groups.values() for phrase in group]
+            score = intent.weight * len(intent.triggers)
+            ranked.append((score, intent.priority, -intent_index,
+                           IntentMatch(intent.name, score, matched, intent=intent)))
+        ranked.sort(key=lambda item: item[:3], reverse=True)
+
+        matches = [match for *_, match in ranked]
+        if extract_slots:
+            for match in matches:
+                match.slots = self._extract(match.intent, text, text_lower)
+        return matches
+
+    def route(self, text: str) -> Optional[IntentMatch]:
+        """Best-ranked intent whose required slots could be filled, or None."""
+        text_lower = text.lower()
+        for match in self.rank(text):
+            match.slots = self._extract(match.intent, text, text_lower)
+            if all(match.slots.get(slot) is not None for slot in match.intent.required_slots):
+                return match
+        return None
+
+    @staticmethod
+    def _extract(intent: Intent, text: str, text_lower: str) -> Dict[str, Any]:
+        slots = {}
+        for slot, extractors in intent.slots.items():
+            value = None
+            for extractor in extractors:
+                if callable(extractor) and not hasattr(extractor, "search"):
+                    value = extractor(text)
+                else:
+                    found = extractor.search(text_lower)
+                    if found:
+                        value = found.group(1) if found.groups() else found.group(0)
+                if value is not None:
+                    break
+            slots[slot] = value.strip() if isinstance(value, str) else value
+        return slots
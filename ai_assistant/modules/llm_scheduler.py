@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+LLM Admission Scheduler
+Global admission control for LLM calls across the backend.
+
+Every provider has a fixed number of concurrency slots (a local Ollama
+server only runs a couple of generations well). Requests wait for a slot
+in priority order - interactive streams, then interactive requests, then
+background work - and sessions get a fair share of the slots, so one user
+with a huge prompt or a burst of requests cannot hold all of them. When
+the queue is too deep to serve a request within its class's wait budget,
+it is rejected immediately with LLMOverloadedError (HTTP 429) instead of
+slowing every request down together.
+"""
+
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Generator, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most urgent first
+STREAM = 0
+INTERACTIVE = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {STREAM: "stream", INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Concurrency slots per provider; override with LLM_SLOTS_<PROVIDER>
+DEFAULT_SLOTS = {"ollama": 2, "offline": 1, "openai": 16, "gemini": 16}
+PROVIDER_ALIASES = {"local": "ollama", "localllm": "ollama", "offlinellmmanager": "offline"}
+
+# Waiting requests per provider beyond which a class is shed; lower classes shed first
+DEFAULT_QUEUE_LIMITS = {STREAM: 32, INTERACTIVE: 24, BACKGROUND: 16}
+# Longest a class waits for a slot (None waits indefinitely)
+DEFAULT_MAX_WAIT = {STREAM: 10.0, INTERACTIVE: 20.0, BACKGROUND: None}
+
+
+class LLMOverloadedError(Exception):
+    """Raised when a request is shed instead of queued."""
+
+    def __init__(self, provider: str, priority: int, reason: str, retry_after: float):
+        self.provider = provider
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        super().__init__(
+            f"LLM provider '{provider}' is overloaded ({reason}); retry in {self.retry_after}s"
+        )
+
+
+_request_context: contextvars.ContextVar = contextvars.ContextVar("llm_request_context", default={})
+
+
+@contextmanager
+def llm_request(session_id: Optional[str] = None, priority: Optional[int] = None):
+    """
+    Attribute LLM calls made in this block to a session and priority class.
+
+    Used where the code that knows the user (an HTTP handler) is not the
+    code that calls the provider.
+    """
+    context = dict(_request_context.get())
+    if session_id is not None:
+        context["session_id"] = session_id
+    if priority is not None:
+        context["priority"] = priority
+    token = _request_context.set(context)
+    try:
+        yield
+    finally:
+        _request_context.reset(token)
+
+
+def request_context(session_id: Optional[str] = None, priority: int = INTERACTIVE) -> Dict[str, Any]:
+    """Session and priority for a call; an enclosing llm_request block takes precedence."""
+    context = _request_context.get()
+    return {
+        "session_id": context.get("session_id", session_id) or "default",
+        "priority": context.get("priority", priority),
+    }
+
+
+def provider_key(provider: Any) -> str:
+    """Slot pool name for a provider instance, class or name."""
+    if isinstance(provider, str):
+        name = provider
+    else:
+        name = provider.__name__ if isinstance(provider, type) else type(provider).__name__
+        name = name.replace("Provider", "")
+    name = name.lower()
+    return PROVIDER_ALIASES.get(name, name)
+
+
+@dataclass
+class _Ticket:
+    """A request waiting for, or holding, a slot."""
+    provider: str
+    priority: int
+    session_id: str
+    seq: int
+    enqueued_at: float = field(default_factory=time.time)
+    granted_at: Optional[float] = None
+    event: threading.Event = field(default_factory=threading.Event)
+
+
+class _Pool:
+    """Slots, holders and waiters of one provider."""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.active = 0
+        self.sessions: Counter = Counter()       # session -> slots held
+        self.waiting_sessions: Counter = Counter()
+        self.waiters: List[_Ticket] = []
+        self.service_time = 1.0                  # EWMA of seconds a slot is held
+
+
+class LLMScheduler:
+    """Priority admission control with per-provider slots."""
+
+    def __init__(
+        self,
+        slots: Optional[Dict[str, int]] = None,
+        queue_limits: Optional[Dict[int, int]] = None,
+        max_wait: Optional[Dict[int, Optional[float]]] = None,
+        session_queue_limit: int = 4,
+        session_share: float = 0.5,
+        metrics_window: int = 1000
+    ):
+        """
+        Initialize scheduler.
+
+        Args:
+            slots: Concurrency slots per provider (defaults to DEFAULT_SLOTS)
+            queue_limits: Waiting requests per provider at which each class is shed
+            max_wait: Seconds each class may wait for a slot
+            session_queue_limit: Requests one session may have waiting
+            session_share: Fraction of a provider's slots one session may hold
+                while other sessions are waiting
+            metrics_window: Queue-time samples kept per class
+        """
+        self.slots = dict(DEFAULT_SLOTS)
+        self.slots.update(slots or {})
+        self.queue_limits = dict(DEFAULT_QUEUE_LIMITS)
+        self.queue_limits.update(queue_limits or {})
+        self.max_wait = dict(DEFAULT_MAX_WAIT)
+        self.max_wait.update(max_wait or {})
+        self.session_queue_limit = session_queue_limit
+        self.session_share = session_share
+
+        self._pools: Dict[str, _Pool] = {}
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._queue_times: Dict[int, Deque[float]] = {p: deque(maxlen=metrics_window) for p in PRIORITY_NAMES}
+        self.counters = {p: Counter() for p in PRIORITY_NAMES}
+
+    def _pool(self, provider: str) -> _Pool:
+        pool = self._pools.get(provider)
+        if pool is None:
+            slots = int(os.getenv(f"LLM_SLOTS_{provider.upper()}", self.slots.get(provider, 4)))
+            pool = _Pool(max(1, slots))
+            self._pools[provider] = pool
+        return pool
+
+    def configure(self, provider: str, slots: int):
+        """Change the number of slots of a provider."""
+        provider = provider_key(provider)
+        with self._lock:
+            self.slots[provider] = slots
+            pool = self._pool(provider)
+            pool.slots = max(1, slots)
+            self._grant(pool)
+
+    # --- Admission ---
+
+    def _estimated_wait(self, pool: _Pool, priority: int) -> float:
+        """Seconds until a new request of a class would get a slot."""
+        ahead = sum(1 for t in pool.waiters if t.priority <= priority)
+        return (ahead + 1) / pool.slots * pool.service_time
+
+    def _shed_reason(self, pool: _Pool, priority: int, session_id: str) -> Optional[str]:
+        if len(pool.waiters) >= self.queue_limits[priority]:
+            return "queue full"
+        if pool.waiting_sessions[session_id] >= self.session_queue_limit:
+            return "too many requests from this session"
+        budget = self.max_wait[priority]
+        if budget is not None and self._estimated_wait(pool, priority) > budget:
+            return "queue wait exceeds budget"
+        return None
+
+    def would_shed(self, provider: Any, priority: int = INTERACTIVE,
+                   session_id: str = "default") -> Optional[float]:
+        """
+        Seconds to retry after if a request would be shed right now, else None.
+
+        Lets HTTP handlers answer 429 before starting a response stream.
+        """
+        provider = provider_key(provider)
+        with self._lock:
+            pool = self._pool(provider)
+            if pool.active < pool.slots and not pool.waiters:
+                return None
+            if self._shed_reason(pool, priority, session_id) is None:
+                return None
+            return LLMOverloadedError(provider, priority, "", self._estimated_wait(pool, priority)).retry_after
+
+    def acquire(self, provider: Any, priority: int = INTERACTIVE, session_id: str = "default",
+                timeout: Optional[float] = None) -> _Ticket:
+        """
+        Wait for a slot.
+
+        Args:
+            provider: Provider instance or name
+            priority: STREAM, INTERACTIVE or BACKGROUND
+            session_id: Session the request belongs to, for fair share
+            timeout: Seconds to wait (defaults to the class's wait budget)
+
+        Returns:
+            Ticket to pass to release()
+
+        Raises:
+            LLMOverloadedError: If the request is shed or times out
+        """
+        provider = provider_key(provider)
+        with self._lock:
+            pool = self._pool(provider)
+            self._seq += 1
+            ticket = _Ticket(provider, priority, session_id, self._seq)
+            if pool.active < pool.slots and not pool.waiters:
+                self._take_slot(pool, ticket)
+                return ticket
+            reason = self._shed_reason(pool, priority, session_id)
+            if reason:
+                self.counters[priority]["shed"] += 1
+                raise LLMOverloadedError(provider, priority, reason, self._estimated_wait(pool, priority))
+            pool.waiters.append(ticket)
+            pool.waiting_sessions[session_id] += 1
+
+        wait = timeout if timeout is not None else self.max_wait[priority]
+        if ticket.event.wait(wait):
+            return ticket
+        with self._lock:
+            if ticket.granted_at is not None:
+                return ticket  # Granted while timing out
+            pool.waiters.remove(ticket)
+            pool.waiting_sessions[session_id] -= 1
+            self.counters[priority]["timeouts"] += 1
+            raise LLMOverloadedError(provider, priority, "timed out waiting for a slot",
+                                     self._estimated_wait(pool, priority))
+
+    def _take_slot(self, pool: _Pool, ticket: _Ticket):
+        ticket.granted_at = time.time()
+        pool.active += 1
+        pool.sessions[ticket.session_id] += 1
+        self._queue_times[ticket.priority].append(ticket.granted_at - ticket.enqueued_at)
+        self.counters[ticket.priority]["admitted"] += 1
+
+    def _grant(self, pool: _Pool):
+        """Hand free slots to waiters: by class, then sessions holding the fewest slots, then FIFO."""
+        share = max(1, int(pool.slots * self.session_share))
+        while pool.active < pool.slots and pool.waiters:
+            ranked = sorted(pool.waiters, key=lambda t: (t.priority, pool.sessions[t.session_id], t.seq))
+            ticket = next((t for t in ranked if pool.sessions[t.session_id] < share), ranked[0])
+            pool.waiters.remove(ticket)
+            pool.waiting_sessions[ticket.session_id] -= 1
+            self._take_slot(pool, ticket)
+            ticket.event.set()
+
+    def release(self, ticket: _Ticket):
+        """Give a slot back and hand it to the next waiter."""
+        with self._lock:
+            pool = self._pool(ticket.provider)
+            pool.active -= 1
+            pool.sessions[ticket.session_id] -= 1
+            if pool.sessions[ticket.session_id] <= 0:
+                del pool.sessions[ticket.session_id]
+            held = time.time() - ticket.granted_at
+            pool.service_time = 0.8 * pool.service_time + 0.2 * held
+            self._grant(pool)
+
+    @contextmanager
+    def slot(self, provider: Any, priority: int = INTERACTIVE, session_id: str = "default",
+             timeout: Optional[float] = None):
+        """Hold a slot for the duration of the block."""
+        ticket = self.acquire(provider, priority, session_id, timeout)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stream(self, provider: Any, tokens: Callable[[], Iterable[str]], priority: int = STREAM,
+               session_id: str = "default") -> Generator[str, None, None]:
+        """
+        Stream tokens while holding a slot.
+
+        The slot is acquired when iteration starts and released when the
+        stream ends or the consumer stops reading.
+        """
+        with self.slot(provider, priority, session_id):
+            yield from tokens()
+
+    # --- Metrics ---
+
+    @staticmethod
+    def _percentile(samples: List[float], fraction: float) -> float:
+        if not samples:
+            return 0.0
+        samples = sorted(samples)
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+    def stats(self) -> Dict[str, Any]:
+        """Slots, queue depths, shed counts and queue-time percentiles."""
+        with self._lock:
+            providers = {
+                name: {
+                    "slots": pool.slots,
+                    "active": pool.active,
+                    "waiting": len(pool.waiters),
+                    "sessions": len(pool.sessions),
+                    "service_time": round(pool.service_time, 3),
+                }
+                for name, pool in self._pools.items()
+            }
+            classes = {}
+            for priority, name in PRIORITY_NAMES.items():
+                samples = list(self._queue_times[priority])
+                classes[name] = dict(self.counters[priority])
+                classes[name].update({
+                    "queue_p50": round(self._percentile(samples, 0.50), 4),
+                    "queue_p95": round(self._percentile(samples, 0.95), 4),
+                    "queue_p99": round(self._percentile(samples, 0.99), 4),
+                })
+        return {"providers": providers, "classes": classes}
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Returns the process-wide LLM scheduler, creating it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
@@ -0,0 +1,462 @@
+# Mail Sync Module
+"""
+Local Gmail mirror for the email tools:
+- Message metadata fetched through the Gmail batch endpoint, up to 50
+  messages per HTTP round trip instead of one request per message
+- Headers, labels and snippets kept in SQLite with an FTS5 index
+- Incremental sync from the stored historyId (users.history.list),
+  falling back to a full resync when Gmail has expired that history
+- Inbox summaries and most searches answered from the local store
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+
+METADATA_HEADERS = ['From', 'To', 'Subject', 'Date']
+
+# Gmail accepts up to 100 calls per batch but recommends 50 to avoid rate limiting
+BATCH_SIZE = 50
+# API-specific batch endpoint; the Gmail discovery document has no batchPath, so
+# service.new_batch_http_request() would target the retired global /batch endpoint
+GMAIL_BATCH_URI = "https://gmail.googleapis.com/batch/gmail/v1"
+
+# Like Gmail search, the mirror leaves these out unless asked for (in:trash)
+HIDDEN_LABELS = ('TRASH', 'SPAM')
+
+_QUERY_TOKEN = re.compile(r'(\w+):("[^"]*"|\S+)|"([^"]*)"|(\S+)')
+
+
+def message_record(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a messages.get (format=metadata) response into a store row"""
+    headers = {h['name'].lower(): h['value'] for h in message.get('payload', {}).get('headers', [])}
+    return {
+        'id': message['id'],
+        'thread_id': message.get('threadId'),
+        'history_id': int(message.get('historyId') or 0),
+        'internal_date': int(message.get('internalDate') or 0),
+        'sender': headers.get('from', 'Unknown'),
+        'recipients': headers.get('to', ''),
+        'subject': headers.get('subject', 'No Subject'),
+        'date': headers.get('date', 'Unknown Date'),
+        'snippet': message.get('snippet', ''),
+        'labels': message.get('labelIds', []),
+    }
+
+
+class MailStore:
+    """SQLite mirror of message metadata with full-text search"""
+
+    def __init__(self, db_path: str = "gmail_cache.db"):
+        self.db_path = db_path
+        self.fts_enabled = True
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_database(self):
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id TEXT PRIMARY KEY,
+                    thread_id TEXT,
+                    history_id INTEGER,
+                    internal_date INTEGER,
+                    sender TEXT,
+                    recipients TEXT,
+                    subject TEXT,
+                    date TEXT,
+                    snippet TEXT,
+                    labels TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_messages_date ON messages (internal_date DESC);
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+            try:
+                conn.executescript("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                        subject, sender, recipients, snippet,
+                        content='messages', content_rowid='rowid'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+                        INSERT INTO messages_fts (rowid, subject, sender, recipients, snippet)
+                        VALUES (new.rowid, new.subject, new.sender, new.recipients, new.snippet);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+                        INSERT INTO messages_fts (messages_fts, rowid, subject, sender, recipients, snippet)
+                        VALUES ('delete', old.rowid, old.subject, old.sender, old.recipients, old.snippet);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS messages_au
+                    AFTER UPDATE OF subject, sender, recipients, snippet ON messages BEGIN
+                        INSERT INTO messages_fts (messages_fts, rowid, subject, sender, recipients, snippet)
+                        VALUES ('delete', old.rowid, old.subject, old.sender, old.recipients, old.snippet);
+                        INSERT INTO messages_fts (rowid, subject, sender, recipients, snippet)
+                        VALUES (new.rowid, new.subject, new.sender, new.recipients, new.snippet);
+                    END;
+                """)
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5; search falls back to LIKE
+                self.fts_enabled = False
+
+    @staticmethod
+    def _labels_text(labels: Iterable[str]) -> str:
+        # Padded so "label LIKE '% UNREAD %'" matches whole label ids
+        return f" {' '.join(labels)} "
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        record['labels'] = record['labels'].split()
+        return record
+
+    def get_state(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_state(self, **values):
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                             [(key, str(value)) for key, value in values.items()])
+
+    def upsert(self, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        with self._connect() as conn:
+            conn.executemany("""
+                INSERT INTO messages (id, thread_id, history_id, internal_date, sender, recipients,
+                                      subject, date, snippet, labels)
+                VALUES (:id, :thread_id, :history_id, :internal_date, :sender, :recipients,
+                        :subject, :date, :snippet, :labels)
+                ON CONFLICT(id) DO UPDATE SET
+                    history_id = excluded.history_id, labels = excluded.labels,
+                    snippet = excluded.snippet
+            """, [dict(record, labels=self._labels_text(record['labels'])) for record in records])
+
+    def set_labels(self, message_id: str, labels: Iterable[str]):
+        with self._connect() as conn:
+            conn.execute("UPDATE messages SET labels = ? WHERE id = ?",
+                         (self._labels_text(labels), message_id))
+
+    def change_labels(self, message_id: str, add: Iterable[str] = (), remove: Iterable[str] = ()):
+        record = self.get(message_id)
+        if record:
+            labels = [label for label in record['labels'] if label not in set(remove)]
+            labels.extend(label for label in add if label not in labels)
+            self.set_labels(message_id, labels)
+
+    def delete(self, message_ids: Iterable[str]):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM messages WHERE id = ?", [(mid,) for mid in message_ids])
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM messages")
+            conn.execute("DELETE FROM sync_state")
+
+    def trim(self, max_messages: int) -> int:
+        """Drop the oldest messages beyond max_messages; returns how many"""
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                DELETE FROM messages WHERE id IN (
+                    SELECT id FROM messages ORDER BY internal_date DESC LIMIT -1 OFFSET ?
+                )
+            """, (max_messages,))
+            return cursor.rowcount
+
+    def known_ids(self, message_ids: Iterable[str]) -> set:
+        message_ids = list(message_ids)
+        known = set()
+        with self._connect() as conn:
+            for start in range(0, len(message_ids), 500):
+                chunk = message_ids[start:start + 500]
+                rows = conn.execute(f"SELECT id FROM messages WHERE id IN ({','.join('?' * len(chunk))})",
+                                    chunk).fetchall()
+                known.update(row['id'] for row in rows)
+        return known
+
+    def get(self, message_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM messages WHERE id = ?", (message_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def get_many(self, message_ids: List[str]) -> List[Dict[str, Any]]:
+        """Records for the given ids, in the same order (missing ids skipped)"""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT * FROM messages WHERE id IN ({','.join('?' * len(message_ids))})",
+                                message_ids).fetchall() if message_ids else []
+        by_id = {row['id']: self._row_to_dict(row) for row in rows}
+        return [by_id[mid] for mid in message_ids if mid in by_id]
+
+    def count(self, label: Optional[str] = None) -> int:
+        with self._connect() as conn:
+            if label:
+                return conn.execute("SELECT COUNT(*) FROM messages WHERE labels LIKE ?",
+                                    (f"% {label} %",)).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def recent(self, label: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        return self.query({'labels': [label] if label else []}, limit)
+
+    def query(self, criteria: Dict[str, Any], limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Run a parsed search (see parse_search_query) against the mirror.
+
+        Returns:
+            Matching records, newest first
+        """
+        clauses, params = [], []
+        labels = criteria.get('labels', [])
+        for label in labels:
+            clauses.append("m.labels LIKE ?")
+            params.append(f"% {label} %")
+        hidden = [label for label in HIDDEN_LABELS if label not in labels]
+        for label in criteria.get('not_labels', []) + hidden:
+            clauses.append("m.labels NOT LIKE ?")
+            params.append(f"% {label} %")
+        for column in ('sender', 'recipients', 'subject'):
+            for value in criteria.get(column, []):
+                clauses.append(f"m.{column} LIKE ?")
+                params.append(f"%{value}%")
+        join = ""
+        words = criteria.get('words', [])
+        if words and self.fts_enabled:
+            join = "JOIN messages_fts f ON f.rowid = m.rowid"
+            clauses.append("messages_fts MATCH ?")
+            params.append(" ".join('"' + word.replace('"', '""') + '"' for word in words))
+        elif words:
+            for word in words:
+                clauses.append("(m.subject LIKE ? OR m.sender LIKE ? OR m.snippet LIKE ?)")
+                params.extend([f"%{word}%"] * 3)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT m.* FROM messages m {join} {where} "
+                                f"ORDER BY m.internal_date DESC LIMIT ?", params + [limit]).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+
+def parse_search_query(query: str) -> Optional[Dict[str, List[str]]]:
+    """
+    Translate the common subset of Gmail search syntax into store criteria.
+
+    Returns:
+        Criteria dict, or None if the query uses operators the mirror can't
+        answer (dates, attachments, OR, negation...) and must go to Gmail
+    """
+    criteria: Dict[str, List[str]] = {}
+    fields = {'from': 'sender', 'to': 'recipients', 'subject': 'subject'}
+    flags = {'unread': ('labels', 'UNREAD'), 'read': ('not_labels', 'UNREAD'),
+             'starred': ('labels', 'STARRED'), 'important': ('labels', 'IMPORTANT')}
+    for match in _QUERY_TOKEN.finditer(query):
+        operator, value, phrase, word = match.groups()
+        if operator:
+            operator, value = operator.lower(), value.strip('"')
+            if operator in fields:
+                criteria.setdefault(fields[operator], []).append(value)
+            elif operator == 'is' and value.lower() in flags:
+                key, label = flags[value.lower()]
+                criteria.setdefault(key, []).append(label)
+            elif operator in ('in', 'label') and value.lower() != 'anywhere':
+                criteria.setdefault('labels', []).append(value.upper())
+            else:
+                return None
+        elif phrase is not None:
+            criteria.setdefault('words', []).append(phrase)
+        elif word.startswith('-') or word.upper() in ('OR', 'AND') or any(c in word for c in '{}()'):
+            return None
+        else:
+            criteria.setdefault('words', []).append(word)
+    return criteria
+
+
+class GmailSync:
+    """
+    Keeps a MailStore in step with a Gmail account.
+
+    Args:
+        service: Authenticated Gmail API service (googleapiclient)
+        store: Local mirror
+        initial_messages: Newest messages fetched on a full sync
+        max_messages: Mirror size; older messages are trimmed
+        batch_size: Calls per batch HTTP request
+    """
+
+    def __init__(self, service, store: MailStore, initial_messages: int = 200,
+                 max_messages: int = 2000, batch_size: int = BATCH_SIZE):
+        self.service = service
+        self.store = store
+        self.initial_messages = initial_messages
+        self.max_messages = max_messages
+        self.batch_size = batch_size
+        self.stats = {'full_syncs': 0, 'incremental_syncs': 0, 'batches': 0, 'fetched': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def history_id(self) -> Optional[str]:
+        return self.store.get_state('history_id')
+
+    @property
+    def complete(self) -> bool:
+        """True when the mirror holds every message in the account"""
+        return self.store.get_state('complete') == '1'
+
+    def sync(self, max_age: float = 0) -> Dict[str, int]:
+        """
+        Bring the mirror up to date.
+
+        Args:
+            max_age: Skip the sync if the last one finished less than this many seconds ago
+
+        Returns:
+            Counts of added, deleted and relabelled messages
+        """
+        with self._lock:
+            last_sync = float(self.store.get_state('last_sync', '0'))
+            if max_age and time.time() - last_sync < max_age:
+                return {'added': 0, 'deleted': 0, 'updated': 0}
+            if self.history_id:
+                try:
+                    changes = self._incremental_sync()
+                except HttpError as e:
+                    if e.resp.status != 404:
+                        raise
+                    # Gmail only keeps about a week of history; start over
+                    changes = self._full_sync()
+            else:
+                changes = self._full_sync()
+            if self.store.trim(self.max_messages):
+                self.store.set_state(complete='0')
+            self.store.set_state(last_sync=time.time())
+            return changes
+
+    def _full_sync(self) -> Dict[str, int]:
+        self.stats['full_syncs'] += 1
+        # Read the history id first so changes made while listing are replayed next time
+        profile = self.service.users().getProfile(userId='me').execute()
+        message_ids, page_token = [], None
+        while len(message_ids) < self.initial_messages:
+            response = self.service.users().messages().list(
+                userId='me', maxResults=min(500, self.initial_messages - len(message_ids)),
+                pageToken=page_token).execute()
+            message_ids.extend(m['id'] for m in response.get('messages', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        self.store.clear()
+        records = self.fetch_metadata(message_ids)
+        self.store.upsert(records)
+        self.store.set_state(history_id=profile['historyId'], complete='0' if page_token else '1')
+        return {'added': len(records), 'deleted': 0, 'updated': 0}
+
+    def _incremental_sync(self) -> Dict[str, int]:
+        self.stats['incremental_syncs'] += 1
+        added, deleted, labels = {}, set(), {}
+        history_id, page_token = self.history_id, None
+        while True:
+            response = self.service.users().history().list(
+                userId='me', startHistoryId=history_id, pageToken=page_token,
+                historyTypes=['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
+            ).execute()
+            for record in response.get('history', []):
+                for entry in record.get('messagesAdded', []):
+                    message = entry['message']
+                    added[message['id']] = message
+                    deleted.discard(message['id'])
+                for entry in record.get('messagesDeleted', []):
+                    message_id = entry['message']['id']
+                    added.pop(message_id, None)
+                    labels.pop(message_id, None)
+                    deleted.add(message_id)
+                for entry in record.get('labelsAdded', []) + record.get('labelsRemoved', []):
+                    message = entry['message']
+                    if 'labelIds' in message and message['id'] not in deleted:
+                        labels[message['id']] = message['labelIds']
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                new_history_id = response.get('historyId', history_id)
+                break
+
+        records = self.fetch_metadata(list(added))
+        for record in records:
+            if record['id'] in labels:
+                record['labels'] = labels.pop(record['id'])
+        self.store.upsert(records)
+        self.store.delete(deleted)
+        known = self.store.known_ids(labels)
+        for message_id in known:
+            self.store.set_labels(message_id, labels[message_id])
+        self.store.set_state(history_id=new_history_id)
+        return {'added': len(records), 'deleted': len(deleted), 'updated': len(known)}
+
+    def fetch_metadata(self, message_ids: List[str], retries: int = 2) -> List[Dict[str, Any]]:
+        """
+        Fetch headers, labels and snippets for many messages with batch requests.
+
+        Returns:
+            Store records for the messages that still exist
+        """
+        records, pending = [], list(dict.fromkeys(message_ids))
+        for attempt in range(retries + 1):
+            retry = []
+            for start in range(0, len(pending), self.batch_size):
+                chunk = pending[start:start + self.batch_size]
+                records.extend(self._fetch_batch(chunk, retry))
+            if not retry:
+                break
+            pending = retry
+            time.sleep(0.5 * (2 ** attempt))  # Back off before retrying rate-limited calls
+        return records
+
+    def _fetch_batch(self, message_ids: List[str], retry: List[str]) -> List[Dict[str, Any]]:
+        records = []
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                records.append(message_record(response))
+            elif isinstance(exception, HttpError) and exception.resp.status in (429, 500, 503):
+                retry.append(request_id)
+            elif not (isinstance(exception, HttpError) and exception.resp.status == 404):
+                print(f"Error fetching message {request_id}: {exception}")
+
+        batch = BatchHttpRequest(callback=callback, batch_uri=GMAIL_BATCH_URI)
+        messages = self.service.users().messages()
+        for message_id in message_ids:
+            batch.add(messages.get(userId='me', id=message_id, format='metadata',
+                                   metadataHeaders=METADATA_HEADERS), request_id=message_id)
+        batch.execute()
+        self.stats['batches'] += 1
+        self.stats['fetched'] += len(message_ids)
+        return records
+
+    def search(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+        """
+        Search messages, locally when possible.
+
+        The mirror answers supported queries when it is complete or already
+        holds enough matches; otherwise Gmail runs the query and only
+        messages missing from the mirror are fetched (in one batch).
+        """
+        criteria = parse_search_query(query)
+        if criteria is not None:
+            results = self.store.query(criteria, max_results)
+            if len(results) >= max_results or self.complete:
+                return results
+        response = self.service.users().messages().list(
+            userId='me', q=query, maxResults=max_results).execute()
+        message_ids = [m['id'] for m in response.get('messages', [])]
+        known = self.store.known_ids(message_ids)
+        missing = [mid for mid in message_ids if mid not in known]
+        self.store.upsert(self.fetch_metadata(missing))
+        return self.store.get_many(message_ids)
+
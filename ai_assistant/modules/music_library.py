@@ -0,0 +1,381 @@
+# Music Library Module
+"""
+Local metadata layer for the music controllers.
+
+The user's Spotify playlists are mirrored - every page, with their tracks -
+into a SQLite store with an in-memory name index, so playlist lookups by
+name are answered locally and are not limited to the first page of the
+API. The mirror refreshes in the background and only re-fetches the tracks
+of playlists whose snapshot ID changed. Search and recommendation results
+are kept in a TTL cache shared by the Spotify and YouTube Music functions.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PLAYLIST_PAGE_SIZE = 50
+TRACK_PAGE_SIZE = 100
+TRACK_FIELDS = 'items(track(id,uri,name,artists(name))),next'
+
+
+def normalize_name(name: str) -> str:
+    """Case and whitespace insensitive key for names and queries."""
+    return ' '.join(str(name).lower().split())
+
+
+def slim_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the fields the music functions use from a track or artist."""
+    slim = {'id': item.get('id'), 'uri': item.get('uri'), 'name': item.get('name', 'Unknown')}
+    if 'artists' in item:
+        slim['artists'] = [{'name': artist.get('name', 'Unknown')} for artist in item.get('artists') or []]
+    return slim
+
+
+class MetadataCache:
+    """Bounded TTL cache for search and recommendation results"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def key(namespace: str, *parts: Any) -> tuple:
+        """Cache key; string parts are normalized so 'Queen ' and 'queen' share an entry."""
+        return (namespace,) + tuple(normalize_name(p) if isinstance(p, str) else p for p in parts)
+
+    def get(self, key: tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def set(self, key: tuple, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_fetch(self, key: tuple, ttl: float, fetch: Callable[[], Any]) -> Any:
+        """
+        Cached value for a key, fetching it on a miss.
+
+        Empty results are not cached, so a track that was just released is
+        found on the next query instead of after the TTL.
+        """
+        value = self.get(key)
+        if value is None:
+            value = fetch()
+            if value:
+                self.set(key, value, ttl)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SpotifyLibrary:
+    """Local mirror of the user's Spotify playlists with a name index"""
+
+    def __init__(self, client: Callable[[], Any], db_path: Optional[str] = None,
+                 refresh_interval: float = 900, miss_resync_interval: float = 30):
+        """
+        Args:
+            client: Returns the authenticated spotipy client
+            db_path: SQLite file the mirror is persisted to; None keeps it in memory
+            refresh_interval: Seconds before the mirror is refreshed in the background
+            miss_resync_interval: Minimum seconds between the blocking re-syncs
+                triggered by looking up a playlist the mirror does not know
+        """
+        self._client = client
+        self.db_path = str(db_path) if db_path else None
+        self.refresh_interval = refresh_interval
+        self.miss_resync_interval = miss_resync_interval
+        self.synced_at = 0.0
+
+        self._playlists: Dict[str, Dict[str, Any]] = {}  # playlist id -> record
+        self._by_name: Dict[str, List[str]] = {}          # normalized name -> playlist ids
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {'syncs': 0, 'playlist_pages': 0, 'track_pages': 0, 'skipped': 0, 'fetched': 0}
+        self._init_db()
+        self._load()
+
+    # --- Persistence ---
+
+    def _init_db(self):
+        if not self.db_path:
+            return
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS spotify_playlists (
+                        id TEXT PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        name_key TEXT NOT NULL,
+                        owner TEXT,
+                        snapshot_id TEXT,
+                        total INTEGER,
+                        uri TEXT,
+                        url TEXT,
+                        position INTEGER,
+                        tracks TEXT,
+                        synced_at REAL NOT NULL
+                    )
+                """)
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_spotify_playlists_name ON spotify_playlists(name_key)"
+                )
+                conn.commit()
+        except Exception as e:
+            print(f"Spotify library DB init failed: {e}")
+            self.db_path = None
+
+    def _load(self):
+        """Serve the mirror from disk until the first refresh completes."""
+        if not self.db_path:
+            return
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute("""
+                    SELECT id, name, owner, snapshot_id, total, uri, url, tracks, synced_at, position
+                    FROM spotify_playlists ORDER BY position
+                """).fetchall()
+        except Exception as e:
+            print(f"Spotify library load failed: {e}")
+            return
+        playlists = []
+        for row in rows:
+            playlists.append({
+                'id': row[0], 'name': row[1], 'owner': row[2], 'snapshot_id': row[3],
+                'total': row[4], 'uri': row[5], 'url': row[6], 'position': row[9],
+                'tracks': json.loads(row[7]) if row[7] is not None else None,
+            })
+        self._replace(playlists)
+        if rows:
+            self.synced_at = min(row[8] for row in rows)
+
+    def _save(self, records: List[Dict[str, Any]], removed: List[str] = ()):
+        if not self.db_path:
+            return
+        now = time.time()
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.executemany("""
+                    INSERT OR REPLACE INTO spotify_playlists
+                    (id, name, name_key, owner, snapshot_id, total, uri, url, position, tracks, synced_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [(r['id'], r['name'], normalize_name(r['name']), r['owner'], r['snapshot_id'],
+                       r['total'], r['uri'], r['url'], r.get('position', 0),
+                       json.dumps(r['tracks']) if r['tracks'] is not None else None, now)
+                      for r in records])
+                conn.executemany("DELETE FROM spotify_playlists WHERE id = ?", [(pid,) for pid in removed])
+                conn.commit()
+        except Exception as e:
+            print(f"Spotify library save failed: {e}")
+
+    # --- Syncing ---
+
+    @staticmethod
+    def _record(item: Dict[str, Any], position: int) -> Dict[str, Any]:
+        return {
+            'id': item['id'],
+            'name': item.get('name', ''),
+            'owner': (item.get('owner') or {}).get('id'),
+            'snapshot_id': item.get('snapshot_id'),
+            'total': (item.get('tracks') or {}).get('total', 0),
+            'uri': item.get('uri'),
+            'url': (item.get('external_urls') or {}).get('spotify'),
+            'position': position,
+            'tracks': None,
+        }
+
+    def _replace(self, playlists: List[Dict[str, Any]]):
+        by_name: Dict[str, List[str]] = {}
+        for record in playlists:
+            by_name.setdefault(normalize_name(record['name']), []).append(record['id'])
+        with self._lock:
+            self._playlists = {record['id']: record for record in playlists}
+            self._by_name = by_name
+
+    def _fetch_tracks(self, sp, playlist_id: str) -> List[Dict[str, Any]]:
+        tracks = []
+        page = sp.playlist_items(playlist_id, fields=TRACK_FIELDS, limit=TRACK_PAGE_SIZE,
+                                 additional_types=('track',))
+        while page:
+            self.stats['track_pages'] += 1
+            for entry in page.get('items') or []:
+                track = (entry or {}).get('track')
+                if track and track.get('uri'):
+                    tracks.append(slim_item(track))
+            page = sp.next(page) if page.get('next') else None
+        return tracks
+
+    def sync(self, include_tracks: bool = True) -> Dict[str, int]:
+        """
+        Mirror every page of the user's playlists.
+
+        Args:
+            include_tracks: Also mirror the tracks of playlists whose snapshot
+                ID changed; unchanged playlists keep their mirrored tracks
+
+        Returns:
+            Counts of playlists, playlists whose tracks were fetched or
+            skipped, and playlists removed since the previous sync
+        """
+        with self._sync_lock:
+            sp = self._client()
+            listed = []
+            page = sp.current_user_playlists(limit=PLAYLIST_PAGE_SIZE)
+            while page:
+                self.stats['playlist_pages'] += 1
+                listed.extend(item for item in page.get('items') or [] if item and item.get('id'))
+                page = sp.next(page) if page.get('next') else None
+
+            with self._lock:
+                known = dict(self._playlists)
+            playlists, fetched, skipped = [], 0, 0
+            for position, item in enumerate(listed):
+                record = self._record(item, position)
+                current = known.get(record['id'])
+                if current and current['snapshot_id'] == record['snapshot_id'] and current['tracks'] is not None:
+                    record['tracks'] = current['tracks']
+                    skipped += 1
+                elif include_tracks:
+                    record['tracks'] = self._fetch_tracks(sp, record['id'])
+                    fetched += 1
+                playlists.append(record)
+
+            removed = [pid for pid in known if pid not in {r['id'] for r in playlists}]
+            self._replace(playlists)
+            self._save(playlists, removed)
+            self.synced_at = time.time()
+            self.stats['syncs'] += 1
+            self.stats['fetched'] += fetched
+            self.stats['skipped'] += skipped
+            return {'playlists': len(playlists), 'fetched': fetched, 'skipped': skipped, 'removed': len(removed)}
+
+    def fill_tracks(self) -> int:
+        """Mirror the tracks of listed playlists that have none yet; returns how many."""
+        with self._sync_lock:
+            sp = self._client()
+            with self._lock:
+                pending = [record for record in self._playlists.values() if record['tracks'] is None]
+            for record in pending:
+                record['tracks'] = self._fetch_tracks(sp, record['id'])
+            self._save(pending)
+            self.stats['fetched'] += len(pending)
+            return len(pending)
+
+    def refresh_async(self, full: bool = True) -> threading.Thread:
+        """
+        Start a background refresh unless one is already running.
+
+        Args:
+            full: Re-list every playlist; False only fills in missing tracks
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._refresh, args=(full,), daemon=True,
+                                                name="spotify-library-sync")
+                self._thread.start()
+            return self._thread
+
+    def _refresh(self, full: bool):
+        try:
+            if full:
+                self.sync()
+            else:
+                self.fill_tracks()
+        except Exception as e:
+            print(f"Spotify library refresh failed: {e}")
+
+    def ensure_fresh(self):
+        """Block only when nothing is mirrored yet; otherwise refresh in the background."""
+        if not self.synced_at:
+            # Listing alone is enough to answer name lookups; tracks follow in the background
+            self.sync(include_tracks=False)
+            self.refresh_async(full=False)
+        elif time.time() - self.synced_at >= self.refresh_interval:
+            self.refresh_async()
+
+    # --- Reading ---
+
+    def _lookup(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            ids = self._by_name.get(normalize_name(name))
+            return self._playlists[ids[0]] if ids else None
+
+    def find(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Playlist by name, case insensitive.
+
+        A name the mirror does not know triggers one blocking re-sync, since
+        the playlist may have been created in another Spotify client.
+        """
+        self.ensure_fresh()
+        record = self._lookup(name)
+        if record is None and time.time() - self.synced_at >= self.miss_resync_interval:
+            self.sync(include_tracks=False)
+            record = self._lookup(name)
+        return record
+
+    def playlists(self) -> List[Dict[str, Any]]:
+        """All mirrored playlists in the order Spotify lists them."""
+        self.ensure_fresh()
+        with self._lock:
+            return list(self._playlists.values())
+
+    def tracks(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        """Mirrored tracks of a playlist; None until its tracks are mirrored."""
+        record = self.find(name)
+        return record['tracks'] if record else None
+
+    # --- Local writes ---
+
+    def note_created(self, item: Dict[str, Any]):
+        """Add a playlist created through the API without waiting for a sync."""
+        if not item or not item.get('id'):
+            return
+        record = self._record(item, -1)
+        record['tracks'] = []
+        with self._lock:
+            playlists = [record] + [p for p in self._playlists.values() if p['id'] != record['id']]
+        self._replace(playlists)
+        self._save([record])
+
+    def note_added(self, playlist_id: str, tracks: List[Dict[str, Any]], snapshot_id: Optional[str] = None):
+        """
+        Record tracks added through the API.
+
+        With the snapshot ID returned by the add, the next sync sees the
+        playlist as unchanged instead of re-fetching its tracks.
+        """
+        with self._lock:
+            record = self._playlists.get(playlist_id)
+            if record is None:
+                return
+            record['total'] = (record['total'] or 0) + len(tracks)
+            if record['tracks'] is not None:
+                record['tracks'] = record['tracks'] + [slim_item(track) for track in tracks]
+            if snapshot_id:
+                record['snapshot_id'] = snapshot_id
+            elif record['tracks'] is not None:
+                # Unknown snapshot: make the next sync re-fetch this playlist
+                record['snapshot_id'] = None
+        self._save([record])
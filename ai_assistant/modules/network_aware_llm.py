@@ -1,22 +1,58 @@
 """
 Smart Network-Aware LLM Configuration
 Automatically uses GPT/Gemini when online, falls back to local models when offline.
+
+Connectivity and provider availability come from the shared provider
+health monitor, which probes in the background; choosing a provider reads
+cached health instead of probing every endpoint on each new session.
 """
 
 import os
 import json
 import requests
 import logging
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
 
+try:
+    from .provider_health import HealthMonitor, get_health_monitor
+except ImportError:
+    from provider_health import HealthMonitor, get_health_monitor
+
 logger = logging.getLogger(__name__)
 
 class NetworkAwareLLMConfig:
     """Smart configuration that adapts based on network connectivity."""
     
-    def __init__(self):
+    def __init__(self, monitor: Optional[HealthMonitor] = None, ollama_host: str = "http://localhost:11434"):
         self.last_check = None
+        self.network_status = None
+        self.check_interval = timedelta(minutes=5)  # Check every 5 minutes
+        self.ollama_host = ollama_host
+        self.api_keys = self._load_api_keys()
+        
+        # Priority configuration - Your powerful local models first!
+        self.local_providers = [
+            ("ollama", "gemma3:27b", True),  # Your 27B model - PRIORITY
+            ("ollama", "gpt-oss:20b", True)  # Your 20B model - PRIORITY  
+        ]
+        
+        openai_key = os.getenv("OPENAI_API_KEY") or self.api_keys.get("OPENAI_API_KEY")
+        gemini_key = os.getenv("GEMINI_API_KEY") or self.api_keys.get("GEMINI_API_KEY")
+        self.online_providers = [
+            ("openai", "gpt-4o", openai_key),
+            ("openai", "gpt-4", openai_key), 
+            ("openai", "gpt-3.5-turbo", openai_key), 
+            ("gemini", "gemini-1.5-pro", gemini_key),
+            ("gemini", "gemini-1.5-flash", gemini_key)
+        ]
+        
+        self.monitor = monitor or get_health_monitor()
+        self._register_probes()
+    
+    def _load_api_keys(self) -> Dict:
+        """Load API keys from api_keys.json at the project root, if present."""
+        try:
             key_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "api_keys.json")
             if os.path.exists(key_file):
                 with open(key_file, 'r') as f:
@@ -24,47 +60,22 @@ class NetworkAwareLLMConfig:
         except Exception as e:
             logger.warning(f"Failed to load api_keys.json: {e}")
         return {}
-
+    
+    def _register_probes(self):
+        """Register background health probes for Ollama and every keyed online provider."""
+        self.monitor.register("ollama", self._probe_ollama)
+        for provider, _, api_key in self.online_providers:
+            if api_key:
+                self.monitor.register(provider, lambda p=provider, k=api_key: self._test_provider(p, k))
+    
     def check_internet_connectivity(self) -> bool:
-        """Check if internet connection is available."""
-        # Cache the result to avoid excessive checks
-        now = datetime.now()
-        if (self.last_check and 
-            self.network_status is not None and 
-            now - self.last_check < self.check_interval):
-            return self.network_status
-        
-        try:
-            # Test multiple endpoints for reliability
-            test_urls = [
-                "https://api.openai.com/v1/models",
-                "https://generativelanguage.googleapis.com/v1beta/models",
-                "https://httpbin.org/status/200",
-                "https://google.com"
-            ]
-            
-            for url in test_urls:
-                try:
-                    response = requests.get(url, timeout=3)
-                    if response.status_code == 200:
-                        self.network_status = True
-                        self.last_check = now
-                        logger.info("✅ Internet connectivity confirmed")
-                        return True
-                except:
-                    continue
-            
-            # All tests failed
-            self.network_status = False
-            self.last_check = now
+        """Check if internet connection is available (cached by the health monitor)."""
+        self.network_status = self.monitor.is_healthy("internet")
+        checked_at = self.monitor.stats().get("internet", {}).get("checked_at")
+        self.last_check = datetime.fromtimestamp(checked_at) if checked_at else datetime.now()
+        if not self.network_status:
             logger.warning("❌ No internet connectivity detected")
-            return False
-            
-        except Exception as e:
-            logger.error(f"Network check failed: {e}")
-            self.network_status = False
-            self.last_check = now
-            return False
+        return self.network_status
     
     def get_optimal_provider(self) -> Tuple[str, str]:
         """
@@ -88,8 +99,8 @@ class NetworkAwareLLMConfig:
             for provider, model, api_key in self.online_providers:
                 if api_key:  # Only use if API key is available
                     try:
-                        # Quick test of the provider
-                        if self._test_provider(provider, api_key):
+                        # Cached probe result; skips providers with an open circuit
+                        if self.monitor.is_healthy(provider):
                             logger.info(f"🌐 Using online provider: {provider} ({model})")
                             return (provider, model)
                     except Exception as e:
@@ -127,17 +138,19 @@ class NetworkAwareLLMConfig:
         except Exception:
             return False
     
+    def _probe_ollama(self) -> Optional[List[str]]:
+        """Health probe: names of the models Ollama serves, or None if it is down."""
+        response = requests.get(f"{self.ollama_host}/api/tags", timeout=2)
+        if response.status_code != 200:
+            return None
+        return [m.get("name", "") for m in response.json().get("models", [])]
+    
     def _test_ollama_model(self, model: str) -> bool:
-        """Test if Ollama model is available."""
-        try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=2)
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                model_names = [m.get("name", "") for m in models]
-                return any(model in name for name in model_names)
-            return False
-        except Exception:
+        """Test if Ollama model is available (from the cached Ollama probe)."""
+        if not self.monitor.is_healthy("ollama"):
             return False
+        model_names = self.monitor.value("ollama") or []
+        return any(model in name for name in model_names)
     
     def get_provider_config(self) -> Dict:
         """Get complete provider configuration."""
@@ -6,13 +6,20 @@ Supports:
 - Ollama (llama2, mistral, neural-chat, etc.)
 - Hugging Face transformers (BERT, DistilBERT, etc.)
 - Local embeddings
+
+Local models are kept warm by a ModelPool: preloaded at startup, pinned
+with Ollama keep_alive, and evicted least recently used first under a RAM
+budget, so the first request after a quiet period does not pay a cold load.
 """
 
 import os
 import json
 import logging
 import re
-from typing import Dict, List, Optional, Generator, Any
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Dict, List, Optional, Generator, Any, Callable
 from abc import ABC, abstractmethod
 
 logger = logging.getLogger(__name__)
@@ -42,24 +49,380 @@ class OfflineLLMProvider(ABC):
         pass
 
 
+def parse_keep_alive(value) -> Optional[float]:
+    """Seconds for an Ollama keep_alive value ("30m", "1h", 300); None means forever."""
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = re.fullmatch(r"\s*(-?[\d.]+)\s*([smh]?)\s*", str(value))
+        if not match:
+            return None
+        seconds = float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+    return None if seconds < 0 else seconds
+
+
+class ModelPool:
+    """
+    Keeps local models warm between requests.
+    
+    Tracks which models are resident and how much memory each holds, pins
+    Ollama models with keep_alive, preloads models at startup or ahead of
+    predicted demand, and unloads the least recently used model when a new
+    one would exceed the RAM budget. Cold and warm request latencies are
+    recorded separately.
+    """
+    
+    def __init__(
+        self,
+        host: str = "http://localhost:11434",
+        ram_budget_mb: Optional[float] = None,
+        keep_alive: Any = "30m",
+        min_predicted_uses: int = 3,
+        requests_module=None
+    ):
+        """
+        Initialize model pool.
+        
+        Args:
+            host: Ollama server host
+            ram_budget_mb: Memory all resident models may use (defaults to
+                OFFLINE_LLM_RAM_BUDGET_MB, else half of system RAM)
+            keep_alive: How long Ollama keeps a model loaded after a request
+            min_predicted_uses: Past requests in an hour of the day needed
+                before a model is preloaded ahead of that hour
+            requests_module: HTTP client (defaults to requests)
+        """
+        self.host = host
+        self.keep_alive = keep_alive
+        self.keep_alive_seconds = parse_keep_alive(keep_alive)
+        self.min_predicted_uses = min_predicted_uses
+        if ram_budget_mb is None and os.getenv("OFFLINE_LLM_RAM_BUDGET_MB"):
+            ram_budget_mb = float(os.getenv("OFFLINE_LLM_RAM_BUDGET_MB"))
+        if ram_budget_mb is None:
+            try:
+                import psutil
+                ram_budget_mb = psutil.virtual_memory().total / (1024 * 1024) / 2
+            except ImportError:
+                ram_budget_mb = float("inf")
+        self.ram_budget_mb = ram_budget_mb
+        
+        if requests_module is None:
+            import requests as requests_module
+        self.requests = requests_module
+        
+        # model -> {"size_mb", "last_used", "in_use", "unload"}; least recently used first
+        self._resident: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._disk_sizes: Dict[str, float] = {}
+        self._demand: Dict[str, Counter] = {}
+        self._latency = {"cold": deque(maxlen=500), "warm": deque(maxlen=500)}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._keeper: Optional[threading.Thread] = None
+        self.counters = Counter()
+    
+    @staticmethod
+    def _name(model: str) -> str:
+        return model[:-len(":latest")] if model.endswith(":latest") else model
+    
+    # --- Residency ---
+    
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        if entry.get("unload") or self.keep_alive_seconds is None or entry["in_use"]:
+            return False  # In-process models stay until evicted
+        return time.time() - entry["last_used"] > self.keep_alive_seconds
+    
+    def refresh(self) -> Dict[str, float]:
+        """
+        Sync the resident set with the models Ollama has loaded.
+        
+        Returns:
+            Resident Ollama models and their memory in MB
+        """
+        try:
+            response = self.requests.get(f"{self.host}/api/ps", timeout=2)
+            loaded = {
+                self._name(m.get("name", "")): m.get("size", 0) / (1024 * 1024)
+                for m in response.json().get("models", [])
+            }
+        except Exception as e:
+            logger.debug(f"Could not list loaded Ollama models: {e}")
+            return {}
+        with self._lock:
+            for name, entry in list(self._resident.items()):
+                if not entry.get("unload") and name not in loaded and not entry["in_use"]:
+                    del self._resident[name]  # Unloaded by Ollama itself
+            for name, size_mb in loaded.items():
+                entry = self._resident.get(name)
+                if entry is None:
+                    self._resident[name] = {"size_mb": size_mb, "last_used": time.time(), "in_use": 0}
+                    self._resident.move_to_end(name, last=False)
+                else:
+                    entry["size_mb"] = size_mb
+        return loaded
+    
+    def is_resident(self, model: str) -> bool:
+        """Whether a model is loaded and within its keep-alive."""
+        with self._lock:
+            entry = self._resident.get(self._name(model))
+            return entry is not None and not self._expired(entry)
+    
+    @property
+    def used_mb(self) -> float:
+        """Memory held by resident models."""
+        with self._lock:
+            return sum(e["size_mb"] for e in self._resident.values() if not self._expired(e))
+    
+    def _model_size(self, model: str) -> float:
+        """Expected memory of a model, from its last load or its size on disk."""
+        entry = self._resident.get(model)
+        if entry and entry["size_mb"]:
+            return entry["size_mb"]
+        if model not in self._disk_sizes:
+            try:
+                response = self.requests.get(f"{self.host}/api/tags", timeout=2)
+                for m in response.json().get("models", []):
+                    self._disk_sizes[self._name(m.get("name", ""))] = m.get("size", 0) / (1024 * 1024)
+            except Exception as e:
+                logger.debug(f"Could not list Ollama models: {e}")
+        return self._disk_sizes.get(model, 0.0)
+    
+    def _make_room(self, model: str, size_mb: float):
+        """Evict least recently used idle models until `size_mb` more fits the budget."""
+        with self._lock:
+            for name, entry in list(self._resident.items()):
+                if self._expired(entry):
+                    del self._resident[name]
+            for name in list(self._resident):
+                if self.used_mb + size_mb <= self.ram_budget_mb:
+                    return
+                if name != model and not self._resident[name]["in_use"]:
+                    self.evict(name)
+    
+    def evict(self, model: str):
+        """Unload a model and free its memory."""
+        model = self._name(model)
+        with self._lock:
+            entry = self._resident.pop(model, None)
+        if entry is None:
+            return
+        self.counters["evictions"] += 1
+        logger.info(f"Unloading model '{model}' ({entry['size_mb']:.0f} MB)")
+        try:
+            if entry.get("unload"):
+                entry["unload"]()
+            else:
+                self.requests.post(f"{self.host}/api/generate",
+                                   json={"model": model, "keep_alive": 0}, timeout=10)
+        except Exception as e:
+            logger.warning(f"Failed to unload model '{model}': {e}")
+    
+    def _mark_loaded(self, model: str, size_mb: float, unload: Optional[Callable[[], None]] = None):
+        with self._lock:
+            entry = self._resident.setdefault(model, {"size_mb": size_mb, "last_used": time.time(), "in_use": 0})
+            entry["size_mb"] = size_mb or entry["size_mb"]
+            entry["last_used"] = time.time()
+            if unload:
+                entry["unload"] = unload
+            self._resident.move_to_end(model)
+    
+    # --- Loading ---
+    
+    def preload(self, model: str) -> bool:
+        """
+        Load an Ollama model and pin it with keep_alive.
+        
+        Returns:
+            True if the model is resident afterwards
+        """
+        model = self._name(model)
+        if self.is_resident(model):
+            self.touch(model)
+            return True
+        self._make_room(model, self._model_size(model))
+        start = time.time()
+        try:
+            response = self.requests.post(
+                f"{self.host}/api/generate",
+                json={"model": model, "prompt": "", "keep_alive": self.keep_alive, "stream": False},
+                timeout=300
+            )
+            if response.status_code != 200:
+                logger.warning(f"Preloading '{model}' failed ({response.status_code})")
+                return False
+        except Exception as e:
+            logger.warning(f"Preloading '{model}' failed: {e}")
+            return False
+        self.counters["preloads"] += 1
+        self._mark_loaded(model, self._model_size(model))
+        self.refresh()
+        logger.info(f"✅ Preloaded model '{model}' in {time.time() - start:.1f}s")
+        return True
+    
+    def preload_async(self, models: List[str]) -> threading.Thread:
+        """Preload models on a background thread."""
+        def run():
+            for model in models:
+                self.preload(model)
+        thread = threading.Thread(target=run, daemon=True, name="model-preload")
+        thread.start()
+        return thread
+    
+    def register_local(self, name: str, size_mb: float, unload: Callable[[], None]):
+        """
+        Track an in-process model (e.g. a transformers pipeline) against the budget.
+        
+        Args:
+            name: Model name
+            size_mb: Memory the loaded model holds
+            unload: Releases the model when it is evicted
+        """
+        self._make_room(name, size_mb)
+        self._mark_loaded(name, size_mb, unload)
+    
+    # --- Requests ---
+    
+    def touch(self, model: str):
+        """Mark a model as just used."""
+        with self._lock:
+            entry = self._resident.get(self._name(model))
+            if entry:
+                entry["last_used"] = time.time()
+                self._resident.move_to_end(self._name(model))
+    
+    def before_request(self, model: str) -> bool:
+        """
+        Prepare for a request to a model, making room if it must be loaded.
+        
+        Returns:
+            True if the request will pay a cold load
+        """
+        model = self._name(model)
+        cold = not self.is_resident(model)
+        if cold:
+            # Ollama may still have it loaded from another client
+            cold = model not in self.refresh()
+        if cold:
+            self._make_room(model, self._model_size(model))
+        self._mark_loaded(model, self._model_size(model))
+        with self._lock:
+            self._resident[model]["in_use"] += 1
+        return cold
+    
+    def after_request(self, model: str, latency: float, cold: bool):
+        """
+        Record a finished request.
+        
+        Args:
+            model: Model name
+            latency: Seconds to the first token (or the full response)
+            cold: Whether the request loaded the model
+        """
+        model = self._name(model)
+        with self._lock:
+            entry = self._resident.get(model)
+            if entry:
+                entry["in_use"] = max(0, entry["in_use"] - 1)
+                entry["last_used"] = time.time()
+            self._latency["cold" if cold else "warm"].append(latency)
+            self.counters["cold_requests" if cold else "warm_requests"] += 1
+            self._demand.setdefault(model, Counter())[time.localtime().tm_hour] += 1
+    
+    def predicted_models(self, hour: Optional[int] = None) -> List[str]:
+        """Models used at least min_predicted_uses times in this hour (or the next) of past days."""
+        hour = time.localtime().tm_hour if hour is None else hour
+        with self._lock:
+            return [
+                model for model, hours in self._demand.items()
+                if hours[hour] + hours[(hour + 1) % 24] >= self.min_predicted_uses
+            ]
+    
+    def warm_predicted(self, hour: Optional[int] = None) -> List[str]:
+        """Preload the models expected to be needed soon; returns those loaded."""
+        loaded = []
+        for model in self.predicted_models(hour):
+            if not self.is_resident(model) and self.preload(model):
+                loaded.append(model)
+        return loaded
+    
+    def start_keeper(self, interval: float = 300.0) -> threading.Thread:
+        """Preload predicted models every `interval` seconds on a daemon thread."""
+        if self._keeper and self._keeper.is_alive():
+            return self._keeper
+        
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.warm_predicted()
+                except Exception as e:
+                    logger.warning(f"Model keeper failed: {e}")
+        self._stop.clear()
+        self._keeper = threading.Thread(target=run, daemon=True, name="model-keeper")
+        self._keeper.start()
+        return self._keeper
+    
+    def stop(self):
+        """Stop the keeper thread."""
+        self._stop.set()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Resident models, memory use and cold/warm latency."""
+        def percentile(samples, fraction):
+            samples = sorted(samples)
+            return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 3) if samples else 0.0
+        
+        with self._lock:
+            resident = {
+                name: {"size_mb": round(entry["size_mb"], 1), "idle_seconds": round(time.time() - entry["last_used"], 1)}
+                for name, entry in self._resident.items() if not self._expired(entry)
+            }
+            latency = {
+                kind: {"p50": percentile(samples, 0.5), "p95": percentile(samples, 0.95), "count": len(samples)}
+                for kind, samples in self._latency.items()
+            }
+        return {
+            "resident": resident,
+            "used_mb": round(self.used_mb, 1),
+            "ram_budget_mb": round(self.ram_budget_mb, 1),
+            "latency": latency,
+            **dict(self.counters),
+        }
+
+
+_pools: Dict[str, ModelPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_model_pool(host: str = "http://localhost:11434", **kwargs) -> ModelPool:
+    """The shared model pool for an Ollama host, created on first use."""
+    with _pools_lock:
+        if host not in _pools:
+            _pools[host] = ModelPool(host, **kwargs)
+        return _pools[host]
+
+
 class OllamaProvider(OfflineLLMProvider):
     """Ollama local model provider - requires Ollama to be installed and running."""
     
-    def __init__(self, model: str = "llama2", host: str = "http://localhost:11434"):
+    def __init__(self, model: str = "llama2", host: str = "http://localhost:11434",
+                 pool: Optional[ModelPool] = None):
         """
         Initialize Ollama provider.
         
         Args:
             model: Model name (llama2, mistral, neural-chat, etc.)
             host: Ollama server host (default: http://localhost:11434)
+            pool: Model pool keeping the model warm (defaults to the host's shared pool)
         """
         self.model = model
         self.host = host
         self.available = False
+        self.pool = pool
         
         try:
             import requests
             self.requests = requests
+            if self.pool is None:
+                self.pool = get_model_pool(host)
             self._check_availability()
         except ImportError:
             logger.error("requests library required for Ollama. Install with: pip install requests")
@@ -100,6 +463,8 @@ class OllamaProvider(OfflineLLMProvider):
         if not self.is_available():
             return "Error: Ollama is not available. Please install and run Ollama."
         
+        cold = self.pool.before_request(self.model)
+        start = time.time()
         try:
             # Convert messages to prompt format
             prompt = self._format_prompt(messages)
@@ -111,12 +476,15 @@ class OllamaProvider(OfflineLLMProvider):
                     "prompt": prompt,
                     "stream": False,
                     "temperature": kwargs.get("temperature", 0.7),
+                    "keep_alive": self.pool.keep_alive,
                 },
                 timeout=300  # 5 minutes timeout for generation
             )
             
             if response.status_code == 200:
-                return response.json().get("response", "").strip()
+                data = response.json()
+                cold = cold or self._loaded_model(data)
+                return data.get("response", "").strip()
             else:
                 logger.error(f"Ollama error: {response.text}")
                 return f"Error: Ollama request failed ({response.status_code})"
@@ -125,6 +493,8 @@ class OllamaProvider(OfflineLLMProvider):
         except Exception as e:
             logger.error(f"Ollama generation failed: {e}")
             return f"Error: {str(e)}"
+        finally:
+            self.pool.after_request(self.model, time.time() - start, cold)
     
     def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> Generator[str, None, None]:
         """Stream response from Ollama token-by-token."""
@@ -132,6 +502,9 @@ class OllamaProvider(OfflineLLMProvider):
             yield "Error: Ollama is not available. Please install and run Ollama."
             return
         
+        cold = self.pool.before_request(self.model)
+        start = time.time()
+        first_token = None
         try:
             prompt = self._format_prompt(messages)
             
@@ -142,6 +515,7 @@ class OllamaProvider(OfflineLLMProvider):
                     "prompt": prompt,
                     "stream": True,
                     "temperature": kwargs.get("temperature", 0.7),
+                    "keep_alive": self.pool.keep_alive,
                 },
                 timeout=300,
                 stream=True
@@ -151,6 +525,10 @@ class OllamaProvider(OfflineLLMProvider):
                 for line in response.iter_lines():
                     if line:
                         data = json.loads(line)
+                        if first_token is None:
+                            first_token = time.time() - start
+                        if data.get("done"):
+                            cold = cold or self._loaded_model(data)
                         if data.get("response"):
                             yield data["response"]
             else:
@@ -158,6 +536,18 @@ class OllamaProvider(OfflineLLMProvider):
         except Exception as e:
             logger.error(f"Ollama streaming failed: {e}")
             yield f"Error: {str(e)}"
+        finally:
+            # Time to first token is what a streaming user waits for
+            self.pool.after_request(self.model, first_token or time.time() - start, cold)
+    
+    @staticmethod
+    def _loaded_model(data: Dict[str, Any]) -> bool:
+        """Whether Ollama reports loading the model for this request (load_duration is in ns)."""
+        return data.get("load_duration", 0) > 0.1e9
+    
+    def preload(self) -> bool:
+        """Load the model now so the first request is warm."""
+        return self.pool.preload(self.model)
     
     def count_tokens(self, text: str) -> int:
         """Estimate token count (rough approximation)."""
@@ -185,39 +575,74 @@ class OllamaProvider(OfflineLLMProvider):
 class TransformersProvider(OfflineLLMProvider):
     """Hugging Face Transformers provider for offline local models."""
     
-    def __init__(self, model: str = "distilbert-base-uncased-finetuned-sst-2-english"):
+    def __init__(self, model: str = "distilbert-base-uncased-finetuned-sst-2-english",
+                 pool: Optional[ModelPool] = None, preload: bool = True):
         """
         Initialize Transformers provider.
         
         Args:
             model: Hugging Face model ID
+            pool: Model pool tracking the pipeline's memory, which may evict it
+            preload: Load the pipeline in the background now instead of on
+                the first request
         """
         self.model = model
         self.pipeline = None
         self.available = False
+        self.pool = pool
+        self._pipeline_fn = None
+        self._load_lock = threading.Lock()
         
         try:
             from transformers import pipeline
-            self._init_pipeline(pipeline)
+            self._pipeline_fn = pipeline
+            self.available = True
+            if preload:
+                threading.Thread(target=self._load, daemon=True, name="transformers-preload").start()
         except ImportError:
             logger.error(
                 "transformers library required. Install with: "
                 "pip install transformers torch"
             )
     
-    def _init_pipeline(self, pipeline_fn):
-        """Initialize the transformation pipeline."""
-        try:
-            logger.info(f"Loading model: {self.model}")
-            self.pipeline = pipeline_fn("text-generation", model=self.model)
-            self.available = True
+    @property
+    def pool_name(self) -> str:
+        """Name of the pipeline in the model pool."""
+        return f"transformers:{self.model}"
+    
+    def _load(self):
+        """Load the pipeline if it is not resident; returns it, or None if loading failed."""
+        with self._load_lock:
+            if self.pipeline is not None:
+                return self.pipeline
+            try:
+                logger.info(f"Loading model: {self.model}")
+                pipeline = self._pipeline_fn("text-generation", model=self.model)
+            except Exception as e:
+                logger.warning(f"Failed to load model: {e}")
+                logger.info("Models will be downloaded on first use (requires internet)")
+                self.available = False
+                return None
+            if self.pool:
+                self.pool.register_local(self.pool_name, self._pipeline_size_mb(pipeline), self.unload)
+            self.pipeline = pipeline
             logger.info(f"✅ Model '{self.model}' loaded successfully")
-        except Exception as e:
-            logger.warning(f"Failed to load model: {e}")
-            logger.info("Models will be downloaded on first use (requires internet)")
+            return pipeline
+    
+    @staticmethod
+    def _pipeline_size_mb(pipeline) -> float:
+        """Memory held by the pipeline's weights."""
+        try:
+            return sum(p.numel() * p.element_size() for p in pipeline.model.parameters()) / (1024 * 1024)
+        except Exception:
+            return 0.0
+    
+    def unload(self):
+        """Release the pipeline; the next request loads it again."""
+        self.pipeline = None
     
     def is_available(self) -> bool:
-        """Check if the model is available."""
+        """Check if the model is loaded or can be loaded."""
         return self.available
     
     def generate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
@@ -225,10 +650,20 @@ class TransformersProvider(OfflineLLMProvider):
         if not self.is_available():
             return "Error: Model is not available. Loading on first use."
         
+        start = time.time()
+        pipeline = self.pipeline
+        cold = pipeline is None
+        if cold:
+            pipeline = self._load()  # Waits for a background preload already under way
+            if pipeline is None:
+                return "Error: Model is not available. Loading on first use."
+        elif self.pool:
+            self.pool.touch(self.pool_name)
+        
         try:
             prompt = self._format_prompt(messages)
             
-            result = self.pipeline(
+            result = pipeline(
                 prompt,
                 max_length=kwargs.get("max_tokens", 512),
                 temperature=kwargs.get("temperature", 0.7),
@@ -239,6 +674,9 @@ class TransformersProvider(OfflineLLMProvider):
         except Exception as e:
             logger.error(f"Generation failed: {e}")
             return f"Error: {str(e)}"
+        finally:
+            if self.pool:
+                self.pool.after_request(self.pool_name, time.time() - start, cold)
     
     def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> Generator[str, None, None]:
         """Stream is not supported for transformers - returns full response."""
@@ -346,25 +784,37 @@ What would you like help with?
 class OfflineLLMManager:
     """Manager for offline LLM providers with fallback chain."""
     
-    def __init__(self):
-        """Initialize with multiple offline providers."""
+    def __init__(self, ollama_model: str = "llama2", ollama_host: str = "http://localhost:11434",
+                 preload: Optional[List[str]] = None, pool: Optional[ModelPool] = None):
+        """
+        Initialize with multiple offline providers.
+        
+        Args:
+            ollama_model: Ollama model to chat with
+            ollama_host: Ollama server host
+            preload: Ollama models to load at startup (defaults to
+                OFFLINE_LLM_PRELOAD, comma separated, else the chat model)
+            pool: Model pool (defaults to the host's shared pool)
+        """
         self.providers = []
         self.current_provider = None
+        self.pool = pool or get_model_pool(ollama_host)
         
         # Try to initialize providers in order of preference
-        self._init_providers()
+        self._init_providers(ollama_model, ollama_host)
+        self._warm_models(ollama_model, preload)
     
-    def _init_providers(self):
+    def _init_providers(self, ollama_model: str = "llama2", ollama_host: str = "http://localhost:11434"):
         """Initialize available providers."""
         # Try Ollama first (best quality)
-        ollama = OllamaProvider()
+        ollama = OllamaProvider(ollama_model, ollama_host, pool=self.pool)
         if ollama.is_available():
             self.providers.append(ollama)
             logger.info("✅ Ollama provider available")
         
         # Try Transformers
         try:
-            transformers = TransformersProvider()
+            transformers = TransformersProvider(pool=self.pool)
             self.providers.append(transformers)
             logger.info("✅ Transformers provider available")
         except:
@@ -380,6 +830,17 @@ class OfflineLLMManager:
             self.current_provider = self.providers[0]
             logger.info(f"Using provider: {type(self.current_provider).__name__}")
     
+    def _warm_models(self, ollama_model: str, preload: Optional[List[str]]):
+        """Preload Ollama models in the background and keep predicted ones warm."""
+        if not any(isinstance(p, OllamaProvider) for p in self.providers):
+            return
+        if preload is None:
+            configured = os.getenv("OFFLINE_LLM_PRELOAD", "")
+            preload = [m.strip() for m in configured.split(",") if m.strip()] or [ollama_model]
+        if preload:
+            self.pool.preload_async(preload)
+        self.pool.start_keeper()
+    
     def generate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """Generate response with fallback chain."""
         for provider in self.providers:
@@ -418,7 +879,8 @@ class OfflineLLMManager:
         return {
             "current": type(self.current_provider).__name__ if self.current_provider else None,
             "available_providers": [type(p).__name__ for p in self.providers],
-            "count": len(self.providers)
+            "count": len(self.providers),
+            "model_pool": self.pool.stats()
         }
 
 
@@ -3,6 +3,10 @@
 Offline Mode Detection and Management
 Detects internet connectivity and switches between online and offline modes.
 Manages caching and fallback strategies.
+
+Connectivity comes from the shared provider health monitor's "internet"
+probe, so the process runs one connectivity schedule instead of one per
+component.
 """
 
 import os
@@ -15,6 +19,11 @@ from typing import Dict, Any, Optional, Callable
 from datetime import datetime, timedelta
 from pathlib import Path
 
+try:
+    from .provider_health import get_health_monitor
+except ImportError:
+    from provider_health import get_health_monitor
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,7 +38,8 @@ class OfflineModeManager:
         Initialize offline mode manager.
         
         Args:
-            check_interval: How often to check connectivity (seconds)
+            check_interval: How often to check connectivity (seconds); the
+                shared health monitor probes at least this often
             offline_cache_dir: Directory for caching offline data
             enable_auto_detection: Whether to auto-detect connectivity
         """
@@ -41,6 +51,7 @@ class OfflineModeManager:
         self.is_offline_mode = False  # User-forced offline mode
         self.check_running = False
         self.check_thread = None
+        self._subscribed = False
         self.enable_auto_detection = enable_auto_detection
         
         # Callbacks for mode changes
@@ -59,72 +70,45 @@ class OfflineModeManager:
         Check if device has internet connectivity.
         
         Args:
-            timeout: Timeout for connection check (seconds)
+            timeout: Unused; the health monitor's probe has its own timeout
         
         Returns:
-            True if connected, False otherwise
+            True if connected, False otherwise (cached by the health monitor)
         """
         try:
-            # Try multiple DNS servers (Google, Cloudflare)
-            hosts = [
-                ("8.8.8.8", 53),      # Google DNS
-                ("1.1.1.1", 53),      # Cloudflare DNS
-                ("208.67.222.222", 53)  # OpenDNS
-            ]
-            
-            for host, port in hosts:
-                try:
-                    socket.create_connection((host, port), timeout=timeout)
-                    self.is_online = True
-                    self.last_status_check = datetime.now()
-                    return True
-                except (socket.timeout, socket.error):
-                    continue
-            
-            self.is_online = False
-            self.last_status_check = datetime.now()
-            return False
-        
+            self.is_online = get_health_monitor().is_healthy("internet")
         except Exception as e:
             logger.debug(f"Connectivity check error: {e}")
             self.is_online = False
-            return False
+        self.last_status_check = datetime.now()
+        return self.is_online
     
     def start_connectivity_check(self):
-        """Start background connectivity check thread."""
+        """Follow connectivity changes from the shared health monitor."""
         if self.check_running:
             return
         
+        monitor = get_health_monitor()
+        monitor.interval = min(monitor.interval, self.check_interval)
+        if not self._subscribed:
+            monitor.subscribe("internet", self._on_connectivity_change)
+            self._subscribed = True
         self.check_running = True
-        self.check_thread = threading.Thread(
-            target=self._connectivity_check_loop,
-            daemon=True
-        )
-        self.check_thread.start()
+        monitor.start()
         logger.info("Connectivity monitoring started")
     
     def stop_connectivity_check(self):
-        """Stop background connectivity check thread."""
+        """Stop following connectivity changes."""
         self.check_running = False
-        if self.check_thread:
-            self.check_thread.join(timeout=5)
         logger.info("Connectivity monitoring stopped")
     
-    def _connectivity_check_loop(self):
-        """Background thread for periodic connectivity checks."""
-        while self.check_running:
-            try:
-                previous_state = self.is_online
-                self._check_connectivity()
-                
-                # Call callbacks if state changed
-                if previous_state != self.is_online:
-                    self._trigger_mode_change_callbacks()
-                
-                time.sleep(self.check_interval)
-            except Exception as e:
-                logger.error(f"Connectivity check loop error: {e}")
-                time.sleep(self.check_interval)
+    def _on_connectivity_change(self, is_online: bool):
+        """Health monitor callback when the internet probe changes state."""
+        if not self.check_running:
+            return
+        self.is_online = is_online
+        self.last_status_check = datetime.now()
+        self._trigger_mode_change_callbacks()
     
     def set_offline_mode(self, force_offline: bool):
         """
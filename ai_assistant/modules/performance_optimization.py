@@ -48,6 +48,11 @@ try:
 except ImportError:
     HAS_LINE_PROFILER = False
 
+try:
+    from .telemetry import get_sampler
+except ImportError:
+    from telemetry import get_sampler
+
 class PerformanceLevel(Enum):
     """Performance optimization levels"""
     MINIMAL = "minimal"
@@ -721,22 +726,16 @@ class ResourceMonitor:
     
     def collect_metrics(self) -> PerformanceMetrics:
         """Collect current performance metrics"""
-        # CPU usage
-        cpu_percent = psutil.cpu_percent(interval=1)
-        
-        # Memory usage
-        memory = psutil.virtual_memory()
-        
-        # Disk usage
-        disk = psutil.disk_usage('/')
+        # Latest snapshot from the shared telemetry sampler
+        sample = get_sampler().latest()
         
         # Network I/O
-        network = psutil.net_io_counters()
+        network = sample["network"] or {}
         network_io = {
-            "bytes_sent": network.bytes_sent,
-            "bytes_recv": network.bytes_recv,
-            "packets_sent": network.packets_sent,
-            "packets_recv": network.packets_recv
+            "bytes_sent": network.get("bytes_sent", 0),
+            "bytes_recv": network.get("bytes_recv", 0),
+            "packets_sent": network.get("packets_sent", 0),
+            "packets_recv": network.get("packets_recv", 0)
         }
         
         # Thread count
@@ -745,10 +744,10 @@ class ResourceMonitor:
         # Create metrics object
         metrics = PerformanceMetrics(
             timestamp=datetime.now(),
-            cpu_usage=cpu_percent,
-            memory_usage=memory.percent,
-            memory_available=memory.available,
-            disk_usage=disk.percent,
+            cpu_usage=sample["cpu_percent"],
+            memory_usage=sample["memory_percent"],
+            memory_available=sample["memory"]["available"],
+            disk_usage=sample["disk_percent"] or 0.0,
             network_io=network_io,
             active_threads=active_threads,
             response_time=0.0,  # To be filled by application
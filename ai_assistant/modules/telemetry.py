@@ -0,0 +1,264 @@
+# System Telemetry Module
+"""
+Shared system telemetry sampler.
+
+One background thread samples CPU, memory, disk, network and battery on a
+fixed cadence and keeps a ring buffer of recent samples with derived rates
+(network and disk throughput). The process table is swept on a slower
+cadence. Every consumer - status reports, hardware monitors, dashboards,
+mobile sync - reads the latest snapshot instead of running its own
+psutil sweep, and subscribers are pushed each new sample.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import psutil
+
+PROCESS_ATTRS = ['pid', 'name', 'username', 'cpu_percent', 'memory_percent']
+
+
+class TelemetrySampler:
+    """Samples system metrics in one background thread for all consumers"""
+
+    def __init__(self, interval: float = 2.0, process_interval: float = 10.0,
+                 history_size: int = 300, idle_timeout: float = 60.0):
+        """
+        Args:
+            interval: Seconds between system samples
+            process_interval: Seconds between process table sweeps
+            history_size: Number of samples kept in the ring buffer
+            idle_timeout: Seconds without readers or subscribers before the
+                thread stops; the next read restarts it
+        """
+        self.interval = interval
+        self.process_interval = process_interval
+        self.idle_timeout = idle_timeout
+        self.history = deque(maxlen=history_size)
+        self.sample_count = 0
+        self.process_sweeps = 0
+
+        self._processes: List[Dict[str, Any]] = []
+        self._processes_at = 0.0
+        self._subscribers: Dict[int, Callable[[Dict[str, Any]], None]] = {}
+        self._next_token = 0
+        self._last_read = 0.0
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._disk_root = 'C:\\' if os.name == 'nt' else '/'
+
+    # --- Reading ---
+
+    def latest(self) -> Dict[str, Any]:
+        """Most recent sample; never waits for the sampling interval."""
+        self._last_read = time.time()
+        self._ensure_thread()
+        if self._sample_stale():
+            # Cold start or the thread idled out: the first reader samples,
+            # concurrent ones wait for it
+            with self._sample_lock:
+                if self._sample_stale():
+                    self._sample()
+        return self.history[-1]
+
+    def _sample_stale(self) -> bool:
+        return not self.history or time.time() - self.history[-1]['time'] > 2 * self.interval
+
+    def recent(self, seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Samples from the ring buffer, oldest first."""
+        self._last_read = time.time()
+        self._ensure_thread()
+        samples = list(self.history)
+        if seconds is not None:
+            cutoff = time.time() - seconds
+            samples = [s for s in samples if s['time'] >= cutoff]
+        return samples
+
+    def average(self, key: str, samples: int = 5) -> float:
+        """Mean of a numeric sample field over the last few samples."""
+        values = [s[key] for s in list(self.history)[-samples:] if s.get(key) is not None]
+        return sum(values) / len(values) if values else 0.0
+
+    def processes(self, limit: int = 50, sort_by: str = 'cpu_percent') -> List[Dict[str, Any]]:
+        """Top processes from the latest process table sweep."""
+        self._last_read = time.time()
+        self._ensure_thread()
+        if self._processes_stale():
+            with self._sweep_lock:
+                if self._processes_stale():
+                    self._sweep_processes()
+        return sorted(self._processes, key=lambda p: p.get(sort_by) or 0, reverse=True)[:limit]
+
+    def _processes_stale(self) -> bool:
+        return time.time() - self._processes_at > 2 * self.process_interval
+
+    # --- Subscriptions ---
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]) -> int:
+        """Call back with every new sample; returns a token for unsubscribe()."""
+        with self._lock:
+            self._next_token += 1
+            self._subscribers[self._next_token] = callback
+            token = self._next_token
+        self._ensure_thread()
+        return token
+
+    def unsubscribe(self, token: int):
+        with self._lock:
+            self._subscribers.pop(token, None)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    # --- Sampling ---
+
+    def sample(self) -> Dict[str, Any]:
+        """Take one sample, derive rates from the previous one and store it."""
+        with self._sample_lock:
+            return self._sample()
+
+    def _sample(self) -> Dict[str, Any]:
+        now = time.time()
+        idle = not self.history or now - self.history[-1]['time'] > self.idle_timeout
+        memory = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        sample = {
+            'time': now,
+            'timestamp': datetime.fromtimestamp(now).isoformat(),
+            # The first sample, and the first after the thread idled out, would
+            # otherwise average over the whole gap, so measure briefly instead
+            'cpu_percent': psutil.cpu_percent(interval=0.1 if idle else None),
+            'cpu_count': psutil.cpu_count(logical=True),
+            'cpu_freq_mhz': None,
+            'memory': memory._asdict(),
+            'memory_percent': memory.percent,
+            'swap_percent': swap.percent,
+            'disk_percent': None,
+            'disk': None,
+            'network': None,
+            'disk_io': None,
+            'process_count': len(psutil.pids()),
+            'battery': None,
+        }
+        try:
+            freq = psutil.cpu_freq()
+            sample['cpu_freq_mhz'] = freq.current if freq else None
+        except Exception:
+            pass
+        try:
+            disk = psutil.disk_usage(self._disk_root)
+            sample['disk'] = disk._asdict()
+            sample['disk_percent'] = disk.percent
+        except Exception:
+            pass
+        try:
+            sample['network'] = psutil.net_io_counters()._asdict()
+        except Exception:
+            pass
+        try:
+            disk_io = psutil.disk_io_counters()
+            sample['disk_io'] = disk_io._asdict() if disk_io else None
+        except Exception:
+            pass
+        try:
+            battery = psutil.sensors_battery()
+            if battery:
+                sample['battery'] = {'percent': battery.percent, 'power_plugged': battery.power_plugged}
+        except Exception:
+            pass
+
+        self._derive_rates(sample, self.history[-1] if self.history else None)
+        self.history.append(sample)
+        self.sample_count += 1
+        return sample
+
+    @staticmethod
+    def _derive_rates(sample: Dict[str, Any], previous: Optional[Dict[str, Any]]):
+        rates = {'net_sent_bps': 0.0, 'net_recv_bps': 0.0, 'disk_read_bps': 0.0, 'disk_write_bps': 0.0}
+        if previous:
+            elapsed = sample['time'] - previous['time']
+            pairs = [('network', 'bytes_sent', 'net_sent_bps'), ('network', 'bytes_recv', 'net_recv_bps'),
+                     ('disk_io', 'read_bytes', 'disk_read_bps'), ('disk_io', 'write_bytes', 'disk_write_bps')]
+            for section, field, rate in pairs:
+                if elapsed > 0 and sample[section] and previous[section]:
+                    # Counters can wrap or reset; never report a negative rate
+                    rates[rate] = max(0.0, (sample[section][field] - previous[section][field]) / elapsed)
+        sample.update(rates)
+        sample['net_download_mbps'] = rates['net_recv_bps'] * 8 / (1024 * 1024)
+        sample['net_upload_mbps'] = rates['net_sent_bps'] * 8 / (1024 * 1024)
+
+    def sweep_processes(self) -> List[Dict[str, Any]]:
+        """Refresh the process table snapshot."""
+        with self._sweep_lock:
+            return self._sweep_processes()
+
+    def _sweep_processes(self) -> List[Dict[str, Any]]:
+        processes = []
+        # process_iter reuses Process objects, so cpu_percent is the usage
+        # since the previous sweep rather than a blocking measurement
+        for proc in psutil.process_iter(PROCESS_ATTRS):
+            try:
+                processes.append(proc.info)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        self._processes = processes
+        self._processes_at = time.time()
+        self.process_sweeps += 1
+        return processes
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, daemon=True, name="telemetry-sampler")
+                self._thread.start()
+
+    def stop(self):
+        """Stop the sampling thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._subscribers and time.time() - self._last_read > self.idle_timeout:
+                return  # Idle; restarted by the next read or subscription
+            try:
+                sample = self.sample()
+                with self._sweep_lock:
+                    if time.time() - self._processes_at >= self.process_interval:
+                        self._sweep_processes()
+            except Exception as e:
+                print(f"Telemetry sampling error: {e}")
+                self._stop.wait(self.interval)
+                continue
+
+            with self._lock:
+                subscribers = list(self._subscribers.values())
+            for callback in subscribers:
+                try:
+                    callback(sample)
+                except Exception as e:
+                    print(f"Telemetry subscriber error: {e}")
+            self._stop.wait(self.interval)
+
+
+_sampler: Optional[TelemetrySampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> TelemetrySampler:
+    """Returns the process-wide telemetry sampler, creating it on first use."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = TelemetrySampler()
+        return _sampler
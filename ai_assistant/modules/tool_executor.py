@@ -3,10 +3,17 @@
 Tool Executor Module
 Handles execution of tools/functions called by LLM models.
 Includes safety checks, error handling, and result formatting.
+Independent tool calls from one model turn run concurrently, each with
+an enforced timeout; deterministic tools can be memoized with a TTL.
 """
 
+import hashlib
 import json
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
 from typing import Dict, Any, Optional, Callable, List
 from dataclasses import dataclass
 from enum import Enum
@@ -31,6 +38,8 @@ class ToolResult:
     error: Optional[str] = None
     execution_time: float = 0.0
     tool_name: str = ""
+    cached: bool = False
+    timed_out: bool = False
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
@@ -39,19 +48,60 @@ class ToolResult:
             "result": self.result,
             "error": self.error,
             "execution_time": self.execution_time,
-            "tool_name": self.tool_name
+            "tool_name": self.tool_name,
+            "cached": self.cached,
+            "timed_out": self.timed_out
         }
 
 
+class _PendingCall:
+    """A tool call running on its own worker thread."""
+    
+    def __init__(self, result: ToolResult, func: Callable = None, kwargs: Dict[str, Any] = None,
+                 timeout: float = 0.0, cache_key: Optional[str] = None):
+        self.result = result
+        self.cache_key = cache_key
+        self.timeout = timeout
+        self.value = None
+        self.exception: Optional[BaseException] = None
+        self.thread: Optional[threading.Thread] = None
+        self.start_time = time.time()
+        if func is not None:
+            # Daemon thread: a hung tool is abandoned instead of blocking shutdown
+            self.thread = threading.Thread(target=self._run, args=(func, kwargs),
+                                           daemon=True, name=f"tool-{result.tool_name}")
+            self.thread.start()
+    
+    def _run(self, func: Callable, kwargs: Dict[str, Any]):
+        try:
+            self.value = func(**kwargs)
+        except BaseException as e:
+            self.exception = e
+
+
 class ToolExecutor:
     """Executes tools/functions called by LLM."""
     
-    def __init__(self):
-        """Initialize tool executor."""
+    def __init__(self, max_history: int = 100, default_timeout: float = 30.0,
+                 max_cache_entries: int = 256):
+        """
+        Initialize tool executor.
+        
+        Args:
+            max_history: Number of results kept in execution history
+            default_timeout: Timeout for tools registered without one
+            max_cache_entries: Memoized results kept (least recently used evicted first)
+        """
         self.registered_tools: Dict[str, Callable] = {}
         self.tool_definitions: Dict[str, Dict[str, Any]] = {}
-        self.execution_history: List[ToolResult] = []
-        self.max_history = 100
+        self.tool_options: Dict[str, Dict[str, Any]] = {}
+        self.max_history = max_history
+        self.execution_history: deque = deque(maxlen=max_history)
+        self.default_timeout = default_timeout
+        self.tool_stats: Dict[str, Dict[str, Any]] = {}
+        self.max_cache_entries = max_cache_entries
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()  # cache key -> (expires_at, result)
+        self._lock = threading.Lock()
         
     def register_tool(
         self,
@@ -59,7 +109,10 @@ class ToolExecutor:
         func: Callable,
         description: str,
         parameters: Dict[str, Any],
-        required_params: List[str] = None
+        required_params: List[str] = None,
+        timeout: Optional[float] = None,
+        cache_ttl: Optional[float] = None,
+        timeout_param: Optional[str] = None
     ):
         """
         Register a tool that can be called by LLM.
@@ -70,11 +123,22 @@ class ToolExecutor:
             description: Human-readable description
             parameters: Parameter schema
             required_params: List of required parameters
+            timeout: Default timeout in seconds for this tool
+            cache_ttl: Memoize successful results for this many seconds
+                (only for deterministic tools)
+            timeout_param: Keyword through which the tool receives its
+                timeout, for tools that can stop their own work (e.g. kill
+                a subprocess) instead of being abandoned
         """
         if required_params is None:
             required_params = []
             
         self.registered_tools[name] = func
+        self.tool_options[name] = {
+            "timeout": timeout,
+            "cache_ttl": cache_ttl,
+            "timeout_param": timeout_param
+        }
         self.tool_definitions[name] = {
             "type": "function",
             "function": {
@@ -97,7 +161,7 @@ class ToolExecutor:
         self,
         tool_name: str,
         tool_input: Dict[str, Any],
-        timeout: float = 30.0
+        timeout: Optional[float] = None
     ) -> ToolResult:
         """
         Execute a registered tool.
@@ -105,13 +169,34 @@ class ToolExecutor:
         Args:
             tool_name: Name of tool to execute
             tool_input: Parameters for tool
-            timeout: Execution timeout in seconds
+            timeout: Execution timeout in seconds (defaults to the tool's own)
             
         Returns:
             ToolResult with success/failure and result
         """
-        import time
+        return self._finish(self._start(tool_name, tool_input, timeout))
+    
+    def execute_tools(
+        self,
+        calls: List[tuple],
+        timeout: Optional[float] = None
+    ) -> List[ToolResult]:
+        """
+        Execute several independent tools concurrently.
         
+        Args:
+            calls: (tool_name, tool_input) pairs
+            timeout: Per-tool timeout in seconds
+            
+        Returns:
+            ToolResults in the same order as calls
+        """
+        pending = [self._start(name, tool_input, timeout) for name, tool_input in calls]
+        return [self._finish(call) for call in pending]
+    
+    def _start(self, tool_name: str, tool_input: Dict[str, Any],
+               timeout: Optional[float] = None) -> _PendingCall:
+        """Validate a call, answer it from cache, or start it on a worker thread."""
         result = ToolResult(
             success=False,
             result=None,
@@ -122,35 +207,135 @@ class ToolExecutor:
         if tool_name not in self.registered_tools:
             result.error = f"Tool '{tool_name}' not registered"
             logger.error(result.error)
-            return result
+            return _PendingCall(result)
         
-        try:
-            start_time = time.time()
-            func = self.registered_tools[tool_name]
-            
-            # Execute with timeout
-            result.result = func(**tool_input)
-            result.success = True
-            result.execution_time = time.time() - start_time
-            
-            logger.info(f"✅ Tool executed: {tool_name} ({result.execution_time:.2f}s)")
+        options = self.tool_options.get(tool_name, {})
+        if timeout is None:
+            timeout = options.get("timeout") or self.default_timeout
+        
+        cache_key = None
+        if options.get("cache_ttl"):
+            cache_key = self._cache_key(tool_name, tool_input)
+            with self._lock:
+                entry = self._cache.get(cache_key)
+                if entry and entry[0] > time.time():
+                    self._cache.move_to_end(cache_key)
+                elif entry:
+                    del self._cache[cache_key]
+                    entry = None
+            if entry:
+                result.success = True
+                result.result = entry[1]
+                result.cached = True
+                return _PendingCall(result)
+        
+        kwargs = dict(tool_input)
+        if options.get("timeout_param"):
+            kwargs[options["timeout_param"]] = timeout
+        return _PendingCall(result, self.registered_tools[tool_name], kwargs, timeout, cache_key)
+    
+    def _finish(self, call: _PendingCall) -> ToolResult:
+        """Wait for a started call within its remaining timeout and record it."""
+        result = call.result
+        tool_name = result.tool_name
+        
+        if call.thread is not None:
+            options = self.tool_options.get(tool_name, {})
+            # Tools that enforce their own timeout get a moment to clean up
+            grace = 1.0 if options.get("timeout_param") else 0.0
+            remaining = call.start_time + call.timeout + grace - time.time()
+            call.thread.join(max(0.0, remaining))
             
-        except TypeError as e:
-            # Parameter validation error
-            result.error = f"Invalid parameters for {tool_name}: {str(e)}"
-            logger.error(result.error)
+            if call.thread.is_alive():
+                result.timed_out = True
+                result.error = f"Tool {tool_name} timed out after {call.timeout:.1f}s"
+                logger.error(result.error)
+            elif isinstance(call.exception, TypeError):
+                # Parameter validation error
+                result.error = f"Invalid parameters for {tool_name}: {str(call.exception)}"
+                logger.error(result.error)
+            elif call.exception is not None:
+                result.error = f"Tool execution failed: {str(call.exception)}"
+                logger.error(result.error)
+            else:
+                result.result = call.value
+                result.success = True
+                if call.cache_key and not (isinstance(call.value, dict) and call.value.get("error")):
+                    self._remember(call.cache_key, call.value, self.tool_options[tool_name]["cache_ttl"])
+            result.execution_time = time.time() - call.start_time
             
-        except Exception as e:
-            result.error = f"Tool execution failed: {str(e)}"
-            logger.error(result.error)
-        
-        # Add to history
-        self.execution_history.append(result)
-        if len(self.execution_history) > self.max_history:
-            self.execution_history.pop(0)
+            if result.success:
+                logger.info(f"✅ Tool executed: {tool_name} ({result.execution_time:.2f}s)")
         
+        self._record(result)
         return result
     
+    def _remember(self, cache_key: str, value: Any, ttl: float):
+        """Memoize a result, dropping expired entries and then the least recently used."""
+        now = time.time()
+        with self._lock:
+            for key in [key for key, (expires_at, _) in self._cache.items() if expires_at <= now]:
+                del self._cache[key]
+            self._cache[cache_key] = (now + ttl, value)
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+    
+    @staticmethod
+    def _cache_key(tool_name: str, tool_input: Dict[str, Any]) -> str:
+        arguments = json.dumps(tool_input, sort_keys=True, default=str)
+        return f"{tool_name}:{hashlib.sha256(arguments.encode()).hexdigest()}"
+    
+    def _record(self, result: ToolResult):
+        """Add a result to history and per-tool latency stats."""
+        with self._lock:
+            self.execution_history.append(result)
+            if result.tool_name not in self.registered_tools:
+                return
+            stats = self.tool_stats.setdefault(result.tool_name, {
+                "calls": 0,
+                "errors": 0,
+                "timeouts": 0,
+                "cache_hits": 0,
+                "total_time": 0.0,
+                "max_time": 0.0,
+                "recent_times": deque(maxlen=100)
+            })
+            stats["calls"] += 1
+            if result.cached:
+                stats["cache_hits"] += 1
+                return
+            if result.timed_out:
+                stats["timeouts"] += 1
+            if not result.success:
+                stats["errors"] += 1
+            stats["total_time"] += result.execution_time
+            stats["max_time"] = max(stats["max_time"], result.execution_time)
+            stats["recent_times"].append(result.execution_time)
+    
+    def get_tool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-tool call counts and latency (seconds, cache hits excluded)."""
+        report = {}
+        with self._lock:
+            for name, stats in self.tool_stats.items():
+                executed = stats["calls"] - stats["cache_hits"]
+                recent = sorted(stats["recent_times"])
+                report[name] = {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "timeouts": stats["timeouts"],
+                    "cache_hits": stats["cache_hits"],
+                    "avg_time": stats["total_time"] / executed if executed else 0.0,
+                    "p95_time": recent[int(0.95 * (len(recent) - 1))] if recent else 0.0,
+                    "max_time": stats["max_time"]
+                }
+        return report
+    
+    def clear_cache(self):
+        """Drop memoized tool results."""
+        with self._lock:
+            self._cache.clear()
+    
     def execute_tool_call(self, tool_call: Dict[str, Any]) -> ToolResult:
         """
         Execute a tool call from LLM response.
@@ -161,33 +346,50 @@ class ToolExecutor:
         Returns:
             ToolResult
         """
-        try:
-            # Parse tool call structure
-            function_data = tool_call.get("function", {})
-            tool_name = function_data.get("name", "")
-            arguments_str = function_data.get("arguments", "{}")
+        return self.execute_tool_calls([tool_call])[0]
+    
+    def execute_tool_calls(self, tool_calls: List[Dict[str, Any]]) -> List[ToolResult]:
+        """
+        Execute the tool calls from one LLM response concurrently.
+        
+        Args:
+            tool_calls: Tool call objects with id, type, function details
             
-            # Parse arguments
+        Returns:
+            ToolResults in the same order as tool_calls
+        """
+        pending = []
+        for tool_call in tool_calls:
             try:
-                tool_input = json.loads(arguments_str)
-            except json.JSONDecodeError:
-                return ToolResult(
+                # Parse tool call structure
+                function_data = tool_call.get("function", {})
+                tool_name = function_data.get("name", "")
+                arguments_str = function_data.get("arguments", "{}")
+                
+                # Parse arguments
+                try:
+                    tool_input = json.loads(arguments_str)
+                except json.JSONDecodeError:
+                    pending.append(ToolResult(
+                        success=False,
+                        result=None,
+                        error=f"Invalid JSON in tool arguments: {arguments_str}",
+                        tool_name=tool_name
+                    ))
+                    continue
+                
+                # Start tool; all calls run while we wait on the first
+                pending.append(self._start(tool_name, tool_input))
+                
+            except Exception as e:
+                logger.error(f"Failed to parse tool call: {e}")
+                pending.append(ToolResult(
                     success=False,
                     result=None,
-                    error=f"Invalid JSON in tool arguments: {arguments_str}",
-                    tool_name=tool_name
-                )
-            
-            # Execute tool
-            return self.execute_tool(tool_name, tool_input)
-            
-        except Exception as e:
-            logger.error(f"Failed to parse tool call: {e}")
-            return ToolResult(
-                success=False,
-                result=None,
-                error=f"Failed to parse tool call: {str(e)}"
-            )
+                    error=f"Failed to parse tool call: {str(e)}"
+                ))
+        
+        return [self._finish(call) if isinstance(call, _PendingCall) else call for call in pending]
     
     def format_tool_result_for_llm(self, result: ToolResult) -> Dict[str, Any]:
         """
@@ -222,7 +424,7 @@ class ToolExecutor:
     
     def get_execution_history(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent tool execution history."""
-        return [r.to_dict() for r in self.execution_history[-limit:]]
+        return [r.to_dict() for r in list(self.execution_history)[-limit:]]
     
     def clear_history(self):
         """Clear execution history."""
@@ -253,27 +455,43 @@ def web_search(query: str, max_results: int = 5) -> Dict[str, Any]:
         }
 
 
-def execute_code(code: str, language: str = "python") -> Dict[str, Any]:
+def execute_code(code: str, language: str = "python", timeout: float = 5.0) -> Dict[str, Any]:
     """
     Execute code (sandboxed).
     
     Args:
         code: Code to execute
         language: Programming language
+        timeout: Seconds before the process (and any children) is killed
     """
     try:
         if language == "python":
             import subprocess
-            result = subprocess.run(
+            process = subprocess.Popen(
                 ["python", "-c", code],
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=5
+                # Own process group so children spawned by the code die with it
+                start_new_session=(os.name != "nt")
             )
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                if os.name != "nt":
+                    import signal
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+                process.communicate()
+                return {
+                    "error": f"Execution timed out after {timeout:.1f}s",
+                    "language": language
+                }
             return {
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "return_code": result.returncode,
+                "stdout": stdout,
+                "stderr": stderr,
+                "return_code": process.returncode,
                 "language": language
             }
     except Exception as e:
@@ -339,7 +557,9 @@ def get_default_executor() -> ToolExecutor:
                 "default": 5
             }
         },
-        required_params=["query"]
+        required_params=["query"],
+        timeout=15.0,
+        cache_ttl=300
     )
     
     executor.register_tool(
@@ -359,7 +579,9 @@ def get_default_executor() -> ToolExecutor:
                 "description": "Mathematical expression to evaluate"
             }
         },
-        required_params=["expression"]
+        required_params=["expression"],
+        timeout=2.0,
+        cache_ttl=3600
     )
     
     executor.register_tool(
@@ -377,7 +599,9 @@ def get_default_executor() -> ToolExecutor:
                 "default": "python"
             }
         },
-        required_params=["code"]
+        required_params=["code"],
+        timeout=5.0,
+        timeout_param="timeout"
     )
     
     return executor
@@ -7,14 +7,23 @@ Provides search trigger detection, result formatting, and response enhancement.
 
 import json
 import logging
+import os
+import re
+import sqlite3
+import threading
 import time
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Persistent search cache lives beside this module, not in whatever the CWD is
+DEFAULT_CACHE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "web_search_cache.db")
+
 
 class SearchTriggerType(Enum):
     """Triggers for web search."""
@@ -45,6 +54,18 @@ class SearchResult:
             "timestamp": self.timestamp,
             "relevance_score": self.relevance_score
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SearchResult":
+        """Create from dictionary."""
+        return cls(
+            title=data.get("title", ""),
+            url=data.get("url", ""),
+            snippet=data.get("snippet", ""),
+            source=data.get("source", ""),
+            timestamp=data.get("timestamp"),
+            relevance_score=data.get("relevance_score", 1.0)
+        )
 
 
 @dataclass
@@ -67,6 +88,23 @@ class SearchResponse:
             "total_results": self.total_results,
             "timestamp": self.timestamp
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SearchResponse":
+        """Create from dictionary."""
+        return cls(
+            query=data["query"],
+            results=[SearchResult.from_dict(r) for r in data.get("results", [])],
+            trigger_type=SearchTriggerType(data.get("trigger_type", SearchTriggerType.MANUAL.value)),
+            search_time=data.get("search_time", 0.0),
+            total_results=data.get("total_results", 0),
+            timestamp=data.get("timestamp", "")
+        )
+    
+    @property
+    def source(self) -> str:
+        """Search backend that produced the results."""
+        return self.results[0].source if self.results else "unknown"
 
 
 class WebSearchTrigger:
@@ -134,58 +172,310 @@ class WebSearchTrigger:
         return False, None
 
 
+# Sentence punctuation only: symbols such as + # $ % and decimal points
+# change what is being searched for ("C++" vs "C", "$5", "3.5")
+_PUNCTUATION_RE = re.compile(r"[!?;:'\"“”‘’()\[\]{}]|(?<!\d)[.,]|[.,](?!\d)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query into a cache key.
+    
+    Queries differing only in case, whitespace or sentence punctuation map
+    to the same key ("What's the weather?" == "whats the  weather").
+    """
+    key = _PUNCTUATION_RE.sub("", query.casefold())
+    return _WHITESPACE_RE.sub(" ", key).strip()
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls for the same key; followers share the leader's result."""
+    
+    class _Call:
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.error: Optional[BaseException] = None
+            self.followers = 0
+    
+    def __init__(self):
+        self._calls: Dict[str, "SingleFlight._Call"] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+    
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once per key among concurrent callers.
+        
+        Returns:
+            (result, shared) where shared is True for followers
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = SingleFlight._Call()
+                leader = True
+        
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+    
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._calls
+
+
 class WebSearchCache:
-    """Cache for web search results to reduce API calls."""
+    """
+    Two-tier cache for web search results to reduce API calls.
+    
+    A bounded LRU dict serves hot queries from memory; every entry is also
+    written to SQLite so the cache survives restarts. Keys are normalized
+    queries. Entries older than the TTL but within the stale window are
+    still served, flagged as stale so the caller can refresh them.
+    """
     
-    def __init__(self, ttl_hours: int = 24):
+    def __init__(self, ttl_hours: int = 24, max_entries: int = 512,
+                 db_path: Optional[str] = DEFAULT_CACHE_DB_PATH,
+                 stale_hours: float = 24, max_db_entries: int = 10000):
         """Initialize cache."""
-        self.cache: Dict[str, tuple[SearchResponse, datetime]] = {}
+        self.cache: "OrderedDict[str, Tuple[SearchResponse, datetime]]" = OrderedDict()
         self.ttl = timedelta(hours=ttl_hours)
+        self.stale_window = timedelta(hours=stale_hours)
+        self.max_entries = max_entries
+        self.max_db_entries = max_db_entries
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._writes = 0
+        self._init_db()
+    
+    def _init_db(self):
+        """Initialize persistent tier."""
+        if not self.db_path:
+            return
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS search_cache (
+                        query_key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        source TEXT,
+                        cached_at REAL NOT NULL,
+                        last_accessed REAL NOT NULL
+                    )
+                """)
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_search_cache_accessed ON search_cache(last_accessed)"
+                )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Search cache DB init failed: {e}")
+            self.db_path = None
+    
+    def _remember(self, key: str, response: SearchResponse, cached_at: datetime):
+        """Insert into the memory tier, evicting least recently used entries."""
+        self.cache[key] = (response, cached_at)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+    
+    def _load(self, key: str) -> Optional[Tuple[SearchResponse, datetime]]:
+        """Load an entry from the persistent tier."""
+        if not self.db_path:
+            return None
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                row = conn.execute(
+                    "SELECT response, cached_at FROM search_cache WHERE query_key = ?", (key,)
+                ).fetchone()
+                if not row:
+                    return None
+                conn.execute(
+                    "UPDATE search_cache SET last_accessed = ? WHERE query_key = ?", (time.time(), key)
+                )
+                conn.commit()
+            return SearchResponse.from_dict(json.loads(row[0])), datetime.fromtimestamp(row[1])
+        except Exception as e:
+            logger.error(f"Search cache read failed: {e}")
+            return None
+    
+    def lookup(self, query: str) -> Tuple[Optional[SearchResponse], bool]:
+        """
+        Look up a query in both tiers.
+        
+        Returns:
+            (response, is_stale) - response is None on a miss or after the stale window
+        """
+        key = normalize_query(query)
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.cache.move_to_end(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is not None:
+                with self._lock:
+                    self._remember(key, *entry)
+        if entry is None:
+            return None, False
+        
+        response, cached_at = entry
+        age = datetime.now() - cached_at
+        if age < self.ttl:
+            return response, False
+        if age < self.ttl + self.stale_window:
+            return response, True
+        self.delete(query)
+        return None, False
     
     def get(self, query: str) -> Optional[SearchResponse]:
-        """Get cached search results."""
-        if query in self.cache:
-            response, timestamp = self.cache[query]
-            if datetime.now() - timestamp < self.ttl:
-                return response
-            else:
-                # Expired, remove
-                del self.cache[query]
-        return None
+        """Get fresh cached search results."""
+        response, is_stale = self.lookup(query)
+        return None if is_stale else response
     
     def set(self, query: str, response: SearchResponse):
         """Cache search results."""
-        self.cache[query] = (response, datetime.now())
+        key = normalize_query(query)
+        now = datetime.now()
+        with self._lock:
+            self._remember(key, response, now)
+            self._writes += 1
+            prune = self._writes % 100 == 0
+        if not self.db_path:
+            return
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO search_cache
+                    (query_key, response, source, cached_at, last_accessed)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (key, json.dumps(response.to_dict()), response.source,
+                      now.timestamp(), now.timestamp()))
+                if prune:
+                    self._prune(conn)
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Search cache write failed: {e}")
+    
+    def _prune(self, conn: sqlite3.Connection):
+        """Bound the persistent tier: drop dead entries, then least recently used."""
+        horizon = (datetime.now() - self.ttl - self.stale_window).timestamp()
+        conn.execute("DELETE FROM search_cache WHERE cached_at < ?", (horizon,))
+        conn.execute("""
+            DELETE FROM search_cache WHERE query_key IN (
+                SELECT query_key FROM search_cache
+                ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_db_entries,))
+    
+    def delete(self, query: str):
+        """Remove a query from both tiers."""
+        key = normalize_query(query)
+        with self._lock:
+            self.cache.pop(key, None)
+        if not self.db_path:
+            return
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("DELETE FROM search_cache WHERE query_key = ?", (key,))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Search cache delete failed: {e}")
     
     def clear(self):
         """Clear cache."""
-        self.cache.clear()
+        with self._lock:
+            self.cache.clear()
+        if not self.db_path:
+            return
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("DELETE FROM search_cache")
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Search cache clear failed: {e}")
     
     def cleanup(self):
         """Remove expired entries."""
         now = datetime.now()
-        expired = [q for q, (_, ts) in self.cache.items() if now - ts > self.ttl]
-        for q in expired:
-            del self.cache[q]
+        limit = self.ttl + self.stale_window
+        with self._lock:
+            expired = [q for q, (_, ts) in self.cache.items() if now - ts > limit]
+            for q in expired:
+                del self.cache[q]
+        if not self.db_path:
+            return
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                self._prune(conn)
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Search cache cleanup failed: {e}")
+    
+    def persistent_size(self) -> int:
+        """Number of entries in the persistent tier."""
+        if not self.db_path:
+            return len(self.cache)
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                return conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        except Exception:
+            return 0
 
 
 class WebSearchIntegration:
     """Integrates web search into chat."""
     
-    def __init__(self, cache_ttl_hours: int = 24):
+    def __init__(self, cache_ttl_hours: int = 24, cache_db_path: Optional[str] = DEFAULT_CACHE_DB_PATH,
+                 max_cache_entries: int = 512, stale_hours: float = 24):
         """Initialize web search integration."""
-        self.cache = WebSearchCache(cache_ttl_hours)
+        self.cache = WebSearchCache(cache_ttl_hours, max_entries=max_cache_entries,
+                                    db_path=cache_db_path, stale_hours=stale_hours)
         self.trigger = WebSearchTrigger()
         self.search_count = 0
+        self._flight = SingleFlight()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="search-refresh")
+        self._metrics: Dict[str, Dict[str, int]] = {}
+        self._metrics_lock = threading.Lock()
     
     def should_search_for_message(self, message: str) -> tuple[bool, SearchTriggerType]:
         """Check if message should trigger search."""
         return self.trigger.should_search(message)
     
+    def _record(self, source: str, outcome: str):
+        """Count a cache outcome (hits, stale_hits, misses, coalesced) for a search source."""
+        with self._metrics_lock:
+            counters = self._metrics.setdefault(
+                source, {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0}
+            )
+            counters[outcome] += 1
+    
     def search_web(self, query: str, max_results: int = 5) -> Optional[SearchResponse]:
         """
         Perform web search.
         
+        Fresh cached results are returned directly. Stale results are
+        returned immediately while a background refresh runs. Concurrent
+        misses for the same normalized query share a single fetch.
+        
         Args:
             query: Search query
             max_results: Maximum results to return
@@ -193,55 +483,91 @@ class WebSearchIntegration:
         Returns:
             SearchResponse or None if failed
         """
-        # Check cache first
-        cached = self.cache.get(query)
+        cached, is_stale = self.cache.lookup(query)
         if cached:
-            logger.info(f"🔍 Using cached search for: {query}")
+            if is_stale:
+                logger.info(f"🔍 Using stale cached search for: {query} (refreshing)")
+                self._record(cached.source, "stale_hits")
+                self._schedule_refresh(query, max_results)
+            else:
+                logger.info(f"🔍 Using cached search for: {query}")
+                self._record(cached.source, "hits")
             return cached
         
+        try:
+            response, shared = self._flight.do(
+                normalize_query(query), lambda: self._fetch_and_cache(query, max_results)
+            )
+        except Exception as e:
+            logger.error(f"Web search failed: {e}")
+            response, shared = None, False
+        
+        # Failed fetches count as misses too, under the "unknown" source
+        source = response.source if response else "unknown"
+        self._record(source, "coalesced" if shared else "misses")
+        return response
+    
+    def _schedule_refresh(self, query: str, max_results: int):
+        """Refresh a stale entry in the background unless a fetch is already running."""
+        key = normalize_query(query)
+        if self._flight.in_flight(key):
+            return
+        
+        def refresh():
+            try:
+                self._flight.do(key, lambda: self._fetch_and_cache(query, max_results))
+            except Exception as e:
+                logger.error(f"Background search refresh failed: {e}")
+        
+        self._refresher.submit(refresh)
+    
+    def _fetch_and_cache(self, query: str, max_results: int) -> Optional[SearchResponse]:
+        """Fetch results from the search backends and store them in the cache."""
         logger.info(f"🌐 Searching web for: {query}")
+        response = self._search_google(query, max_results)
+        if response is None:
+            response = self._search_duckduckgo(query, max_results)
+        if response:
+            self.cache.set(query, response)
+            self.search_count += 1
+            logger.info(f"✅ Found {response.total_results} results in {response.search_time:.2f}s")
+        return response
+    
+    def _search_google(self, query: str, max_results: int = 5) -> Optional[SearchResponse]:
+        """Search using automation_tools_new's search_google, if available."""
+        try:
+            from automation_tools_new import search_google
+        except ImportError:
+            logger.warning("search_google not available, trying DuckDuckGo")
+            return None
         
         try:
             start_time = time.time()
+            results = search_google(query, max_results=max_results)
             
-            # Try to use automation_tools_new's search_google
-            try:
-                from automation_tools_new import search_google
-                results = search_google(query, max_results=max_results)
-                
-                if results:
-                    search_results = []
-                    for result in results:
-                        if isinstance(result, dict):
-                            search_results.append(SearchResult(
-                                title=result.get("title", ""),
-                                url=result.get("link", ""),
-                                snippet=result.get("snippet", ""),
-                                source="Google"
-                            ))
-                    
-                    search_time = time.time() - start_time
-                    response = SearchResponse(
-                        query=query,
-                        results=search_results[:max_results],
-                        trigger_type=SearchTriggerType.MANUAL,
-                        search_time=search_time,
-                        total_results=len(search_results),
-                        timestamp=datetime.now().isoformat()
-                    )
-                    
-                    # Cache result
-                    self.cache.set(query, response)
-                    self.search_count += 1
-                    
-                    logger.info(f"✅ Found {len(search_results)} results in {search_time:.2f}s")
-                    return response
-            except ImportError:
-                logger.warning("search_google not available, trying DuckDuckGo")
-                return self._search_duckduckgo(query, max_results)
-        
+            search_results = []
+            for result in results or []:
+                if isinstance(result, dict):
+                    search_results.append(SearchResult(
+                        title=result.get("title", ""),
+                        url=result.get("link", ""),
+                        snippet=result.get("snippet", ""),
+                        source="Google"
+                    ))
+            
+            if not search_results:
+                return None
+            
+            return SearchResponse(
+                query=query,
+                results=search_results[:max_results],
+                trigger_type=SearchTriggerType.MANUAL,
+                search_time=time.time() - start_time,
+                total_results=len(search_results),
+                timestamp=datetime.now().isoformat()
+            )
         except Exception as e:
-            logger.error(f"Web search failed: {e}")
+            logger.error(f"Google search failed: {e}")
             return None
     
     def _search_duckduckgo(self, query: str, max_results: int = 5) -> Optional[SearchResponse]:
@@ -299,9 +625,6 @@ class WebSearchIntegration:
                     timestamp=datetime.now().isoformat()
                 )
                 
-                self.cache.set(query, search_response)
-                self.search_count += 1
-                
                 return search_response
         
         except Exception as e:
@@ -361,10 +684,20 @@ Based on the above search results, provide an informative answer to the user's q
     
     def get_search_stats(self) -> Dict[str, Any]:
         """Get search statistics."""
+        with self._metrics_lock:
+            per_source = {}
+            for source, counters in self._metrics.items():
+                lookups = sum(counters.values())
+                served = counters["hits"] + counters["stale_hits"] + counters["coalesced"]
+                per_source[source] = dict(counters, hit_rate=served / lookups if lookups else 0.0)
+        
         return {
             "searches_performed": self.search_count,
             "cached_queries": len(self.cache.cache),
-            "cache_ttl_hours": self.cache.ttl.total_seconds() / 3600
+            "persisted_queries": self.cache.persistent_size(),
+            "coalesced_requests": self._flight.coalesced,
+            "cache_ttl_hours": self.cache.ttl.total_seconds() / 3600,
+            "sources": per_source
         }
 
 
@@ -0,0 +1,281 @@
+# Workflow Scheduler Module
+"""
+Cron scheduling for SmartAutomationEngine:
+- Full 5-field cron expressions (lists, ranges, steps, month/day names, @macros)
+- Min-heap of next fire times; the scheduler thread sleeps exactly until
+  the earliest job is due instead of polling
+- Next-run state persisted to SQLite so restarts keep their place and
+  runs missed while the assistant was down fire once on startup
+"""
+
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+
+_MONTH_NAMES = {name: i for i, name in enumerate(
+    ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC'], 1)}
+_DAY_NAMES = {name: i for i, name in enumerate(['SUN', 'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT'])}
+_MACROS = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+
+class CronExpression:
+    """
+    Standard 5-field cron expression: minute hour day-of-month month day-of-week.
+
+    As in cron, when both day fields are restricted a day matches if either does.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = _MACROS.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: '{expression}'")
+        minute, hour, day, month, weekday = fields
+        self.minutes = sorted(self._parse_field(minute, 0, 59))
+        self.hours = sorted(self._parse_field(hour, 0, 23))
+        self.days = self._parse_field(day, 1, 31)
+        self.months = self._parse_field(month, 1, 12, _MONTH_NAMES)
+        # 7 is an alias for Sunday
+        self.weekdays = {d % 7 for d in self._parse_field(weekday, 0, 7, _DAY_NAMES)}
+        self.day_restricted = not day.startswith('*')
+        self.weekday_restricted = not weekday.startswith('*')
+
+    @staticmethod
+    def _parse_value(value: str, names: Optional[Dict[str, int]]) -> int:
+        if names and value.upper() in names:
+            return names[value.upper()]
+        return int(value)
+
+    @classmethod
+    def _parse_field(cls, field: str, low: int, high: int,
+                     names: Optional[Dict[str, int]] = None) -> Set[int]:
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step_text = part.split('/', 1)
+                step = int(step_text)
+                if step < 1:
+                    raise ValueError(f"Invalid cron step: '{field}'")
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start_text, end_text = part.split('-', 1)
+                start, end = cls._parse_value(start_text, names), cls._parse_value(end_text, names)
+            else:
+                start = cls._parse_value(part, names)
+                end = high if step > 1 else start
+            if not low <= start <= end <= high:
+                raise ValueError(f"Cron field out of range: '{field}'")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after moment"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate.year + 5
+        while candidate.year <= limit:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1,
+                                              day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            hour = next((h for h in self.hours if h >= candidate.hour), None)
+            if hour is None:
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if hour != candidate.hour:
+                candidate = candidate.replace(hour=hour, minute=0)
+            minute = next((m for m in self.minutes if m >= candidate.minute), None)
+            if minute is None:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            return candidate.replace(minute=minute)
+        raise ValueError(f"Cron expression never fires: '{self.expression}'")
+
+
+@dataclass
+class ScheduledJob:
+    """A cron trigger for one workflow"""
+    job_id: str
+    workflow_id: str
+    schedule: str
+    cron: CronExpression
+    next_run: float
+    last_run: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "workflow_id": self.workflow_id,
+            "schedule": self.schedule,
+            "next_run": datetime.fromtimestamp(self.next_run).isoformat(),
+            "last_run": datetime.fromtimestamp(self.last_run).isoformat() if self.last_run else None,
+        }
+
+
+class WorkflowScheduler:
+    """
+    Fires workflow triggers at their cron times.
+
+    Args:
+        dispatch: Called with the workflow id when a job is due; must not block
+        db_path: SQLite database for next-run state
+        misfire_grace: Runs missed by less than this many seconds fire on startup
+    """
+
+    def __init__(self, dispatch: Callable[[str], Any], db_path: str = "automation_engine.db",
+                 misfire_grace: float = 3600):
+        self.dispatch = dispatch
+        self.db_path = db_path
+        self.misfire_grace = misfire_grace
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._init_database()
+
+    def _init_database(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workflow_schedule (
+                    job_id TEXT PRIMARY KEY,
+                    workflow_id TEXT NOT NULL,
+                    schedule TEXT NOT NULL,
+                    next_run REAL NOT NULL,
+                    last_run REAL
+                )
+            """)
+
+    def _load_state(self, job_id: str) -> Optional[tuple]:
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(
+                "SELECT schedule, next_run, last_run FROM workflow_schedule WHERE job_id = ?",
+                (job_id,)).fetchone()
+
+    def _save_state(self, job: ScheduledJob):
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO workflow_schedule (job_id, workflow_id, schedule, next_run, last_run)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (job.job_id, job.workflow_id, job.schedule, job.next_run, job.last_run))
+        except sqlite3.Error as e:
+            print(f"Error saving schedule state for {job.job_id}: {e}")
+
+    def add_job(self, job_id: str, workflow_id: str, schedule: str) -> ScheduledJob:
+        """Schedule (or reschedule) a workflow; raises ValueError for bad cron"""
+        cron = CronExpression(schedule)
+        now = time.time()
+        next_run = cron.next_after(datetime.now()).timestamp()
+        last_run = None
+        state = self._load_state(job_id)
+        if state and state[0] == schedule:
+            _, saved_next, last_run = state
+            if saved_next > now or now - saved_next <= self.misfire_grace:
+                # Keep our place; a recently missed run fires right away
+                next_run = saved_next
+        job = ScheduledJob(job_id, workflow_id, schedule, cron, next_run, last_run)
+        with self._condition:
+            self._jobs[job_id] = job
+            heapq.heappush(self._heap, (job.next_run, next(self._sequence), job_id))
+            self._condition.notify()
+        self._save_state(job)
+        return job
+
+    def remove_job(self, job_id: str):
+        with self._condition:
+            self._jobs.pop(job_id, None)
+            self._condition.notify()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM workflow_schedule WHERE job_id = ?", (job_id,))
+
+    def remove_workflow(self, workflow_id: str):
+        """Remove every job of a workflow"""
+        with self._condition:
+            job_ids = [job_id for job_id, job in self._jobs.items() if job.workflow_id == workflow_id]
+        for job_id in job_ids:
+            self.remove_job(job_id)
+
+    def get_jobs(self) -> List[Dict[str, Any]]:
+        with self._condition:
+            return [job.to_dict() for job in sorted(self._jobs.values(), key=lambda j: j.next_run)]
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="workflow-scheduler")
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _next_due(self) -> List[ScheduledJob]:
+        """Block until at least one job is due (or stop); returns due jobs"""
+        with self._condition:
+            while self._running:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                next_run, _, job_id = self._heap[0]
+                job = self._jobs.get(job_id)
+                if job is None or job.next_run != next_run:
+                    heapq.heappop(self._heap)  # removed or rescheduled
+                    continue
+                delay = next_run - time.time()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                due = []
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    next_run, _, job_id = heapq.heappop(self._heap)
+                    job = self._jobs.get(job_id)
+                    if job is None or job.next_run != next_run:
+                        continue
+                    job.last_run = now
+                    job.next_run = job.cron.next_after(datetime.fromtimestamp(now)).timestamp()
+                    heapq.heappush(self._heap, (job.next_run, next(self._sequence), job_id))
+                    due.append(job)
+                return due
+            return []
+
+    def _run(self):
+        while self._running:
+            for job in self._next_due():
+                self._save_state(job)
+                try:
+                    self.dispatch(job.workflow_id)
+                except Exception as e:
+                    print(f"Error dispatching scheduled workflow {job.workflow_id}: {e}")
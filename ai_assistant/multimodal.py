@@ -24,6 +24,11 @@ from datetime import datetime
 import threading
 import asyncio
 
+try:
+    from .screen_observer import AdaptiveInterval, HASH_BITS, ImageSignature, image_signature, tiles_bbox
+except ImportError:
+    from screen_observer import AdaptiveInterval, HASH_BITS, ImageSignature, image_signature, tiles_bbox
+
 class MultiModalAI:
     """Advanced multi-modal AI system for visual understanding and generation."""
     
@@ -55,11 +60,26 @@ class MultiModalAI:
         self.monitor_thread = None
         self.last_screenshot = None
         self.last_screenshot_time = None
+        self.last_screenshot_region = None
+        self.monitor_interval = None
+        self.monitor_stats = {"captures": 0, "skipped": 0, "region_analyses": 0, "full_analyses": 0}
         
-        # Enhanced screenshot caching with hash-based deduplication
-        self.screenshot_cache = {}  # hash -> (image, analysis, timestamp)
+        # Enhanced screenshot caching with perceptual-hash deduplication
+        self.screenshot_cache = {}  # "<hash>_<prompt>" -> (image, analysis, timestamp)
         self.cache_max_size = 10
         self.cache_expiry_seconds = 300  # 5 minutes
+        # Images within this many differing hash bits share a cached analysis,
+        # so a blinking cursor or ticking clock does not cost an API call
+        self.hash_threshold = 5
+        # Screen tiles (columns, rows) used for region-level change detection
+        self.tile_grid = (4, 4)
+        self.tile_threshold = 3
+        
+        # Video key frames: samples scanned per second, size and encoding sent to the model
+        self.video_scan_fps = 2.0
+        self.video_frame_max_side = 1024
+        self.video_frame_format = "JPEG"  # or "WEBP"
+        self.video_frame_quality = 85
         
         # Analysis history
         self.analysis_history = []
@@ -77,7 +97,8 @@ class MultiModalAI:
         """
         try:
             # Check if we can use cached screenshot
-            if use_cache and self.last_screenshot and self.last_screenshot_time:
+            if use_cache and self.last_screenshot and self.last_screenshot_time \
+                    and self.last_screenshot_region == region:
                 time_diff = time.time() - self.last_screenshot_time
                 if time_diff < 2.0:  # Use cache if less than 2 seconds old
                     return self.last_screenshot
@@ -95,6 +116,7 @@ class MultiModalAI:
             
             self.last_screenshot = screenshot
             self.last_screenshot_time = time.time()
+            self.last_screenshot_region = region
             self._cleanup_old_cache()
             return screenshot
             
@@ -110,14 +132,24 @@ class MultiModalAI:
         return img_str
     
     def _image_hash(self, image: Image.Image) -> str:
-        """Generate hash for image to check cache."""
-        import hashlib
-        buffered = io.BytesIO()
-        # Use smaller size for hash to improve performance
-        thumb = image.copy()
-        thumb.thumbnail((100, 100))
-        thumb.save(buffered, format="PNG")
-        return hashlib.md5(buffered.getvalue()).hexdigest()
+        """Generate perceptual hash for image to check cache."""
+        return image_signature(image, grid=(0, 0)).hex
+    
+    def _find_cached_analysis(self, signature: ImageSignature, prompt: str) -> Optional[Dict[str, Any]]:
+        """Closest unexpired cached analysis for the prompt within hash_threshold."""
+        best_distance, best_analysis = None, None
+        current_time = time.time()
+        for key, (img, analysis, timestamp) in self.screenshot_cache.items():
+            cached_hash, _, cached_prompt = key.partition("_")
+            if cached_prompt != prompt or current_time - timestamp >= self.cache_expiry_seconds:
+                continue
+            cached_signature = ImageSignature.from_hex(cached_hash)
+            if cached_signature is None:
+                continue
+            distance = signature.distance(cached_signature)
+            if distance <= self.hash_threshold and (best_distance is None or distance < best_distance):
+                best_distance, best_analysis = distance, analysis
+        return best_analysis
     
     def _cleanup_old_cache(self):
         """Remove expired items from screenshot cache."""
@@ -151,16 +183,13 @@ class MultiModalAI:
             Analysis results dictionary
         """
         try:
-            # Check cache first
+            # Check cache first (near-identical images count as hits)
             if use_cache:
-                img_hash = self._image_hash(image)
-                cache_key = f"{img_hash}_{prompt}"
-                
-                if cache_key in self.screenshot_cache:
-                    cached_img, cached_analysis, cached_time = self.screenshot_cache[cache_key]
-                    if time.time() - cached_time < self.cache_expiry_seconds:
-                        print("Using cached analysis")
-                        return cached_analysis
+                signature = image_signature(image, grid=(0, 0))
+                cached_analysis = self._find_cached_analysis(signature, prompt)
+                if cached_analysis is not None:
+                    print("Using cached analysis")
+                    return dict(cached_analysis, cached=True)
             
             # Optimize image size for API
             optimized_image = self._optimize_image(image)
@@ -183,9 +212,9 @@ class MultiModalAI:
             
             # Cache the result
             if use_cache:
-                img_hash = self._image_hash(image)
-                cache_key = f"{img_hash}_{prompt}"
+                cache_key = f"{signature.hex}_{prompt}"
                 self.screenshot_cache[cache_key] = (image, result, time.time())
+                self._cleanup_old_cache()
             
             # Add to history
             self.analysis_history.append(result)
@@ -334,33 +363,58 @@ class MultiModalAI:
             "timestamp": result.get("timestamp")
         }
     
-    def monitor_screen_changes(self, callback: callable = None, interval: float = 2.0):
+    def monitor_screen_changes(self, callback: callable = None, interval: float = 2.0,
+                               max_interval: Optional[float] = None):
         """
         Monitor screen for changes and trigger callback.
         
+        Each capture is reduced to a perceptual signature; the vision model is
+        only called when tiles actually changed, and then only on the changed
+        region unless most of the screen changed. The capture interval backs
+        off while the screen is idle and resets on change.
+        
         Args:
             callback: Function to call when changes detected
-            interval: Check interval in seconds
+            interval: Minimum check interval in seconds
+            max_interval: Longest interval while idle (default 8x interval)
         """
+        self.monitor_interval = AdaptiveInterval(interval, max_interval or interval * 8)
+        pacing = self.monitor_interval
+        
         def monitor_loop():
             previous_analysis = None
+            previous_signature = None
             
             while self.is_monitoring:
                 try:
-                    # Capture and analyze current screen
-                    current_analysis = self.analyze_screen("Briefly describe what's on screen")
+                    screenshot = self.capture_screen(use_cache=False)
+                    if screenshot is None:
+                        time.sleep(pacing.idle())
+                        continue
+                    self.monitor_stats["captures"] += 1
+                    signature = image_signature(screenshot, self.tile_grid)
+                    
+                    if previous_signature is None:
+                        current_analysis = self._analyze_screen_changes(screenshot, signature, None)
+                    else:
+                        tiles = signature.changed_tiles(previous_signature, self.tile_threshold)
+                        if not tiles:
+                            self.monitor_stats["skipped"] += 1
+                            time.sleep(pacing.idle())
+                            continue
+                        current_analysis = self._analyze_screen_changes(screenshot, signature, tiles)
                     
                     # Compare with previous
-                    if previous_analysis and current_analysis != previous_analysis:
-                        if callback:
-                            callback(current_analysis, previous_analysis)
+                    if previous_analysis and callback:
+                        callback(current_analysis, previous_analysis)
                     
                     previous_analysis = current_analysis
-                    time.sleep(interval)
+                    previous_signature = signature
+                    time.sleep(pacing.changed())
                     
                 except Exception as e:
                     print(f"Monitor error: {e}")
-                    time.sleep(interval)
+                    time.sleep(pacing.current)
         
         if not self.is_monitoring:
             self.is_monitoring = True
@@ -370,6 +424,24 @@ class MultiModalAI:
         else:
             return "Screen monitoring already active"
     
+    def _analyze_screen_changes(self, screenshot: Image.Image, signature: ImageSignature,
+                                tiles: Optional[List[int]]) -> Dict[str, Any]:
+        """Analyze only the changed tiles of a screenshot, or all of it if most changed."""
+        total_tiles = self.tile_grid[0] * self.tile_grid[1]
+        if tiles is None or len(tiles) * 2 > total_tiles:
+            self.monitor_stats["full_analyses"] += 1
+            result = self.analyze_image(screenshot, "Briefly describe what's on screen")
+            result["changed_tiles"] = tiles if tiles is not None else list(range(total_tiles))
+            return result
+        
+        self.monitor_stats["region_analyses"] += 1
+        bbox = tiles_bbox(tiles, self.tile_grid, screenshot.size)
+        result = self.analyze_image(screenshot.crop(bbox),
+                                    "Briefly describe what's shown in this part of the screen")
+        result["region"] = bbox
+        result["changed_tiles"] = tiles
+        return result
+    
     def stop_monitoring(self):
         """Stop screen monitoring."""
         self.is_monitoring = False
@@ -481,18 +553,102 @@ class MultiModalAI:
         self.screenshot_cache.clear()
         self.last_screenshot = None
         self.last_screenshot_time = None
+        self.last_screenshot_region = None
         return "Cache cleared successfully"
     
+    def _encode_frame(self, image: Image.Image) -> Dict[str, Any]:
+        """Encode a frame as a compact JPEG/WebP blob for the vision model."""
+        buffered = io.BytesIO()
+        image_format = self.video_frame_format.upper()
+        image.convert("RGB").save(buffered, format=image_format, quality=self.video_frame_quality)
+        return {"mime_type": f"image/{image_format.lower()}", "data": buffered.getvalue()}
+    
+    def _select_keyframes(self, cap, cv2, fps: float, max_frames: int,
+                          frame_interval: Optional[int], scene_threshold: int) -> Tuple[List[tuple], Dict[str, int]]:
+        """
+        Decode the video in one forward pass and keep the strongest scene changes.
+        
+        Frames are only fully retrieved at the sampling step; each sample is
+        scored by its perceptual distance to the previous sample and to the last
+        kept frame (so slow drift also counts). The top max_frames scores win and
+        near-duplicates of frames already kept are dropped.
+        
+        Returns:
+            ([(frame_index, timestamp, image)] in time order, scan statistics)
+        """
+        import heapq
+        
+        if frame_interval:
+            step = frame_interval
+        elif fps > 0:
+            step = max(1, int(round(fps / self.video_scan_fps)))
+        else:
+            step = 1
+        max_side = self.video_frame_max_side
+        stats = {"frames_decoded": 0, "frames_sampled": 0, "duplicates_skipped": 0}
+        kept = []  # min-heap of (score, frame_index, signature, image)
+        previous_signature = None
+        last_kept_signature = None
+        frame_index = 0
+        
+        while cap.grab():
+            stats["frames_decoded"] += 1
+            if frame_index % step:
+                frame_index += 1
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                frame_index += 1
+                continue
+            stats["frames_sampled"] += 1
+            
+            # Downscale to model resolution before any colour conversion
+            height, width = frame.shape[:2]
+            scale = min(1.0, max_side / max(height, width))
+            if scale < 1.0:
+                frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+            image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            signature = image_signature(image, grid=(0, 0))
+            
+            if previous_signature is None:
+                score = HASH_BITS + 1  # always keep the opening frame
+            else:
+                score = max(signature.distance(previous_signature), signature.distance(last_kept_signature))
+            previous_signature = signature
+            
+            if score >= scene_threshold:
+                if any(signature.distance(other) <= self.hash_threshold for _, _, other, _ in kept):
+                    stats["duplicates_skipped"] += 1
+                else:
+                    entry = (score, frame_index, signature, image)
+                    if len(kept) < max_frames:
+                        heapq.heappush(kept, entry)
+                    elif score > kept[0][0]:
+                        heapq.heapreplace(kept, entry)
+                    last_kept_signature = signature
+            frame_index += 1
+        
+        keyframes = [(index, index / fps if fps > 0 else 0, image)
+                     for _, index, _, image in sorted(kept, key=lambda e: e[1])]
+        return keyframes, stats
+    
     def analyze_video(self, video_path: str, prompt: str = "Describe this video", 
-                      max_frames: int = 10, frame_interval: Optional[int] = None) -> Dict[str, Any]:
+                      max_frames: int = 10, frame_interval: Optional[int] = None,
+                      max_concurrency: int = 4, scene_threshold: int = 10) -> Dict[str, Any]:
         """
         Analyze a video by extracting and analyzing key frames.
         
+        The video is decoded once, front to back; key frames are chosen by
+        scene-change score, near-identical frames are dropped, and the chosen
+        frames are sent to the model concurrently as compressed images.
+        
         Args:
             video_path: Path to the video file
             prompt: Analysis prompt
             max_frames: Maximum number of frames to extract (default: 10)
-            frame_interval: Frame interval for extraction (auto-calculated if None)
+            frame_interval: Sampling step in frames (auto-calculated if None)
+            max_concurrency: Maximum frame analyses in flight at once
+            scene_threshold: Minimum perceptual change for a frame to be a key frame
             
         Returns:
             Dict with video analysis results
@@ -523,55 +679,42 @@ class MultiModalAI:
             
             print(f"📹 Video: {duration:.2f}s, {frame_count} frames, {fps:.1f} fps, {width}x{height}")
             
-            # Calculate frame interval if not provided
-            if frame_interval is None:
-                frame_interval = max(1, frame_count // max_frames)
+            try:
+                keyframes, scan_stats = self._select_keyframes(cap, cv2, fps, max_frames,
+                                                               frame_interval, scene_threshold)
+            finally:
+                cap.release()
             
-            # Extract key frames
-            frames = []
-            frame_timestamps = []
-            frame_num = 0
-            
-            while len(frames) < max_frames and frame_num < frame_count:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
-                ret, frame = cap.read()
-                
-                if ret:
-                    # Convert BGR to RGB
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    pil_image = Image.fromarray(frame_rgb)
-                    frames.append(pil_image)
-                    
-                    # Calculate timestamp
-                    timestamp = frame_num / fps if fps > 0 else 0
-                    frame_timestamps.append(timestamp)
-                
-                frame_num += frame_interval
-            
-            cap.release()
-            
-            if not frames:
+            if not keyframes:
                 return {"success": False, "error": "No frames extracted from video"}
             
-            print(f"🎞️ Extracted {len(frames)} frames for analysis")
+            print(f"🎞️ Selected {len(keyframes)} key frames from {scan_stats['frames_sampled']} samples")
             
-            # Analyze each frame
-            frame_analyses = []
-            for i, (frame, timestamp) in enumerate(zip(frames, frame_timestamps)):
-                print(f"🔍 Analyzing frame {i+1}/{len(frames)} at {timestamp:.1f}s...")
-                
-                result = self.analyze_image(
-                    frame,
-                    f"{prompt} (Frame at {timestamp:.1f}s)"
+            # Analyze frames concurrently, bounded by max_concurrency
+            def analyze_frame(item):
+                number, (frame_index, timestamp, image) = item
+                response = self.vision_model.generate_content(
+                    [f"{prompt} (Frame at {timestamp:.1f}s)", self._encode_frame(image)]
                 )
-                
-                # Check if analysis was successful (has analysis text and no error)
-                if result.get("analysis") and result.get("confidence") != "error":
-                    frame_analyses.append({
-                        "frame_number": i + 1,
-                        "timestamp": timestamp,
-                        "description": result.get("analysis", "")
-                    })
+                return {
+                    "frame_number": number,
+                    "video_frame": frame_index,
+                    "timestamp": timestamp,
+                    "description": response.text
+                }
+            
+            from concurrent.futures import ThreadPoolExecutor
+            frame_analyses = []
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(keyframes)))) as pool:
+                futures = [pool.submit(analyze_frame, item) for item in enumerate(keyframes, 1)]
+                for future in futures:
+                    try:
+                        analysis = future.result()
+                    except Exception as e:
+                        print(f"Frame analysis failed: {e}")
+                        continue
+                    if analysis["description"]:
+                        frame_analyses.append(analysis)
             
             if not frame_analyses:
                 return {"success": False, "error": "Failed to analyze any frames"}
@@ -607,6 +750,7 @@ Please provide:
                 },
                 "frames_analyzed": len(frame_analyses),
                 "frame_descriptions": frame_analyses,
+                "scan_stats": scan_stats,
                 "summary": summary_response.text,
                 "timestamp": datetime.now().isoformat()
             }
@@ -17,6 +17,11 @@ from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 import psutil
 
+try:
+    from .music_library import MetadataCache, SpotifyLibrary, slim_item
+except ImportError:
+    from music_library import MetadataCache, SpotifyLibrary, slim_item
+
 try:
     import spotipy
     from spotipy.oauth2 import SpotifyOAuth
@@ -34,6 +39,13 @@ except ImportError:
     print("WARNING: ytmusicapi not installed. YouTube Music features will be disabled.")
     print("Install with: pip install ytmusicapi")
 
+# Seconds search and recommendation results are reused for
+SEARCH_CACHE_TTL = 6 * 3600
+RECOMMENDATIONS_CACHE_TTL = 30 * 60
+
+# Shared by every search, playback and recommendation function
+metadata_cache = MetadataCache()
+
 class SpotifyController:
     """
     Spotify Web API integration with proper OAuth2 authentication
@@ -67,7 +79,9 @@ class SpotifyController:
         
         # Cache path for token storage
         self.cache_path = Path.home() / ".yourdaddy" / ".spotify_cache"
+        self.library_path = Path.home() / ".yourdaddy" / "spotify_library.db"
         self.sp = None
+        self.library = None
         self._initialized = True
         
     def setup_spotify_auth(self) -> str:
@@ -146,6 +160,28 @@ Option B - Use credentials file:
             if "❌" in result:
                 return False
         return True
+    
+    def get_library(self) -> SpotifyLibrary:
+        """Local mirror of the user's playlists, created on first use"""
+        if self.library is None:
+            self.library_path.parent.mkdir(parents=True, exist_ok=True)
+            self.library = SpotifyLibrary(lambda: self.sp, db_path=self.library_path)
+        return self.library
+
+def _search_spotify(controller: SpotifyController, query: str, search_type: str = 'track') -> Optional[Dict]:
+    """
+    Top Spotify search result for a query, served from the metadata cache when possible
+    Args:
+        controller: Authenticated Spotify controller
+        query: Search term
+        search_type: 'track' or 'artist'
+    """
+    def fetch():
+        results = controller.sp.search(q=query, type=search_type, limit=1)
+        return [slim_item(item) for item in results.get(f'{search_type}s', {}).get('items', [])]
+    
+    items = metadata_cache.get_or_fetch(MetadataCache.key('spotify', search_type, query), SEARCH_CACHE_TTL, fetch)
+    return items[0] if items else None
 
 class YouTubeMusicController:
     """
@@ -219,6 +255,18 @@ This will guide you to copy request headers from your browser."""
             return False
         return True
 
+def _search_ytmusic(controller: YouTubeMusicController, query: str, limit: int) -> List[Dict]:
+    """YouTube Music song results for a query, served from the metadata cache when possible"""
+    def fetch():
+        return [{
+            'title': track.get('title', 'Unknown'),
+            'artists': [{'name': a['name']} for a in track.get('artists', [])],
+            'duration': track.get('duration', 'Unknown'),
+            'videoId': track.get('videoId'),
+        } for track in controller.ytmusic.search(query, filter="songs", limit=limit)]
+    
+    return metadata_cache.get_or_fetch(MetadataCache.key('ytmusic', 'songs', query, limit), SEARCH_CACHE_TTL, fetch)
+
 def search_youtube_music(query: str, limit: int = 5) -> str:
     """
     Search for songs on YouTube Music
@@ -235,7 +283,7 @@ def search_youtube_music(query: str, limit: int = 5) -> str:
             except:
                 return "🎵 YouTube Music not authenticated. Please run setup first."
         
-        results = controller.ytmusic.search(query, filter="songs", limit=limit)
+        results = _search_ytmusic(controller, query, limit)
         
         if not results:
             return f"🔍 No results found for: {query}"
@@ -269,7 +317,7 @@ def play_youtube_music(query: str) -> str:
                 return "🎵 YouTube Music not authenticated. Please run setup first."
         
         # Search for the song
-        results = controller.ytmusic.search(query, filter="songs", limit=1)
+        results = _search_ytmusic(controller, query, 1)
         
         if not results:
             return f"🔍 No results found for: {query}"
@@ -462,13 +510,11 @@ def search_and_play_spotify(query: str) -> str:
             return "🎵 Spotify not authenticated. Please run setup first."
             
         # Search for tracks
-        results = controller.sp.search(q=query, type='track', limit=1)
-        tracks = results.get('tracks', {}).get('items', [])
+        track = _search_spotify(controller, query)
         
-        if not tracks:
+        if not track:
             return f"🔍 No tracks found for: {query}"
         
-        track = tracks[0]
         track_uri = track['uri']
         track_name = track['name']
         artist_name = track['artists'][0]['name']
@@ -636,6 +682,9 @@ def create_spotify_playlist(name: str, description: str = "") -> str:
             description=description
         )
         
+        if controller.library is not None:
+            controller.library.note_created(playlist)
+        
         playlist_url = playlist['external_urls']['spotify']
         return f"✅ Created playlist: {name}\n🔗 {playlist_url}"
         
@@ -658,31 +707,25 @@ def add_to_spotify_playlist(playlist_name: str, track_query: str) -> str:
             return "🎵 Spotify not authenticated. Please run setup first."
         
         # Search for the track
-        results = controller.sp.search(q=track_query, type='track', limit=1)
-        tracks = results.get('tracks', {}).get('items', [])
+        track = _search_spotify(controller, track_query)
         
-        if not tracks:
+        if not track:
             return f"🔍 No tracks found for: {track_query}"
         
-        track = tracks[0]
         track_uri = track['uri']
         track_name = track['name']
         artist_name = track['artists'][0]['name']
         
-        # Get user's playlists
-        playlists = controller.sp.current_user_playlists(limit=50)
-        target_playlist = None
-        
-        for playlist in playlists['items']:
-            if playlist['name'].lower() == playlist_name.lower():
-                target_playlist = playlist
-                break
+        # Look the playlist up in the local mirror (covers every page of playlists)
+        library = controller.get_library()
+        target_playlist = library.find(playlist_name)
         
         if not target_playlist:
             return f"❌ Playlist '{playlist_name}' not found"
         
         # Add track to playlist
-        controller.sp.playlist_add_items(target_playlist['id'], [track_uri])
+        result = controller.sp.playlist_add_items(target_playlist['id'], [track_uri])
+        library.note_added(target_playlist['id'], [track], (result or {}).get('snapshot_id'))
         
         return f"✅ Added '{track_name}' by {artist_name} to playlist '{playlist_name}'"
         
@@ -707,6 +750,11 @@ def get_music_recommendations(seed_type: str = "genre", seed_value: str = "pop",
         
         limit = max(1, min(20, limit))  # Clamp between 1 and 20
         
+        cache_key = MetadataCache.key('spotify', 'recommendations', seed_type, seed_value, limit)
+        tracks = metadata_cache.get(cache_key)
+        if tracks:
+            return _format_recommendations(tracks, seed_type, seed_value)
+        
         # Build recommendation parameters
         kwargs = {'limit': limit}
         
@@ -714,18 +762,16 @@ def get_music_recommendations(seed_type: str = "genre", seed_value: str = "pop",
             kwargs['seed_genres'] = [seed_value.lower()]
         elif seed_type == 'artist':
             # Search for artist
-            results = controller.sp.search(q=seed_value, type='artist', limit=1)
-            artists = results.get('artists', {}).get('items', [])
-            if not artists:
+            artist = _search_spotify(controller, seed_value, 'artist')
+            if not artist:
                 return f"🔍 Artist not found: {seed_value}"
-            kwargs['seed_artists'] = [artists[0]['id']]
+            kwargs['seed_artists'] = [artist['id']]
         elif seed_type == 'track':
             # Search for track
-            results = controller.sp.search(q=seed_value, type='track', limit=1)
-            tracks = results.get('tracks', {}).get('items', [])
-            if not tracks:
+            track = _search_spotify(controller, seed_value)
+            if not track:
                 return f"🔍 Track not found: {seed_value}"
-            kwargs['seed_tracks'] = [tracks[0]['id']]
+            kwargs['seed_tracks'] = [track['id']]
         else:
             return f"❌ Invalid seed type: {seed_type}. Use 'genre', 'artist', or 'track'"
         
@@ -736,18 +782,23 @@ def get_music_recommendations(seed_type: str = "genre", seed_value: str = "pop",
         if not tracks:
             return f"🎵 No recommendations found for {seed_type}: {seed_value}"
         
-        # Format recommendations
-        result = f"🎵 Recommendations based on {seed_type}: {seed_value}\n\n"
-        for i, track in enumerate(tracks, 1):
-            track_name = track['name']
-            artist_name = track['artists'][0]['name']
-            result += f"{i}. {track_name} by {artist_name}\n"
-        
-        return result.strip()
+        tracks = [slim_item(track) for track in tracks]
+        metadata_cache.set(cache_key, tracks, RECOMMENDATIONS_CACHE_TTL)
+        return _format_recommendations(tracks, seed_type, seed_value)
         
     except Exception as e:
         return f"❌ Recommendations error: {str(e)}"
 
+def _format_recommendations(tracks: List[Dict], seed_type: str, seed_value: str) -> str:
+    """Format recommended tracks for display"""
+    result = f"🎵 Recommendations based on {seed_type}: {seed_value}\n\n"
+    for i, track in enumerate(tracks, 1):
+        track_name = track['name']
+        artist_name = track['artists'][0]['name']
+        result += f"{i}. {track_name} by {artist_name}\n"
+    
+    return result.strip()
+
 def get_spotify_playlists() -> str:
     """
     Get user's Spotify playlists
@@ -760,15 +811,15 @@ def get_spotify_playlists() -> str:
         if not controller._ensure_authenticated():
             return "🎵 Spotify not authenticated. Please run setup first."
         
-        playlists = controller.sp.current_user_playlists(limit=50)
+        playlists = controller.get_library().playlists()
         
-        if not playlists or not playlists.get('items'):
+        if not playlists:
             return "🎵 No playlists found"
         
         result = "🎵 Your Spotify Playlists:\n\n"
-        for i, playlist in enumerate(playlists['items'], 1):
+        for i, playlist in enumerate(playlists, 1):
             name = playlist['name']
-            track_count = playlist['tracks']['total']
+            track_count = playlist['total']
             result += f"{i}. {name} ({track_count} tracks)\n"
         
         return result.strip()
@@ -0,0 +1,141 @@
+# Screen Observation Helpers for YourDaddy Assistant
+"""
+Cheap change detection for screenshots and video frames, used by the
+multi-modal module to avoid vision API calls when nothing changed:
+- Perceptual difference hash (dHash) on a downscaled grayscale array
+- Hamming-distance comparison instead of exact byte hashes
+- Per-tile hashes so only changed screen regions need re-analysis
+- Adaptive polling interval that backs off while the screen is idle
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Mean brightness (0-255) may drift this much before two images are treated as different.
+# dHash only encodes gradients, so flat images of different colours would otherwise match.
+LUMA_TOLERANCE = 8.0
+HASH_BITS = 64
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+def _dhash_bits(gray: np.ndarray) -> int:
+    """dHash of a 8x9 grayscale block: one bit per horizontal gradient"""
+    bits = (gray[:, 1:] > gray[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _grayscale(image: Image.Image, size: Tuple[int, int]) -> np.ndarray:
+    """Downscale first, then convert, so full-resolution frames stay cheap"""
+    small = image.resize(size, Image.Resampling.BOX, reducing_gap=2.0)
+    return np.asarray(small.convert("L"), dtype=np.int16)
+
+
+@dataclass
+class ImageSignature:
+    """Perceptual fingerprint of an image (global and per-tile)"""
+    dhash: int
+    luma: float
+    grid: Tuple[int, int] = (0, 0)
+    tile_hashes: List[int] = field(default_factory=list)
+    tile_luma: List[float] = field(default_factory=list)
+
+    @property
+    def hex(self) -> str:
+        """Stable string form: 16 hex digits of dHash + 2 of mean brightness"""
+        return f"{self.dhash:016x}{int(round(self.luma)):02x}"
+
+    @classmethod
+    def from_hex(cls, value: str) -> Optional["ImageSignature"]:
+        try:
+            return cls(int(value[:16], 16), float(int(value[16:18], 16)))
+        except (TypeError, ValueError):
+            return None
+
+    def distance(self, other: "ImageSignature") -> int:
+        """Hamming distance, or the maximum if overall brightness changed"""
+        if abs(self.luma - other.luma) > LUMA_TOLERANCE:
+            return HASH_BITS
+        return hamming_distance(self.dhash, other.dhash)
+
+    def changed_tiles(self, other: "ImageSignature", threshold: int = 3) -> List[int]:
+        """Indices of tiles that differ from the same tile in other"""
+        if self.grid != other.grid or not self.tile_hashes:
+            return list(range(self.grid[0] * self.grid[1]))
+        changed = []
+        for i, (a, b) in enumerate(zip(self.tile_hashes, other.tile_hashes)):
+            if hamming_distance(a, b) > threshold or \
+                    abs(self.tile_luma[i] - other.tile_luma[i]) > LUMA_TOLERANCE:
+                changed.append(i)
+        return changed
+
+
+def image_signature(image: Image.Image, grid: Tuple[int, int] = (4, 4)) -> ImageSignature:
+    """
+    Compute the perceptual signature of an image.
+
+    Args:
+        image: PIL image of any size or mode
+        grid: (columns, rows) of tiles for region-level diffs; (0, 0) disables tiles
+
+    Returns:
+        ImageSignature
+    """
+    cols, rows = grid
+    if cols and rows:
+        # One downscale serves every tile: each tile becomes an 8x9 block
+        gray = _grayscale(image, (cols * 9, rows * 8))
+        tile_hashes, tile_luma = [], []
+        for row in range(rows):
+            for col in range(cols):
+                block = gray[row * 8:(row + 1) * 8, col * 9:(col + 1) * 9]
+                tile_hashes.append(_dhash_bits(block))
+                tile_luma.append(float(block.mean()))
+        overall = _grayscale(image, (9, 8))
+        return ImageSignature(_dhash_bits(overall), float(gray.mean()), grid,
+                              tile_hashes, tile_luma)
+    overall = _grayscale(image, (9, 8))
+    return ImageSignature(_dhash_bits(overall), float(overall.mean()))
+
+
+def tiles_bbox(tiles: List[int], grid: Tuple[int, int],
+               size: Tuple[int, int]) -> Optional[Tuple[int, int, int, int]]:
+    """Pixel bounding box (left, top, right, bottom) covering the given tiles"""
+    if not tiles:
+        return None
+    cols, rows = grid
+    width, height = size
+    tile_cols = [t % cols for t in tiles]
+    tile_rows = [t // cols for t in tiles]
+    return (min(tile_cols) * width // cols, min(tile_rows) * height // rows,
+            (max(tile_cols) + 1) * width // cols, (max(tile_rows) + 1) * height // rows)
+
+
+class AdaptiveInterval:
+    """
+    Polling interval that grows while nothing changes and snaps back to
+    the minimum as soon as a change is seen.
+    """
+
+    def __init__(self, minimum: float = 2.0, maximum: float = 16.0, backoff: float = 1.5):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.backoff = backoff
+        self.current = minimum
+
+    def changed(self) -> float:
+        self.current = self.minimum
+        return self.current
+
+    def idle(self) -> float:
+        self.current = min(self.maximum, self.current * self.backoff)
+        return self.current
@@ -14,7 +14,7 @@ from utils.session_activity_logger import (
 )
 
 from flask import Flask, jsonify, request, send_from_directory
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
 from flask_jwt_extended import (
     JWTManager, jwt_required, create_access_token, 
@@ -119,13 +119,148 @@ except ImportError as e:
     LLM_PROVIDER_AVAILABLE = False
     print(f"âš ï¸ LLM providers not available: {e}")
 
+# LLM admission control (standard library only)
+try:
+    from modules.llm_scheduler import INTERACTIVE, STREAM, LLMOverloadedError, get_scheduler, llm_request
+    LLM_SCHEDULER_AVAILABLE = True
+except ImportError as e:
+    LLM_SCHEDULER_AVAILABLE = False
+    print(f"⚠️ LLM scheduler not available: {e}")
+    from contextlib import contextmanager
+
+    STREAM, INTERACTIVE = 0, 1
+
+    class LLMOverloadedError(Exception):
+        retry_after = 1.0
+
+    class _UnlimitedScheduler:
+        """Admits every request; used when the scheduler can't be imported"""
+
+        def would_shed(self, provider, priority, session_id=None):
+            return None
+
+        @contextmanager
+        def slot(self, provider, priority=INTERACTIVE, session_id=None):
+            yield
+
+        def stats(self):
+            return {"available": False}
+
+    _unlimited_scheduler = _UnlimitedScheduler()
+
+    def get_scheduler():
+        return _unlimited_scheduler
+
+    @contextmanager
+    def llm_request(session_id=None, priority=None):
+        yield
+
+# Identical in-flight chat requests share one run (standard library only)
+try:
+    from modules.request_coalescing import get_coalescer
+    REQUEST_COALESCING_AVAILABLE = True
+except ImportError as e:
+    REQUEST_COALESCING_AVAILABLE = False
+    print(f"⚠️ Request coalescing not available: {e}")
+
+    class _PassThroughCoalescer:
+        """Runs every request on its own; used when coalescing can't be imported"""
+
+        def key(self, endpoint, message, user=None, context=None, stateless=False):
+            return None
+
+        def do(self, endpoint, key, fn):
+            return fn(), False
+
+        def stream(self, endpoint, key, fn):
+            return fn(), False
+
+        def stats(self):
+            return {"available": False}
+
+    _pass_through_coalescer = _PassThroughCoalescer()
+
+    def get_coalescer():
+        return _pass_through_coalescer
+
+# State shared by all web workers: a SQLite file by default, or Redis (STATE_STORE_URL)
+try:
+    from modules.shared_state import ChatSessionStore, get_state_store, shared_secret, socketio_queue_options
+    SHARED_STATE_AVAILABLE = True
+except ImportError as e:
+    SHARED_STATE_AVAILABLE = False
+    print(f"⚠️ Shared state not available, keeping state in memory: {e}")
+
+    class _MemoryStateStore:
+        """Per-process state; only correct with a single web worker"""
+        url = "memory://"
+
+        def __init__(self):
+            self._data = {}
+            self._lock = threading.Lock()
+
+        def get(self, key, default=None):
+            return self._data.get(key, default)
+
+        def set(self, key, value, ttl=None):
+            self._data[key] = value
+
+        def add(self, key, value, ttl=None):
+            with self._lock:
+                if key in self._data:
+                    return False
+                self._data[key] = value
+                return True
+
+        def delete(self, key):
+            return self._data.pop(key, None) is not None
+
+        def incr(self, key, amount=1, ttl=None):
+            with self._lock:
+                self._data[key] = self._data.get(key, 0) + amount
+                return self._data[key]
+
+    _memory_state_store = _MemoryStateStore()
+
+    def get_state_store():
+        return _memory_state_store
+
+    def shared_secret(store, name):
+        store.add(f"secret:{name}", secrets.token_hex(32))
+        return store.get(f"secret:{name}")
+
+    def socketio_queue_options(url):
+        return {}
+
+    class ChatSessionStore:
+        """Keeps nothing; chats then live only in the worker's own cache"""
+
+        def __init__(self, store=None):
+            self.store = store
+
+        def load(self, session_id):
+            return None
+
+        def resume(self, session_id, chat):
+            return False
+
+        def save(self, session_id, chat):
+            pass
+
+        def delete(self, session_id):
+            return False
+
 # System monitoring
 try:
     import psutil
+    from modules.telemetry import get_sampler
     PSUTIL_AVAILABLE = True
 except ImportError:
     PSUTIL_AVAILABLE = False
 
+# Socket.IO room of clients receiving pushed system stats
+SYSTEM_STATS_ROOM = 'system_stats'
+
 # Voice processing
 try:
     import vosk
@@ -148,8 +283,11 @@ load_dotenv()
 app = Flask(__name__)
 
 # Security Configuration
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', secrets.token_hex(32))
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', secrets.token_hex(32))
+# Every worker must sign with the same keys, so generated ones live in the shared store
+state_store = get_state_store()
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', '1'))
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY') or shared_secret(state_store, 'flask_secret_key')
+app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY') or shared_secret(state_store, 'jwt_secret_key')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
 
@@ -161,7 +299,8 @@ limiter = Limiter(
     app=app,
     key_func=get_remote_address,
     default_limits=["200 per hour", "50 per minute"],
-    storage_uri="memory://"
+    # Counters shared by all workers; one worker keeps them in memory
+    storage_uri=state_store.url if WEB_WORKERS > 1 else "memory://"
 )
 
 # Secure CORS Configuration
@@ -180,7 +319,9 @@ socketio = SocketIO(
     app, 
     cors_allowed_origins=ALLOWED_ORIGINS,
     async_mode='threading',
-    engineio_logger=False
+    engineio_logger=False,
+    # With several workers, emits are relayed to clients connected to the others
+    **(socketio_queue_options(state_store.url) if WEB_WORKERS > 1 else {})
 )
 
 # User Management (Simple in-memory store - replace with database in production)
@@ -232,8 +373,6 @@ class ModernAssistant:
         self.conversational_ai = None
         self.multilingual = None
         self.voice_listening = False
-        self.system_stats_cache = {}
-        self.cache_timestamp = 0
         self.voice_recognizer = None
         self.tts_engine = None
         self.audio_stream = None
@@ -248,10 +387,10 @@ class ModernAssistant:
         self.init_memory()
         self.init_voice_system()
         
-        # Network speed tracking
-        self.last_network_stats = None
-        self.last_network_time = None
-        self.network_speed_history = []
+        # Socket.IO clients subscribed to system stats pushes
+        self.stats_subscribers = set()
+        self._stats_subscription = None
+        self._last_stats_push = 0
         
         # Start background tasks
         self.start_system_monitoring()
@@ -324,6 +463,12 @@ class ModernAssistant:
             self.llm_chat = None
             self.current_llm_config = None
     
+    def llm_slot_provider(self):
+        """Provider whose LLM scheduler slots a chat request will use"""
+        if getattr(self, 'llm_chat', None):
+            return self.llm_chat.provider
+        return LLMFactory.detect_provider()[0]
+    
     def init_multimodal_ai(self):
         """Initialize multimodal AI"""
         if MULTIMODAL_AVAILABLE:
@@ -462,31 +607,35 @@ class ModernAssistant:
     
     def start_system_monitoring(self):
         """Start background system monitoring"""
-        try:
-            def monitor_loop():
-                while True:
-                    try:
-                        stats = self.get_real_time_system_stats()
-                        socketio.emit('system_stats_update', stats)
-                        time.sleep(5)  # Update every 5 seconds
-                    except Exception as e:
-                        print(f"System monitoring error: {e}")
-                        time.sleep(10)
-            
-            monitor_thread = threading.Thread(target=monitor_loop, daemon=True)
-            monitor_thread.start()
+        # Stats come from the shared telemetry sampler; nothing is pushed
+        # until a Socket.IO client subscribes
+        if PSUTIL_AVAILABLE:
             print("âœ… System monitoring started")
-        except Exception as e:
-            print(f"âš ï¸ System monitoring could not start: {e}")
+        else:
+            print("âš ï¸ System monitoring could not start: psutil not available")
+    
+    def add_stats_subscriber(self, sid):
+        """Start pushing system stats to a Socket.IO client"""
+        self.stats_subscribers.add(sid)
+        if PSUTIL_AVAILABLE and self._stats_subscription is None:
+            self._stats_subscription = get_sampler().subscribe(self._push_system_stats)
+    
+    def remove_stats_subscriber(self, sid):
+        """Stop pushing system stats to a Socket.IO client"""
+        self.stats_subscribers.discard(sid)
+        if not self.stats_subscribers and self._stats_subscription is not None:
+            get_sampler().unsubscribe(self._stats_subscription)
+            self._stats_subscription = None
+    
+    def _push_system_stats(self, sample):
+        """Sampler callback; emits to subscribers every 5 seconds"""
+        if not self.stats_subscribers or sample['time'] - self._last_stats_push < 4.5:
+            return
+        self._last_stats_push = sample['time']
+        socketio.emit('system_stats_update', self.get_real_time_system_stats(), to=SYSTEM_STATS_ROOM)
     
     def get_real_time_system_stats(self):
         """Get real-time system statistics"""
-        current_time = time.time()
-        
-        # Cache stats for 2 seconds to avoid excessive calls
-        if current_time - self.cache_timestamp < 2:
-            return self.system_stats_cache
-        
         stats = {
             "timestamp": datetime.now().isoformat(),
             "cpu_usage": 0,
@@ -501,83 +650,30 @@ class ModernAssistant:
         
         if PSUTIL_AVAILABLE:
             try:
-                # Basic system stats
+                # Latest snapshot from the shared sampler; never blocks on psutil
+                sampler = get_sampler()
+                sample = sampler.latest()
+                
+                # Network speeds averaged over recent samples for a smoother display
+                avg_download = sampler.average('net_download_mbps')
+                avg_upload = sampler.average('net_upload_mbps')
+                
                 stats.update({
-                    "cpu_usage": psutil.cpu_percent(interval=0.1),
-                    "memory_usage": psutil.virtual_memory().percent,
-                    "disk_usage": psutil.disk_usage('C:\\' if os.name == 'nt' else '/').percent,
-                    "active_tasks": len(psutil.pids()),
+                    "timestamp": sample['timestamp'],
+                    "cpu_usage": sample['cpu_percent'],
+                    "memory_usage": sample['memory_percent'],
+                    "disk_usage": sample['disk_percent'] or 0,
+                    "active_tasks": sample['process_count'],
+                    "network_speed_download": avg_download,
+                    "network_speed_upload": avg_upload,
+                    "network_mbps": (avg_download + avg_upload) / 2
                 })
                 
-                # Enhanced network speed calculation
-                network_stats = self._calculate_network_speed(current_time)
-                stats.update(network_stats)
-                
             except Exception as e:
                 print(f"PSUtil error: {e}")
         
-        self.system_stats_cache = stats
-        self.cache_timestamp = current_time
         return stats
     
-    def _calculate_network_speed(self, current_time):
-        """Calculate network download and upload speeds in Mbps"""
-        network_stats = {
-            "network_mbps": 0,
-            "network_speed_download": 0,
-            "network_speed_upload": 0
-        }
-        
-        try:
-            # Get current network I/O counters
-            current_net = psutil.net_io_counters()
-            
-            if self.last_network_stats is not None and self.last_network_time is not None:
-                # Calculate time difference
-                time_diff = current_time - self.last_network_time
-                
-                if time_diff > 0:
-                    # Calculate bytes transferred since last measurement
-                    bytes_sent_diff = current_net.bytes_sent - self.last_network_stats.bytes_sent
-                    bytes_recv_diff = current_net.bytes_recv - self.last_network_stats.bytes_recv
-                    
-                    # Convert to Mbps (bytes/sec -> Mbps)
-                    upload_bps = bytes_sent_diff / time_diff
-                    download_bps = bytes_recv_diff / time_diff
-                    
-                    upload_mbps = (upload_bps * 8) / (1024 * 1024)  # Convert to Mbps
-                    download_mbps = (download_bps * 8) / (1024 * 1024)  # Convert to Mbps
-                    
-                    # Store in history for smoothing (keep last 5 measurements)
-                    self.network_speed_history.append({
-                        'download': download_mbps,
-                        'upload': upload_mbps
-                    })
-                    
-                    # Keep only last 5 measurements for averaging
-                    if len(self.network_speed_history) > 5:
-                        self.network_speed_history.pop(0)
-                    
-                    # Calculate averaged speeds for smoother display
-                    if self.network_speed_history:
-                        avg_download = sum(h['download'] for h in self.network_speed_history) / len(self.network_speed_history)
-                        avg_upload = sum(h['upload'] for h in self.network_speed_history) / len(self.network_speed_history)
-                        
-                        network_stats.update({
-                            "network_speed_download": max(0, avg_download),
-                            "network_speed_upload": max(0, avg_upload),
-                            "network_mbps": max(0, (avg_download + avg_upload) / 2)
-                        })
-            
-            # Update tracking variables
-            self.last_network_stats = current_net
-            self.last_network_time = current_time
-            
-        except Exception as e:
-            print(f"Network speed calculation error: {e}")
-        
-        return network_stats
-    
     def process_command(self, command_text, model_preference=None):
         """Process user command with multilingual support"""
         log_query(command_text)
@@ -834,7 +930,26 @@ Just speak naturally - I understand context! ðŸŽ‰"""
         except Exception as e:
             return f"Screen analysis error: {str(e)}"
     
-    def process_enhanced_chat(self, message, context=None, image_data=None, model_preference=None):
+    def process_enhanced_chat(self, message, context=None, image_data=None, model_preference=None, user=None):
+        """
+        Enhanced chat processing; identical requests already in flight share one run.
+        `user` (JWT identity or socket sid) scopes the sharing; without it nothing is shared.
+        """
+        coalescer = get_coalescer()
+        key = coalescer.key(
+            'enhanced_chat', message,
+            user=user,
+            context=(context or {}, image_data, model_preference),
+            stateless=not context and not image_data
+        ) if user else None
+        response, shared = coalescer.do('enhanced_chat', key, lambda: self._process_enhanced_chat(
+            message, context, image_data, model_preference
+        ))
+        if shared:
+            response["features_used"] = response["features_used"] + ["coalesced"]
+        return response
+    
+    def _process_enhanced_chat(self, message, context=None, image_data=None, model_preference=None):
         """Enhanced chat processing with full AI integration and all features"""
         features_used = []
         suggestions = []
@@ -928,6 +1043,8 @@ Just speak naturally - I understand context! ðŸŽ‰"""
                     else:
                         response_text += "âŒ No AI system available for processing"
                         
+                except LLMOverloadedError:
+                    raise  # Answered with 429 by the caller
                 except Exception as e:
                     response_text += f"âŒ AI processing failed: {str(e)}\n\n"
             
@@ -1027,6 +1144,8 @@ Just speak naturally - I understand context! ðŸŽ‰"""
                 "message_type": self._classify_message_type(processed_message)
             }
             
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             import traceback
             error_details = traceback.format_exc()
@@ -1378,15 +1497,12 @@ def api_register():
         if len(password) < 6:
             return jsonify({"error": "Password must be at least 6 characters"}), 400
         
-        # Check if user already exists
-        if username in USERS_DB:
-            return jsonify({"error": "Username already exists"}), 409
-        
-        # Create new user
-        USERS_DB[username] = {
+        # Create new user unless it exists; registered users live in the shared store
+        if username in USERS_DB or not state_store.add(f"user:{username}", {
             "password_hash": generate_password_hash(password),
             "role": "user"
-        }
+        }):
+            return jsonify({"error": "Username already exists"}), 409
         
         # Create tokens
         access_token = create_access_token(
@@ -1462,7 +1578,7 @@ def api_login():
 def api_verify_token():
     """Verify JWT token is valid"""
     current_user = get_jwt_identity()
-    user = USERS_DB.get(current_user)
+    user = USERS_DB.get(current_user) or state_store.get(f"user:{current_user}")
     
     return jsonify({
         "valid": True,
@@ -1517,8 +1633,15 @@ def api_chat():
         if not message and not image_data:
             return jsonify({"error": "No message or image provided"}), 400
         
-        # Process with full AI capabilities
-        response = assistant.process_enhanced_chat(message, context, image_data)
+        # Process with full AI capabilities, charging LLM slots to this user
+        if LLM_PROVIDER_AVAILABLE:
+            retry_after = get_scheduler().would_shed(assistant.llm_slot_provider(), INTERACTIVE, current_user)
+            if retry_after:
+                return llm_overloaded_response(retry_after)
+            with llm_request(session_id=current_user):
+                response = assistant.process_enhanced_chat(message, context, image_data, user=current_user)
+        else:
+            response = assistant.process_enhanced_chat(message, context, image_data, user=current_user)
         
         return jsonify({
             "message": message,
@@ -1530,6 +1653,8 @@ def api_chat():
             "user": current_user,
             "timestamp": datetime.now().isoformat()
         })
+    except LLMOverloadedError as e:
+        return llm_overloaded_response(e.retry_after)
     except Exception as e:
         logging.error(f"Chat API error: {str(e)}")
         return jsonify({"error": "Chat processing failed"}), 500
@@ -1574,8 +1699,21 @@ def api_command():
         return jsonify({"error": "Internal server error"}), 500
 
 # Chat Streaming Session Management
+# Interfaces are cached per worker; histories live in the shared store so any
+# worker can resume a session without sticky load balancing
 chat_sessions = {}
 chat_session_lock = threading.Lock()
+chat_session_store = ChatSessionStore(state_store)
+
+def get_chat_session(session_id):
+    """Chat interface for a session, resuming history saved by any worker"""
+    with chat_session_lock:
+        chat = chat_sessions.get(session_id)
+        if chat is None:
+            chat = chat_sessions[session_id] = UnifiedChatInterface(session_id=session_id)
+            chat.add_system_message("You are a helpful AI assistant. Respond concisely and accurately.")
+        chat_session_store.resume(session_id, chat)
+    return chat
 
 @app.route('/api/chat/stream', methods=['POST'])
 @jwt_required(optional=True)
@@ -1600,25 +1738,27 @@ def api_chat_stream():
         if not message:
             return jsonify({"error": "No message provided"}), 400
         
+        if LLM_PROVIDER_AVAILABLE:
+            retry_after = get_scheduler().would_shed(assistant.llm_slot_provider(), STREAM, session_id)
+            if retry_after:
+                return llm_overloaded_response(retry_after)
+        
         logger.info(f"ðŸ”„ Streaming chat for user: {current_user}, session: {session_id}")
         
+        # Re-sent messages attach to the stream already running for them
+        coalescer = get_coalescer()
+        coalesce_key = coalescer.key('chat_stream', message, user=current_user,
+                                     context=data.get('session_id'), stateless='session_id' not in data)
+        
         def generate_stream():
             """Generate streaming response tokens"""
             try:
-                # Get or create chat session
-                with chat_session_lock:
-                    if session_id not in chat_sessions:
-                        if LLM_PROVIDER_AVAILABLE:
-                            chat_sessions[session_id] = UnifiedChatInterface()
-                            chat_sessions[session_id].add_system_message(
-                                "You are a helpful AI assistant. Respond concisely and accurately."
-                            )
-                        else:
-                            # Fallback if LLM not available
-                            yield f"data: {json.dumps({'error': 'LLM provider not available'})}\n\n"
-                            return
-                    
-                    chat = chat_sessions[session_id]
+                # Get or resume the chat session; another worker may have served it last
+                if not LLM_PROVIDER_AVAILABLE:
+                    # Fallback if LLM not available
+                    yield f"data: {json.dumps({'error': 'LLM provider not available'})}\n\n"
+                    return
+                chat = get_chat_session(session_id)
                 
                 # Stream the response
                 start_time = time.time()
@@ -1628,8 +1768,11 @@ def api_chat_stream():
                 logger.debug(f"Starting stream for message: {message[:50]}...")
                 
                 try:
-                    # Get streaming response
-                    for token in chat.chat(message, stream=True):
+                    # Get streaming response, shared with identical requests in flight
+                    stream, shared = coalescer.stream(
+                        'chat_stream', coalesce_key, lambda: chat.chat(message, stream=True)
+                    )
+                    for token in stream:
                         tokens += 1
                         full_response += token
                         
@@ -1643,12 +1786,20 @@ def api_chat_stream():
                         
                         # Small delay to prevent overwhelming client
                         time.sleep(0.001)
+                except LLMOverloadedError as overloaded:
+                    error_data = json.dumps({'error': str(overloaded), 'retry_after': overloaded.retry_after})
+                    yield f"data: {error_data}\n\n"
+                    return
                 except Exception as stream_error:
                     logger.error(f"Streaming error: {stream_error}")
                     error_data = json.dumps({'error': f'Streaming failed: {str(stream_error)}'})
                     yield f"data: {error_data}\n\n"
                     return
                 
+                # Save the turn so any worker can resume the session
+                if not shared:
+                    chat_session_store.save(session_id, chat)
+                
                 # Send completion stats
                 duration = time.time() - start_time
                 completion_data = json.dumps({
@@ -1657,6 +1808,7 @@ def api_chat_stream():
                     'duration': round(duration, 2),
                     'tokens_per_second': round(tokens / duration, 2) if duration > 0 else 0,
                     'full_response': full_response,
+                    'coalesced': shared,
                     'user': current_user,
                     'timestamp': datetime.now().isoformat()
                 })
@@ -1680,13 +1832,14 @@ def api_chat_stream():
 def api_get_session(session_id):
     """Get information about a chat session"""
     try:
-        if session_id not in chat_sessions:
+        stored = chat_session_store.load(session_id)
+        if stored is None and session_id not in chat_sessions:
             return jsonify({"error": "Session not found"}), 404
         
-        chat = chat_sessions[session_id]
+        history = stored["history"] if stored else chat_sessions[session_id].conversation_history
         stats = {
             "session_id": session_id,
-            "messages": len(chat.conversation_history),
+            "messages": len(history),
             "timestamp": datetime.now().isoformat()
         }
         
@@ -1700,9 +1853,9 @@ def api_delete_session(session_id):
     """Delete a chat session"""
     try:
         with chat_session_lock:
-            if session_id in chat_sessions:
-                del chat_sessions[session_id]
-                return jsonify({"success": True, "message": "Session deleted"})
+            cached = chat_sessions.pop(session_id, None) is not None
+        if chat_session_store.delete(session_id) or cached:
+            return jsonify({"success": True, "message": "Session deleted"})
         
         return jsonify({"error": "Session not found"}), 404
     except Exception as e:
@@ -1719,6 +1872,31 @@ def api_system_stats():
     except Exception as e:
         return jsonify({"error": "Failed to retrieve system stats"}), 500
 
+def llm_overloaded_response(retry_after):
+    """429 for a chat request the LLM scheduler shed"""
+    response = jsonify({
+        "error": "The assistant is busy, please retry shortly",
+        "retry_after": retry_after
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+@app.route('/api/llm/scheduler')
+@jwt_required()
+@limiter.limit("60 per minute")
+def api_llm_scheduler():
+    """LLM slot usage, queue depths and queue-time percentiles - PROTECTED"""
+    if not LLM_PROVIDER_AVAILABLE:
+        return jsonify({"error": "LLM providers not available"}), 503
+    return jsonify(get_scheduler().stats())
+
+@app.route('/api/chat/coalescing')
+@jwt_required()
+@limiter.limit("60 per minute")
+def api_chat_coalescing():
+    """Identical in-flight chat requests served from one run, per endpoint - PROTECTED"""
+    return jsonify(get_coalescer().stats())
+
 @app.route('/api/weather')
 @jwt_required()
 @limiter.limit("20 per minute")
@@ -2269,6 +2447,8 @@ def api_process_voice():
 def handle_connect():
     """Handle client connection"""
     print(f"Client connected: {request.sid}")
+    # Dashboards expect stats pushes from the moment they connect
+    subscribe_system_stats()
     emit('connected', {
         'message': 'Connected to YourDaddy Assistant',
         'timestamp': datetime.now().isoformat()
@@ -2278,6 +2458,22 @@ def handle_connect():
 def handle_disconnect():
     """Handle client disconnection"""
     print(f"Client disconnected: {request.sid}")
+    if hasattr(assistant, 'remove_stats_subscriber'):
+        assistant.remove_stats_subscriber(request.sid)
+
+@socketio.on('subscribe_system_stats')
+def subscribe_system_stats():
+    """Start receiving system_stats_update pushes"""
+    join_room(SYSTEM_STATS_ROOM)
+    if hasattr(assistant, 'add_stats_subscriber'):
+        assistant.add_stats_subscriber(request.sid)
+
+@socketio.on('unsubscribe_system_stats')
+def unsubscribe_system_stats():
+    """Stop receiving system_stats_update pushes"""
+    leave_room(SYSTEM_STATS_ROOM)
+    if hasattr(assistant, 'remove_stats_subscriber'):
+        assistant.remove_stats_subscriber(request.sid)
 
 @socketio.on('command')
 def handle_command(data):
@@ -2332,7 +2528,9 @@ def handle_enhanced_chat(data):
         model = data.get('model')  # Get model preference
         
         if message or image_data:
-            response = assistant.process_enhanced_chat(message, context, image_data, model_preference=model)
+            with llm_request(session_id=request.sid):
+                response = assistant.process_enhanced_chat(message, context, image_data, model_preference=model,
+                                                           user=request.sid)
             emit('enhanced_chat_response', {
                 'message': message,
                 'response': response['response'],
@@ -2346,6 +2544,8 @@ def handle_enhanced_chat(data):
             })
         else:
             emit('enhanced_chat_error', {'error': 'No message or image provided'})
+    except LLMOverloadedError as e:
+        emit('enhanced_chat_error', {'error': str(e), 'retry_after': e.retry_after})
     except Exception as e:
         emit('enhanced_chat_error', {'error': f'Chat processing failed: {str(e)}'})
 
@@ -2365,19 +2565,11 @@ def handle_chat_stream(data):
         
         logger.info(f"ðŸ“¡ WebSocket chat stream started: {session_id}")
         
-        # Get or create chat session
-        with chat_session_lock:
-            if session_id not in chat_sessions:
-                if LLM_PROVIDER_AVAILABLE:
-                    chat_sessions[session_id] = UnifiedChatInterface()
-                    chat_sessions[session_id].add_system_message(
-                        "You are a helpful AI assistant. Respond concisely and accurately."
-                    )
-                else:
-                    emit('chat_stream_error', {'error': 'LLM provider not available'})
-                    return
-            
-            chat = chat_sessions[session_id]
+        # Get or resume the chat session; another worker may have served it last
+        if not LLM_PROVIDER_AVAILABLE:
+            emit('chat_stream_error', {'error': 'LLM provider not available'})
+            return
+        chat = get_chat_session(session_id)
         
         # Stream the response
         start_time = time.time()
@@ -2385,8 +2577,13 @@ def handle_chat_stream(data):
         full_response = ""
         
         try:
-            # Stream tokens
-            for token in chat.chat(message, stream=True):
+            # Stream tokens, shared with identical requests in flight for this session
+            coalescer = get_coalescer()
+            stream, shared = coalescer.stream(
+                'socket_chat_stream', coalescer.key('socket_chat_stream', message, user=session_id),
+                lambda: chat.chat(message, stream=True)
+            )
+            for token in stream:
                 tokens += 1
                 full_response += token
                 
@@ -2397,11 +2594,18 @@ def handle_chat_stream(data):
                     'partial': full_response
                 }, skip_sid=False)  # Send to current client
         
+        except LLMOverloadedError as overloaded:
+            emit('chat_stream_error', {'error': str(overloaded), 'retry_after': overloaded.retry_after})
+            return
         except Exception as stream_error:
             logger.error(f"WebSocket streaming error: {stream_error}")
             emit('chat_stream_error', {'error': f'Streaming failed: {str(stream_error)}'})
             return
         
+        # Save the turn so any worker can resume the session
+        if not shared:
+            chat_session_store.save(session_id, chat)
+        
         # Send completion signal with stats
         duration = time.time() - start_time
         emit('chat_complete', {
@@ -2409,6 +2613,7 @@ def handle_chat_stream(data):
             'duration': round(duration, 2),
             'tokens_per_second': round(tokens / duration, 2) if duration > 0 else 0,
             'full_response': full_response,
+            'coalesced': shared,
             'session_id': session_id,
             'timestamp': datetime.now().isoformat()
         })
@@ -3422,6 +3627,7 @@ if __name__ == '__main__':
         print(f"ðŸ”’ Security: Rate limiting enabled")
         print(f"ðŸ”’ Security: CORS restricted to: {', '.join(ALLOWED_ORIGINS)}")
         print(f"ðŸ”’ Security: Host binding: {host}")
+        print(f"   Shared state: {state_store.url} ({WEB_WORKERS} worker(s))")
         print("")
         print(f"âš ï¸  Default credentials: username='admin', password='{os.getenv('ADMIN_PASSWORD', 'changeme123')}'")
         print("âš ï¸  CHANGE THE PASSWORD in .env file before production!")
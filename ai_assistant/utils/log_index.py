@@ -0,0 +1,394 @@
+"""
+Incremental Log Index for YourDaddy Assistant
+=============================================
+
+Parses the files written by utils.logging_config into a SQLite store:
+- Each file is read from the offset reached last time (tracked per inode,
+  so a file renamed by RotatingFileHandler continues where it left off)
+- Parsed records are kept in a compact, time-indexed table; the errors/
+  copies logging_config writes next to a module log are not read, so each
+  line is stored once
+- Per-15-minute, per-operation aggregates (counts, errors, latency histogram)
+  are updated as records arrive, so summaries never re-read old data
+
+Usage:
+    from utils.log_index import LogIndex
+
+    index = LogIndex('logs')
+    index.ingest()
+    stats = index.operation_stats(start_ts, end_ts)
+"""
+
+import json
+import math
+import os
+import re
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# 2024-06-01 12:00:00 | rest of the record
+RECORD_START = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \| (.*)$')
+LEVELS = {'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'}
+ERROR_LEVELS = {'ERROR', 'CRITICAL'}
+
+# Latency histogram: bucket i covers [HISTOGRAM_BASE**i, HISTOGRAM_BASE**(i+1)) ms,
+# so percentiles are accurate to within ~10%
+HISTOGRAM_BASE = 1.1
+# Aggregate buckets; 15 minutes keeps local-day boundaries aligned in every timezone
+BUCKET_SECONDS = 900
+MAX_MESSAGE_LENGTH = 1000
+# Bumped when the tables change; the index is rebuilt from the logs
+SCHEMA_VERSION = 2
+
+# errors/<module>_errors_<session>.log duplicates the ERROR lines of the
+# module's own log (<module>_<session>.log or <module>.log)
+ERROR_COPY = re.compile(r'^(?P<module>.+)_errors_(?P<session>\d{8}_\d{6})\.log$')
+ROTATION_SUFFIX = re.compile(r'\.\d+$')
+
+
+def latency_bucket(duration_ms: float) -> int:
+    if duration_ms <= 1:
+        return 0
+    return int(math.log(duration_ms) / math.log(HISTOGRAM_BASE))
+
+
+def histogram_percentile(histogram: Dict[int, int], percentile: float) -> float:
+    """Approximate percentile (0-100) in ms from a latency histogram"""
+    total = sum(histogram.values())
+    if not total:
+        return 0.0
+    rank = percentile / 100 * total
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            # Geometric midpoint of the bucket
+            return round(HISTOGRAM_BASE ** (bucket + 0.5), 2) if bucket else 1.0
+    return round(HISTOGRAM_BASE ** (max(histogram) + 0.5), 2)
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse the first line of a record in any logging_config format.
+
+    Returns:
+        Dict with ts, level, logger and message, or None for continuation lines
+    """
+    match = RECORD_START.match(line)
+    if not match:
+        return None
+    try:
+        ts = datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S').timestamp()
+    except ValueError:
+        return None
+    fields = match.group(2).split(' | ')
+    first = fields[0].strip()
+    if first in LEVELS:
+        # Simple/API format: time | LEVEL | message
+        level, logger_name, message = first, '', ' | '.join(fields[1:])
+    elif len(fields) >= 5 and fields[1].strip() in LEVELS:
+        # Detailed format: time | name | LEVEL | [file:line] | func | message
+        level, logger_name, message = fields[1].strip(), first, ' | '.join(fields[4:])
+    else:
+        level, logger_name, message = 'INFO', '', match.group(2)
+    return {'ts': ts, 'level': level, 'logger': logger_name, 'message': message}
+
+
+def _json_payload(message: str) -> Dict[str, Any]:
+    start = message.find('{')
+    if start < 0:
+        return {}
+    try:
+        payload = json.loads(message[start:])
+    except json.JSONDecodeError:
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def classify(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Derive kind, operation, duration and status from the tagged messages
+    written by utils.advanced_logging (RESPONSE | {...}, SLOW_FUNCTION | f | 12ms, ...).
+    """
+    message = record['message']
+    tag, _, rest = message.partition(' | ')
+    kind, operation, duration, status = 'log', record['logger'] or None, None, None
+
+    if tag in ('RESPONSE', 'CLIENT_ERROR', 'SERVER_ERROR'):
+        payload = _json_payload(rest)
+        kind = 'api'
+        operation = f"{payload.get('method', '')} {payload.get('endpoint', '')}".strip() or operation
+        duration = payload.get('duration_ms')
+        status = payload.get('status_code')
+    elif tag == 'REQUEST':
+        kind = 'request'
+    elif tag in ('SLOW_FUNCTION', 'FUNCTION_ERROR'):
+        parts = rest.split(' | ')
+        kind = 'function'
+        operation = parts[0].strip() if parts else operation
+        if len(parts) > 1 and parts[1].strip().endswith('ms'):
+            try:
+                duration = float(parts[1].strip()[:-2])
+            except ValueError:
+                pass
+    elif tag in ('USER_ACTION', 'VOICE_COMMAND'):
+        kind = 'user'
+    elif tag in ('EXCEPTION', 'CRITICAL_EXCEPTION'):
+        kind = 'exception'
+        payload = _json_payload(rest)
+        operation = payload.get('exception_type') or rest.split(' | ')[0].strip() or operation
+
+    is_error = (record['level'] in ERROR_LEVELS or tag == 'FUNCTION_ERROR'
+                or (isinstance(status, int) and status >= 500))
+    return {'kind': kind, 'operation': operation, 'duration_ms': duration,
+            'status': status, 'error': is_error}
+
+
+def _base_name(path) -> str:
+    """File name without the RotatingFileHandler backup suffix (.1, .2, ...)"""
+    return ROTATION_SUFFIX.sub('', Path(path).name)
+
+
+def _is_error_copy(path: Path, names: Set[str]) -> bool:
+    """Whether path is an errors/ copy of a module log that is also indexed"""
+    match = ERROR_COPY.match(_base_name(path))
+    if not match or Path(path).parent.name != 'errors':
+        return False
+    module = match.group('module')
+    return f"{module}_{match.group('session')}.log" in names or f"{module}.log" in names
+
+
+class LogIndex:
+    """
+    Indexed, incrementally updated store of parsed log records.
+
+    Args:
+        log_dir: Root of the log directory tree
+        db_path: SQLite file (defaults to <log_dir>/log_index.db)
+    """
+
+    def __init__(self, log_dir: str = 'logs', db_path: Optional[str] = None):
+        self.log_dir = Path(log_dir)
+        self.db_path = str(db_path or self.log_dir / 'log_index.db')
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._init_database()
+
+    def _init_database(self):
+        with sqlite3.connect(self.db_path) as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                conn.executescript('''
+                    DROP TABLE IF EXISTS log_files;
+                    DROP TABLE IF EXISTS log_records;
+                    DROP TABLE IF EXISTS log_aggregates;
+                ''')
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS log_files (
+                    device INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    path TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    PRIMARY KEY (device, inode)
+                );
+                CREATE TABLE IF NOT EXISTS log_records (
+                    id INTEGER PRIMARY KEY,
+                    ts REAL NOT NULL,
+                    level TEXT NOT NULL,
+                    logger TEXT,
+                    kind TEXT NOT NULL,
+                    operation TEXT,
+                    duration_ms REAL,
+                    status INTEGER,
+                    message TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_log_records_ts ON log_records (ts);
+                CREATE INDEX IF NOT EXISTS idx_log_records_level ON log_records (level, ts);
+                CREATE INDEX IF NOT EXISTS idx_log_records_operation ON log_records (operation, ts);
+                CREATE TABLE IF NOT EXISTS log_aggregates (
+                    bucket INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    operation TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    errors INTEGER NOT NULL,
+                    total_ms REAL NOT NULL,
+                    timed INTEGER NOT NULL,
+                    histogram TEXT NOT NULL,
+                    PRIMARY KEY (bucket, kind, operation)
+                );
+            ''')
+
+    # --- ingestion -------------------------------------------------------------
+
+    def ingest(self, paths: Optional[Iterable[Path]] = None) -> int:
+        """
+        Read everything appended to the log files since the last ingest.
+
+        Args:
+            paths: Files to ingest (defaults to every *.log* file under log_dir)
+
+        Returns:
+            Number of new records
+        """
+        if paths is None:
+            paths = [p for p in self.log_dir.rglob('*.log*') if p.is_file()]
+        paths = list(paths)
+        total = 0
+        with sqlite3.connect(self.db_path) as conn:
+            offsets = {}
+            names = {_base_name(path) for path in paths}
+            for device, inode, path, offset in conn.execute("SELECT device, inode, path, offset FROM log_files"):
+                offsets[(device, inode)] = offset
+                names.add(_base_name(path))
+            for path in paths:
+                if _is_error_copy(path, names):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                key = (stat.st_dev, stat.st_ino)
+                offset = offsets.get(key, 0)
+                if stat.st_size < offset:
+                    offset = 0  # Truncated and rewritten
+                if stat.st_size == offset:
+                    continue
+                records, offset = self._read_new(path, offset)
+                total += self._store(conn, records)
+                conn.execute("INSERT OR REPLACE INTO log_files (device, inode, path, offset) VALUES (?, ?, ?, ?)",
+                             (stat.st_dev, stat.st_ino, str(path), offset))
+        return total
+
+    @staticmethod
+    def _read_new(path: Path, offset: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Parse complete lines after offset; returns records and the new offset"""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return [], offset  # Partial line still being written
+
+        records: List[Dict[str, Any]] = []
+        for line in data[:end].decode('utf-8', errors='replace').splitlines():
+            record = parse_line(line)
+            if record:
+                records.append(record)
+            elif records:
+                # Continuation of a multi-line message (e.g. indented JSON)
+                records[-1]['message'] += '\n' + line
+        return records, offset + end
+
+    def _store(self, conn: sqlite3.Connection, records: List[Dict[str, Any]]) -> int:
+        """Insert new records and fold them into the aggregate buckets"""
+        stored = 0
+        aggregates: Dict[Tuple[int, str, str], Dict[str, Any]] = {}
+        for record in records:
+            info = classify(record)
+            conn.execute('''
+                INSERT INTO log_records (ts, level, logger, kind, operation, duration_ms, status, message)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (record['ts'], record['level'], record['logger'], info['kind'], info['operation'],
+                  info['duration_ms'], info['status'], record['message'][:MAX_MESSAGE_LENGTH]))
+            stored += 1
+
+            bucket = int(record['ts'] // BUCKET_SECONDS * BUCKET_SECONDS)
+            key = (bucket, info['kind'], info['operation'] or '')
+            entry = aggregates.setdefault(key, {'count': 0, 'errors': 0, 'total_ms': 0.0,
+                                                'timed': 0, 'histogram': {}})
+            entry['count'] += 1
+            entry['errors'] += int(info['error'])
+            if isinstance(info['duration_ms'], (int, float)):
+                entry['total_ms'] += info['duration_ms']
+                entry['timed'] += 1
+                index = latency_bucket(info['duration_ms'])
+                entry['histogram'][index] = entry['histogram'].get(index, 0) + 1
+
+        for (bucket, kind, operation), entry in aggregates.items():
+            row = conn.execute("SELECT count, errors, total_ms, timed, histogram FROM log_aggregates "
+                               "WHERE bucket = ? AND kind = ? AND operation = ?",
+                               (bucket, kind, operation)).fetchone()
+            if row:
+                histogram = {int(k): v for k, v in json.loads(row[4]).items()}
+                for index, count in entry['histogram'].items():
+                    histogram[index] = histogram.get(index, 0) + count
+                entry = {'count': row[0] + entry['count'], 'errors': row[1] + entry['errors'],
+                         'total_ms': row[2] + entry['total_ms'], 'timed': row[3] + entry['timed'],
+                         'histogram': histogram}
+            conn.execute('''
+                INSERT OR REPLACE INTO log_aggregates (bucket, kind, operation, count, errors, total_ms, timed, histogram)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (bucket, kind, operation, entry['count'], entry['errors'], entry['total_ms'],
+                  entry['timed'], json.dumps(entry['histogram'])))
+        return stored
+
+    # --- queries ---------------------------------------------------------------
+
+    def operation_stats(self, start: float, end: float, kind: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Merge aggregate buckets in [start, end) into per-operation stats.
+
+        Returns:
+            {kind: {operation: {count, errors, error_rate, avg_ms, p50_ms, p95_ms, p99_ms}}}
+        """
+        query = ("SELECT kind, operation, count, errors, total_ms, timed, histogram FROM log_aggregates "
+                 "WHERE bucket >= ? AND bucket < ?")
+        params: List[Any] = [start // BUCKET_SECONDS * BUCKET_SECONDS, end]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+
+        merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        with sqlite3.connect(self.db_path) as conn:
+            for row_kind, operation, count, errors, total_ms, timed, histogram in conn.execute(query, params):
+                entry = merged.setdefault((row_kind, operation), {'count': 0, 'errors': 0, 'total_ms': 0.0,
+                                                                  'timed': 0, 'histogram': {}})
+                entry['count'] += count
+                entry['errors'] += errors
+                entry['total_ms'] += total_ms
+                entry['timed'] += timed
+                for index, value in json.loads(histogram).items():
+                    entry['histogram'][int(index)] = entry['histogram'].get(int(index), 0) + value
+
+        stats: Dict[str, Dict[str, Any]] = {}
+        for (row_kind, operation), entry in merged.items():
+            stats.setdefault(row_kind, {})[operation] = {
+                'count': entry['count'],
+                'errors': entry['errors'],
+                'error_rate': round(entry['errors'] / entry['count'], 4),
+                'avg_ms': round(entry['total_ms'] / entry['timed'], 2) if entry['timed'] else None,
+                'p50_ms': histogram_percentile(entry['histogram'], 50) if entry['timed'] else None,
+                'p95_ms': histogram_percentile(entry['histogram'], 95) if entry['timed'] else None,
+                'p99_ms': histogram_percentile(entry['histogram'], 99) if entry['timed'] else None,
+            }
+        return stats
+
+    def level_counts(self, start: float, end: float) -> Dict[str, int]:
+        with sqlite3.connect(self.db_path) as conn:
+            return dict(conn.execute("SELECT level, COUNT(*) FROM log_records WHERE ts >= ? AND ts < ? "
+                                     "GROUP BY level", (start, end)).fetchall())
+
+    def records(self, start: float, end: float, level: Optional[str] = None, operation: Optional[str] = None,
+                limit: int = 100) -> List[Dict[str, Any]]:
+        """Parsed records in [start, end), newest first"""
+        query = "SELECT ts, level, logger, kind, operation, duration_ms, status, message FROM log_records " \
+                "WHERE ts >= ? AND ts < ?"
+        params: List[Any] = [start, end]
+        if level:
+            query += " AND level = ?"
+            params.append(level)
+        if operation:
+            query += " AND operation = ?"
+            params.append(operation)
+        query += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+        columns = ('ts', 'level', 'logger', 'kind', 'operation', 'duration_ms', 'status', 'message')
+        with sqlite3.connect(self.db_path) as conn:
+            return [dict(zip(columns, row)) for row in conn.execute(query, params)]
+
+    def prune(self, before: float):
+        """Drop records and aggregates older than a timestamp"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM log_records WHERE ts < ?", (before,))
+            conn.execute("DELETE FROM log_aggregates WHERE bucket < ?", (before // BUCKET_SECONDS * BUCKET_SECONDS,))
@@ -3,22 +3,32 @@ Session Activity Logger for YourDaddy Assistant
 =============================================
 
 This module handles session-specific activity logging with categorized tracking.
-Each session gets its own activity log files organized by categories.
+Activities are queued and appended in batches to compressed JSON Lines
+segments under logs/activities/events (see utils.event_sink); each session
+also gets a summary file with per-category counts.
 """
 
+import atexit
 import json
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from utils.logging_config import get_logger, SessionManager
+from utils.event_sink import EventSink
 
 class SessionActivityLogger:
-    """Logs all user activities in session-specific files"""
+    """Logs all user activities, tagged by session"""
+    
+    # Minimum seconds between rewrites of the session summary file
+    SUMMARY_SAVE_INTERVAL = 5.0
     
     def __init__(self):
         self.session_id = SessionManager.get_current_session()
         self.activities_dir = Path('logs/activities')
         self.activities_dir.mkdir(parents=True, exist_ok=True)
+        self.sink = EventSink(self.activities_dir / 'events')
+        self._summary_saved_at = 0.0
         
         # Category-specific loggers
         self.loggers = {
@@ -45,12 +55,11 @@ class SessionActivityLogger:
         }
         
         self._save_session_start()
+        atexit.register(self._save_summary)
     
     def _save_session_start(self):
         """Save session start information"""
-        summary_file = self.activities_dir / f'session_summary_{self.session_id}.json'
-        with open(summary_file, 'w') as f:
-            json.dump(self.session_summary, f, indent=2)
+        self._save_summary()
         
         # Log session start in all category loggers
         for category, logger in self.loggers.items():
@@ -72,8 +81,7 @@ class SessionActivityLogger:
             'execution_time_ms': execution_time_ms
         }
         
-        self.loggers['voice_commands'].info(f"VOICE_CMD | {json.dumps(activity)}")
-        self._update_session_summary('voice_commands', activity)
+        self._record('voice_commands', activity)
     
     def log_file_operation(self, operation: str, file_path: str = None, 
                           success: bool = True, details: Dict = None):
@@ -88,8 +96,7 @@ class SessionActivityLogger:
             'details': details or {}
         }
         
-        self.loggers['file_operations'].info(f"FILE_OP | {json.dumps(activity)}")
-        self._update_session_summary('file_operations', activity)
+        self._record('file_operations', activity)
     
     def log_system_command(self, command: str, command_type: str = None,
                           success: bool = True, output: str = None):
@@ -105,8 +112,7 @@ class SessionActivityLogger:
             'output_length': len(output) if output else 0
         }
         
-        self.loggers['system_commands'].info(f"SYS_CMD | {json.dumps(activity)}")
-        self._update_session_summary('system_commands', activity)
+        self._record('system_commands', activity)
     
     def log_api_request(self, endpoint: str, method: str = 'GET',
                        status_code: int = 200, response_time_ms: float = None,
@@ -123,8 +129,7 @@ class SessionActivityLogger:
             'user_id': user_id
         }
         
-        self.loggers['api_requests'].info(f"API_REQ | {json.dumps(activity)}")
-        self._update_session_summary('api_requests', activity)
+        self._record('api_requests', activity)
     
     def log_user_interaction(self, interaction_type: str, details: Dict = None,
                            duration_ms: float = None):
@@ -138,8 +143,7 @@ class SessionActivityLogger:
             'duration_ms': duration_ms
         }
         
-        self.loggers['user_interactions'].info(f"USER_INT | {json.dumps(activity)}")
-        self._update_session_summary('user_interactions', activity)
+        self._record('user_interactions', activity)
     
     def log_music_control(self, action: str, track_info: Dict = None,
                          platform: str = None, success: bool = True):
@@ -154,8 +158,7 @@ class SessionActivityLogger:
             'success': success
         }
         
-        self.loggers['music_control'].info(f"MUSIC | {json.dumps(activity)}")
-        self._update_session_summary('music_control', activity)
+        self._record('music_control', activity)
     
     def log_email_operation(self, operation: str, email_count: int = None,
                            sender: str = None, subject: str = None,
@@ -172,8 +175,7 @@ class SessionActivityLogger:
             'success': success
         }
         
-        self.loggers['email_operations'].info(f"EMAIL | {json.dumps(activity)}")
-        self._update_session_summary('email_operations', activity)
+        self._record('email_operations', activity)
     
     def log_calendar_operation(self, operation: str, event_details: Dict = None,
                               date_range: Dict = None, success: bool = True):
@@ -188,8 +190,7 @@ class SessionActivityLogger:
             'success': success
         }
         
-        self.loggers['calendar_operations'].info(f"CALENDAR | {json.dumps(activity)}")
-        self._update_session_summary('calendar_operations', activity)
+        self._record('calendar_operations', activity)
     
     def log_web_scraping(self, url: str, scraping_type: str = None,
                         data_extracted: bool = False, error: str = None):
@@ -205,8 +206,7 @@ class SessionActivityLogger:
             'success': error is None
         }
         
-        self.loggers['web_scraping'].info(f"WEB_SCRAPE | {json.dumps(activity)}")
-        self._update_session_summary('web_scraping', activity)
+        self._record('web_scraping', activity)
     
     def log_multimodal_ai(self, operation: str, input_type: str = None,
                          processing_time_ms: float = None, 
@@ -223,8 +223,7 @@ class SessionActivityLogger:
             'success': success
         }
         
-        self.loggers['multimodal_ai'].info(f"MULTIMODAL | {json.dumps(activity)}")
-        self._update_session_summary('multimodal_ai', activity)
+        self._record('multimodal_ai', activity)
     
     def log_automation(self, automation_type: str, steps_count: int = None,
                       execution_time_ms: float = None, success: bool = True):
@@ -239,8 +238,12 @@ class SessionActivityLogger:
             'success': success
         }
         
-        self.loggers['automation'].info(f"AUTOMATION | {json.dumps(activity)}")
-        self._update_session_summary('automation', activity)
+        self._record('automation', activity)
+    
+    def _record(self, category: str, activity: Dict):
+        """Queue an activity for the event log and count it in the summary"""
+        self.sink.put(category, activity, session_id=self.session_id)
+        self._update_session_summary(category, activity)
     
     def _update_session_summary(self, category: str, activity: Dict):
         """Update session summary with new activity"""
@@ -251,10 +254,35 @@ class SessionActivityLogger:
             self.session_summary['categories'][category] = 0
         self.session_summary['categories'][category] += 1
         
-        # Save updated summary
+        # Rewriting the summary on every activity is the cost we are avoiding
+        if time.time() - self._summary_saved_at >= self.SUMMARY_SAVE_INTERVAL:
+            self._save_summary()
+    
+    def _save_summary(self):
+        """Write the session summary file"""
         summary_file = self.activities_dir / f'session_summary_{self.session_id}.json'
         with open(summary_file, 'w') as f:
             json.dump(self.session_summary, f, indent=2)
+        self._summary_saved_at = time.time()
+    
+    def get_activities(self, category: Optional[str] = None, session_id: Optional[str] = None,
+                       start=None, end=None) -> List[Dict]:
+        """
+        Read logged activities
+        
+        Args:
+            category: Only this category (e.g. 'voice_commands')
+            session_id: Session to read; defaults to the current one, '*' for all
+            start: Inclusive start (datetime or epoch seconds)
+            end: Exclusive end (datetime or epoch seconds)
+        
+        Returns:
+            Activity dicts, oldest first
+        """
+        if session_id is None:
+            session_id = self.session_id
+        events = self.sink.query(None if session_id == '*' else session_id, category, start, end)
+        return [event['data'] for event in events]
     
     def end_session(self):
         """Mark session as ended"""
@@ -264,10 +292,9 @@ class SessionActivityLogger:
             datetime.fromisoformat(self.session_summary['start_time'])
         ).total_seconds()
         
-        # Save final summary
-        summary_file = self.activities_dir / f'session_summary_{self.session_id}.json'
-        with open(summary_file, 'w') as f:
-            json.dump(self.session_summary, f, indent=2)
+        # Save final summary and write out queued activities
+        self._save_summary()
+        self.sink.close()
         
         # Log session end in all category loggers
         for category, logger in self.loggers.items():
@@ -1,29 +1,63 @@
 
 import os
-import json
 from datetime import datetime
 
+from utils.event_sink import EventSink, read_events
+
 USER_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'user_data')
+EVENTS_DIR = os.path.join(USER_DATA_DIR, 'events')
+
+_sink = None
 
 def get_timestamp():
     return datetime.now().strftime('%Y%m%d_%H%M%S')
 
+def get_sink():
+    """Returns the shared buffered sink for user data, creating it on first use."""
+    global _sink
+    if _sink is None:
+        _sink = EventSink(EVENTS_DIR)
+    return _sink
+
+def _current_session():
+    try:
+        from utils.logging_config import SessionManager
+        return SessionManager.get_current_session()
+    except Exception:
+        return None
+
 def save_data(data_type, data):
     """
-    Saves data to the appropriate folder with a timestamp.
+    Queues data for the user data log. Events are appended in batches to
+    rotating compressed JSON Lines segments by a background thread.
 
     Args:
         data_type (str): The type of data (e.g., 'actions', 'queries', 'replies', 'modules').
-        data (dict): The data to save as a JSON file.
+        data (dict): The data to save.
+    """
+    get_sink().put(data_type, data, session_id=_current_session())
+
+def read_data(data_type=None, session_id=None, start=None, end=None):
     """
-    timestamp = get_timestamp()
-    folder_path = os.path.join(USER_DATA_DIR, data_type)
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
-    
-    file_path = os.path.join(folder_path, f'{timestamp}.json')
-    with open(file_path, 'w') as f:
-        json.dump(data, f, indent=4)
+    Reads logged user data, oldest first.
+
+    Args:
+        data_type (str): Only this type of data (e.g., 'queries').
+        session_id (str): Only data from this session.
+        start (datetime or float): Inclusive start of the time range.
+        end (datetime or float): Exclusive end of the time range.
+
+    Returns:
+        list: Events with 'ts', 'time', 'session_id', 'type' and 'data'.
+    """
+    if _sink is not None:
+        return _sink.query(session_id, data_type, start, end)
+    return list(read_events(EVENTS_DIR, session_id, data_type, start, end))
+
+def flush():
+    """Writes all queued user data to disk."""
+    if _sink is not None:
+        _sink.flush()
 
 def log_action(action_name, params):
     """Logs a user action."""
@@ -47,5 +81,7 @@ if __name__ == '__main__':
     log_query('What is the weather today?')
     log_reply('The weather is sunny.')
     log_module_usage('music', 'play')
-    print(f"User data logging setup in: {USER_DATA_DIR}")
-
+    flush()
+    print(f"User data logging setup in: {EVENTS_DIR}")
+    for event in read_data():
+        print(event['time'], event['type'], event['data'])
@@ -21,6 +21,12 @@ import feedparser
 import time
 from urllib.parse import urljoin, urlparse
 import os
+import threading
+
+try:
+    from .feed_aggregator import FeedAggregator
+except ImportError:
+    from feed_aggregator import FeedAggregator
 
 class WebScrapingManager:
     """
@@ -34,11 +40,29 @@ class WebScrapingManager:
         })
         self.cache_dir = "web_cache"
         self.ensure_cache_dir()
+        self.feeds = FeedAggregator(
+            session=self.session,
+            cache_dir=os.path.join(self.cache_dir, "feeds"),
+            max_workers=8,
+            timeout=10
+        )
     
     def ensure_cache_dir(self):
         """Ensure cache directory exists"""
         os.makedirs(self.cache_dir, exist_ok=True)
 
+_scraping_manager = None
+_scraping_manager_lock = threading.Lock()
+
+def get_scraping_manager() -> WebScrapingManager:
+    """Get the shared WebScrapingManager (one HTTP session and feed cache per process)"""
+    global _scraping_manager
+    if _scraping_manager is None:
+        with _scraping_manager_lock:
+            if _scraping_manager is None:
+                _scraping_manager = WebScrapingManager()
+    return _scraping_manager
+
 def get_weather_info(location: str = "New York", api_key: str = None) -> str:
     """
     Get current weather information for a location
@@ -166,29 +190,25 @@ def get_latest_news(category: str = "general", country: str = "us", max_articles
         feeds = news_sources.get(category, news_sources["general"])
         all_articles = []
         
-        for feed_url in feeds:
-            try:
-                feed = feedparser.parse(feed_url)
-                for entry in feed.entries[:max_articles]:
-                    published = entry.get('published', 'Unknown date')
-                    if published != 'Unknown date':
-                        try:
-                            pub_date = datetime.datetime.strptime(published, '%a, %d %b %Y %H:%M:%S %z')
-                            published = pub_date.strftime('%B %d, %H:%M')
-                        except:
-                            published = published[:20]  # Truncate if parsing fails
-                    
-                    article = {
-                        'title': entry.get('title', 'No title'),
-                        'summary': entry.get('summary', 'No summary'),
-                        'link': entry.get('link', ''),
-                        'published': published,
-                        'source': feed.feed.get('title', 'Unknown source')
-                    }
-                    all_articles.append(article)
-                    
-            except Exception as feed_error:
-                continue
+        # Feeds are fetched concurrently with conditional GET; unchanged feeds come from cache
+        for feed_result in get_scraping_manager().feeds.fetch_all(feeds):
+            for entry in feed_result.entries[:max_articles]:
+                published = entry.get('published', 'Unknown date')
+                if published != 'Unknown date':
+                    try:
+                        pub_date = datetime.datetime.strptime(published, '%a, %d %b %Y %H:%M:%S %z')
+                        published = pub_date.strftime('%B %d, %H:%M')
+                    except:
+                        published = published[:20]  # Truncate if parsing fails
+                
+                article = {
+                    'title': entry.get('title', 'No title'),
+                    'summary': entry.get('summary', 'No summary'),
+                    'link': entry.get('link', ''),
+                    'published': published,
+                    'source': entry.get('source', 'Unknown source')
+                }
+                all_articles.append(article)
         
         if not all_articles:
             return f"❌ Could not retrieve news for category: {category}"
@@ -503,42 +523,44 @@ def get_trending_topics(platform: str = "general") -> str:
     except Exception as e:
         return f"❌ Trending topics error: {str(e)}"
 
-def monitor_rss_feeds(feed_urls: List[str], max_items: int = 5) -> str:
+def monitor_rss_feeds(feed_urls: List[str], max_items: int = 5, only_new: bool = False) -> str:
     """
     Monitor multiple RSS feeds and return latest updates
     Args:
         feed_urls: List of RSS feed URLs to monitor
         max_items: Maximum items per feed
+        only_new: Only report items not seen by a previous call
     """
     try:
         all_items = []
+        feeds = get_scraping_manager().feeds
         
-        for feed_url in feed_urls:
-            try:
-                feed = feedparser.parse(feed_url)
-                source_name = feed.feed.get('title', 'Unknown Source')
-                
-                for entry in feed.entries[:max_items]:
-                    published = entry.get('published', 'Unknown date')
-                    if published != 'Unknown date':
-                        try:
-                            pub_date = feedparser._parse_date(entry.published)
-                            published = datetime.datetime(*pub_date[:6]).strftime('%B %d, %H:%M')
-                        except:
-                            published = published[:20]
-                    
-                    item = {
-                        'title': entry.get('title', 'No title'),
-                        'link': entry.get('link', ''),
-                        'published': published,
-                        'source': source_name
-                    }
-                    all_items.append(item)
-                    
-            except Exception as feed_error:
-                continue
+        if only_new:
+            # Capped per feed before marking seen, so extras show on the next call
+            entries = feeds.poll(feed_urls, max_per_feed=max_items)
+        else:
+            entries = [entry for feed_result in feeds.fetch_all(feed_urls)
+                       for entry in feed_result.entries[:max_items]]
+        
+        for entry in entries:
+            published = entry.get('published', 'Unknown date')
+            if published != 'Unknown date':
+                if entry.get('published_ts'):
+                    published = datetime.datetime.fromtimestamp(entry['published_ts'], datetime.timezone.utc).strftime('%B %d, %H:%M')
+                else:
+                    published = published[:20]
+            
+            item = {
+                'title': entry.get('title', 'No title'),
+                'link': entry.get('link', ''),
+                'published': published,
+                'source': entry.get('source', 'Unknown Source')
+            }
+            all_items.append(item)
         
         if not all_items:
+            if only_new:
+                return "📡 No new items in the monitored RSS feeds"
             return "❌ Could not retrieve items from any RSS feeds"
         
         result = f"📡 RSS Feed Monitor ({len(all_items)} items):\n\n"
@@ -0,0 +1,138 @@
+"""
+Benchmark for the compiled intent router.
+
+Generates a large labeled Hinglish/English command corpus from templates,
+routes it through the Hinglish intents used by core.process_hinglish_command,
+and reports intent/slot accuracy and per-utterance latency. A second pass
+adds thousands of synthetic intents to show that routing cost stays flat as
+the intent table grows.
+
+Usage:
+    python scripts/analysis/intent_router_benchmark.py --size 50000
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'ai_assistant'))
+
+from modules.intent_router import Intent, IntentRouter
+from modules.core import HINGLISH_INTENTS
+
+APPS = ['chrome', 'notepad', 'spotify', 'vs code', 'calculator', 'whatsapp', 'excel']
+CONTACTS = ['mummy', 'papa', 'raj', 'priya', 'bhaiya', 'rahul']
+QUERIES = ['aaj ka weather', 'arijit singh songs', 'python tutorial', 'cricket score',
+           'paneer recipe', 'delhi metro timing']
+FILLERS = ['', 'please ', 'zara ', 'jaldi ', 'yaar ']
+
+# (template, intent, slots); slot values are filled from the lists above
+TEMPLATES = [
+    ('{f}volume badhao', 'volume_up', {}),
+    ('{f}awaaz thoda zyada karo', 'volume_up', {}),
+    ('sound up kar do', 'volume_up', {}),
+    ('{f}volume kam karo', 'volume_down', {}),
+    ('awaaz ghatao {f}', 'volume_down', {}),
+    ('{f}sound band karo', 'mute', {}),
+    ('awaaz chup karo', 'mute', {}),
+    ('{f}volume on karo', 'unmute', {}),
+    ('volume {n} karo', 'volume', {'level': 'n'}),
+    ('{f}awaaz kitni hai', 'volume', {}),
+    ('{f}{contact} ko call karo', 'make_call', {'contact_name': 'contact'}),
+    ('{contact} ko phone lagao', 'make_call', {'contact_name': 'contact'}),
+    ('{f}{phone} dial karo', 'make_call', {'phone_number': 'phone'}),
+    ('{f}{app} kholo', 'open_app', {'app_name': 'app'}),
+    ('{app} open karo', 'open_app', {'app_name': 'app'}),
+    ('open {app}', 'open_app', {'app_name': 'app'}),
+    ('youtube pe {query}', 'search_youtube', {'query': 'query'}),
+    ('{f}google pe {query}', 'search_google', {'query': 'query'}),
+    ('search {query}', 'search_google', {'query': 'query'}),
+    # Unrelated utterances whose words contain trigger substrings
+    ('{f}iphone ka update check karo', None, {}),
+    ('bandwidth kitni hai', None, {}),
+    ('{f}kal ki meeting ka agenda batao', None, {}),
+]
+
+
+def generate_corpus(size: int, seed: int = 7):
+    """Returns a list of (utterance, expected intent, expected slots)."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        template, intent, slots = rng.choice(TEMPLATES)
+        values = {
+            'f': rng.choice(FILLERS),
+            'app': rng.choice(APPS),
+            'contact': rng.choice(CONTACTS),
+            'query': rng.choice(QUERIES),
+            'n': str(rng.randrange(0, 101, 5)),
+            'phone': ''.join(rng.choice(string.digits) for _ in range(10)),
+        }
+        expected = {slot: values[key] for slot, key in slots.items()}
+        if 'level' in expected:
+            expected['level'] = int(expected['level'])
+        corpus.append((template.format(**values), intent, expected))
+    return corpus
+
+
+def synthetic_intents(count: int, seed: int = 11):
+    """Intents with random trigger words that never occur in the corpus."""
+    rng = random.Random(seed)
+
+    def word():
+        return 'zq' + ''.join(rng.choice(string.ascii_lowercase) for _ in range(6))
+
+    return [Intent(f'synthetic_{i}', [[word(), word()], [word()]]) for i in range(count)]
+
+
+def run(router: IntentRouter, corpus):
+    """Routes the corpus; returns accuracy figures and latencies in microseconds."""
+    intent_hits = slot_hits = slot_total = 0
+    latencies = []
+    for text, expected, slots in corpus:
+        start = time.perf_counter()
+        match = router.route(text)
+        latencies.append((time.perf_counter() - start) * 1e6)
+
+        if (match.name if match else None) == expected:
+            intent_hits += 1
+        for slot, value in slots.items():
+            slot_total += 1
+            if match and match.slots.get(slot) == value:
+                slot_hits += 1
+
+    latencies.sort()
+    return {
+        'intent_accuracy': intent_hits / len(corpus),
+        'slot_accuracy': slot_hits / slot_total if slot_total else 1.0,
+        'p50_us': latencies[len(latencies) // 2],
+        'p99_us': latencies[int(len(latencies) * 0.99)],
+        'per_sec': len(corpus) / (sum(latencies) / 1e6),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled intent router")
+    parser.add_argument('--size', type=int, default=20000, help="Number of labeled utterances")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.size, args.seed)
+    print(f"Corpus: {len(corpus)} utterances from {len(TEMPLATES)} templates\n")
+
+    print(f"{'intents':>8} {'intent acc':>11} {'slot acc':>9} {'p50 us':>8} {'p99 us':>8} {'utt/s':>10}")
+    for extra in (0, 100, 1000, 10000):
+        start = time.perf_counter()
+        router = IntentRouter(HINGLISH_INTENTS + synthetic_intents(extra))
+        compile_ms = (time.perf_counter() - start) * 1000
+        stats = run(router, corpus)
+        print(f"{len(router.intents):>8} {stats['intent_accuracy']:>11.2%} {stats['slot_accuracy']:>9.2%} "
+              f"{stats['p50_us']:>8.1f} {stats['p99_us']:>8.1f} {stats['per_sec']:>10.0f}"
+              f"   (compiled in {compile_ms:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Multi-worker load test for the web tier.
+
+Starts 1, 2, 4... worker processes sharing one state store - rate limits
+and chat sessions go through it exactly as in the backend - and drives
+them round-robin, as a load balancer would, from several client
+processes. Each request does the CPU work of a chat turn (validating and
+parsing the request, resuming the session, building the prompt). The
+script prints throughput per worker count and its scaling efficiency
+against one worker, then checks that a rate limit and a chat session
+hold across workers.
+
+Throughput can only scale with the cores available; the core count is
+printed with the results.
+
+Usage:
+    python scripts/analysis/multi_worker_load.py --workers 1 2 4 --duration 10
+    python scripts/analysis/multi_worker_load.py --backend --path /api/status
+        (runs the real backend, which needs its full dependencies)
+"""
+
+import argparse
+import hashlib
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'ai_assistant'))
+
+from modules.shared_state import ChatSessionStore, create_state_store
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..', '..', 'ai_assistant', 'services', 'modern_web_backend.py')
+
+
+def serve_worker(url: str, work_ms: float, ports):
+    """Web worker handling chat-like requests with shared limits and sessions."""
+    from types import SimpleNamespace
+
+    from flask import Flask, jsonify, request
+    from flask_limiter import Limiter
+    from flask_limiter.util import get_remote_address
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No per-request log lines
+    store = create_state_store(url)
+    sessions = ChatSessionStore(store, ttl=600)
+    chats = {}
+    app = Flask(__name__)
+    limiter = Limiter(get_remote_address, app=app, storage_uri=store.url)
+
+    @app.route("/chat/<session_id>", methods=["POST"])
+    @limiter.limit("1000000 per minute")
+    def chat(session_id):
+        message = request.get_json()["message"]
+        chat = chats.setdefault(session_id, SimpleNamespace(conversation_history=[]))
+        sessions.resume(session_id, chat)
+        chat.conversation_history = chat.conversation_history[-20:]
+        chat.conversation_history.append({"role": "user", "content": message})
+
+        # CPU work standing in for request handling and prompt building
+        deadline = time.process_time() + work_ms / 1000
+        digest = message.encode()
+        while time.process_time() < deadline:
+            digest = hashlib.sha256(digest).digest()
+
+        sessions.save(session_id, chat)
+        return jsonify({"turns": len(chat.conversation_history), "pid": os.getpid()})
+
+    @app.route("/limited")
+    @limiter.limit("10 per minute")
+    def limited():
+        return jsonify({"pid": os.getpid()})
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def start_workers(count: int, url: str, work_ms: float, backend: bool, base_port: int):
+    """Start workers; returns (processes, ports)."""
+    if backend:
+        processes, ports = [], []
+        for i in range(count):
+            env = dict(os.environ, PORT=str(base_port + i), WEB_WORKERS=str(count),
+                       STATE_STORE_URL=url, NO_BROWSER="true")
+            processes.append(subprocess.Popen([sys.executable, BACKEND], env=env,
+                                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            ports.append(base_port + i)
+        for port in ports:
+            wait_for_port(port, 120)
+        return processes, ports
+
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=serve_worker, args=(url, work_ms, queue), daemon=True)
+                 for _ in range(count)]
+    for process in processes:
+        process.start()
+    return processes, [queue.get(timeout=60) for _ in processes]
+
+
+def wait_for_port(port: int, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Worker on port {port} did not start")
+
+
+def client(ports, path: str, duration: float, client_id: int, results):
+    """Send requests round-robin over the workers for `duration` seconds."""
+    connections = [http.client.HTTPConnection("127.0.0.1", port, timeout=30) for port in ports]
+    body = json.dumps({"message": f"What's on my calendar today? ({client_id})"})
+    headers = {"Content-Type": "application/json"}
+    done = errors = 0
+    start = time.time()
+    while time.time() - start < duration:
+        conn = connections[(done + errors) % len(connections)]
+        try:
+            if path:
+                conn.request("GET", path)
+            else:
+                conn.request("POST", f"/chat/client-{client_id}", body, headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                done += 1
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+    results.put((done, errors))
+
+
+def measure(ports, path: str, clients: int, duration: float):
+    """Returns (requests per second, errors)."""
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=client, args=(ports, path, duration, i, results))
+                 for i in range(clients)]
+    for process in processes:
+        process.start()
+    totals = [results.get(timeout=duration + 60) for _ in processes]
+    for process in processes:
+        process.join()
+    return sum(t[0] for t in totals) / duration, sum(t[1] for t in totals)
+
+
+def check_shared_state(ports):
+    """Check a rate limit and a chat session hold across workers."""
+    statuses = []
+    for i in range(12):
+        conn = http.client.HTTPConnection("127.0.0.1", ports[i % len(ports)], timeout=10)
+        conn.request("GET", "/limited")
+        statuses.append(conn.getresponse().status)
+    turns = []
+    for i in range(len(ports) * 2):
+        conn = http.client.HTTPConnection("127.0.0.1", ports[i % len(ports)], timeout=10)
+        conn.request("POST", "/chat/shared-check", json.dumps({"message": "hi"}),
+                     {"Content-Type": "application/json"})
+        turns.append(json.loads(conn.getresponse().read())["turns"])
+    print(f"  rate limit 10/min across workers: {statuses.count(200)} allowed, {statuses.count(429)} limited")
+    print(f"  session turns as requests alternate workers: {turns}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="client processes")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--work-ms", type=float, default=5.0, help="CPU time per request")
+    parser.add_argument("--backend", action="store_true", help="run the real web backend")
+    parser.add_argument("--path", default="", help="GET this path instead of the chat-like POST")
+    parser.add_argument("--base-port", type=int, default=5100)
+    args = parser.parse_args()
+    if args.backend and not args.path:
+        parser.error("--backend needs --path")
+
+    print(f"{os.cpu_count()} cores, {args.clients} client processes, {args.duration:.0f}s per run")
+    baseline = None
+    for count in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'state.db')}"
+            processes, ports = start_workers(count, url, args.work_ms, args.backend, args.base_port)
+            try:
+                throughput, errors = measure(ports, args.path, args.clients, args.duration)
+                baseline = baseline or throughput
+                print(f"{count} worker(s): {throughput:8.1f} req/s  "
+                      f"speedup {throughput / baseline:4.2f}x  "
+                      f"efficiency {throughput / (baseline * count):4.0%}  errors {errors}")
+                if not args.backend and count > 1:
+                    check_shared_state(ports)
+            finally:
+                for process in processes:
+                    process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Unit tests for the Advanced Integration Module.
+Tests filesystem event sources, coalescing and batched event storage.
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.advanced_integration import HookType, SystemHookManager
+from modules.event_sources import EventCoalescer, FilesystemEventSource, InotifyBackend
+
+
+class TestEventCoalescer(unittest.TestCase):
+    """Test suite for burst coalescing."""
+
+    def test_bursts_merge_into_net_action(self):
+        """Test repeated events on a path collapse to one settled action."""
+        coalescer = EventCoalescer(debounce=0.5)
+        coalescer.add("created", "/a", now=0.0)
+        for i in range(10):
+            coalescer.add("modified", "/a", now=0.1 + i * 0.01)
+        coalescer.add("modified", "/b", now=0.0)
+        coalescer.add("deleted", "/b", now=0.1)
+        coalescer.add("created", "/tmp_file", now=0.0)
+        coalescer.add("deleted", "/tmp_file", now=0.1)
+
+        self.assertEqual(coalescer.due(now=0.4), [])
+        self.assertEqual(sorted(coalescer.due(now=0.7)), [("created", "/a"), ("deleted", "/b")])
+        self.assertEqual(len(coalescer), 0)
+
+
+class TestFilesystemEventSource(unittest.TestCase):
+    """Test suite for the filesystem event backends."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _collect(self, backend):
+        events = []
+
+        def callback(action, path, info):
+            events.append((action, os.path.relpath(path, self.temp_dir), info))
+
+        source = FilesystemEventSource([self.temp_dir], callback, debounce=0.1,
+                                       backend=backend, poll_interval=0.1, ignore=["*/.git/*"])
+        source.start()
+        self.addCleanup(source.stop)
+        return source, events
+
+    def _wait_for(self, events, count, timeout=3.0):
+        deadline = time.monotonic() + timeout
+        while len(events) < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+    def test_backends_report_coalesced_changes(self):
+        """Test each backend reports one settled event per changed file."""
+        backends = ["polling"] + (["inotify"] if sys.platform.startswith("linux") else [])
+        for backend in backends:
+            with self.subTest(backend=backend):
+                shutil.rmtree(self.temp_dir)
+                os.makedirs(os.path.join(self.temp_dir, ".git"))
+                source, events = self._collect(backend)
+                self.assertEqual(source.backend, backend)
+                time.sleep(0.15)
+
+                with open(os.path.join(self.temp_dir, "notes.txt"), "w") as f:
+                    for _ in range(20):
+                        f.write("line\n")
+                        f.flush()
+                with open(os.path.join(self.temp_dir, ".git", "index"), "w") as f:
+                    f.write("ignored")
+                os.makedirs(os.path.join(self.temp_dir, "sub"))
+                with open(os.path.join(self.temp_dir, "sub", "new.py"), "w") as f:
+                    f.write("x = 1")
+
+                self._wait_for(events, 2)
+                time.sleep(0.3)
+                source.stop()
+                summary = sorted((action, path) for action, path, _ in events)
+                self.assertEqual(summary, [("created", "notes.txt"),
+                                           ("created", os.path.join("sub", "new.py"))])
+                notes_info = next(info for _, path, info in events if path == "notes.txt")
+                self.assertEqual(notes_info["size"], 100)
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux-only")
+    def test_inotify_overflow_rescans(self):
+        """Test changes dropped by an inotify overflow are recovered by a rescan."""
+        with open(os.path.join(self.temp_dir, "existing.txt"), "w") as f:
+            f.write("old")
+
+        def overflowing_read(backend, timeout, emit):
+            time.sleep(min(timeout, 0.05))
+            return False  # Every event lost
+
+        with mock.patch.object(InotifyBackend, "read", overflowing_read):
+            source, events = self._collect("inotify")
+            os.makedirs(os.path.join(self.temp_dir, "sub"))
+            with open(os.path.join(self.temp_dir, "sub", "new.py"), "w") as f:
+                f.write("x = 1")
+            os.remove(os.path.join(self.temp_dir, "existing.txt"))
+            self._wait_for(events, 2)
+            time.sleep(0.3)
+            source.stop()
+
+        summary = sorted((action, path) for action, path, _ in events)
+        self.assertEqual(summary, [("created", os.path.join("sub", "new.py")),
+                                   ("deleted", "existing.txt")])
+
+
+class TestSystemHookManager(unittest.TestCase):
+    """Test suite for hook registration, filtering and batched storage."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.watch_dir = os.path.join(self.temp_dir, "watched")
+        os.makedirs(self.watch_dir)
+        self.manager = SystemHookManager(os.path.join(self.temp_dir, "hooks.db"), flush_interval=0.2)
+
+    def tearDown(self):
+        for hook_name in list(self.manager.hooks):
+            self.manager.stop_hook(hook_name)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_glob_filtered_handlers(self):
+        """Test subscribers only receive events for paths matching their globs."""
+        python_events, all_events = [], []
+        self.manager.register_event_handler(HookType.FILE_SYSTEM, python_events.append, patterns=["*.py"])
+        self.manager.register_event_handler(HookType.FILE_SYSTEM, all_events.append)
+        self.manager.register_hook("files", HookType.FILE_SYSTEM,
+                                   {"paths": [self.watch_dir], "debounce": 0.1, "interval": 0.1})
+        self.manager.start_hook("files")
+        time.sleep(0.15)
+
+        for name in ("script.py", "readme.md"):
+            with open(os.path.join(self.watch_dir, name), "w") as f:
+                f.write("content")
+
+        deadline = time.monotonic() + 3.0
+        while len(all_events) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(len(all_events), 2)
+        self.assertEqual([os.path.basename(e.data["path"]) for e in python_events], ["script.py"])
+
+        stored = self.manager.get_recent_events(HookType.FILE_SYSTEM)
+        self.assertEqual(len(stored), 2)
+        self.assertEqual({e.source for e in stored}, {"files"})
+
+    def test_events_written_in_batches(self):
+        """Test a burst of events is persisted in a single transaction."""
+        writer = self.manager.event_writer
+        transactions = []
+        original_write = writer._write
+        writer._write = lambda rows: transactions.append(len(rows)) or original_write(rows)
+
+        for i in range(200):
+            self.manager._emit_event(HookType.PROCESS, {"action": "created", "pid": i}, "test")
+        self.assertTrue(writer.flush())
+
+        self.assertEqual(transactions, [200])
+        with sqlite3.connect(self.manager.db_path) as conn:
+            count, = conn.execute("SELECT COUNT(*) FROM system_events").fetchone()
+        self.assertEqual(count, 200)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -10,6 +10,8 @@ import tempfile
 import sqlite3
 from unittest.mock import Mock, patch, MagicMock
 from modules import app_discovery
+from modules.app_index import AppIndex
+from modules.app_inventory import AppInventory, AppScanner, directory_fingerprint, scan_desktop_entries
 
 
 class TestAppDiscovery(unittest.TestCase):
@@ -98,6 +100,7 @@ class TestAppDiscovery(unittest.TestCase):
         self.app_disc.track_app_launch("notepad", "C:\\Windows\\notepad.exe", True)
         self.app_disc.track_app_launch("notepad", "C:\\Windows\\notepad.exe", True)
         self.app_disc.track_app_launch("calculator", "C:\\Windows\\calc.exe", True)
+        self.app_disc.flush_usage()
         
         # Check frequency table
         with sqlite3.connect(self.test_usage_db) as conn:
@@ -352,6 +355,204 @@ class TestAppDiscoveryPerformance(unittest.TestCase):
         # Search should complete quickly (< 1 second)
         self.assertLess(elapsed_time, 1.0)
         self.assertGreater(len(results), 0)
+    
+    def test_index_lookup_10k_catalog(self):
+        """Benchmark top-k lookups against a 10k-app synthetic catalog."""
+        import random
+        import time
+        
+        rng = random.Random(42)
+        vendors = ["adobe", "microsoft", "google", "mozilla", "jetbrains", "valve", "zoom", "epic"]
+        products = ["studio", "reader", "player", "editor", "launcher", "manager", "viewer", "sync"]
+        catalog = {}
+        for i in range(10000):
+            name = f"{rng.choice(vendors)} {rng.choice(products)} {i}"
+            catalog[name] = f"C:\\Program Files\\App{i}\\app{i}.exe"
+        catalog["visual studio code"] = "C:\\Program Files\\VS Code\\Code.exe"
+        numbered = next(name for name in catalog if name.endswith(" 1234"))
+        
+        self.app_disc.apps_database = catalog
+        
+        queries = ["visual studio code", "vsual studio code", "code", numbered,
+                   "player 77", "zoom launcher 9999", "jetbrains"]
+        rounds = 20
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            for query in queries:
+                results = self.app_disc.search_apps(query, limit=5)
+        per_lookup_ms = (time.perf_counter() - start_time) * 1000 / (rounds * len(queries))
+        
+        self.assertEqual(self.app_disc.find_app("visual studio code"), catalog["visual studio code"])
+        self.assertEqual(self.app_disc.find_app("vsual studio code"), catalog["visual studio code"])
+        self.assertEqual(self.app_disc.find_app(numbered), catalog[numbered])
+        # Sub-millisecond goal, with headroom for slow CI machines
+        self.assertLess(per_lookup_ms, 1.5)
+
+
+class TestAppIndex(unittest.TestCase):
+    """Test the app lookup index."""
+    
+    def test_incremental_updates(self):
+        """Test apps added to and removed from the catalog are indexed."""
+        import shutil
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        app_disc = app_discovery.AppDiscovery()
+        app_disc.usage_db_file = os.path.join(temp_dir, "test_usage.db")
+        app_disc._init_usage_database()
+        app_disc.apps_database = {"notepad": "C:\\Windows\\notepad.exe"}
+        
+        app_disc.apps_database["paint"] = "C:\\Windows\\mspaint.exe"
+        self.assertIn("paint", app_disc.index.candidates("paint"))
+        
+        del app_disc.apps_database["paint"]
+        self.assertEqual(app_disc.find_app("paint"), "")
+    
+    def test_executable_alias(self):
+        """Test apps can be found by executable name."""
+        index = AppIndex()
+        index.add("microsoft word", "C:\\Program Files\\Microsoft Office\\WINWORD.EXE")
+        
+        self.assertIn("microsoft word", index.candidates("winword"))
+        self.assertEqual(index.aliases("microsoft word"), ["microsoft word", "winword"])
+    
+    def test_candidates_cover_substring_and_typos(self):
+        """Test candidate generation for substring, reverse substring and typo queries."""
+        index = AppIndex()
+        for name in ["notepad", "notepad++", "calculator", "paint"]:
+            index.add(name)
+        
+        self.assertEqual(index.candidates("note"), {"notepad", "notepad++"})
+        self.assertIn("paint", index.candidates("open paint now"))
+        self.assertIn("notepad", index.candidates("notpad"))
+        self.assertEqual(index.candidates("xyz"), set())
+    
+    def test_prefix_search(self):
+        """Test prefix lookups through the trie."""
+        index = AppIndex()
+        for name in ["chrome", "chromium", "calculator"]:
+            index.add(name)
+        
+        self.assertEqual(index.prefix_search("chr"), ["chrome", "chromium"])
+
+
+class TestAppInventory(unittest.TestCase):
+    """Test suite for incremental, concurrent inventory scanning."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "inventory.db")
+        self.scan_dir = os.path.join(self.temp_dir, "apps")
+        os.makedirs(self.scan_dir)
+        self.scan_calls = 0
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _scan_dir(self):
+        self.scan_calls += 1
+        return {name: os.path.join(self.scan_dir, name) for name in os.listdir(self.scan_dir)}
+    
+    def _inventory(self):
+        return AppInventory([
+            AppScanner('dir', self._scan_dir, lambda: directory_fingerprint([self.scan_dir])),
+            AppScanner('static', lambda: {'notepad': 'notepad.exe'}, lambda: 'static'),
+        ], db_path=self.db_path)
+    
+    def test_unchanged_sources_are_skipped(self):
+        """Test a second refresh reuses results when fingerprints match."""
+        os.makedirs(os.path.join(self.scan_dir, "chrome"))
+        first = self._inventory().refresh()
+        self.assertTrue(first.initial)
+        self.assertEqual(set(first.added), {"chrome", "notepad"})
+        
+        second = self._inventory().refresh()
+        self.assertEqual(sorted(second.skipped), ["dir", "static"])
+        self.assertTrue(second.empty)
+        self.assertEqual(self.scan_calls, 1)
+    
+    def test_diff_and_change_events(self):
+        """Test added and removed apps are reported to subscribers."""
+        os.makedirs(os.path.join(self.scan_dir, "chrome"))
+        inventory = self._inventory()
+        inventory.refresh()
+        events = []
+        inventory.subscribe(events.append)
+        
+        os.rmdir(os.path.join(self.scan_dir, "chrome"))
+        os.makedirs(os.path.join(self.scan_dir, "vlc"))
+        os.utime(self.scan_dir, ns=(0, 0))
+        change = inventory.refresh()
+        
+        self.assertEqual(list(change.added), ["vlc"])
+        self.assertEqual(list(change.removed), ["chrome"])
+        self.assertEqual(change.skipped, ["static"])
+        self.assertEqual(events, [change])
+        self.assertEqual(self._inventory().apps, {"vlc": os.path.join(self.scan_dir, "vlc"),
+                                                  "notepad": "notepad.exe"})
+    
+    def test_discovery_reseeds_from_existing_inventory(self):
+        """Test a new session fills its catalog although the inventory has no changes."""
+        os.makedirs(os.path.join(self.scan_dir, "chrome"))
+        self._inventory().refresh()
+
+        disc = app_discovery.AppDiscovery()
+        disc.apps_cache_file = os.path.join(self.temp_dir, "apps.json")
+        disc.apps_database = {}
+        disc._inventory = self._inventory()
+        disc._inventory.subscribe(disc._apply_inventory_change)
+
+        disc.scan_installed_applications()
+        self.assertEqual(dict(disc.apps_database), {"chrome": os.path.join(self.scan_dir, "chrome"),
+                                                    "notepad": "notepad.exe"})
+        self.assertEqual(disc.find_app("chrome"), os.path.join(self.scan_dir, "chrome"))
+
+    def test_discovery_applies_diffs_after_seeding(self):
+        """Test later changes patch the catalog in place and only drift forces a reseed."""
+        os.makedirs(os.path.join(self.scan_dir, "chrome"))
+        disc = app_discovery.AppDiscovery()
+        disc.apps_cache_file = os.path.join(self.temp_dir, "apps.json")
+        disc._inventory = self._inventory()
+        disc._inventory.subscribe(disc._apply_inventory_change)
+        disc.scan_installed_applications()
+        catalog = disc.apps_database
+
+        os.makedirs(os.path.join(self.scan_dir, "vlc"))
+        os.utime(self.scan_dir, ns=(0, 0))
+        disc.scan_installed_applications()
+        self.assertIs(disc.apps_database, catalog)
+        self.assertEqual(disc.find_app("vlc"), os.path.join(self.scan_dir, "vlc"))
+
+        del catalog["chrome"]  # Catalog drifts from the inventory
+        os.rmdir(os.path.join(self.scan_dir, "chrome"))
+        os.utime(self.scan_dir, ns=(1, 1))
+        disc.scan_installed_applications()
+        self.assertIsNot(disc.apps_database, catalog)
+        self.assertEqual(dict(disc.apps_database), {"vlc": os.path.join(self.scan_dir, "vlc"),
+                                                    "notepad": "notepad.exe"})
+
+    def test_scanners_run_concurrently(self):
+        """Test slow scanners overlap instead of running back to back."""
+        import time
+        
+        def slow():
+            time.sleep(0.3)
+            return {}
+        
+        inventory = AppInventory([AppScanner(f"s{i}", slow) for i in range(4)], db_path=self.db_path)
+        start = time.monotonic()
+        inventory.refresh()
+        self.assertLess(time.monotonic() - start, 0.9)
+    
+    def test_desktop_entries(self):
+        """Test freedesktop entries are parsed and hidden ones skipped."""
+        with open(os.path.join(self.scan_dir, "firefox.desktop"), "w") as f:
+            f.write("[Desktop Entry]\nType=Application\nName=Firefox\nExec=firefox %u\n")
+        with open(os.path.join(self.scan_dir, "hidden.desktop"), "w") as f:
+            f.write("[Desktop Entry]\nName=Hidden\nExec=hidden\nNoDisplay=true\n")
+        
+        self.assertEqual(scan_desktop_entries([self.scan_dir]), {"firefox": "firefox"})
 
 
 if __name__ == '__main__':
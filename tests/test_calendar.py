@@ -8,11 +8,104 @@ from unittest.mock import Mock, patch, MagicMock
 import sys
 import os
 import datetime
+import json
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+from googleapiclient.discovery import build
 
 # Add parent directory to path to import modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from modules import google_calendar as cal_module
+from modules.calendar_sync import CalendarMirror, IntervalIndex, event_interval
+
+
+class FakeCalendarServer:
+    """
+    In-process Calendar API: serves events.list with paging and sync
+    tokens through the httplib2 interface and records each request.
+    """
+    
+    def __init__(self):
+        self.events = {}
+        self.sequence = 0
+        self.oldest_token = 0
+        self.offline = False
+        self.requests = []
+        self.credentials = None
+    
+    def add_event(self, event_id, summary, start=None, hours_from_now=None, all_day_in=None, **fields):
+        """Create or update an event; times are local"""
+        self.sequence += 1
+        event = {'id': event_id, 'status': 'confirmed', 'summary': summary, 'updated': self.sequence, **fields}
+        if all_day_in is not None:
+            day = datetime.date.today() + datetime.timedelta(days=all_day_in)
+            event['start'] = {'date': day.isoformat()}
+            event['end'] = {'date': (day + datetime.timedelta(days=1)).isoformat()}
+        else:
+            start = start or datetime.datetime.now() + datetime.timedelta(hours=hours_from_now)
+            start = start.astimezone()
+            event['start'] = {'dateTime': start.isoformat()}
+            event['end'] = {'dateTime': (start + datetime.timedelta(hours=1)).isoformat()}
+        self.events[event_id] = event
+    
+    def cancel_event(self, event_id):
+        self.sequence += 1
+        self.events[event_id].update(status='cancelled', updated=self.sequence)
+    
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        if self.offline:
+            raise httplib2.ServerNotFoundError("Unable to find the server at www.googleapis.com")
+        query = parse_qs(urlparse(uri).query)
+        self.requests.append(query)
+        if 'syncToken' in query:
+            since = int(query['syncToken'][0].split('-')[1])
+            if since < self.oldest_token:
+                return self._response(410, {'error': {'code': 410, 'message': 'Sync token is no longer valid'}})
+            items = [e for e in self.events.values() if e['updated'] > since]
+        else:
+            items = [e for e in self.events.values() if e['status'] != 'cancelled']
+        items.sort(key=lambda e: e['updated'])
+        
+        # Two events per page to exercise pagination
+        offset = int(query.get('pageToken', ['0'])[0])
+        page = {'items': [{k: v for k, v in e.items() if k != 'updated'} for e in items[offset:offset + 2]]}
+        if offset + 2 < len(items):
+            page['nextPageToken'] = str(offset + 2)
+        else:
+            page['nextSyncToken'] = f"tok-{self.sequence}"
+        return self._response(200, page)
+    
+    def close(self):
+        pass
+    
+    @staticmethod
+    def _response(status, payload):
+        return httplib2.Response({'status': status, 'content-type': 'application/json'}), json.dumps(payload).encode()
+
+
+@contextmanager
+def calendar_server():
+    """Point the calendar tools at a fake server with a temporary mirror"""
+    cal_module.CalendarManager._instance = None
+    temp_dir = tempfile.mkdtemp()
+    server = FakeCalendarServer()
+    manager = cal_module.CalendarManager()
+    manager.cache_path = Path(temp_dir) / 'calendar_cache.db'
+    service = build('calendar', 'v3', http=server, static_discovery=True)
+    try:
+        with patch('modules.google_calendar.get_calendar_service', return_value=service):
+            yield server
+    finally:
+        if manager.mirror:
+            manager.mirror.stop()
+        cal_module.CalendarManager._instance = None
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 class TestCalendarManager(unittest.TestCase):
@@ -87,39 +180,23 @@ class TestCalendarEvents(unittest.TestCase):
         self.assertIn("not authenticated", result)
         self.assertIn("❌", result)
     
-    @patch('modules.google_calendar.get_calendar_service')
-    def test_get_upcoming_events_no_events(self, mock_service):
+    def test_get_upcoming_events_no_events(self):
         """Test get_upcoming_events when no events exist"""
-        mock_svc = Mock()
-        mock_svc.events().list().execute.return_value = {'items': []}
-        mock_service.return_value = mock_svc
-        
-        result = cal_module.get_upcoming_events(7)
+        with calendar_server() as server:
+            result = cal_module.get_upcoming_events(7)
         self.assertIn("No upcoming events", result)
     
-    @patch('modules.google_calendar.get_calendar_service')
-    def test_get_upcoming_events_with_events(self, mock_service):
+    def test_get_upcoming_events_with_events(self):
         """Test get_upcoming_events with existing events"""
-        mock_svc = Mock()
-        mock_svc.events().list().execute.return_value = {
-            'items': [
-                {
-                    'summary': 'Test Meeting',
-                    'start': {'dateTime': '2025-11-18T10:00:00Z'},
-                    'location': 'Conference Room'
-                },
-                {
-                    'summary': 'Lunch',
-                    'start': {'date': '2025-11-19'},
-                }
-            ]
-        }
-        mock_service.return_value = mock_svc
-        
-        result = cal_module.get_upcoming_events(7)
+        with calendar_server() as server:
+            server.add_event('e1', 'Test Meeting', hours_from_now=3, location='Conference Room')
+            server.add_event('e2', 'Lunch', all_day_in=2)
+            server.add_event('e3', 'Next Month', hours_from_now=24 * 30)
+            result = cal_module.get_upcoming_events(7)
         self.assertIn("Test Meeting", result)
         self.assertIn("Lunch", result)
         self.assertIn("Conference Room", result)
+        self.assertNotIn("Next Month", result)
     
     @patch('modules.google_calendar.get_calendar_service', return_value=None)
     def test_create_event_not_authenticated(self, mock_service):
@@ -177,65 +254,171 @@ class TestCalendarEvents(unittest.TestCase):
 class TestTodaysSchedule(unittest.TestCase):
     """Test today's schedule function"""
     
-    @patch('modules.google_calendar.get_calendar_service')
-    @patch('modules.google_calendar.datetime')
-    def test_todays_schedule_with_events(self, mock_datetime, mock_service):
+    def test_todays_schedule_with_events(self):
         """Test get_todays_schedule with events today"""
-        # Mock today's date
-        mock_today = datetime.date(2025, 11, 18)
-        mock_datetime.date.today.return_value = mock_today
-        mock_datetime.datetime.combine = datetime.datetime.combine
-        mock_datetime.time = datetime.time
-        mock_datetime.datetime.fromisoformat = datetime.datetime.fromisoformat
-        
-        mock_svc = Mock()
-        mock_svc.events().list().execute.return_value = {
-            'items': [
-                {
-                    'summary': 'Morning Standup',
-                    'start': {'dateTime': '2025-11-18T09:00:00Z'}
-                }
-            ]
-        }
-        mock_service.return_value = mock_svc
-        
-        result = cal_module.get_todays_schedule()
+        today = datetime.datetime.combine(datetime.date.today(), datetime.time(9, 0))
+        with calendar_server() as server:
+            server.add_event('e1', 'Morning Standup', start=today)
+            server.add_event('e2', 'Tomorrow Review', start=today + datetime.timedelta(days=1))
+            result = cal_module.get_todays_schedule()
         self.assertIn("TODAY'S SCHEDULE", result)
         self.assertIn("Morning Standup", result)
+        self.assertNotIn("Tomorrow Review", result)
 
 
 class TestSearchEvents(unittest.TestCase):
     """Test search calendar events"""
     
-    @patch('modules.google_calendar.get_calendar_service')
-    def test_search_events_found(self, mock_service):
+    def test_search_events_found(self):
         """Test searching for events with results"""
-        mock_svc = Mock()
-        mock_svc.events().list().execute.return_value = {
-            'items': [
-                {
-                    'summary': 'Project Meeting',
-                    'start': {'dateTime': '2025-11-20T14:00:00Z'}
-                }
-            ]
-        }
-        mock_service.return_value = mock_svc
-        
-        result = cal_module.search_calendar_events('project', 30, 30)
+        with calendar_server() as server:
+            server.add_event('e1', 'Project Meeting', hours_from_now=48)
+            server.add_event('e2', 'Dentist', hours_from_now=50)
+            result = cal_module.search_calendar_events('project', 30, 30)
         self.assertIn("SEARCH RESULTS", result)
         self.assertIn("Project Meeting", result)
+        self.assertNotIn("Dentist", result)
     
-    @patch('modules.google_calendar.get_calendar_service')
-    def test_search_events_not_found(self, mock_service):
+    def test_search_events_not_found(self):
         """Test searching with no results"""
-        mock_svc = Mock()
-        mock_svc.events().list().execute.return_value = {'items': []}
-        mock_service.return_value = mock_svc
-        
-        result = cal_module.search_calendar_events('nonexistent', 30, 30)
+        with calendar_server():
+            result = cal_module.search_calendar_events('nonexistent', 30, 30)
         self.assertIn("No events found", result)
 
 
+class TestCalendarMirror(unittest.TestCase):
+    """Test the local event mirror and its incremental sync"""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.server = FakeCalendarServer()
+        self.service = build('calendar', 'v3', http=self.server, static_discovery=True)
+        self.mirror = CalendarMirror(self.service, os.path.join(self.temp_dir, 'calendar_cache.db'))
+    
+    def tearDown(self):
+        self.mirror.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _window(self, days=7):
+        now = datetime.datetime.now()
+        return now - datetime.timedelta(days=1), now + datetime.timedelta(days=days)
+    
+    def test_incremental_sync_fetches_only_changes(self):
+        """Test a syncToken sync only transfers events changed since the last sync"""
+        for i in range(5):
+            self.server.add_event(f'e{i}', f'Meeting {i}', hours_from_now=i + 1)
+        self.assertEqual(self.mirror.sync(), {'updated': 5, 'removed': 0})
+        self.assertIsNotNone(self.mirror.sync_token)
+        
+        self.server.add_event('e1', 'Meeting 1 (moved)', hours_from_now=30)
+        self.server.cancel_event('e2')
+        self.server.add_event('new', 'New Event', hours_from_now=2)
+        changes = self.mirror.sync()
+        
+        self.assertEqual(changes, {'updated': 2, 'removed': 1})
+        self.assertEqual(self.server.requests[-1]['syncToken'], ['tok-5'])
+        self.assertNotIn('timeMin', self.server.requests[-1])
+        titles = [e['summary'] for e in self.mirror.events_between(*self._window())]
+        self.assertEqual(titles, ['Meeting 0', 'New Event', 'Meeting 3', 'Meeting 4', 'Meeting 1 (moved)'])
+    
+    def test_expired_token_triggers_full_sync(self):
+        """Test a 410 Gone for the sync token rebuilds the mirror"""
+        self.server.add_event('e1', 'Kept', hours_from_now=1)
+        self.server.add_event('e2', 'Dropped', hours_from_now=2)
+        self.mirror.sync()
+        self.server.events.pop('e2')
+        self.server.oldest_token = self.server.sequence + 1
+        
+        self.mirror.sync()
+        
+        self.assertEqual(self.mirror.stats['full_syncs'], 2)
+        self.assertEqual([e['summary'] for e in self.mirror.events_between(*self._window())], ['Kept'])
+    
+    def test_range_queries_are_local(self):
+        """Test fresh mirrors answer range queries without network calls"""
+        self.server.add_event('e1', 'Standup', hours_from_now=1)
+        self.mirror.events_between(*self._window())
+        calls = len(self.server.requests)
+        
+        for _ in range(20):
+            self.mirror.events_between(*self._window())
+        self.assertEqual(len(self.server.requests), calls)
+        
+        # Once the data is older than max_staleness, the next read syncs first
+        self.mirror.last_sync -= self.mirror.max_staleness + 1
+        self.mirror.events_between(*self._window())
+        self.assertEqual(len(self.server.requests), calls + 1)
+    
+    def test_serves_cache_while_offline(self):
+        """Test stale cached events are served during connectivity drops"""
+        self.server.add_event('e1', 'Flight', hours_from_now=5)
+        self.mirror.sync()
+        self.server.offline = True
+        self.mirror.last_sync -= self.mirror.max_staleness + 1
+        
+        with patch('builtins.print'):
+            events = self.mirror.events_between(*self._window())
+        self.assertEqual([e['summary'] for e in events], ['Flight'])
+        self.assertIsNotNone(self.mirror.last_error)
+        
+        # Past the grace period the failure is surfaced
+        self.mirror.last_sync -= self.mirror.offline_grace
+        with self.assertRaises(httplib2.ServerNotFoundError):
+            self.mirror.events_between(*self._window())
+    
+    def test_mirror_survives_restart(self):
+        """Test a new mirror resumes from the stored events and sync token"""
+        self.server.add_event('e1', 'Persisted', hours_from_now=1)
+        self.mirror.sync()
+        
+        reopened = CalendarMirror(self.service, self.mirror.db_path)
+        calls = len(self.server.requests)
+        self.assertEqual([e['summary'] for e in reopened.events_between(*self._window())], ['Persisted'])
+        self.assertEqual(len(self.server.requests), calls)
+        reopened.sync()
+        self.assertIn('syncToken', self.server.requests[-1])
+
+    def test_shorter_history_resyncs_in_full(self):
+        """Test a mirror synced with less history than needed is rebuilt once"""
+        self.server.add_event('e1', 'Standup', hours_from_now=1)
+        CalendarMirror(self.service, self.mirror.db_path, history_days=90).sync()
+
+        self.mirror.sync()
+        since = datetime.datetime.fromisoformat(self.server.requests[-1]['timeMin'][0])
+        self.assertLess(since, datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=364))
+        self.assertEqual(self.mirror.stats['full_syncs'], 1)
+
+        for _ in range(2):  # Incremental syncs keep the recorded coverage
+            self.mirror.sync()
+            self.assertIn('syncToken', self.server.requests[-1])
+
+
+class TestIntervalIndex(unittest.TestCase):
+    """Test the overlap index used for range queries"""
+    
+    def test_overlapping_events(self):
+        """Test long, all-day and zero-length events are found by overlap"""
+        index = IntervalIndex()
+        index.add('conference', 0, 10 * 86400)
+        index.add('short', 5 * 86400, 5 * 86400 + 3600)
+        index.add('reminder', 6 * 86400, 6 * 86400)
+        index.add('later', 20 * 86400, 21 * 86400)
+        
+        self.assertEqual(index.overlapping(5 * 86400, 7 * 86400), ['conference', 'short', 'reminder'])
+        self.assertEqual(index.overlapping(10 * 86400, 20 * 86400), [])
+        index.remove('conference')
+        self.assertEqual(index.overlapping(0, 5 * 86400 + 1), ['short'])
+        self.assertEqual(len(index), 3)
+    
+    def test_all_day_event_interval(self):
+        """Test all-day events span the whole local day"""
+        start, end = event_interval({'id': 'a', 'start': {'date': '2025-11-18'}, 'end': {'date': '2025-11-19'}})
+        self.assertEqual(start, datetime.datetime(2025, 11, 18).timestamp())
+        self.assertEqual(end - start, 86400)
+        start, end = event_interval({'id': 'b', 'start': {'dateTime': '2025-11-18T09:00:00Z'}})
+        self.assertEqual(start, end)
+
+
 class TestDeleteEvent(unittest.TestCase):
     """Test delete calendar event"""
     
@@ -0,0 +1,281 @@
+"""
+Unit tests for Email Handler Module (Gmail Integration)
+Tests batched metadata fetching, the local mail mirror and incremental sync
+against a fake Gmail API server.
+"""
+
+import unittest
+import email.utils
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from email.parser import Parser
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+from googleapiclient.discovery import build
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import email_handler
+from modules.mail_sync import parse_search_query
+
+
+class FakeGmailServer:
+    """
+    In-process Gmail API: answers the REST and batch requests made by
+    googleapiclient through the httplib2 interface and records each call.
+    """
+
+    def __init__(self):
+        self.messages = {}
+        self.history = []
+        self.history_id = 100
+        self.oldest_history_id = 100
+        self.calls = []
+        self.throttle = set()  # message ids answered with 429 once
+        self.credentials = None
+
+    # --- mailbox mutations -------------------------------------------------
+    def add_message(self, message_id, sender, subject, minutes_ago=0, labels=("INBOX", "UNREAD")):
+        self.history_id += 1
+        sent = datetime(2024, 6, 1, 12, 0) - timedelta(minutes=minutes_ago)
+        self.messages[message_id] = {
+            "id": message_id, "threadId": f"t{message_id}", "labelIds": list(labels),
+            "snippet": f"Snippet for {subject}", "historyId": str(self.history_id),
+            "internalDate": str(int(sent.timestamp() * 1000)),
+            "payload": {"headers": [
+                {"name": "From", "value": sender},
+                {"name": "To", "value": "me@example.com"},
+                {"name": "Subject", "value": subject},
+                {"name": "Date", "value": email.utils.format_datetime(sent)},
+            ]},
+        }
+        self.history.append({"id": str(self.history_id),
+                             "messagesAdded": [{"message": {"id": message_id, "labelIds": list(labels)}}]})
+
+    def remove_label(self, message_id, label):
+        self.history_id += 1
+        message = self.messages[message_id]
+        message["labelIds"].remove(label)
+        self.history.append({"id": str(self.history_id), "labelsRemoved": [
+            {"message": {"id": message_id, "labelIds": list(message["labelIds"])}, "labelIds": [label]}]})
+
+    def delete_message(self, message_id):
+        self.history_id += 1
+        del self.messages[message_id]
+        self.history.append({"id": str(self.history_id),
+                             "messagesDeleted": [{"message": {"id": message_id}}]})
+
+    # --- transport ---------------------------------------------------------
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        parsed = urlparse(uri)
+        if parsed.path == "/batch/gmail/v1":
+            self.calls.append("batch")
+            return self._batch(body, headers)
+        status, payload = self._dispatch(method, parsed.path, parse_qs(parsed.query), batched=False)
+        return self._response(status), json.dumps(payload).encode()
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _response(status, content_type="application/json"):
+        return httplib2.Response({"status": status, "content-type": content_type})
+
+    def _dispatch(self, method, path, query, batched):
+        path = path[len("/gmail/v1/users/me/"):]
+        if path == "profile":
+            self.calls.append("profile")
+            return 200, {"emailAddress": "me@example.com", "historyId": str(self.history_id)}
+        if path == "messages":
+            self.calls.append("list")
+            return 200, self._list(query)
+        if path.startswith("messages/"):
+            message_id = path.split("/", 1)[1]
+            if not batched:
+                self.calls.append("get")
+            if message_id in self.throttle:
+                self.throttle.discard(message_id)
+                return 429, {"error": {"code": 429, "message": "Rate limit exceeded"}}
+            if message_id not in self.messages:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            return 200, self.messages[message_id]
+        if path == "history":
+            self.calls.append("history")
+            start = int(query["startHistoryId"][0])
+            if start < self.oldest_history_id:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            records = [r for r in self.history if int(r["id"]) > start]
+            return 200, {"history": records, "historyId": str(self.history_id)}
+        return 404, {"error": {"code": 404, "message": f"Unknown path {path}"}}
+
+    def _list(self, query):
+        ordered = sorted(self.messages.values(), key=lambda m: int(m["internalDate"]), reverse=True)
+        if "q" in query:
+            words = [w.lower() for w in query["q"][0].split() if ":" not in w]
+            ordered = [m for m in ordered
+                       if all(w in m["payload"]["headers"][2]["value"].lower() for w in words)]
+        offset = int(query.get("pageToken", ["0"])[0])
+        limit = int(query.get("maxResults", ["100"])[0])
+        page = ordered[offset:offset + limit]
+        response = {"messages": [{"id": m["id"], "threadId": m["threadId"]} for m in page]}
+        if offset + limit < len(ordered):
+            response["nextPageToken"] = str(offset + limit)
+        return response
+
+    def _batch(self, body, headers):
+        message = Parser().parsestr(f"Content-Type: {headers['content-type']}\r\n\r\n{body}")
+        boundary = "batch_boundary"
+        parts = []
+        for part in message.get_payload():
+            request_line = part.get_payload().split("\n", 1)[0]
+            method, target, _ = request_line.split(" ")
+            target = urlparse(target)
+            status, payload = self._dispatch(method, target.path, parse_qs(target.query), batched=True)
+            content_id = part["Content-ID"].strip("<>")
+            parts.append(f"--{boundary}\r\nContent-Type: application/http\r\n"
+                         f"Content-ID: <response-{content_id}>\r\n\r\n"
+                         f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                         f"Content-Type: application/json\r\n\r\n{json.dumps(payload)}\r\n")
+        content = "".join(parts) + f"--{boundary}--\r\n"
+        return (self._response(200, f"multipart/mixed; boundary={boundary}"), content.encode())
+
+
+class TestMailSync(unittest.TestCase):
+    """Test the local mirror and the email tools that read from it"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.server = FakeGmailServer()
+        for i in range(50):
+            sender = "Alice <alice@example.com>" if i % 5 == 0 else f"Sender {i} <s{i}@example.com>"
+            self.server.add_message(f"m{i:03d}", sender, f"Weekly report {i}" if i % 10 == 0 else f"Update {i}",
+                                    minutes_ago=i)
+        self.server.oldest_history_id = self.server.history_id
+        self.server.history.clear()
+
+        email_handler.GmailManager._instance = None
+        self.manager = email_handler.GmailManager()
+        self.manager.service = build("gmail", "v1", http=self.server, static_discovery=True)
+        self.manager.cache_path = Path(self.temp_dir) / "gmail_cache.db"
+
+    def tearDown(self):
+        email_handler.GmailManager._instance = None
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_inbox_summary_uses_one_batch(self):
+        """Test 50 messages are summarized with a single batch request"""
+        summary = email_handler.get_inbox_summary(50)
+
+        self.assertIn("INBOX SUMMARY (50 recent emails)", summary)
+        self.assertEqual(summary.count("🆕"), 50)
+        self.assertEqual(self.server.calls, ["profile", "list", "batch"])
+        # Newest first, as Gmail lists them
+        self.assertLess(summary.index("Weekly report 0"), summary.index("Update 1"))
+
+        # A repeat call inside the freshness window is served locally
+        self.server.calls.clear()
+        email_handler.get_inbox_summary(10)
+        self.assertEqual(self.server.calls, [])
+
+    def test_incremental_history_sync(self):
+        """Test only changed messages are fetched after the initial sync"""
+        sync = email_handler.get_mail_sync()
+        sync.sync()
+        self.server.calls.clear()
+
+        self.server.add_message("new1", "Bob <bob@example.com>", "Lunch tomorrow?", minutes_ago=-5)
+        self.server.remove_label("m001", "UNREAD")
+        self.server.delete_message("m002")
+        changes = sync.sync()
+
+        self.assertEqual(changes, {"added": 1, "deleted": 1, "updated": 1})
+        self.assertEqual(self.server.calls, ["history", "batch"])
+        self.assertEqual(sync.store.recent("INBOX", 1)[0]["subject"], "Lunch tomorrow?")
+        self.assertNotIn("UNREAD", sync.store.get("m001")["labels"])
+        self.assertIsNone(sync.store.get("m002"))
+        self.assertEqual(sync.history_id, str(self.server.history_id))
+
+    def test_expired_history_triggers_full_resync(self):
+        """Test a 404 from history.list rebuilds the mirror"""
+        sync = email_handler.get_mail_sync()
+        sync.sync()
+        self.server.add_message("late", "Carol <carol@example.com>", "Expired history", minutes_ago=-1)
+        self.server.oldest_history_id = self.server.history_id + 1
+        self.server.calls.clear()
+
+        sync.sync()
+
+        # 51 messages take two batches of 50
+        self.assertEqual(self.server.calls, ["history", "profile", "list", "batch", "batch"])
+        self.assertEqual(sync.store.count(), 51)
+
+    def test_search_answered_locally(self):
+        """Test supported queries never reach Gmail once the mirror is complete"""
+        email_handler.get_mail_sync().sync()
+        self.server.calls.clear()
+
+        results = email_handler.search_emails("from:alice report", 10)
+
+        self.assertIn("(5 found)", results)
+        self.assertEqual(results.count("Alice"), 5)
+        self.assertEqual(self.server.calls, [])
+
+    def test_trash_and_spam_hidden_unless_requested(self):
+        """Test trashed and spam messages only show up when asked for, as in Gmail"""
+        sync = email_handler.get_mail_sync()
+        sync.sync()
+        self.server.add_message("bin1", "Alice <alice@example.com>", "Old report", minutes_ago=-2,
+                                labels=("TRASH",))
+        self.server.add_message("spam1", "Alice <alice@example.com>", "Prize report", minutes_ago=-1,
+                                labels=("SPAM", "UNREAD"))
+        sync.sync()
+        self.server.calls.clear()
+
+        self.assertNotIn(sync.store.recent(limit=1)[0]["id"], ("bin1", "spam1"))
+        self.assertEqual([m["id"] for m in sync.store.recent("TRASH")], ["bin1"])
+        self.assertIn("(5 found)", email_handler.search_emails("from:alice report", 10))
+        self.assertIn("Prize report", email_handler.search_emails("in:spam report", 10))
+        self.assertEqual(self.server.calls, [])
+
+    def test_unsupported_query_fetches_only_missing(self):
+        """Test Gmail-only operators go remote and reuse mirrored metadata"""
+        sync = email_handler.get_mail_sync()
+        sync.sync()
+        sync.store.delete(["m010"])
+        self.server.calls.clear()
+
+        results = email_handler.search_emails("has:attachment report", 10)
+
+        self.assertIn("(5 found)", results)
+        self.assertEqual(self.server.calls, ["list", "batch"])
+        self.assertIsNotNone(sync.store.get("m010"))
+
+    def test_rate_limited_calls_are_retried(self):
+        """Test 429 responses inside a batch are retried"""
+        self.server.throttle = {"m003", "m007"}
+        sync = email_handler.get_mail_sync()
+        with patch("modules.mail_sync.time.sleep"):
+            sync.sync()
+
+        self.assertEqual(sync.store.count(), 50)
+        self.assertEqual(self.server.calls.count("batch"), 2)
+
+    def test_parse_search_query(self):
+        """Test Gmail query translation"""
+        self.assertEqual(parse_search_query('from:alice subject:"q3 plan" is:unread budget'),
+                         {"sender": ["alice"], "subject": ["q3 plan"], "labels": ["UNREAD"],
+                          "words": ["budget"]})
+        for query in ["after:2024/01/01", "has:attachment", "alice OR bob", "-spam", "in:anywhere"]:
+            self.assertIsNone(parse_search_query(query), query)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,126 @@
+"""
+Unit tests for the buffered event sink used by the user data and
+session activity loggers.
+"""
+
+import unittest
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.event_sink import EventSink, read_events
+from utils import user_data_logger
+
+
+class TestEventSink(unittest.TestCase):
+    """Test batching, rotation and reading of event segments"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.events_dir = Path(self.temp_dir) / 'events'
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_burst_written_in_one_batch(self):
+        """Test a burst of events lands in a single append to one file"""
+        sink = EventSink(self.events_dir, flush_interval=0.05, max_batch=10000)
+        writes = []
+        original_write = sink._write
+        sink._write = lambda events: writes.append(len(events)) or original_write(events)
+
+        for i in range(1000):
+            sink.put('queries', {'query': f'q{i}'}, session_id='s1')
+        self.assertTrue(sink.flush())
+
+        self.assertEqual(writes, [1000])
+        self.assertEqual(len(list(self.events_dir.iterdir())), 1)
+        events = sink.query(session_id='s1')
+        self.assertEqual([e['data']['query'] for e in events[:3]], ['q0', 'q1', 'q2'])
+        self.assertEqual(len(events), 1000)
+        sink.close()
+
+    def test_rotation_compresses_segments(self):
+        """Test full segments are closed, gzipped and still readable in order"""
+        sink = EventSink(self.events_dir, flush_interval=0, segment_max_bytes=2000)
+        for i in range(60):
+            sink.put('replies', {'reply': 'x' * 50, 'n': i}, timestamp=1000 + i)
+            if i % 10 == 9:
+                sink.flush()
+        sink.close()
+
+        segments = sorted(self.events_dir.iterdir())
+        self.assertGreater(len(segments), 1)
+        self.assertTrue(all(path.name.endswith('.jsonl.gz') for path in segments))
+        with gzip.open(segments[0], 'rt') as f:
+            self.assertIn('"replies"', f.readline())
+        self.assertEqual([e['data']['n'] for e in read_events(self.events_dir)], list(range(60)))
+
+    def test_query_by_session_and_time_range(self):
+        """Test reads filter by session and time, skipping segments outside the range"""
+        sink = EventSink(self.events_dir, flush_interval=0, segment_max_bytes=1)
+        for i in range(10):
+            sink.put('actions', {'n': i}, session_id='a' if i % 2 else 'b', timestamp=2000 + i * 10)
+            sink.flush()
+        sink.close()
+
+        window = [e['data']['n'] for e in read_events(self.events_dir, session_id='a', start=2020, end=2071)]
+        self.assertEqual(window, [3, 5, 7])
+
+        opened = []
+        original_open = gzip.open
+        with patch('utils.event_sink.gzip.open', side_effect=lambda *a, **k: opened.append(a[0]) or original_open(*a, **k)):
+            list(read_events(self.events_dir, start=datetime.fromtimestamp(2050), end=2070))
+        self.assertEqual(len(opened), 2)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test the command path never waits on a backed-up writer"""
+        sink = EventSink(self.events_dir, max_queue=5)
+        with patch.object(sink, '_ensure_thread'):
+            for i in range(8):
+                sink.put('queries', {'n': i})
+        self.assertEqual(sink.dropped, 3)
+
+
+class TestUserDataLogger(unittest.TestCase):
+    """Test the user data logging functions"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.patches = [patch.object(user_data_logger, 'EVENTS_DIR', self.temp_dir),
+                        patch.object(user_data_logger, '_sink', None),
+                        patch.object(user_data_logger, '_current_session', return_value='sess1')]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        if user_data_logger._sink is not None:
+            user_data_logger._sink.close()
+        for p in reversed(self.patches):
+            p.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_queries_and_replies_share_one_segment(self):
+        """Test logging many events creates one file instead of one per event"""
+        for i in range(100):
+            user_data_logger.log_query(f'question {i}')
+            user_data_logger.log_reply(f'answer {i}')
+        user_data_logger.log_action('play_music', {'song_name': 'Test'})
+
+        queries = user_data_logger.read_data('queries', session_id='sess1')
+        self.assertEqual(len(queries), 100)
+        self.assertEqual(queries[0]['data'], {'query': 'question 0'})
+        self.assertEqual(len(os.listdir(self.temp_dir)), 1)
+        self.assertEqual(len(user_data_logger.read_data(session_id='other')), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
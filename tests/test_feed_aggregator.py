@@ -0,0 +1,242 @@
+"""
+Unit tests for the Feed Aggregation Service
+
+Runs against a local HTTP fixture server and covers:
+- Conditional GET with persisted ETag / Last-Modified validators
+- On-disk cache of parsed entries
+- Concurrent fetching
+- Per-host rate limiting
+- Incremental "new since last poll" queries
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.feed_aggregator import FeedAggregator, HostRateLimiter
+
+
+def _rss(title, items):
+    """Render a minimal RSS document"""
+    body = "".join(
+        f"<item><guid>{guid}</guid><title>{name}</title>"
+        f"<link>http://example.com/{guid}</link>"
+        f"<pubDate>{pub_date}</pubDate></item>"
+        for guid, name, pub_date in items
+    )
+    return (f'<?xml version="1.0"?><rss version="2.0"><channel><title>{title}</title>'
+            f'{body}</channel></rss>').encode('utf-8')
+
+
+class FeedFixtureServer:
+    """Local HTTP server serving configurable feeds with ETag support"""
+
+    def __init__(self):
+        self.feeds = {}
+        self.delays = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fixture.lock:
+                    fixture.requests.append((self.path, time.monotonic(),
+                                             self.headers.get('If-None-Match')))
+                    feed = fixture.feeds.get(self.path)
+                    delay = fixture.delays.get(self.path, 0)
+                if delay:
+                    time.sleep(delay)
+                if feed is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                etag, body = feed
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/rss+xml')
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', 'Mon, 01 Jan 2024 12:00:00 GMT')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def set_feed(self, path, etag, body):
+        with self.lock:
+            self.feeds[path] = (etag, body)
+
+    def count(self, path):
+        with self.lock:
+            return sum(1 for p, _, _ in self.requests if p == path)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestFeedAggregator(unittest.TestCase):
+    """Test suite for FeedAggregator against a fixture server"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.server = FeedFixtureServer().__enter__()
+        self.server.set_feed('/news', '"v1"', _rss('Fixture News', [
+            ('a', 'Article A', 'Mon, 01 Jan 2024 12:00:00 GMT'),
+            ('b', 'Article B', 'Mon, 01 Jan 2024 13:00:00 GMT'),
+        ]))
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _aggregator(self, **kwargs):
+        kwargs.setdefault('min_host_interval', 0)
+        return FeedAggregator(cache_dir=self.cache_dir, **kwargs)
+
+    def test_fetch_parses_entries(self):
+        """Test a first fetch downloads and parses the feed"""
+        result = self._aggregator().fetch_feed(self.server.url('/news'))
+
+        self.assertEqual(result.status, 'updated')
+        self.assertEqual(result.source, 'Fixture News')
+        self.assertEqual([e['title'] for e in result.entries], ['Article A', 'Article B'])
+        self.assertIsNotNone(result.entries[0]['published_ts'])
+
+    def test_conditional_get_uses_persisted_validators(self):
+        """Test a new aggregator revalidates with the stored ETag and gets 304"""
+        url = self.server.url('/news')
+        self._aggregator().fetch_feed(url)
+
+        result = self._aggregator().fetch_feed(url)
+
+        self.assertEqual(result.status, 'not_modified')
+        self.assertEqual(len(result.entries), 2)
+        self.assertEqual(self.server.requests[-1][2], '"v1"')
+
+    def test_max_age_skips_network(self):
+        """Test recently fetched feeds are served from cache without a request"""
+        url = self.server.url('/news')
+        aggregator = self._aggregator(max_age=60)
+        aggregator.fetch_feed(url)
+
+        result = aggregator.fetch_feed(url)
+
+        self.assertEqual(result.status, 'cached')
+        self.assertEqual(self.server.count('/news'), 1)
+
+    def test_error_falls_back_to_cache(self):
+        """Test a failing feed still returns previously cached entries"""
+        url = self.server.url('/news')
+        aggregator = self._aggregator()
+        aggregator.fetch_feed(url)
+        with self.server.lock:
+            del self.server.feeds['/news']
+
+        result = aggregator.fetch_feed(url)
+
+        self.assertEqual(result.status, 'cached')
+        self.assertEqual(len(result.entries), 2)
+
+    def test_missing_feed_is_error(self):
+        """Test an unknown feed without cache reports an error"""
+        result = self._aggregator().fetch_feed(self.server.url('/missing'))
+
+        self.assertFalse(result.ok)
+        self.assertEqual(result.entries, [])
+
+    def test_fetch_all_is_concurrent(self):
+        """Test slow feeds are fetched in parallel, in input order"""
+        paths = [f'/slow{i}' for i in range(6)]
+        for i, path in enumerate(paths):
+            self.server.set_feed(path, f'"s{i}"', _rss(f'Slow {i}', [(f's{i}', f'Item {i}', '')]))
+            self.server.delays[path] = 0.3
+
+        start = time.monotonic()
+        results = self._aggregator(max_workers=6).fetch_all([self.server.url(p) for p in paths])
+        elapsed = time.monotonic() - start
+
+        self.assertEqual([r.source for r in results], [f'Slow {i}' for i in range(6)])
+        self.assertLess(elapsed, 1.2)
+
+    def test_poll_returns_only_new_entries(self):
+        """Test incremental polling reports each entry once"""
+        url = self.server.url('/news')
+        aggregator = self._aggregator()
+
+        first = aggregator.poll([url])
+        self.assertEqual({e['title'] for e in first}, {'Article A', 'Article B'})
+        self.assertEqual(aggregator.poll([url]), [])
+
+        self.server.set_feed('/news', '"v2"', _rss('Fixture News', [
+            ('c', 'Article C', 'Mon, 01 Jan 2024 14:00:00 GMT'),
+            ('a', 'Article A', 'Mon, 01 Jan 2024 12:00:00 GMT'),
+        ]))
+        self.assertEqual([e['title'] for e in aggregator.poll([url])], ['Article C'])
+
+    def test_poll_cap_keeps_extras_unseen(self):
+        """Test entries beyond the per-feed cap are returned by the next poll"""
+        url = self.server.url('/news')
+        aggregator = self._aggregator()
+
+        first = aggregator.poll([url], max_per_feed=1)
+        second = aggregator.poll([url], max_per_feed=1)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 1)
+        self.assertEqual({first[0]['title'], second[0]['title']}, {'Article A', 'Article B'})
+        self.assertGreaterEqual(first[0]['published_ts'], second[0]['published_ts'])
+        self.assertEqual(aggregator.poll([url], max_per_feed=1), [])
+
+    def test_new_since_filters_by_timestamp(self):
+        """Test entries can be queried by publication time"""
+        entries = self._aggregator().new_since([self.server.url('/news')], since=1704110400)
+
+        self.assertEqual([e['title'] for e in entries], ['Article B'])
+
+
+class TestHostRateLimiter(unittest.TestCase):
+    """Test suite for per-host rate limiting"""
+
+    def test_same_host_is_spaced(self):
+        """Test requests to one host wait for the minimum interval"""
+        limiter = HostRateLimiter(min_interval=0.1)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.acquire('http://example.com/a')
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_different_hosts_do_not_wait(self):
+        """Test requests to different hosts are independent"""
+        limiter = HostRateLimiter(min_interval=1.0)
+        start = time.monotonic()
+        limiter.acquire('http://one.example.com/')
+        limiter.acquire('http://two.example.com/')
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Unit tests for the compiled intent router and the chat command intents.
+"""
+
+import unittest
+import os
+import re
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.intent_router import Intent, IntentRouter, tokenize
+from modules.conversational_ai import command_router
+
+
+class TestIntentRouter(unittest.TestCase):
+    """Test trie matching, ranking and slot extraction"""
+
+    def setUp(self):
+        self.router = IntentRouter([
+            Intent('unmute', [['volume'], ['on', 'unmute']], priority=2),
+            Intent('mute', [['volume'], ['mute']], priority=2),
+            Intent('call', [['call', 'phone']], priority=1, slots={
+                'number': [re.compile(r'\b(\d{10})\b')],
+            }),
+            Intent('search', [['search', 'look up']], required_slots=['query'], slots={
+                'query': [re.compile(r'(?:search|look up)\s+(.+)')],
+            }),
+            Intent('level', [['volume']], slots={'level': [lambda text: 50 if '50' in text else None]}),
+        ])
+
+    def test_phrases_match_whole_tokens(self):
+        """Test a trigger never fires inside an unrelated word"""
+        self.assertEqual(tokenize("Phone, mom!"), ['phone', 'mom'])
+        self.assertEqual(self.router.route("volume unmute").name, 'unmute')
+        self.assertEqual(self.router.route("phone mummy").name, 'call')
+        self.assertIsNone(self.router.route("researching the lookup table"))
+
+    def test_multi_token_phrases(self):
+        """Test phrases spanning several tokens are matched in the same pass"""
+        match = self.router.route("please look up flight status")
+        self.assertEqual(match.name, 'search')
+        self.assertEqual(match.slots['query'], 'flight status')
+        self.assertEqual(match.matched, ['look up'])
+
+    def test_ranked_multi_intent(self):
+        """Test every matching intent is scored, more specific ones first"""
+        ranked = self.router.rank("volume on and call 9876543210", extract_slots=True)
+        self.assertEqual([m.name for m in ranked], ['unmute', 'call', 'level'])
+        self.assertEqual(ranked[0].score, 2)
+        self.assertEqual(ranked[1].slots, {'number': '9876543210'})
+
+    def test_required_slots_fall_through(self):
+        """Test an intent missing a required slot yields to the next one"""
+        self.assertIsNone(self.router.route("search"))
+        self.assertEqual(self.router.route("volume 50").slots, {'level': 50})
+
+    def test_empty_phrase_rejected(self):
+        """Test intents are validated when the router is compiled"""
+        with self.assertRaises(ValueError):
+            IntentRouter([Intent('broken', [['!!']])])
+
+
+class TestChatCommandIntents(unittest.TestCase):
+    """Test the conversational AI command table against labeled utterances"""
+
+    CORPUS = [
+        ("open chrome", 'open'),
+        ("launch spotify for me", 'open'),
+        ("open wifi settings", 'settings'),
+        ("show me the control panel", 'settings'),
+        ("close notepad", 'close'),
+        ("stop the timer", 'close'),
+        ("google best pizza near me", 'search'),
+        ("look up python decorators", 'search'),
+        ("play some lofi music", 'play'),
+        ("make a new presentation on climate", 'create_document'),
+        ("create a pdf of my notes", 'create_document'),
+        ("mute", 'volume'),
+        ("turn the volume down", 'volume'),
+        ("lock my computer", 'system'),
+        # Substrings of unrelated words used to trigger commands
+        ("i am running late", None),
+        ("what is the latest news", None),
+        ("look at that clock", None),
+        ("tell me about playwright", None),
+        ("thanks, that was perfect", None),
+    ]
+
+    def test_labeled_corpus(self):
+        """Test each utterance routes to its labeled intent"""
+        for text, expected in self.CORPUS:
+            match = command_router.route(text)
+            self.assertEqual(match.name if match else None, expected, text)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
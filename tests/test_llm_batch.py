@@ -0,0 +1,366 @@
+"""
+Unit tests for the LLM request layer: stable prompt prefixes, chat session
+reuse and the background batch queue, run against a local mock provider
+server.
+"""
+
+import unittest
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.llm_batch import BatchQueue, TrafficGate, get_batch_queue
+from modules.llm_provider import GeminiProvider, LocalLLMProvider, OpenAIProvider, UnifiedChatInterface
+from modules.context_optimizer import ConversationCompressor
+
+
+class MockProviderServer:
+    """
+    Local HTTP server speaking the Ollama generate API and the OpenAI chat
+    completion, file and batch APIs.
+
+    Chat completions report cached prompt tokens for the prefix a request
+    shares with an earlier one under the same prompt_cache_key, the way
+    provider-side prompt caching does.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompts = {}   # prompt_cache_key -> prompts seen
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, payload, status=200, raw=False):
+                body = payload if raw else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parts = self.path.strip('/').split('/')
+                if parts[:2] == ['v1', 'batches']:
+                    batch = server.batches[parts[2]]
+                    # Each status check moves the batch along
+                    if batch['status'] == 'validating':
+                        batch['status'] = 'in_progress'
+                    elif batch['status'] == 'in_progress':
+                        server._complete_batch(batch)
+                    self._reply(batch)
+                elif parts[:2] == ['v1', 'files']:
+                    self._reply(server.files[parts[2]].encode('utf-8'), raw=True)
+
+            def do_POST(self):
+                data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path == '/api/generate':
+                    self._reply(server._generate(json.loads(data)))
+                elif self.path == '/v1/chat/completions':
+                    self._reply(server._chat_completion(json.loads(data)))
+                elif self.path == '/v1/files':
+                    file_id = f'file-{len(server.files)}'
+                    server.files[file_id] = data.decode('utf-8')
+                    self._reply({'id': file_id})
+                elif self.path == '/v1/batches':
+                    batch_id = f'batch-{len(server.batches)}'
+                    server.batches[batch_id] = {'id': batch_id, 'status': 'validating', 'output_file_id': None,
+                                                'input_file_id': json.loads(data)['input_file_id']}
+                    self._reply(server.batches[batch_id])
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _track(self, prompt):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.requests.append((time.time(), prompt))
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+
+    def _generate(self, body):
+        self._track(body['prompt'])
+        last_line = body['prompt'].strip().split('\n')[-3]
+        return {'response': f'reply to {last_line}', 'done': True}
+
+    def _chat_completion(self, body):
+        prompt = json.dumps(body['messages'])
+        self._track(prompt)
+        seen = self.prompts.setdefault(body.get('prompt_cache_key'), [])
+        cached = max((len(os.path.commonprefix([prompt, earlier])) for earlier in seen), default=0)
+        seen.append(prompt)
+        return {
+            'choices': [{'message': {'role': 'assistant', 'content': f"reply {len(body['messages'])}"}}],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': 2,
+                      'prompt_tokens_details': {'cached_tokens': cached // 4}},
+        }
+
+    def _complete_batch(self, batch):
+        lines = []
+        for line in self.files[batch['input_file_id']].splitlines():
+            request = json.loads(line)
+            lines.append(json.dumps({'custom_id': request['custom_id'],
+                                     'response': {'body': self._chat_completion(request['body'])}}))
+        output_id = f'file-{len(self.files)}'
+        # Results come back out of order, as they do from the real API
+        self.files[output_id] = '\n'.join(reversed(lines))
+        batch.update(status='completed', output_file_id=output_id)
+
+
+class HTTPOpenAIClient:
+    """Minimal OpenAI-SDK-shaped client that talks to the mock server over HTTP"""
+
+    def __init__(self, base_url):
+        def call(method, path, **kwargs):
+            response = requests.request(method, base_url + path, timeout=10, **kwargs)
+            return json.loads(response.text, object_hook=lambda d: SimpleNamespace(**d))
+
+        def create_completion(extra_body=None, stream=False, stream_options=None, **body):
+            return call('POST', '/v1/chat/completions', json=dict(body, **(extra_body or {})))
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create_completion))
+        self.files = SimpleNamespace(
+            create=lambda file, purpose: call('POST', '/v1/files', data=file[1]),
+            content=lambda file_id: SimpleNamespace(
+                text=requests.get(f'{base_url}/v1/files/{file_id}', timeout=10).text),
+        )
+        self.batches = SimpleNamespace(
+            create=lambda input_file_id, endpoint, completion_window: call(
+                'POST', '/v1/batches', json={'input_file_id': input_file_id}),
+            retrieve=lambda batch_id: call('GET', f'/v1/batches/{batch_id}'),
+            cancel=lambda batch_id: None,
+        )
+
+
+class FakeGenAI:
+    """google.generativeai stand-in that counts started chat sessions"""
+
+    def __init__(self):
+        self.started = []
+
+    def GenerativeModel(self, model, system_instruction=None):
+        genai = self
+
+        class Chat:
+            def __init__(self, history):
+                self.history = list(history)
+
+            def send_message(self, message, generation_config=None, stream=False):
+                reply = f'reply {len(self.history) // 2 + 1}'
+                self.history += [{'role': 'user', 'parts': [message]}, {'role': 'model', 'parts': [reply]}]
+                if stream:
+                    return iter([SimpleNamespace(text=reply[:3]), SimpleNamespace(text=reply[3:])])
+                return SimpleNamespace(text=reply)
+
+        def start_chat(history):
+            genai.started.append((system_instruction, len(history)))
+            return Chat(history)
+
+        return SimpleNamespace(start_chat=start_chat)
+
+
+def chat_interface(provider):
+    """UnifiedChatInterface around an existing provider, skipping provider detection"""
+    chat = UnifiedChatInterface.__new__(UnifiedChatInterface)
+    chat.provider = provider
+    chat.provider_name = 'test'
+    chat.model = 'test'
+    chat.conversation_history = []
+    chat.offline_mode = False
+    chat.session_id = 'test'
+    chat.use_fallback = False
+    chat.hedge = False
+    return chat
+
+
+class TestPromptReuse(unittest.TestCase):
+    """Test stable prompt prefixes and chat session reuse"""
+
+    def setUp(self):
+        self.server = MockProviderServer()
+        self.addCleanup(self.server.close)
+
+    def test_gemini_reuses_chat_session_across_turns(self):
+        """Test a conversation starts one Gemini chat session and reuses it every turn"""
+        provider = GeminiProvider(api_key='test-key')
+        provider.genai = FakeGenAI()
+        chat = chat_interface(provider)
+        chat.add_system_message('You are a helpful assistant.')
+
+        for i in range(4):
+            self.assertEqual(chat.chat(f'question {i}'), f'reply {i + 1}')
+        self.assertEqual(''.join(chat.chat('streamed', stream=True)), 'reply 5')
+        self.assertEqual(chat.chat('after stream'), 'reply 6')
+
+        self.assertEqual(provider.genai.started, [('You are a helpful assistant.', 0)])
+        self.assertEqual(provider.session_stats, {'reused': 5, 'created': 1})
+
+    def test_gemini_diverged_history_starts_new_session(self):
+        """Test an edited history is rebuilt instead of reusing a stale session"""
+        provider = GeminiProvider(api_key='test-key')
+        provider.genai = FakeGenAI()
+        provider.client = provider.genai.GenerativeModel('gemini-pro')
+        messages = [{'role': 'user', 'content': 'hi'}]
+        reply = provider.generate_response(messages)
+
+        messages += [{'role': 'assistant', 'content': 'edited ' + reply}, {'role': 'user', 'content': 'next'}]
+        provider.generate_response(messages)
+        self.assertEqual(provider.genai.started, [(None, 0), (None, 2)])
+
+    def test_openai_keeps_prompt_prefix_stable(self):
+        """Test turns share one cache key and prefix, so cached prompt tokens grow"""
+        provider = OpenAIProvider(api_key='test-key', client=HTTPOpenAIClient(self.server.url))
+        chat = chat_interface(provider)
+        chat.add_user_message('hello')
+        chat.add_assistant_message('hi')
+        chat.conversation_history.append({'role': 'system', 'content': 'Be concise. ' * 50})
+
+        for i in range(3):
+            chat.chat(f'question {i}')
+
+        self.assertEqual(len(self.server.prompts), 1)
+        prompts = next(iter(self.server.prompts.values()))
+        self.assertTrue(all(json.loads(p)[0]['role'] == 'system' for p in prompts))
+        self.assertGreater(provider.usage['cached_prompt_tokens'], provider.usage['prompt_tokens'] // 2)
+
+    def test_openai_batch_api(self):
+        """Test batch requests are uploaded, polled and returned in request order"""
+        provider = OpenAIProvider(api_key='test-key', client=HTTPOpenAIClient(self.server.url))
+        requests_ = [([{'role': 'user', 'content': 'x'}] * (i + 1), {}) for i in range(5)]
+
+        results = provider.generate_batch(requests_, poll_interval=0.01)
+        self.assertEqual(results, [f'reply {i + 1}' for i in range(5)])
+        self.assertEqual(len(self.server.batches), 1)
+
+
+class TestBatchQueue(unittest.TestCase):
+    """Test background requests run below interactive priority"""
+
+    def setUp(self):
+        self.server = MockProviderServer(latency=0.05)
+        self.addCleanup(self.server.close)
+        self.provider = LocalLLMProvider(api_url=self.server.url)
+
+    def test_bounded_concurrency(self):
+        """Test background requests never exceed the concurrency limit"""
+        queue = BatchQueue(self.provider, max_concurrency=2, max_wait=0.01, gate=TrafficGate())
+        self.addCleanup(queue.close)
+        results = queue.map([[{'role': 'user', 'content': f'job {i}'}] for i in range(10)], timeout=10)
+
+        self.assertEqual(results, [f'reply to USER: job {i}' for i in range(10)])
+        self.assertEqual(self.server.max_in_flight, 2)
+        self.assertEqual(queue.stats['completed'], 10)
+
+    def test_background_waits_for_interactive_traffic(self):
+        """Test queued work starts only after in-flight user chats finish"""
+        gate = TrafficGate()
+        queue = BatchQueue(self.provider, max_wait=0.01, gate=gate)
+        self.addCleanup(queue.close)
+        released = []
+
+        def user_chat():
+            with gate.interactive():
+                time.sleep(0.3)
+                released.append(time.time())
+
+        thread = threading.Thread(target=user_chat)
+        thread.start()
+        time.sleep(0.05)
+        future = queue.submit([{'role': 'user', 'content': 'summarize'}])
+
+        self.assertEqual(future.result(timeout=5), 'reply to USER: summarize')
+        thread.join()
+        self.assertGreaterEqual(self.server.requests[-1][0], released[0])
+        self.assertEqual(queue.stats['deferred'], 1)
+
+    def test_background_runs_after_max_defer(self):
+        """Test constant interactive traffic delays background work, not starves it"""
+        gate = TrafficGate()
+        queue = BatchQueue(self.provider, max_wait=0.01, max_defer=0.1, gate=gate)
+        self.addCleanup(queue.close)
+        with gate.interactive():
+            future = queue.submit([{'role': 'user', 'content': 'summarize'}])
+            self.assertEqual(future.result(timeout=5), 'reply to USER: summarize')
+
+    def test_large_batches_use_provider_batch_endpoint(self):
+        """Test batches above the threshold go to generate_batch in one call"""
+        provider = OpenAIProvider(api_key='test-key', client=HTTPOpenAIClient(self.server.url))
+        provider.generate_batch = lambda reqs, _batch=provider.generate_batch: _batch(reqs, poll_interval=0.01)
+        queue = BatchQueue(provider, batch_api_min_size=5, max_wait=0.2, gate=TrafficGate())
+        self.addCleanup(queue.close)
+
+        results = queue.map([[{'role': 'user', 'content': 'x'}] * (i + 1) for i in range(8)], timeout=10)
+        self.assertEqual(results, [f'reply {i + 1}' for i in range(8)])
+        self.assertEqual(queue.stats['batch_api_batches'], 1)
+        self.assertEqual(len(self.server.batches), 1)
+
+    def test_provider_batch_does_not_block_queue(self):
+        """Test requests keep flowing while a provider batch is still running"""
+        release = threading.Event()
+        self.provider.generate_batch = lambda reqs: ['batched'] * len(reqs) if release.wait(5) else []
+        queue = BatchQueue(self.provider, batch_size=3, batch_api_min_size=3, max_wait=0.05, gate=TrafficGate())
+        self.addCleanup(queue.close)
+
+        batched = [queue.submit([{'role': 'user', 'content': f'old {i}'}]) for i in range(3)]
+        later = queue.submit([{'role': 'user', 'content': 'later'}])
+
+        self.assertEqual(later.result(timeout=2), 'reply to USER: later')
+        self.assertFalse(batched[0].done())
+        release.set()
+        self.assertEqual([f.result(timeout=2) for f in batched], ['batched'] * 3)
+
+    def test_compression_waits_once_for_all_summaries(self):
+        """Test the timeout bounds the whole call and late summaries fall back"""
+        server = MockProviderServer(latency=1.0)
+        self.addCleanup(server.close)
+        provider = LocalLLMProvider(api_url=server.url)
+        self.addCleanup(lambda: get_batch_queue(provider).close(wait=False))
+        segments = [[{'role': 'user', 'content': f'topic {i}'}] for i in range(4)]
+
+        start = time.monotonic()
+        summaries = ConversationCompressor().compress_many_with_llm(segments, provider, timeout=0.3)
+
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertEqual(len(summaries), 4)
+        self.assertFalse(any(s.startswith('reply to') for s in summaries))
+
+    def test_compression_goes_through_background_queue(self):
+        """Test summaries share one system prefix and run on the provider's queue"""
+        segments = [[{'role': 'user', 'content': f'topic {i}'}, {'role': 'assistant', 'content': 'ok'}]
+                    for i in range(4)]
+        summaries = ConversationCompressor().compress_many_with_llm(segments, self.provider)
+
+        self.assertEqual(len(summaries), 4)
+        self.assertTrue(all(s.startswith('reply to') for s in summaries))
+        self.assertEqual(get_batch_queue(self.provider).stats['completed'], 4)
+        prefixes = {prompt.split('\n\n')[0] for _, prompt in self.server.requests}
+        self.assertEqual(len(prefixes), 1)
+        get_batch_queue(self.provider).close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,318 @@
+"""
+Unit tests for the LLM admission scheduler: slot priority, per-session fair
+share, queue-depth shedding, queue-time metrics, and its use by the chat
+interface and background queue, against a mock provider.
+"""
+
+import unittest
+import os
+import sys
+import threading
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import modules.llm_scheduler as llm_scheduler
+from modules.llm_scheduler import (BACKGROUND, INTERACTIVE, STREAM, LLMOverloadedError,
+                                   LLMScheduler, llm_request, provider_key, request_context)
+from modules.llm_batch import BatchQueue, TrafficGate
+from modules.llm_provider import LocalLLMProvider, UnifiedChatInterface
+
+
+class MockProvider:
+    """Provider with a fixed latency, recording calls and peak concurrency."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def generate_response(self, messages, **kwargs):
+        with self._lock:
+            self.calls.append(messages[-1]['content'])
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return f"reply to {messages[-1]['content']}"
+
+    def stream_response(self, messages, **kwargs):
+        for word in self.generate_response(messages, **kwargs).split():
+            yield word + " "
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+class SchedulerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = LLMScheduler(slots={"mock": 1})
+        self.granted = []
+        self.threads = []
+
+    def tearDown(self):
+        for thread in self.threads:
+            thread.join(timeout=2)
+
+    def waiter(self, label, priority=INTERACTIVE, session_id="default", hold=0.0):
+        """Queue a request in a thread; records the label when it gets a slot."""
+        def run():
+            try:
+                with self.scheduler.slot("mock", priority, session_id):
+                    self.granted.append(label)
+                    time.sleep(hold)
+            except LLMOverloadedError:
+                self.granted.append(f"shed:{label}")
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        pool = self.scheduler._pools["mock"]
+        expected = len(self.threads)
+        wait_for(lambda: len(pool.waiters) + len(self.granted) >= expected)
+        return thread
+
+
+class TestSlots(SchedulerTestCase):
+    """Test slot limits and grant order"""
+
+    def test_slot_limit(self):
+        """Test a provider never runs more calls than it has slots"""
+        self.scheduler.configure("mock", 2)
+        provider = MockProvider(latency=0.05)
+
+        def call(i):
+            with self.scheduler.slot("mock", INTERACTIVE, f"user-{i}"):
+                provider.generate_response([{"role": "user", "content": str(i)}])
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(provider.max_in_flight, 2)
+        self.assertEqual(len(provider.calls), 6)
+
+    def test_priority_order(self):
+        """Test streams are served before interactive calls, and those before background work"""
+        ticket = self.scheduler.acquire("mock")
+        self.waiter("background", BACKGROUND)
+        self.waiter("interactive", INTERACTIVE)
+        self.waiter("stream", STREAM)
+        self.scheduler.release(ticket)
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.assertEqual(self.granted, ["stream", "interactive", "background"])
+
+    def test_fair_share(self):
+        """Test a session holding slots yields to other sessions"""
+        self.scheduler.configure("mock", 2)
+        first = self.scheduler.acquire("mock", session_id="heavy")
+        second = self.scheduler.acquire("mock", session_id="heavy")
+        self.waiter("heavy-3", session_id="heavy")
+        self.waiter("light-1", session_id="light", hold=0.2)
+        self.scheduler.release(first)
+        self.assertTrue(wait_for(lambda: self.granted))
+        self.assertEqual(self.granted, ["light-1"])
+        self.scheduler.release(second)
+        self.assertTrue(wait_for(lambda: len(self.granted) == 2))
+
+    def test_stream_holds_slot(self):
+        """Test a stream keeps its slot until the consumer stops reading"""
+        provider = MockProvider()
+        messages = [{"role": "user", "content": "hi"}]
+        tokens = self.scheduler.stream("mock", lambda: provider.stream_response(messages), STREAM, "s")
+        next(tokens)
+        self.assertEqual(self.scheduler._pools["mock"].active, 1)
+        tokens.close()
+        self.assertEqual(self.scheduler._pools["mock"].active, 0)
+
+
+class TestShedding(SchedulerTestCase):
+    """Test requests are rejected quickly instead of queueing without bound"""
+
+    def test_queue_full(self):
+        """Test a class is shed at its queue depth, lower classes first"""
+        self.scheduler.queue_limits = {STREAM: 3, INTERACTIVE: 2, BACKGROUND: 1}
+        ticket = self.scheduler.acquire("mock")
+        self.waiter("a", session_id="a")
+        self.waiter("b", session_id="b")
+
+        start = time.time()
+        with self.assertRaises(LLMOverloadedError) as raised:
+            self.scheduler.acquire("mock", BACKGROUND, "c")
+        self.assertLess(time.time() - start, 0.1)
+        self.assertEqual(raised.exception.reason, "queue full")
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        with self.assertRaises(LLMOverloadedError):
+            self.scheduler.acquire("mock", INTERACTIVE, "c")
+        self.assertIsNotNone(self.scheduler.would_shed("mock", INTERACTIVE, "c"))
+        self.assertIsNone(self.scheduler.would_shed("mock", STREAM, "c"))
+
+        self.scheduler.release(ticket)
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.assertEqual(self.scheduler.stats()["classes"]["interactive"]["shed"], 1)
+
+    def test_session_queue_limit(self):
+        """Test one session cannot fill the queue"""
+        self.scheduler.session_queue_limit = 1
+        ticket = self.scheduler.acquire("mock")
+        self.waiter("first", session_id="spammer")
+        with self.assertRaises(LLMOverloadedError):
+            self.scheduler.acquire("mock", INTERACTIVE, "spammer")
+        self.assertIsNone(self.scheduler.would_shed("mock", INTERACTIVE, "someone-else"))
+        self.scheduler.release(ticket)
+
+    def test_wait_budget(self):
+        """Test requests are shed when the estimated wait exceeds the class budget"""
+        self.scheduler.max_wait[INTERACTIVE] = 1.0
+        self.scheduler._pool("mock").service_time = 5.0
+        ticket = self.scheduler.acquire("mock")
+        with self.assertRaises(LLMOverloadedError) as raised:
+            self.scheduler.acquire("mock", INTERACTIVE, "late")
+        self.assertEqual(raised.exception.retry_after, 5)
+        self.scheduler.release(ticket)
+
+    def test_timeout(self):
+        """Test a waiter that does not get a slot in time leaves the queue"""
+        ticket = self.scheduler.acquire("mock")
+        start = time.time()
+        with self.assertRaises(LLMOverloadedError) as raised:
+            self.scheduler.acquire("mock", INTERACTIVE, "patient", timeout=0.1)
+        self.assertGreaterEqual(time.time() - start, 0.1)
+        self.assertIn("timed out", raised.exception.reason)
+        self.assertEqual(self.scheduler._pools["mock"].waiters, [])
+        self.scheduler.release(ticket)
+
+    def test_overload_keeps_interactive_latency_bounded(self):
+        """Test interactive p99 stays within its wait budget under sustained overload"""
+        self.scheduler.configure("mock", 2)
+        self.scheduler.max_wait = {STREAM: 0.3, INTERACTIVE: 0.5, BACKGROUND: None}
+        provider = MockProvider(latency=0.02)
+        latencies, shed = [], []
+
+        def call(i, priority):
+            start = time.time()
+            try:
+                with self.scheduler.slot(provider, priority, f"user-{i % 10}"):
+                    provider.generate_response([{"role": "user", "content": str(i)}])
+            except LLMOverloadedError:
+                shed.append(i)
+                return
+            if priority == INTERACTIVE:
+                latencies.append(time.time() - start)
+
+        threads = []
+        for i in range(300):  # ~3x what two slots can serve
+            thread = threading.Thread(target=call, args=(i, BACKGROUND if i % 3 == 0 else INTERACTIVE))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.0033)
+        for thread in threads:
+            thread.join(timeout=5)
+
+        latencies.sort()
+        self.assertTrue(shed)
+        self.assertLess(latencies[int(len(latencies) * 0.99)], 0.5 + 0.1)
+
+
+class TestMetricsAndContext(SchedulerTestCase):
+    """Test queue-time metrics and request attribution"""
+
+    def test_stats(self):
+        """Test stats report slots, counters and queue-time percentiles"""
+        ticket = self.scheduler.acquire("mock", STREAM)
+        self.waiter("queued", STREAM, hold=0.0)
+        time.sleep(0.05)
+        self.scheduler.release(ticket)
+        self.threads[0].join(timeout=2)
+
+        stats = self.scheduler.stats()
+        self.assertEqual(stats["providers"]["mock"]["slots"], 1)
+        self.assertEqual(stats["providers"]["mock"]["active"], 0)
+        self.assertEqual(stats["classes"]["stream"]["admitted"], 2)
+        self.assertGreaterEqual(stats["classes"]["stream"]["queue_p99"], 0.04)
+        self.assertLessEqual(stats["classes"]["stream"]["queue_p50"], stats["classes"]["stream"]["queue_p99"])
+
+    def test_provider_key(self):
+        """Test providers map to shared slot pools"""
+        self.assertEqual(provider_key(LocalLLMProvider()), "ollama")
+        self.assertEqual(provider_key("local"), "ollama")
+        self.assertEqual(provider_key(MockProvider()), "mock")
+
+    def test_request_context(self):
+        """Test an llm_request block overrides the caller's defaults"""
+        self.assertEqual(request_context("chat-1", STREAM), {"session_id": "chat-1", "priority": STREAM})
+        with llm_request(session_id="alice"):
+            self.assertEqual(request_context("chat-1", STREAM)["session_id"], "alice")
+            with llm_request(priority=BACKGROUND):
+                self.assertEqual(request_context("chat-1"), {"session_id": "alice", "priority": BACKGROUND})
+        self.assertEqual(request_context()["session_id"], "default")
+
+
+class TestIntegration(unittest.TestCase):
+    """Test the chat interface and background queue go through the scheduler"""
+
+    def setUp(self):
+        self.scheduler = LLMScheduler(slots={"mock": 1}, max_wait={INTERACTIVE: 0.2, STREAM: 0.2})
+        self.previous = llm_scheduler._scheduler
+        llm_scheduler._scheduler = self.scheduler
+        self.provider = MockProvider()
+        self.chat = UnifiedChatInterface.__new__(UnifiedChatInterface)
+        self.chat.provider = self.provider
+        self.chat.provider_name = 'test'
+        self.chat.model = 'test'
+        self.chat.conversation_history = []
+        self.chat.offline_mode = False
+        self.chat.session_id = 'chat-1'
+        self.chat.use_fallback = False
+        self.chat.hedge = False
+
+    def tearDown(self):
+        llm_scheduler._scheduler = self.previous
+
+    def test_chat_uses_session_slot(self):
+        """Test chat calls are admitted under the chat's session"""
+        self.assertEqual(self.chat.chat("hello"), "reply to hello")
+        self.assertEqual("".join(self.chat.chat("again", stream=True)), "reply to again ")
+        classes = self.scheduler.stats()["classes"]
+        self.assertEqual(classes["interactive"]["admitted"], 1)
+        self.assertEqual(classes["stream"]["admitted"], 1)
+        self.assertEqual(len(self.chat.conversation_history), 4)
+
+    def test_shed_chat_leaves_history_unchanged(self):
+        """Test a shed request raises and does not leave a dangling user message"""
+        ticket = self.scheduler.acquire("mock")
+        with self.assertRaises(LLMOverloadedError):
+            self.chat.chat("hello")
+        with self.assertRaises(LLMOverloadedError):
+            list(self.chat.chat("hello", stream=True))
+        self.assertEqual(self.chat.conversation_history, [])
+        self.scheduler.release(ticket)
+
+    def test_background_waits_for_interactive_slot(self):
+        """Test queued background work only runs once interactive calls free the slot"""
+        queue = BatchQueue(self.provider, max_wait=0.01, gate=TrafficGate())
+        ticket = self.scheduler.acquire("mock", INTERACTIVE, "user")
+        future = queue.submit([{"role": "user", "content": "summarize"}])
+        time.sleep(0.1)
+        self.assertFalse(future.done())
+        self.scheduler.release(ticket)
+        self.assertEqual(future.result(timeout=2), "reply to summarize")
+        self.assertEqual(self.scheduler.stats()["classes"]["background"]["admitted"], 1)
+        queue.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
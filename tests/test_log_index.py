@@ -0,0 +1,156 @@
+"""
+Unit tests for the incremental log index behind LogAggregator.
+"""
+
+import unittest
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.log_index import LogIndex, parse_line
+from utils.advanced_logging import LogAggregator
+
+DAY = datetime(2024, 6, 1, 10, 0, 0)
+
+
+def detailed(when, name, level, message):
+    return f"{when:%Y-%m-%d %H:%M:%S} | {name} | {level:<8} | [app.py:10] | handler | {message}\n"
+
+
+def api_response(when, endpoint, status, duration_ms):
+    payload = {'method': 'GET', 'endpoint': endpoint, 'status_code': status, 'duration_ms': duration_ms}
+    tag = 'SERVER_ERROR' if status >= 500 else 'RESPONSE'
+    level = 'ERROR' if status >= 500 else 'INFO'
+    return detailed(when, 'api_requests_20240601_100000', level, f"{tag} | {json.dumps(payload)}")
+
+
+class TestLogIndex(unittest.TestCase):
+    """Test incremental ingestion and aggregates"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_dir = Path(self.temp_dir) / 'logs'
+        (self.log_dir / 'api').mkdir(parents=True)
+        (self.log_dir / 'errors').mkdir()
+        self.api_log = self.log_dir / 'api' / 'api_requests_20240601_100000.log'
+        self.index = LogIndex(str(self.log_dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, path, lines, mode='a'):
+        with open(path, mode, encoding='utf-8') as f:
+            f.writelines(lines)
+
+    def test_parse_formats(self):
+        """Test detailed and simple formats are recognised"""
+        record = parse_line(detailed(DAY, 'core', 'WARNING', 'Low | disk').rstrip('\n'))
+        self.assertEqual((record['logger'], record['level'], record['message']), ('core', 'WARNING', 'Low | disk'))
+        record = parse_line(f"{DAY:%Y-%m-%d %H:%M:%S} | INFO     | API | Request completed")
+        self.assertEqual((record['level'], record['message']), ('INFO', 'API | Request completed'))
+        self.assertIsNone(parse_line('  "traceback": "..."'))
+
+    def test_ingest_reads_only_new_data(self):
+        """Test a second ingest parses only lines appended since the first"""
+        self._write(self.api_log, [api_response(DAY + timedelta(seconds=i), '/api/chat', 200, 10 + i)
+                                   for i in range(100)])
+        self.assertEqual(self.index.ingest(), 100)
+
+        self._write(self.api_log, [api_response(DAY + timedelta(minutes=5), '/api/chat', 500, 900)])
+        with patch.object(LogIndex, '_read_new', wraps=LogIndex._read_new) as read_new:
+            self.assertEqual(self.index.ingest(), 1)
+        self.assertGreater(read_new.call_args[0][1], 0)  # Resumed from the stored offset
+        self.assertEqual(self.index.ingest(), 0)
+
+        stats = self.index.operation_stats(DAY.timestamp(), (DAY + timedelta(hours=1)).timestamp())
+        chat = stats['api']['GET /api/chat']
+        self.assertEqual((chat['count'], chat['errors']), (101, 1))
+        self.assertAlmostEqual(chat['p50_ms'], 60, delta=6)
+        self.assertAlmostEqual(chat['p99_ms'], 109, delta=11)
+
+    def test_rotation_and_duplicate_error_copies(self):
+        """Test rotated files resume by inode and errors/ copies are not double counted"""
+        self._write(self.api_log, [api_response(DAY, '/api/a', 200, 5)])
+        self.index.ingest()
+
+        # RotatingFileHandler: rename, then start a fresh file
+        self._write(self.api_log, [api_response(DAY + timedelta(seconds=1), '/api/a', 200, 5)])
+        os.rename(self.api_log, str(self.api_log) + '.1')
+        error_line = api_response(DAY + timedelta(seconds=2), '/api/a', 503, 50)
+        self._write(self.api_log, [error_line], mode='w')
+        self._write(self.log_dir / 'errors' / 'api_requests_errors_20240601_100000.log', [error_line])
+
+        self.assertEqual(self.index.ingest(), 2)
+        stats = self.index.operation_stats(DAY.timestamp(), DAY.timestamp() + 3600)['api']['GET /api/a']
+        self.assertEqual((stats['count'], stats['errors']), (3, 1))
+
+    def test_identical_lines_are_distinct_records(self):
+        """Test repeated lines count every time, across ingests and files"""
+        line = api_response(DAY, '/api/a', 200, 5)
+        self._write(self.api_log, [line, line])
+        self.index.ingest()
+        self._write(self.api_log, [line])
+        self._write(self.log_dir / 'api' / 'api_requests_20240601_110000.log', [line])
+
+        self.assertEqual(self.index.ingest(), 2)
+        stats = self.index.operation_stats(DAY.timestamp(), DAY.timestamp() + 3600)['api']['GET /api/a']
+        self.assertEqual(stats['count'], 4)
+
+    def test_errors_only_loggers_are_indexed(self):
+        """Test errors/ files without a module log of their own are read"""
+        line = detailed(DAY, 'api_errors', 'ERROR', 'Upstream failed')
+        self._write(self.log_dir / 'errors' / 'api_errors_20240601_100000.log', [line])
+        self._write(self.log_dir / 'errors' / 'api_errors_errors_20240601_100000.log', [line])
+
+        self.assertEqual(self.index.ingest(), 1)
+
+    def test_multiline_exception_records(self):
+        """Test indented JSON exception records are parsed as one record"""
+        error_info = json.dumps({'exception_type': 'ValueError', 'exception_message': 'bad'}, indent=2)
+        self._write(self.log_dir / 'errors' / 'error_context_global_20240601_100000.log',
+                    [detailed(DAY, 'error_context_global', 'ERROR', f"EXCEPTION | {error_info}") + '\n'])
+        self.assertEqual(self.index.ingest(), 1)
+        stats = self.index.operation_stats(DAY.timestamp(), DAY.timestamp() + 3600)
+        self.assertEqual(stats['exception']['ValueError']['count'], 1)
+
+
+class TestLogAggregator(unittest.TestCase):
+    """Test daily summaries built from the index"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_dir = Path(self.temp_dir) / 'logs'
+        (self.log_dir / 'api').mkdir(parents=True)
+        lines = [api_response(DAY + timedelta(minutes=i), f'/api/{"chat" if i % 3 else "status"}', 200, 20)
+                 for i in range(30)]
+        lines.append(detailed(DAY, 'user_activity', 'INFO', 'USER_ACTION | {"action": "login"}'))
+        lines.append(api_response(DAY - timedelta(days=1), '/api/chat', 200, 20))
+        with open(self.log_dir / 'api' / 'api_requests_20240601_100000.log', 'w') as f:
+            f.writelines(lines)
+        self.aggregator = LogAggregator(str(self.log_dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_daily_summary(self):
+        """Test the summary covers only the requested day"""
+        summary = self.aggregator.generate_daily_summary('2024-06-01')
+
+        self.assertEqual(summary['total_requests'], 30)
+        self.assertEqual(summary['top_endpoints'][0]['endpoint'], 'GET /api/chat')
+        self.assertEqual(summary['top_endpoints'][0]['count'], 20)
+        self.assertEqual(summary['user_activity_count'], 1)
+        self.assertAlmostEqual(summary['average_response_time'], 20)
+        self.assertEqual(self.aggregator.generate_daily_summary('2024-05-31')['total_requests'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,167 @@
+"""
+Unit tests for the mobile delta sync feed, using a simulated fleet of
+devices against the sync endpoints.
+"""
+
+import unittest
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask, request
+
+from modules.mobile_sync import SyncFeed, sync_response, sync_stream
+
+
+class FakeBackend:
+    """Serves the sync endpoints the way MobileAppBackend does"""
+
+    def __init__(self):
+        self.status_calls = 0
+        self.cpu = 10
+        self.feed = SyncFeed(log_retention=5)
+        self.feed.register('system_status', self.get_system_status, interval=0.2)
+        self.feed.register('quick_actions', lambda: [{'id': f'action{i}', 'label': 'x' * 40} for i in range(40)],
+                           interval=3600)
+        self.feed.register_log('recent_conversations')
+
+        self.app = Flask(__name__)
+
+        @self.app.route('/mobile/api/sync', methods=['GET', 'POST'])
+        def sync_data():
+            data = request.get_json(silent=True) or {}
+            return sync_response(self.feed, request.args.get('since') or data.get('since'),
+                                 wait=float(request.args.get('wait') or 0),
+                                 if_none_match=request.headers.get('If-None-Match'),
+                                 accept_encoding=request.headers.get('Accept-Encoding', ''))
+
+        @self.app.route('/mobile/api/sync/stream')
+        def sync_stream_events():
+            return sync_stream(self.feed, request.headers.get('Last-Event-ID'), heartbeat=0.05)
+
+    def get_system_status(self):
+        self.status_calls += 1
+        return {'platform': 'test', 'cpu_usage': self.cpu}
+
+
+class Device:
+    """A paired device that keeps its cursor between syncs"""
+
+    def __init__(self, client):
+        self.client = client
+        self.cursor = None
+        self.state = {}
+
+    def sync(self, **params):
+        query = {'since': self.cursor} if self.cursor else {}
+        query.update(params)
+        response = self.client.get('/mobile/api/sync', query_string=query,
+                                   headers={'Accept-Encoding': 'gzip'})
+        if response.status_code == 200:
+            body = response.data
+            if response.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            changes = json.loads(body)
+            self.cursor = changes['cursor']
+            for domain, value in changes.items():
+                if domain == 'recent_conversations' and not changes['full'] and domain not in changes['replace']:
+                    self.state.setdefault(domain, []).extend(value)
+                elif domain not in ('cursor', 'full', 'replace'):
+                    self.state[domain] = value
+        return response
+
+
+class TestMobileSync(unittest.TestCase):
+    """Test delta sync, conditional requests and push channels"""
+
+    def setUp(self):
+        self.backend = FakeBackend()
+        self.fleet = [Device(self.backend.app.test_client()) for _ in range(30)]
+
+    def test_fleet_full_then_not_modified(self):
+        """Test devices get one compressed full sync, then 304s without re-collecting"""
+        first = [device.sync() for device in self.fleet]
+        self.assertTrue(all(r.status_code == 200 for r in first))
+        self.assertEqual(first[0].headers['Content-Encoding'], 'gzip')
+        self.assertEqual(self.fleet[0].state['recent_conversations'], [])
+
+        second = [device.sync() for device in self.fleet]
+        self.assertTrue(all(r.status_code == 304 for r in second))
+        self.assertEqual(self.backend.status_calls, 1)
+        # Every device shared one encoded full body
+        self.assertEqual(self.backend.feed.stats['encodes'], 1)
+
+    def test_delta_contains_only_changed_domains(self):
+        """Test a change reaches each device once, without unchanged domains"""
+        for device in self.fleet:
+            device.sync()
+        self.backend.cpu = 55
+        time.sleep(0.25)
+        self.backend.feed.append('recent_conversations', {'command': 'hi', 'response': 'hello'})
+
+        response = self.fleet[0].sync()
+        changes = json.loads(response.data)
+        self.assertEqual(set(changes) - {'cursor', 'full', 'replace'}, {'system_status', 'recent_conversations'})
+        self.assertEqual(self.fleet[0].state['system_status']['cpu_usage'], 55)
+        self.assertEqual(self.fleet[0].state['recent_conversations'], [{'command': 'hi', 'response': 'hello'}])
+        self.assertEqual(self.fleet[0].sync().status_code, 304)
+
+    def test_stale_cursor_and_if_none_match(self):
+        """Test unknown cursors fall back to a full sync and matching ETags get 304"""
+        device = self.fleet[0]
+        device.cursor = 'oldepoch.12'
+        response = device.sync()
+        self.assertTrue(json.loads(gzip.decompress(response.data))['full'])
+
+        etag = response.headers['ETag']
+        conditional = device.client.get('/mobile/api/sync', headers={'If-None-Match': etag})
+        self.assertEqual(conditional.status_code, 304)
+
+    def test_evicted_log_entries_replace_device_log(self):
+        """Test a device that fell behind the log retention gets the retained log"""
+        device = self.fleet[0]
+        device.sync()
+        for i in range(8):
+            self.backend.feed.append('recent_conversations', {'n': i})
+
+        changes = json.loads(device.sync().data)
+        self.assertEqual(changes['replace'], ['recent_conversations'])
+        self.assertEqual([item['n'] for item in device.state['recent_conversations']], [3, 4, 5, 6, 7])
+
+    def test_long_poll_wakes_on_change(self):
+        """Test an up-to-date device blocks until the next change"""
+        device = self.fleet[0]
+        device.sync()
+        threading.Timer(0.1, self.backend.feed.append, ('recent_conversations', {'n': 1})).start()
+
+        start = time.time()
+        response = device.sync(wait=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual(device.state['recent_conversations'], [{'n': 1}])
+
+    def test_event_stream_pushes_deltas(self):
+        """Test the SSE channel sends a full sync, then each change"""
+        response = self.backend.app.test_client().get('/mobile/api/sync/stream')
+        events = response.response
+        first = next(events).decode()
+        self.assertIn('event: sync', first)
+        self.assertTrue(json.loads(first.split('data: ', 1)[1])['full'])
+
+        self.backend.feed.append('recent_conversations', {'n': 2})
+        chunk = next(events).decode()
+        while chunk.startswith(':'):
+            chunk = next(events).decode()
+        delta = json.loads(chunk.split('data: ', 1)[1])
+        self.assertEqual(delta['recent_conversations'], [{'n': 2}])
+        response.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,272 @@
+"""
+Unit tests for the offline model pool: keep-alive pinning, preloading,
+LRU eviction under a RAM budget and cold/warm latency tracking, against a
+fake Ollama server.
+"""
+
+import unittest
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.offline_llm_provider import ModelPool, OfflineLLMManager, OllamaProvider, parse_keep_alive
+
+MB = 1024 * 1024
+
+
+class FakeOllamaServer:
+    """
+    Local HTTP server speaking the Ollama tags, ps and generate APIs.
+
+    Loading a model takes `load_delay` seconds; a loaded model stays
+    resident for the request's keep_alive (or `default_keep_alive` when the
+    request sends none), like the real server.
+    """
+
+    def __init__(self, models=None, load_delay=0.3, default_keep_alive=0.2):
+        self.models = models or {"llama2": 4000 * MB}
+        self.load_delay = load_delay
+        self.default_keep_alive = default_keep_alive
+        self.loaded = {}  # name -> expiry time (None keeps it loaded)
+        self.requests = []
+        self.lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, body):
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._json({"models": [{"name": f"{n}:latest", "size": s} for n, s in server.models.items()]})
+                elif self.path == "/api/ps":
+                    self._json({"models": [{"name": f"{n}:latest", "size": server.models[n]}
+                                           for n in server.resident()]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests.append(body)
+                name = body["model"].split(":")[0]
+                if body.get("keep_alive") == 0 and "prompt" not in body:
+                    server.unload(name)
+                    self._json({"model": name, "done": True, "done_reason": "unload"})
+                    return
+                load_duration = server.load(name, body.get("keep_alive"))
+                words = ["hello", "from", name] if body.get("prompt") else []
+                if not body.get("stream"):
+                    self._json({"response": " ".join(words), "done": True, "load_duration": load_duration})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for word in words:
+                    self.wfile.write(json.dumps({"response": word + " ", "done": False}).encode() + b"\n")
+                self.wfile.write(json.dumps({"response": "", "done": True,
+                                             "load_duration": load_duration}).encode() + b"\n")
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def resident(self):
+        with self.lock:
+            now = time.time()
+            return [n for n, expiry in self.loaded.items() if expiry is None or expiry > now]
+
+    def load(self, name, keep_alive):
+        """Load a model if needed; returns the load duration in ns."""
+        cold = name not in self.resident()
+        if cold:
+            time.sleep(self.load_delay)
+        seconds = parse_keep_alive(keep_alive if keep_alive is not None else self.default_keep_alive)
+        with self.lock:
+            self.loaded[name] = None if seconds is None else time.time() + seconds
+        return int(self.load_delay * 1e9) if cold else 1000
+
+    def unload(self, name):
+        with self.lock:
+            self.loaded.pop(name, None)
+
+    def unloads(self):
+        return [r["model"] for r in self.requests if r.get("keep_alive") == 0]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class TestKeepAlive(unittest.TestCase):
+    """Test models stay warm between requests"""
+
+    def setUp(self):
+        self.server = FakeOllamaServer()
+        self.pool = ModelPool(self.server.url, ram_budget_mb=16000, keep_alive="30m")
+        self.provider = OllamaProvider("llama2", self.server.url, pool=self.pool)
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_parse_keep_alive(self):
+        """Test Ollama keep_alive values convert to seconds"""
+        self.assertEqual(parse_keep_alive("30m"), 1800)
+        self.assertEqual(parse_keep_alive("1h"), 3600)
+        self.assertEqual(parse_keep_alive(45), 45)
+        self.assertIsNone(parse_keep_alive(-1))
+
+    def test_cold_then_warm(self):
+        """Test the first request pays the load and later ones do not"""
+        start = time.time()
+        self.assertEqual(self.provider.generate_response(MESSAGES), "hello from llama2")
+        self.assertGreaterEqual(time.time() - start, self.server.load_delay)
+
+        start = time.time()
+        self.provider.generate_response(MESSAGES)
+        self.assertLess(time.time() - start, self.server.load_delay)
+
+        latency = self.pool.stats()["latency"]
+        self.assertEqual(latency["cold"]["count"], 1)
+        self.assertEqual(latency["warm"]["count"], 1)
+        self.assertGreater(latency["cold"]["p50"], latency["warm"]["p50"])
+
+    def test_requests_pin_model(self):
+        """Test keep_alive keeps the model loaded past the server's idle timeout"""
+        self.provider.generate_response(MESSAGES)
+        self.assertEqual(self.server.requests[-1]["keep_alive"], "30m")
+        time.sleep(self.server.default_keep_alive + 0.1)  # A quiet period
+        self.assertIn("llama2", self.server.resident())
+
+        start = time.time()
+        tokens = list(self.provider.stream_response(MESSAGES))
+        self.assertLess(time.time() - start, self.server.load_delay)
+        self.assertEqual("".join(tokens), "hello from llama2 ")
+        self.assertEqual(self.server.requests[-1]["keep_alive"], "30m")
+
+    def test_preload(self):
+        """Test a preloaded model serves its first request warm"""
+        self.assertTrue(self.provider.preload())
+        self.assertEqual(self.server.requests[-1]["prompt"], "")
+        self.assertTrue(self.pool.is_resident("llama2"))
+
+        start = time.time()
+        self.provider.generate_response(MESSAGES)
+        self.assertLess(time.time() - start, self.server.load_delay)
+        self.assertEqual(self.pool.stats()["latency"]["cold"]["count"], 0)
+        self.assertEqual(self.pool.stats()["preloads"], 1)
+
+    def test_unloaded_by_ollama(self):
+        """Test a model Ollama unloaded on its own is treated as cold"""
+        self.provider.generate_response(MESSAGES)
+        self.server.unload("llama2")
+        self.provider.generate_response(MESSAGES)
+        self.assertEqual(self.pool.stats()["latency"]["cold"]["count"], 2)
+
+    def test_resident_memory(self):
+        """Test resident models report their memory"""
+        self.provider.generate_response(MESSAGES)
+        stats = self.pool.stats()
+        self.assertEqual(stats["resident"]["llama2"]["size_mb"], 4000)
+        self.assertEqual(stats["used_mb"], 4000)
+
+
+class TestEviction(unittest.TestCase):
+    """Test LRU eviction under the RAM budget"""
+
+    def setUp(self):
+        self.server = FakeOllamaServer(
+            models={"llama2": 4000 * MB, "mistral": 4000 * MB, "phi": 4000 * MB}, load_delay=0.05
+        )
+        self.pool = ModelPool(self.server.url, ram_budget_mb=9000)
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_evicts_least_recently_used(self):
+        """Test loading past the budget unloads the least recently used model"""
+        self.pool.preload("llama2")
+        self.pool.preload("mistral")
+        OllamaProvider("llama2", self.server.url, pool=self.pool).generate_response(MESSAGES)
+
+        self.pool.preload("phi")
+        self.assertEqual(self.server.unloads(), ["mistral"])
+        self.assertEqual(sorted(self.server.resident()), ["llama2", "phi"])
+        self.assertLessEqual(self.pool.used_mb, self.pool.ram_budget_mb)
+        self.assertEqual(self.pool.stats()["evictions"], 1)
+
+    def test_in_use_model_kept(self):
+        """Test a model serving a request is not evicted"""
+        self.pool.preload("llama2")
+        self.pool.before_request("llama2")  # Request in flight
+        self.pool.preload("mistral")
+        self.pool.preload("phi")
+        self.assertNotIn("llama2", self.server.unloads())
+        self.pool.after_request("llama2", 0.1, cold=False)
+
+    def test_local_model_counts_against_budget(self):
+        """Test in-process models share the budget and are unloaded through their callback"""
+        unloaded = []
+        self.pool.register_local("transformers:gpt2", 6000, lambda: unloaded.append(True))
+        self.pool.preload("llama2")
+        self.assertEqual(unloaded, [True])
+        self.assertEqual(list(self.pool.stats()["resident"]), ["llama2"])
+
+
+class TestPredictedDemand(unittest.TestCase):
+    """Test models are preloaded ahead of predicted demand"""
+
+    def setUp(self):
+        self.server = FakeOllamaServer(models={"llama2": 4000 * MB, "mistral": 4000 * MB}, load_delay=0.05)
+        self.pool = ModelPool(self.server.url, ram_budget_mb=16000, min_predicted_uses=3)
+
+    def tearDown(self):
+        self.pool.stop()
+        self.server.close()
+
+    def test_warm_predicted(self):
+        """Test models used around this hour on past days are preloaded"""
+        hour = time.localtime().tm_hour
+        for _ in range(3):
+            self.pool.after_request("mistral", 0.1, cold=False)
+        self.pool.after_request("llama2", 0.1, cold=False)
+
+        self.assertEqual(self.pool.predicted_models(hour), ["mistral"])
+        self.assertEqual(self.pool.predicted_models((hour + 12) % 24), [])
+        self.assertEqual(self.pool.warm_predicted(hour), ["mistral"])
+        self.assertIn("mistral", self.server.resident())
+
+    def test_manager_preloads_at_startup(self):
+        """Test the offline manager warms its chat model when it starts"""
+        manager = OfflineLLMManager("llama2", self.server.url, pool=self.pool)
+        self.assertTrue(self.pool._keeper.is_alive())
+        deadline = time.time() + 2
+        while not self.pool.is_resident("llama2") and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(manager.generate_response(MESSAGES), "hello from llama2")
+        info = manager.get_provider_info()
+        self.assertEqual(info["current"], "OllamaProvider")
+        self.assertEqual(info["model_pool"]["latency"]["cold"]["count"], 0)
+        self.assertEqual(info["model_pool"]["preloads"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,8 +7,9 @@ import unittest
 import os
 import time
 from unittest.mock import Mock, patch, MagicMock
-from PIL import Image
+from PIL import Image, ImageDraw
 from modules import multimodal
+from modules.screen_observer import image_signature, tiles_bbox, AdaptiveInterval
 
 
 class TestMultiModalAI(unittest.TestCase):
@@ -249,6 +250,106 @@ class TestMultiModalAI(unittest.TestCase):
         ai.clear_analysis_history()
         self.assertEqual(len(ai.analysis_history), 0)
 
+    @patch('modules.multimodal.genai')
+    def test_perceptual_cache_hit_on_small_change(self, mock_genai):
+        """Test near-identical images reuse the cached analysis."""
+        mock_model = Mock()
+        mock_model.generate_content.return_value = Mock(text="Desktop")
+        mock_genai.GenerativeModel.return_value = mock_model
+        
+        ai = multimodal.MultiModalAI(self.mock_api_key)
+        screen = Image.linear_gradient('L').convert('RGB').resize((800, 600))
+        blinked = screen.copy()
+        ImageDraw.Draw(blinked).rectangle((400, 300, 402, 315), fill='black')  # text cursor
+        
+        ai.analyze_image(screen, "Describe")
+        result = ai.analyze_image(blinked, "Describe")
+        
+        self.assertTrue(result["cached"])
+        self.assertEqual(mock_model.generate_content.call_count, 1)
+    
+    def test_changed_tiles_are_localized(self):
+        """Test region diffs report only the tile that changed."""
+        screen = Image.linear_gradient('L').convert('RGB').resize((800, 800))
+        changed = screen.copy()
+        ImageDraw.Draw(changed).rectangle((20, 20, 180, 180), fill='white')
+        
+        tiles = image_signature(changed).changed_tiles(image_signature(screen))
+        
+        self.assertEqual(tiles, [0])
+        self.assertEqual(tiles_bbox(tiles, (4, 4), (800, 800)), (0, 0, 200, 200))
+    
+    def test_adaptive_interval(self):
+        """Test capture interval backs off while idle and resets on change."""
+        interval = AdaptiveInterval(1.0, 4.0, backoff=2.0)
+        self.assertEqual([interval.idle() for _ in range(3)], [2.0, 4.0, 4.0])
+        self.assertEqual(interval.changed(), 1.0)
+    
+    @patch('modules.multimodal.genai')
+    def test_monitor_skips_unchanged_screen(self, mock_genai):
+        """Test monitoring does not call the model while the screen is static."""
+        mock_model = Mock()
+        mock_model.generate_content.return_value = Mock(text="Static screen")
+        mock_genai.GenerativeModel.return_value = mock_model
+        
+        ai = multimodal.MultiModalAI(self.mock_api_key)
+        screen = Image.linear_gradient('L').convert('RGB').resize((400, 300))
+        with patch.object(ai, 'capture_screen', return_value=screen):
+            ai.monitor_screen_changes(interval=0.01, max_interval=0.02)
+            time.sleep(0.3)
+            ai.stop_monitoring()
+        
+        self.assertEqual(mock_model.generate_content.call_count, 1)
+        self.assertGreater(ai.monitor_stats["skipped"], 0)
+
+    def _write_scenes_video(self, path, scenes, frames_per_scene=20, fps=10):
+        """Write an MJPG video made of static scenes."""
+        import cv2
+        import numpy as np
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (320, 240))
+        for scene in scenes:
+            frame = cv2.cvtColor(np.asarray(scene.convert('RGB')), cv2.COLOR_RGB2BGR)
+            for _ in range(frames_per_scene):
+                writer.write(frame)
+        writer.release()
+    
+    @patch('modules.multimodal.genai')
+    def test_analyze_video_selects_scene_changes(self, mock_genai):
+        """Test video analysis keeps one frame per scene and analyzes them concurrently."""
+        import tempfile
+        
+        def slow_response(parts):
+            time.sleep(0.2)
+            return Mock(text="Scene")
+        
+        mock_model = Mock()
+        mock_model.generate_content.side_effect = slow_response
+        mock_genai.GenerativeModel.return_value = mock_model
+        
+        gradient = Image.linear_gradient('L').rotate(90).resize((320, 240))
+        stripes = Image.new('L', (320, 240))
+        ImageDraw.Draw(stripes).rectangle((0, 0, 60, 240), fill=255)
+        ImageDraw.Draw(stripes).rectangle((160, 0, 220, 240), fill=255)
+        scenes = [gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), stripes, gradient]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            video_path = os.path.join(temp_dir, "scenes.avi")
+            self._write_scenes_video(video_path, scenes)
+            
+            ai = multimodal.MultiModalAI(self.mock_api_key)
+            start = time.monotonic()
+            result = ai.analyze_video(video_path, max_frames=10, max_concurrency=4)
+            elapsed = time.monotonic() - start
+        
+        self.assertTrue(result["success"])
+        # The final scene repeats the first, so it is deduplicated
+        self.assertEqual(result["frames_analyzed"], 3)
+        self.assertEqual([f["video_frame"] for f in result["frame_descriptions"]], [0, 20, 40])
+        self.assertEqual(result["scan_stats"]["frames_decoded"], 80)
+        frame_blob = mock_model.generate_content.call_args_list[0][0][0][1]
+        self.assertEqual(frame_blob["mime_type"], "image/jpeg")
+        # Three frames in parallel plus the summary call
+        self.assertLess(elapsed, 0.7)
+
 
 class TestMultiModalConvenienceFunctions(unittest.TestCase):
     """Test convenience functions."""
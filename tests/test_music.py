@@ -239,12 +239,15 @@ class TestSpotifyPlaylists(unittest.TestCase):
         """Test getting user playlists"""
         controller = music.SpotifyController()
         controller.sp = Mock()
+        controller.library = music.SpotifyLibrary(lambda: controller.sp)  # In-memory mirror
         controller.sp.current_user_playlists.return_value = {
             'items': [
-                {'name': 'Playlist 1', 'tracks': {'total': 10}},
-                {'name': 'Playlist 2', 'tracks': {'total': 25}}
-            ]
+                {'id': 'p1', 'snapshot_id': 's1', 'name': 'Playlist 1', 'tracks': {'total': 10}},
+                {'id': 'p2', 'snapshot_id': 's2', 'name': 'Playlist 2', 'tracks': {'total': 25}}
+            ],
+            'next': None
         }
+        controller.sp.playlist_items.return_value = {'items': [], 'next': None}
         
         result = music.get_spotify_playlists()
         self.assertIn("Playlist 1", result)
@@ -0,0 +1,305 @@
+"""
+Unit tests for the music metadata layer: the Spotify playlist mirror and the
+search/recommendation cache, run against a fake Spotify Web API.
+"""
+
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import music
+from modules.music_library import MetadataCache, SpotifyLibrary
+
+API = 'https://api.spotify.com/v1'
+
+
+class FakeSpotifyAPI:
+    """
+    In-process Spotify Web API with the spotipy client surface.
+
+    Pages carry real 'next' URLs that next() resolves, snapshot IDs change on
+    every playlist edit, and every endpoint hit is counted in self.requests.
+    """
+
+    def __init__(self, playlist_count=0, tracks_per_playlist=3):
+        self.requests = Counter()
+        self.playlists = {}
+        self._edits = 0
+        self._created = 0
+        for i in range(playlist_count):
+            self.add_playlist(f'Playlist {i}', [self.track(f'{i}-{n}') for n in range(tracks_per_playlist)])
+
+    @staticmethod
+    def track(key, name=None, artist='Fake Artist'):
+        return {'id': f't{key}', 'uri': f'spotify:track:t{key}', 'name': name or f'Song {key}',
+                'artists': [{'name': artist}], 'available_markets': ['IN', 'US']}
+
+    def add_playlist(self, name, tracks=()):
+        playlist_id = f'p{self._created}'
+        self._created += 1
+        self.playlists[playlist_id] = {'id': playlist_id, 'name': name, 'tracks': list(tracks)}
+        self._touch(playlist_id)
+        return playlist_id
+
+    def _touch(self, playlist_id):
+        self._edits += 1
+        self.playlists[playlist_id]['snapshot_id'] = f'snap{self._edits}'
+
+    def _playlist_item(self, playlist):
+        return {'id': playlist['id'], 'name': playlist['name'], 'snapshot_id': playlist['snapshot_id'],
+                'owner': {'id': 'fake_user'}, 'uri': f"spotify:playlist:{playlist['id']}",
+                'external_urls': {'spotify': f"https://open.spotify.com/playlist/{playlist['id']}"},
+                'tracks': {'total': len(playlist['tracks'])}}
+
+    @staticmethod
+    def _page(items, url, limit, offset):
+        end = offset + limit
+        return {'items': items[offset:end], 'total': len(items),
+                'next': f'{url}?offset={end}&limit={limit}' if end < len(items) else None}
+
+    # --- spotipy client methods ---
+
+    def current_user_playlists(self, limit=50, offset=0):
+        self.requests['GET /me/playlists'] += 1
+        items = [self._playlist_item(p) for p in self.playlists.values()]
+        return self._page(items, f'{API}/me/playlists', limit, offset)
+
+    def playlist_items(self, playlist_id, fields=None, limit=100, offset=0, market=None,
+                       additional_types=('track', 'episode')):
+        self.requests['GET /playlists/{id}/tracks'] += 1
+        items = [{'track': track} for track in self.playlists[playlist_id]['tracks']]
+        return self._page(items, f'{API}/playlists/{playlist_id}/tracks', limit, offset)
+
+    def next(self, page):
+        url = urlparse(page['next'])
+        query = {key: int(value[0]) for key, value in parse_qs(url.query).items()}
+        parts = url.path.split('/')
+        if parts[-1] == 'tracks':
+            return self.playlist_items(parts[-2], **query)
+        return self.current_user_playlists(**query)
+
+    def playlist_add_items(self, playlist_id, items):
+        self.requests['POST /playlists/{id}/tracks'] += 1
+        self.playlists[playlist_id]['tracks'].extend(self.track(uri.rsplit(':t', 1)[1]) for uri in items)
+        self._touch(playlist_id)
+        return {'snapshot_id': self.playlists[playlist_id]['snapshot_id']}
+
+    def current_user(self):
+        return {'id': 'fake_user', 'display_name': 'Fake User'}
+
+    def user_playlist_create(self, user, name, public=True, description=''):
+        self.requests['POST /users/{id}/playlists'] += 1
+        playlist_id = self.add_playlist(name)
+        return self._playlist_item(self.playlists[playlist_id])
+
+    def search(self, q, type='track', limit=10):
+        self.requests[f'GET /search?type={type}'] += 1
+        if q.strip().lower() == 'nothing':
+            return {f'{type}s': {'items': []}}
+        if type == 'artist':
+            return {'artists': {'items': [{'id': 'a1', 'uri': 'spotify:artist:a1', 'name': q.title()}]}}
+        return {'tracks': {'items': [self.track('search', name=q.strip().title())]}}
+
+    def recommendations(self, limit=20, **seeds):
+        self.requests['GET /recommendations'] += 1
+        return {'tracks': [self.track(f'rec{i}') for i in range(limit)]}
+
+    def start_playback(self, uris=None):
+        self.requests['PUT /me/player/play'] += 1
+
+
+class FakeYTMusic:
+    """Counts song searches the way ytmusicapi's YTMusic.search answers them"""
+
+    def __init__(self):
+        self.searches = 0
+
+    def search(self, query, filter=None, limit=20):
+        self.searches += 1
+        return [{'title': f'{query} {i}', 'videoId': f'v{i}', 'duration': '3:30',
+                 'artists': [{'name': 'YT Artist', 'id': 'x'}]} for i in range(limit)]
+
+
+class MusicTestCase(unittest.TestCase):
+    """Wires a controller to the fake API with its library in a temp directory"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, 'spotify_library.db')
+        music.SpotifyController._instance = None
+        music.metadata_cache.clear()
+        self.api = FakeSpotifyAPI(playlist_count=120)
+        self.controller = music.SpotifyController()
+        self.controller.sp = self.api
+        self.controller.library_path = Path(self.db_path)
+        for patcher in (patch('modules.music.SPOTIPY_AVAILABLE', True),
+                        patch.object(music.SpotifyController, '_ensure_authenticated', return_value=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        library = self.controller.library
+        if library and library._thread:
+            library._thread.join(timeout=5)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+class TestPlaylistMirror(MusicTestCase):
+    """Test the paginated playlist mirror and its name index"""
+
+    def test_playlists_beyond_first_page_are_found(self):
+        """Test a playlist on the third page is found and tracks are added to it"""
+        result = music.add_to_spotify_playlist('playlist 117', 'tum hi ho')
+
+        self.assertIn("Added 'Tum Hi Ho'", result)
+        self.assertEqual(self.api.playlists['p117']['tracks'][-1]['uri'], 'spotify:track:tsearch')
+        # 120 playlists at 50 per page; tracks are mirrored afterwards in the background
+        self.assertEqual(self.api.requests['GET /me/playlists'], 3)
+        self.controller.library._thread.join(timeout=5)
+        self.assertEqual(self.api.requests['GET /playlists/{id}/tracks'], 120)
+        self.assertEqual(len(self.controller.library.tracks('Playlist 117')), 4)
+
+    def test_lookups_are_served_from_the_index(self):
+        """Test repeated voice commands do not list playlists again"""
+        library = self.controller.get_library()
+        library.sync()
+        listed = self.api.requests['GET /me/playlists']
+
+        for i in range(0, 120, 7):
+            self.assertIn('✅', music.add_to_spotify_playlist(f'Playlist {i}', 'kesariya'))
+
+        self.assertEqual(self.api.requests['GET /me/playlists'], listed)
+        self.assertEqual(self.api.requests['GET /search?type=track'], 1)
+        self.assertIn('Playlist 118 (3 tracks)', music.get_spotify_playlists())
+
+    def test_sync_skips_unchanged_snapshots(self):
+        """Test a refresh only re-fetches tracks of edited, new or renamed playlists"""
+        library = SpotifyLibrary(lambda: self.api, db_path=self.db_path)
+        self.assertEqual(library.sync()['fetched'], 120)
+
+        self.api.playlists['p5']['tracks'].append(self.api.track('new'))
+        self.api._touch('p5')
+        self.api.playlists['p9']['name'] = 'Road Trip'
+        self.api._touch('p9')
+        del self.api.playlists['p20']
+        self.api.add_playlist('Gym', [self.api.track('gym')])
+        fetched_before = self.api.requests['GET /playlists/{id}/tracks']
+
+        counts = library.sync()
+        self.assertEqual(counts, {'playlists': 120, 'fetched': 3, 'skipped': 117, 'removed': 1})
+        self.assertEqual(self.api.requests['GET /playlists/{id}/tracks'] - fetched_before, 3)
+        self.assertEqual(len(library.tracks('playlist 5')), 4)
+        self.assertEqual(library.find('road trip')['id'], 'p9')
+        self.assertEqual(library.tracks('GYM')[0]['name'], 'Song gym')
+
+    def test_adds_update_the_mirror(self):
+        """Test an add records the new snapshot so the next sync skips that playlist"""
+        library = self.controller.get_library()
+        library.sync()
+        music.add_to_spotify_playlist('Playlist 3', 'chaiyya chaiyya')
+
+        self.assertEqual(library.tracks('Playlist 3')[-1]['name'], 'Chaiyya Chaiyya')
+        self.assertEqual(library.find('Playlist 3')['total'], 4)
+        self.assertEqual(library.sync()['fetched'], 0)
+
+    def test_new_playlists_are_found(self):
+        """Test playlists created here or in another client are found by name"""
+        library = self.controller.get_library()
+        library.sync()
+        library.miss_resync_interval = 0
+
+        music.create_spotify_playlist('Made Here')
+        listed = self.api.requests['GET /me/playlists']
+        self.assertIsNotNone(library.find('made here'))
+        self.assertEqual(self.api.requests['GET /me/playlists'], listed)
+
+        self.api.add_playlist('Made Elsewhere')
+        self.assertIn('✅', music.add_to_spotify_playlist('Made Elsewhere', 'zinda'))
+        self.assertIn('not found', music.add_to_spotify_playlist('Missing', 'zinda'))
+
+    def test_mirror_persists_and_refreshes_in_background(self):
+        """Test a restarted assistant answers from disk and refreshes when stale"""
+        SpotifyLibrary(lambda: self.api, db_path=self.db_path).sync()
+        self.api.requests.clear()
+
+        library = SpotifyLibrary(lambda: self.api, db_path=self.db_path, refresh_interval=3600)
+        self.assertEqual(library.find('Playlist 42')['id'], 'p42')
+        self.assertEqual(len(library.tracks('Playlist 42')), 3)
+        self.assertEqual(sum(self.api.requests.values()), 0)
+
+        library.refresh_interval = 0
+        library.find('Playlist 42')
+        library._thread.join(timeout=5)
+        self.assertEqual(self.api.requests['GET /me/playlists'], 3)
+        self.assertEqual(self.api.requests['GET /playlists/{id}/tracks'], 0)
+
+
+class TestMetadataCache(MusicTestCase):
+    """Test search and recommendation results are cached with a TTL"""
+
+    def test_searches_are_cached(self):
+        """Test repeated plays of the same query make one search"""
+        for query in ('Tum Hi Ho', 'tum hi ho', '  tum  hi ho '):
+            self.assertIn('Now playing: Tum Hi Ho', music.search_and_play_spotify(query))
+
+        self.assertEqual(self.api.requests['GET /search?type=track'], 1)
+        self.assertEqual(self.api.requests['PUT /me/player/play'], 3)
+
+    def test_empty_results_are_not_cached(self):
+        """Test a search with no results is retried on the next query"""
+        music.search_and_play_spotify('nothing')
+        self.assertIn('No tracks found', music.search_and_play_spotify('nothing'))
+        self.assertEqual(self.api.requests['GET /search?type=track'], 2)
+
+    def test_entries_expire(self):
+        """Test results are fetched again after the TTL"""
+        cache = MetadataCache()
+        key = MetadataCache.key('spotify', 'track', 'Query')
+        cache.set(key, ['result'], ttl=0.05)
+        self.assertEqual(cache.get(MetadataCache.key('spotify', 'track', 'query ')), ['result'])
+        time.sleep(0.06)
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(cache.stats, {'hits': 1, 'misses': 1})
+
+    def test_recommendations_are_cached(self):
+        """Test recommendations and their seed lookups are cached"""
+        first = music.get_music_recommendations('artist', 'Arijit Singh', 5)
+        second = music.get_music_recommendations('artist', 'arijit singh', 5)
+
+        self.assertEqual(first.splitlines()[2:], second.splitlines()[2:])
+        self.assertEqual(self.api.requests['GET /recommendations'], 1)
+        self.assertEqual(self.api.requests['GET /search?type=artist'], 1)
+        music.get_music_recommendations('artist', 'Arijit Singh', 10)
+        self.assertEqual(self.api.requests['GET /recommendations'], 2)
+
+    @patch('modules.music.YTMUSIC_AVAILABLE', True)
+    def test_youtube_music_searches_are_cached(self):
+        """Test YouTube Music searches are cached per query and limit"""
+        music.YouTubeMusicController._instance = None
+        ytmusic = FakeYTMusic()
+        music.YouTubeMusicController().ytmusic = ytmusic
+
+        first = music.search_youtube_music('kesariya', 3)
+        self.assertEqual(music.search_youtube_music('Kesariya', 3).splitlines()[1:], first.splitlines()[1:])
+        self.assertIn('kesariya 2', first)
+        self.assertEqual(ytmusic.searches, 1)
+
+        with patch('modules.music.webbrowser.open') as open_browser:
+            music.play_youtube_music('kesariya')
+            music.play_youtube_music('kesariya')
+        open_browser.assert_called_with('https://music.youtube.com/watch?v=v0')
+        self.assertEqual(ytmusic.searches, 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
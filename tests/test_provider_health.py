@@ -0,0 +1,380 @@
+"""
+Unit tests for LLM provider health: cached background probes, circuit
+breakers with half-open recovery, fallback and hedged requests, against
+local stub provider servers that can simulate outages.
+"""
+
+import unittest
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import modules.provider_health as provider_health
+from modules.provider_health import (CircuitBreaker, HealthMonitor, ProviderUnavailableError,
+                                    call_with_breaker, call_with_fallback, hedged_call)
+from modules.network_aware_llm import NetworkAwareLLMConfig
+from modules.offline_mode import OfflineModeManager
+from modules.llm_provider import UnifiedChatInterface
+
+
+class StubProviderServer:
+    """
+    Local HTTP server standing in for an LLM provider.
+
+    `mode` is "ok", "fail" (HTTP 500) or "hang" (answers after `hang_seconds`);
+    `delay` slows every answer. Also serves the Ollama tags API.
+    """
+
+    def __init__(self, name="stub", delay=0.0):
+        self.name = name
+        self.mode = "ok"
+        self.delay = delay
+        self.hang_seconds = 2.0
+        self.hits = {"probe": 0, "generate": 0}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, kind, body):
+                server.hits[kind] += 1
+                time.sleep(server.hang_seconds if server.mode == "hang" else server.delay)
+                status = 500 if server.mode == "fail" else 200
+                data = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except OSError:
+                    pass  # Client gave up
+
+            def do_GET(self):
+                self._reply("probe", {"models": [{"name": "gemma3:27b"}]})
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                self._reply("generate", {"response": f"reply from {server.name}"})
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def probe(self):
+        return requests.get(f"{self.url}/api/tags", timeout=0.5).status_code == 200
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class StubProvider:
+    """LLM provider calling a stub server; reports failures as error strings like the real ones."""
+
+    def __init__(self, server, timeout=0.5):
+        self.server = server
+        self.timeout = timeout
+
+    def generate_response(self, messages, **kwargs):
+        try:
+            response = requests.post(f"{self.server.url}/generate", json={"messages": messages},
+                                     timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            return f"Error: {e}"
+        if response.status_code != 200:
+            return f"Error: {response.status_code}"
+        return response.json()["response"]
+
+    def stream_response(self, messages, **kwargs):
+        yield self.generate_response(messages, **kwargs)
+
+
+class OfflineStub:
+    """Offline fallback provider."""
+
+    def generate_response(self, messages, **kwargs):
+        return "offline reply"
+
+    def stream_response(self, messages, **kwargs):
+        yield "offline reply"
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test breaker state transitions"""
+
+    def test_opens_and_recovers(self):
+        """Test the circuit opens on consecutive failures and closes after a good trial"""
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.1)
+        for _ in range(2):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.15)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # One trial at a time
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        """Test a failed half-open trial opens the circuit again"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_success_resets_failure_count(self):
+        """Test only consecutive failures count"""
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_probe_releases_stale_trial(self):
+        """Test a healthy probe frees a trial that never reported back"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        breaker.half_open()
+        self.assertTrue(breaker.allow())
+        breaker.half_open()
+        self.assertFalse(breaker.allow())  # Trial still fresh
+        time.sleep(0.1)
+        breaker.half_open()
+        self.assertTrue(breaker.allow())
+
+    def test_error_response_prefix(self):
+        """Test only "Error:" replies count as provider failures"""
+        self.assertTrue(provider_health.is_error_response("Error: 500"))
+        self.assertFalse(provider_health.is_error_response("Errors in Python are exceptions."))
+
+
+class TestHealthMonitor(unittest.TestCase):
+    """Test cached background probes"""
+
+    def setUp(self):
+        self.server = StubProviderServer()
+        self.monitor = HealthMonitor(interval=60, ttl=60, failure_threshold=2, reset_timeout=60)
+        self.monitor.register("stub", self.server.probe)
+
+    def tearDown(self):
+        self.monitor.stop()
+        self.server.close()
+
+    def test_probe_cached_within_ttl(self):
+        """Test health reads reuse the cached probe result"""
+        for _ in range(5):
+            self.assertTrue(self.monitor.is_healthy("stub"))
+        self.assertEqual(self.server.hits["probe"], 1)
+
+        self.monitor.ttl = 0
+        self.monitor.is_healthy("stub")
+        self.assertEqual(self.server.hits["probe"], 2)
+
+    def test_background_probes(self):
+        """Test probes run on the monitor's schedule without any reads"""
+        self.monitor.interval = 0.05
+        self.monitor.start()
+        time.sleep(0.3)
+        self.assertGreaterEqual(self.server.hits["probe"], 3)
+
+    def test_failing_probes_open_circuit(self):
+        """Test an outage seen by probes opens the circuit before any request fails"""
+        self.server.mode = "fail"
+        self.monitor.check("stub")
+        self.monitor.check("stub")
+        self.assertFalse(self.monitor.is_healthy("stub"))
+        self.assertEqual(self.monitor.breaker("stub").state, CircuitBreaker.OPEN)
+
+        self.server.mode = "ok"
+        self.monitor.check("stub")
+        self.assertEqual(self.monitor.breaker("stub").state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.monitor.is_healthy("stub"))
+
+    def test_subscribe(self):
+        """Test subscribers hear about health changes"""
+        changes = []
+        self.monitor.subscribe("stub", changes.append)
+        self.monitor.check("stub")
+        self.server.mode = "fail"
+        self.monitor.check("stub")
+        self.monitor.check("stub")
+        self.server.mode = "ok"
+        self.monitor.check("stub")
+        self.assertEqual(changes, [False, True])
+
+
+class TestFallback(unittest.TestCase):
+    """Test requests skip failing providers instead of timing out"""
+
+    def setUp(self):
+        self.primary = StubProviderServer("primary")
+        self.secondary = StubProviderServer("secondary")
+        self.monitor = HealthMonitor(failure_threshold=3, reset_timeout=0.3)
+
+    def tearDown(self):
+        self.primary.close()
+        self.secondary.close()
+
+    def calls(self):
+        return [("primary", lambda: StubProvider(self.primary).generate_response(MESSAGES)),
+                ("secondary", lambda: StubProvider(self.secondary).generate_response(MESSAGES))]
+
+    def test_breaker_raises_on_error_response(self):
+        """Test error strings count as failures"""
+        self.primary.mode = "fail"
+        with self.assertRaises(ProviderUnavailableError):
+            call_with_breaker(self.monitor, "primary", self.calls()[0][1])
+        self.assertEqual(self.monitor.breaker("primary").failures, 1)
+
+    def test_outage_fails_fast(self):
+        """Test once the circuit opens, requests stop waiting for the dead provider"""
+        self.primary.mode = "hang"
+        for _ in range(3):
+            start = time.time()
+            self.assertEqual(call_with_fallback(self.monitor, self.calls()), "reply from secondary")
+            self.assertGreaterEqual(time.time() - start, 0.5)  # Full client timeout
+
+        start = time.time()
+        self.assertEqual(call_with_fallback(self.monitor, self.calls()), "reply from secondary")
+        self.assertLess(time.time() - start, 0.3)
+        self.assertEqual(self.primary.hits["generate"], 3)
+
+    def test_half_open_recovery(self):
+        """Test a recovered provider gets traffic back after the cool-down"""
+        self.primary.mode = "fail"
+        for _ in range(3):
+            call_with_fallback(self.monitor, self.calls())
+        self.primary.mode = "ok"
+        self.assertEqual(call_with_fallback(self.monitor, self.calls()), "reply from secondary")
+
+        time.sleep(0.35)
+        self.assertEqual(call_with_fallback(self.monitor, self.calls()), "reply from primary")
+        self.assertEqual(self.monitor.breaker("primary").state, CircuitBreaker.CLOSED)
+
+    def test_hedged_request(self):
+        """Test a request slower than the primary's p95 is raced against the secondary"""
+        self.primary.delay = 0.02
+        for _ in range(20):
+            hedged_call(self.monitor, self.calls())
+        self.assertEqual(self.secondary.hits["generate"], 0)
+        self.assertLess(self.monitor.latency_percentile("primary"), 0.2)
+
+        self.primary.mode = "hang"
+        self.primary.hang_seconds = 1.0
+        start = time.time()
+        self.assertEqual(hedged_call(self.monitor, self.calls()), "reply from secondary")
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(self.secondary.hits["generate"], 1)
+
+    def test_all_unavailable(self):
+        """Test an error is raised when every provider fails"""
+        self.primary.mode = self.secondary.mode = "fail"
+        with self.assertRaises(ProviderUnavailableError):
+            call_with_fallback(self.monitor, self.calls())
+        with self.assertRaises(ProviderUnavailableError):
+            hedged_call(self.monitor, self.calls())
+
+
+class TestIntegration(unittest.TestCase):
+    """Test provider selection, chat fallback and offline mode use the shared monitor"""
+
+    def setUp(self):
+        self.server = StubProviderServer("ollama")
+        self.monitor = HealthMonitor(failure_threshold=2, reset_timeout=60)
+        self.previous = provider_health._monitor
+        provider_health._monitor = self.monitor
+
+    def tearDown(self):
+        provider_health._monitor = self.previous
+        self.monitor.stop()
+        self.server.close()
+
+    def test_provider_selection_uses_cached_probes(self):
+        """Test choosing a provider probes Ollama once, then reads the cache"""
+        config = NetworkAwareLLMConfig(monitor=self.monitor, ollama_host=self.server.url)
+        for _ in range(3):
+            self.assertEqual(config.get_optimal_provider(), ("ollama", "gemma3:27b"))
+        self.assertEqual(self.server.hits["probe"], 1)
+
+    def test_chat_falls_back_while_circuit_open(self):
+        """Test chat answers from the offline provider without waiting on a dead provider"""
+        chat = UnifiedChatInterface.__new__(UnifiedChatInterface)
+        chat.provider = StubProvider(self.server)
+        chat.provider_name = chat.model = 'test'
+        chat.conversation_history = []
+        chat.offline_mode = False
+        chat.session_id = 'health'
+        chat.use_fallback = True
+        chat.hedge = False
+        chat._fallback_provider = OfflineStub()
+
+        self.assertEqual(chat.chat("hello"), "reply from ollama")
+        self.server.mode = "fail"
+        for _ in range(3):
+            self.assertEqual(chat.chat("hello"), "offline reply")
+        self.assertEqual(self.server.hits["generate"], 3)  # Circuit opened after two failures
+        self.assertEqual("".join(chat.chat("hello", stream=True)), "offline reply")
+        self.assertEqual(self.server.hits["generate"], 3)
+
+    def test_empty_stream_releases_trial(self):
+        """Test a half-open trial that streams nothing does not leave the circuit stuck"""
+        class EmptyStub(StubProvider):
+            def stream_response(self, messages, **kwargs):
+                return iter(())
+
+        chat = UnifiedChatInterface.__new__(UnifiedChatInterface)
+        chat.provider = EmptyStub(self.server)
+        chat.conversation_history = []
+        chat.offline_mode = False
+        chat.session_id = 'health'
+        chat.use_fallback = True
+        chat._fallback_provider = OfflineStub()
+
+        breaker = self.monitor.breaker("empty")
+        for _ in range(2):
+            breaker.record_failure()
+        breaker.half_open()
+        self.assertEqual("".join(chat.chat("hello", stream=True)), "")
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+    def test_offline_mode_follows_monitor(self):
+        """Test the offline mode manager uses the shared connectivity probe"""
+        online = [True]
+        self.monitor.register("internet", lambda: online[0])
+        with tempfile.TemporaryDirectory() as cache_dir:
+            manager = OfflineModeManager(offline_cache_dir=cache_dir)
+            changes = []
+            manager.add_mode_change_callback(changes.append)
+            self.assertTrue(manager.is_connected())
+
+            online[0] = False
+            self.monitor.check("internet")
+            self.assertFalse(manager.is_connected())
+            self.assertEqual(changes, [False])
+            manager.stop_connectivity_check()
+
+
+if __name__ == "__main__":
+    unittest.main()
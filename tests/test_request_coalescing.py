@@ -0,0 +1,246 @@
+"""
+Unit tests for chat request coalescing: identical concurrent requests
+share one run, streams fan out to late joiners, and scope decides who
+may share.
+"""
+
+import unittest
+import os
+import sys
+import threading
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.request_coalescing import RequestCoalescer, context_fingerprint, normalize_message
+from modules.llm_scheduler import llm_request, request_context
+from modules.llm_provider import UnifiedChatInterface
+
+
+class SlowProvider:
+    """Provider streaming words with a delay, counting generations."""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def stream_response(self, messages, **kwargs):
+        with self._lock:
+            self.calls += 1
+        for word in f"reply to {messages[-1]['content']}".split():
+            time.sleep(self.delay)
+            yield word + " "
+
+    def generate_response(self, messages, **kwargs):
+        return "".join(self.stream_response(messages, **kwargs))
+
+
+def run_concurrently(fn, count):
+    """Call fn from count threads at once; returns their results in order."""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = fn(i)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+class TestKeys(unittest.TestCase):
+    """Test request keys and scope"""
+
+    def test_normalize_message(self):
+        """Test re-sent messages normalize to the same key"""
+        self.assertEqual(normalize_message("What's the  weather?"), normalize_message("what's the weather"))
+        self.assertNotEqual(normalize_message("weather today"), normalize_message("weather tomorrow"))
+
+    def test_normalize_keeps_symbols(self):
+        """Test symbols that change the question are not stripped"""
+        self.assertNotEqual(normalize_message("what is 2+2?"), normalize_message("what is 22"))
+        self.assertNotEqual(normalize_message("C++ tutorial"), normalize_message("C tutorial"))
+        self.assertEqual(normalize_message("Learn C++!"), "learn c++")
+
+    def test_context_fingerprint(self):
+        """Test the fingerprint ignores dict order but not content"""
+        self.assertEqual(context_fingerprint({"a": 1, "b": 2}), context_fingerprint({"b": 2, "a": 1}))
+        self.assertNotEqual(context_fingerprint({"a": 1}), context_fingerprint({"a": 2}))
+
+    def test_user_scope(self):
+        """Test per-user scope never shares between users"""
+        coalescer = RequestCoalescer(scope="user")
+        self.assertEqual(coalescer.key("chat", "Hi!", "alice"), coalescer.key("chat", "hi", "alice"))
+        self.assertNotEqual(coalescer.key("chat", "hi", "alice", stateless=True),
+                            coalescer.key("chat", "hi", "bob", stateless=True))
+        self.assertNotEqual(coalescer.key("chat", "hi", "alice", {"topic": "a"}),
+                            coalescer.key("chat", "hi", "alice", {"topic": "b"}))
+
+    def test_global_scope(self):
+        """Test global scope shares only stateless requests between users"""
+        coalescer = RequestCoalescer(scope="global")
+        self.assertEqual(coalescer.key("chat", "hi", "alice", stateless=True),
+                         coalescer.key("chat", "hi", "bob", stateless=True))
+        self.assertNotEqual(coalescer.key("chat", "hi", "alice"), coalescer.key("chat", "hi", "bob"))
+
+    def test_off(self):
+        """Test coalescing can be disabled"""
+        coalescer = RequestCoalescer(scope="off")
+        self.assertIsNone(coalescer.key("chat", "hi", "alice"))
+        calls = []
+        run_concurrently(lambda i: coalescer.do("chat", None, lambda: calls.append(i)), 3)
+        self.assertEqual(len(calls), 3)
+
+    def test_scope_from_environment(self):
+        """Test the scope is read from CHAT_COALESCE_SCOPE"""
+        os.environ["CHAT_COALESCE_SCOPE"] = "global"
+        try:
+            self.assertEqual(RequestCoalescer().scope, "global")
+        finally:
+            del os.environ["CHAT_COALESCE_SCOPE"]
+        self.assertEqual(RequestCoalescer(scope="bogus").scope, "user")
+
+
+class TestDo(unittest.TestCase):
+    """Test blocking requests share the leader's result"""
+
+    def setUp(self):
+        self.coalescer = RequestCoalescer(scope="user")
+
+    def test_concurrent_duplicates_run_once(self):
+        """Test identical concurrent requests run once and all get the answer"""
+        calls = []
+
+        def handle(i):
+            def generate():
+                calls.append(i)
+                time.sleep(0.2)
+                return {"response": "answer", "features_used": []}
+            return self.coalescer.do("chat", self.coalescer.key("chat", "hi", "alice"), generate)
+
+        results = run_concurrently(handle, 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([r[0]["response"] for r in results], ["answer"] * 5)
+        self.assertEqual(sorted(r[1] for r in results), [False] + [True] * 4)
+
+        stats = self.coalescer.stats()
+        self.assertEqual(stats["endpoints"]["chat"], {"requests": 5, "coalesced": 4, "coalesced_ratio": 0.8})
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_followers_get_a_copy(self):
+        """Test a follower changing its result does not affect the leader's"""
+        results = run_concurrently(lambda i: self.coalescer.do(
+            "chat", "key", lambda: time.sleep(0.2) or {"features_used": ["llm"]}
+        ), 2)
+        results[0][0]["features_used"].append("changed")
+        self.assertNotEqual(results[0][0], results[1][0])
+
+    def test_sequential_requests_not_coalesced(self):
+        """Test a request after the leader finished runs again"""
+        calls = []
+        for _ in range(2):
+            self.coalescer.do("chat", "key", lambda: calls.append(1))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.coalescer.stats()["coalesced"], 0)
+
+    def test_error_shared(self):
+        """Test followers see the leader's error"""
+        def fail():
+            time.sleep(0.2)
+            raise RuntimeError("provider down")
+
+        results = run_concurrently(lambda i: self.coalescer.do("chat", "key", fail), 3)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+
+class TestStream(unittest.TestCase):
+    """Test streaming requests fan out from the leader's token stream"""
+
+    def setUp(self):
+        self.coalescer = RequestCoalescer(scope="user")
+        self.generations = 0
+
+    def tokens(self, count=5, delay=0.05):
+        self.generations += 1
+        for i in range(count):
+            time.sleep(delay)
+            yield f"t{i} "
+
+    def test_late_follower_replays_tokens(self):
+        """Test a follower joining mid-stream gets every token"""
+        stream, shared = self.coalescer.stream("chat_stream", "key", self.tokens)
+        self.assertFalse(shared)
+        first = next(stream)
+
+        follower, shared = self.coalescer.stream("chat_stream", "key", self.tokens)
+        self.assertTrue(shared)
+        self.assertEqual(first + "".join(stream), "t0 t1 t2 t3 t4 ")
+        self.assertEqual("".join(follower), "t0 t1 t2 t3 t4 ")
+        self.assertEqual(self.generations, 1)
+        self.assertEqual(self.coalescer.stats()["endpoints"]["chat_stream"]["coalesced"], 1)
+
+    def test_leader_disconnect(self):
+        """Test followers still get the whole stream when the leader's client goes away"""
+        stream, _ = self.coalescer.stream("chat_stream", "key", self.tokens)
+        follower, _ = self.coalescer.stream("chat_stream", "key", self.tokens)
+        next(stream)
+        stream.close()
+        self.assertEqual("".join(follower), "t0 t1 t2 t3 t4 ")
+
+    def test_stream_error_shared(self):
+        """Test an error mid-stream reaches every consumer after the tokens before it"""
+        def failing():
+            yield "partial "
+            time.sleep(0.1)
+            raise RuntimeError("stream broke")
+
+        consumers = [self.coalescer.stream("chat_stream", "key", failing)[0] for _ in range(2)]
+        for consumer in consumers:
+            received = []
+            with self.assertRaises(RuntimeError):
+                for token in consumer:
+                    received.append(token)
+            self.assertEqual(received, ["partial "])
+
+    def test_request_context_carried(self):
+        """Test the leader's stream runs under the caller's LLM request context"""
+        def session_tokens():
+            yield request_context()["session_id"]
+
+        with llm_request(session_id="alice"):
+            stream, _ = self.coalescer.stream("chat_stream", "key", session_tokens)
+        self.assertEqual(list(stream), ["alice"])
+
+    def test_chat_session_streams_once(self):
+        """Test a re-sent message on one chat session generates and records once"""
+        provider = SlowProvider()
+        chat = UnifiedChatInterface.__new__(UnifiedChatInterface)
+        chat.provider = provider
+        chat.provider_name = chat.model = 'test'
+        chat.conversation_history = []
+        chat.offline_mode = False
+        chat.session_id = 'chat-1'
+        chat.use_fallback = False
+        chat.hedge = False
+
+        def handle(i):
+            key = self.coalescer.key("chat_stream", "hello", user="chat-1")
+            stream, _ = self.coalescer.stream("chat_stream", key, lambda: chat.chat("hello", stream=True))
+            return "".join(stream)
+
+        self.assertEqual(run_concurrently(handle, 4), ["reply to hello "] * 4)
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual([m["role"] for m in chat.conversation_history], ["user", "assistant"])
+
+
+if __name__ == "__main__":
+    unittest.main()
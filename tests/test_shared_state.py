@@ -0,0 +1,277 @@
+"""
+Unit tests for multi-worker shared state: the SQLite state store, rate
+limits and chat sessions shared between worker processes, and Socket.IO
+emits relayed between servers.
+"""
+
+import unittest
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.shared_state import (ChatSessionStore, SharedStateManager, SQLiteStateStore,
+                                  create_state_store, shared_secret)
+
+
+def increment_worker(url, count):
+    store = create_state_store(url)
+    for _ in range(count):
+        store.incr("counter")
+
+
+def serve_worker(url, ports):
+    """Web worker using the shared store for rate limits and chat sessions, like the backend."""
+    from flask import Flask, jsonify, request
+    from flask_limiter import Limiter
+    from flask_limiter.util import get_remote_address
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # No per-request log lines
+    store = create_state_store(url)
+    sessions = ChatSessionStore(store)
+    chats = {}
+    app = Flask(__name__)
+    limiter = Limiter(get_remote_address, app=app, storage_uri=store.url)
+
+    @app.route("/limited")
+    @limiter.limit("5 per minute")
+    def limited():
+        return jsonify({"pid": os.getpid()})
+
+    @app.route("/chat/<session_id>", methods=["POST"])
+    def chat(session_id):
+        chat = chats.setdefault(session_id, SimpleNamespace(conversation_history=[]))
+        sessions.resume(session_id, chat)
+        chat.conversation_history.append({"role": "user", "content": request.get_json()["message"]})
+        sessions.save(session_id, chat)
+        return jsonify({"history": [m["content"] for m in chat.conversation_history], "pid": os.getpid()})
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def call(port, path, body=None):
+    """Returns (status, json body) for a request to a worker."""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data,
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+class TestSQLiteStateStore(unittest.TestCase):
+    """Test the default state store"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.tmp.name, 'state.db')}"
+        self.store = create_state_store(self.url)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_values(self):
+        """Test values round-trip as JSON and can be deleted"""
+        self.assertIsInstance(self.store, SQLiteStateStore)
+        self.store.set("session", {"history": [1, 2]})
+        self.assertEqual(self.store.get("session"), {"history": [1, 2]})
+        self.assertTrue(self.store.delete("session"))
+        self.assertFalse(self.store.delete("session"))
+        self.assertEqual(self.store.get("session", "missing"), "missing")
+
+    def test_ttl(self):
+        """Test expired keys read as missing"""
+        self.store.set("short", 1, ttl=0.1)
+        self.store.set("long", 2, ttl=60)
+        self.assertGreater(self.store.expires_at("long"), time.time() + 59)
+        time.sleep(0.15)
+        self.assertIsNone(self.store.get("short"))
+        self.assertEqual(self.store.keys(), ["long"])
+        self.assertTrue(self.store.add("short", 3))
+
+    def test_add_and_prefix(self):
+        """Test add only stores missing keys and clear honours the prefix"""
+        self.assertTrue(self.store.add("user:alice", {"role": "user"}))
+        self.assertFalse(self.store.add("user:alice", {"role": "admin"}))
+        self.assertEqual(self.store.get("user:alice"), {"role": "user"})
+        self.store.set("other", 1)
+        self.store.clear("user:")
+        self.assertEqual(self.store.keys(), ["other"])
+
+    def test_counter_ttl_fixed_at_creation(self):
+        """Test a counter expires a fixed time after its first increment"""
+        self.assertEqual(self.store.incr("hits", ttl=0.2), 1)
+        time.sleep(0.1)
+        self.assertEqual(self.store.incr("hits", 2, ttl=0.2), 3)
+        time.sleep(0.15)
+        self.assertEqual(self.store.incr("hits", ttl=0.2), 1)
+
+    def test_concurrent_processes(self):
+        """Test increments from several processes are never lost"""
+        workers = [multiprocessing.Process(target=increment_worker, args=(self.url, 100)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+        self.assertEqual(self.store.get("counter"), 400)
+
+    def test_shared_secret(self):
+        """Test every worker gets the same generated secret"""
+        other = create_state_store(self.url)
+        self.assertEqual(shared_secret(self.store, "jwt"), shared_secret(other, "jwt"))
+        self.assertEqual(len(shared_secret(other, "jwt")), 64)
+        self.assertNotEqual(shared_secret(self.store, "jwt"), shared_secret(self.store, "flask"))
+
+    def test_unsupported_url(self):
+        """Test unknown store URLs are rejected"""
+        with self.assertRaises(ValueError):
+            create_state_store("memory://")
+
+
+class TestChatSessionStore(unittest.TestCase):
+    """Test session resumption between workers"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        store = create_state_store(f"sqlite:///{os.path.join(self.tmp.name, 'state.db')}")
+        self.sessions = ChatSessionStore(store)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resume_newer_history(self):
+        """Test a worker picks up history saved by another"""
+        first = SimpleNamespace(conversation_history=[{"role": "user", "content": "hi"}])
+        self.sessions.save("s1", first)
+
+        second = SimpleNamespace(conversation_history=[])
+        self.assertTrue(self.sessions.resume("s1", second))
+        self.assertEqual(second.conversation_history, first.conversation_history)
+        self.assertFalse(self.sessions.resume("s1", second))  # Already current
+
+    def test_local_turn_not_rolled_back(self):
+        """Test resuming does not drop a turn still running on this worker"""
+        chat = SimpleNamespace(conversation_history=[])
+        self.sessions.save("s1", chat)
+        chat.conversation_history.append({"role": "user", "content": "in flight"})
+        self.assertFalse(self.sessions.resume("s1", chat))
+        self.assertEqual(len(chat.conversation_history), 1)
+
+    def test_deleted_elsewhere(self):
+        """Test a session deleted on another worker starts over, keeping the system prompt"""
+        chat = SimpleNamespace(conversation_history=[{"role": "system", "content": "Be brief"},
+                                                     {"role": "user", "content": "hi"}])
+        self.sessions.save("s1", chat)
+        self.assertTrue(self.sessions.delete("s1"))
+        self.sessions.resume("s1", chat)
+        self.assertEqual(chat.conversation_history, [{"role": "system", "content": "Be brief"}])
+        self.assertIsNone(self.sessions.load("s1"))
+
+    def test_concurrent_saves_keep_both_turns(self):
+        """Test two workers answering one session at once both keep their turn"""
+        first = SimpleNamespace(conversation_history=[{"role": "user", "content": "hi"}])
+        self.sessions.save("s1", first)
+        second = SimpleNamespace(conversation_history=[])
+        self.sessions.resume("s1", second)
+
+        first.conversation_history.append({"role": "user", "content": "from first"})
+        second.conversation_history.append({"role": "user", "content": "from second"})
+        self.assertTrue(self.sessions.save("s1", first))
+        self.assertFalse(self.sessions.save("s1", second))  # Rebased onto the first worker's save
+
+        contents = [m["content"] for m in self.sessions.load("s1")["history"]]
+        self.assertEqual(contents, ["hi", "from first", "from second"])
+        self.assertEqual(second.conversation_history, self.sessions.load("s1")["history"])
+        self.assertTrue(self.sessions.resume("s1", first))
+        self.assertEqual(len(first.conversation_history), 3)
+
+
+class TestWorkers(unittest.TestCase):
+    """Test rate limits and sessions hold across worker processes"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(self.tmp.name, 'state.db')}"
+        ports = multiprocessing.Queue()
+        self.workers = [multiprocessing.Process(target=serve_worker, args=(url, ports), daemon=True)
+                        for _ in range(2)]
+        for worker in self.workers:
+            worker.start()
+        self.ports = [ports.get(timeout=30) for _ in self.workers]
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.terminate()
+            worker.join(5)
+        self.tmp.cleanup()
+
+    def test_rate_limit_shared(self):
+        """Test a limit counts requests to every worker"""
+        statuses = [call(self.ports[i % 2], "/limited")[0] for i in range(6)]
+        self.assertEqual(statuses, [200] * 5 + [429])
+        self.assertEqual(call(self.ports[0], "/limited")[0], 429)
+
+    def test_session_resumes_on_any_worker(self):
+        """Test a conversation continues whichever worker serves each turn"""
+        status, first = call(self.ports[0], "/chat/s1", {"message": "hi"})
+        self.assertEqual(status, 200)
+        _, second = call(self.ports[1], "/chat/s1", {"message": "again"})
+        _, third = call(self.ports[0], "/chat/s1", {"message": "third"})
+        self.assertNotEqual(first["pid"], second["pid"])
+        self.assertEqual(second["history"], ["hi", "again"])
+        self.assertEqual(third["history"], ["hi", "again", "third"])
+
+
+class TestSocketIOQueue(unittest.TestCase):
+    """Test Socket.IO emits are relayed through the store"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.tmp.name, 'state.db')}"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_emit_reaches_other_server(self):
+        """Test an emit on one worker is handled by another worker's server"""
+        import socketio
+
+        received = []
+
+        class RecordingManager(SharedStateManager):
+            def _handle_emit(self, message):
+                received.append(message)
+
+        server = socketio.Server(client_manager=RecordingManager(self.url), async_mode='threading')
+        server.manager.initialize()  # Normally on the first client connection
+        server.manager_initialized = True
+        time.sleep(0.2)  # Listener starts
+
+        other = SharedStateManager(self.url, write_only=True)
+        other.emit('system_stats', {'cpu': 12}, room='system_stats')
+        deadline = time.time() + 5
+        while not received and time.time() < deadline:
+            time.sleep(0.02)
+
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]['event'], 'system_stats')
+        self.assertEqual(received[0]['data'], [{'cpu': 12}])
+        self.assertEqual(received[0]['room'], 'system_stats')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,400 @@
+"""
+Unit tests for the Smart Automation Module.
+Tests cron parsing, scheduling, and concurrent workflow execution.
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.smart_automation import PatternDetector, SmartAutomationEngine, WorkflowStatus
+from modules.pattern_miner import SpaceSaving, StreamingPatternMiner
+from modules.workflow_scheduler import CronExpression, WorkflowScheduler
+from modules.expression_engine import ConditionWatcher, ExpressionError, compile_expression
+
+
+class TestCronExpression(unittest.TestCase):
+    """Test suite for 5-field cron parsing."""
+
+    def test_weekday_range(self):
+        """Test named weekday ranges skip the weekend."""
+        cron = CronExpression("0 9 * * MON-FRI")
+        saturday = datetime(2024, 6, 1, 10, 0)
+        self.assertEqual(cron.next_after(saturday), datetime(2024, 6, 3, 9, 0))
+
+    def test_steps_and_lists(self):
+        """Test step and list syntax."""
+        self.assertEqual(CronExpression("*/15 * * * *").next_after(datetime(2024, 6, 1, 10, 16)),
+                         datetime(2024, 6, 1, 10, 30))
+        self.assertEqual(CronExpression("5,50 8-10 * * *").next_after(datetime(2024, 6, 1, 10, 51)),
+                         datetime(2024, 6, 2, 8, 5))
+
+    def test_day_of_month_skips_short_months(self):
+        """Test the 31st only fires in months that have one."""
+        cron = CronExpression("0 0 31 * *")
+        self.assertEqual(cron.next_after(datetime(2024, 4, 1)), datetime(2024, 5, 31))
+
+    def test_day_fields_are_ored(self):
+        """Test day-of-month and day-of-week match either way when both are set."""
+        cron = CronExpression("0 12 1 * SUN")
+        self.assertEqual(cron.next_after(datetime(2024, 6, 1, 13, 0)), datetime(2024, 6, 2, 12, 0))
+
+    def test_macros_and_invalid(self):
+        """Test @macros and rejection of malformed expressions."""
+        self.assertEqual(CronExpression("@hourly").next_after(datetime(2024, 6, 1, 10, 5)),
+                         datetime(2024, 6, 1, 11, 0))
+        for bad in ["* * * *", "61 * * * *", "0 0 * * FUNDAY", "*/0 * * * *"]:
+            with self.assertRaises(ValueError):
+                CronExpression(bad)
+
+
+class TestWorkflowScheduler(unittest.TestCase):
+    """Test suite for the heap-based scheduler."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "schedule.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_missed_run_fires_on_startup(self):
+        """Test a persisted run missed during downtime fires promptly once."""
+        fired = threading.Event()
+        scheduler = WorkflowScheduler(lambda workflow_id: fired.set(), self.db_path)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO workflow_schedule VALUES (?, ?, ?, ?, ?)",
+                         ("wf:0", "wf", "0 9 * * *", time.time() - 30, None))
+
+        job = scheduler.add_job("wf:0", "wf", "0 9 * * *")
+        start = time.monotonic()
+        scheduler.start()
+        try:
+            self.assertTrue(fired.wait(1.0))
+            self.assertLess(time.monotonic() - start, 0.5)
+        finally:
+            scheduler.stop()
+
+        # The next run is persisted for the following day
+        with sqlite3.connect(self.db_path) as conn:
+            next_run, = conn.execute("SELECT next_run FROM workflow_schedule").fetchone()
+        self.assertEqual(datetime.fromtimestamp(next_run).strftime("%H:%M"), "09:00")
+        self.assertGreater(next_run, time.time())
+        self.assertEqual(job.next_run, next_run)
+
+    def test_removed_job_does_not_fire(self):
+        """Test removing a job drops it from the heap."""
+        fired = []
+        scheduler = WorkflowScheduler(fired.append, self.db_path)
+        scheduler.add_job("wf:0", "wf", "* * * * *")
+        scheduler.remove_job("wf:0")
+        self.assertEqual(scheduler.get_jobs(), [])
+
+
+class TestExpressionEngine(unittest.TestCase):
+    """Test suite for the restricted condition compiler."""
+
+    def test_evaluates_conditions(self):
+        """Test comparisons, boolean logic, lookups and whitelisted calls."""
+        context = {'results': {'task_1': {'count': 5}}, 'params': {'name': 'Report'},
+                   'datetime': datetime, 'time': time}
+        cases = {
+            "results.task_1.count > 3 and params['name'].lower() == 'report'": True,
+            "len(results) == 1 or False": True,
+            "1 < results['task_1']['count'] <= 4": False,
+            "not results.missing": True,
+            "0 <= datetime.now().hour < 24": True,
+            "'x' if params.name else 'y'": 'x',
+        }
+        for source, expected in cases.items():
+            self.assertEqual(compile_expression(source).evaluate(context), expected, source)
+
+    def test_rejects_unsafe_expressions(self):
+        """Test dunder access, arbitrary calls and statements are refused."""
+        for source in ["__import__('os')", "().__class__", "open('x')", "time.sleep(1)",
+                       "lambda: 1", "x := 1", "[a for a in b]", "2 ** 100"]:
+            with self.assertRaises(ExpressionError, msg=source):
+                compile_expression(source)
+
+    def test_rejects_huge_repetition(self):
+        """Test sequence repetition cannot allocate unbounded memory."""
+        for source in ['"a" * 100000000 * 8', '[0] * 1000000000', '3 * (1, 2) * 100000']:
+            with self.assertRaises(ExpressionError, msg=source):
+                compile_expression(source).evaluate({})
+        self.assertEqual(compile_expression("'-' * n").evaluate({'n': 3}), '---')
+        self.assertEqual(compile_expression("6 * 7").evaluate({}), 42)
+
+    def test_compiled_form_is_cached(self):
+        """Test the same source is parsed only once."""
+        self.assertIs(compile_expression("a > 1"), compile_expression("a > 1"))
+        self.assertEqual(compile_expression("a > b.c").variables, {"a", "b"})
+
+    def test_watcher_reevaluates_only_on_referenced_change(self):
+        """Test conditions fire on a false-to-true edge of their own variables."""
+        fired = []
+        watcher = ConditionWatcher()
+        watcher.watch("low_battery", "battery < 20 and not charging", lambda: fired.append("low"))
+
+        self.assertEqual(watcher.update({"battery": 15}), [])  # charging not set yet
+        self.assertEqual(watcher.update({"charging": False}), ["low_battery"])
+        self.assertEqual(watcher.update({"battery": 10}), [])  # still true, no new edge
+        self.assertEqual(watcher.update({"volume": 3}), [])
+        watcher.update({"charging": True})
+        watcher.update({"charging": False})
+        self.assertEqual(fired, ["low", "low"])
+
+
+class TestPatternDetector(unittest.TestCase):
+    """Test suite for incremental pattern mining."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_sequences_counted_incrementally(self):
+        """Test n-gram counts match a full recount of the history."""
+        detector = PatternDetector()
+        start = datetime.now() - timedelta(minutes=30)
+        for i, action in enumerate(["open_mail", "open_calendar", "play_music"] * 4):
+            detector.record_action(action, timestamp=start + timedelta(minutes=i))
+
+        sequences = {tuple(p["actions"]): p for p in detector.detect_patterns() if p["type"] == "sequence"}
+        self.assertEqual(sequences[("open_mail", "open_calendar")]["frequency"], 4)
+        self.assertEqual(sequences[("open_mail", "open_calendar", "play_music")]["frequency"], 4)
+        self.assertEqual(sequences[("play_music", "open_mail")]["frequency"], 3)
+        self.assertAlmostEqual(sequences[("open_mail", "open_calendar")]["confidence"], 4 / 11, places=3)
+
+    def test_time_patterns(self):
+        """Test the dominant action per hour and weekday is reported."""
+        detector = PatternDetector()
+        monday = datetime.now().replace(hour=9, minute=0) - timedelta(days=datetime.now().weekday() + 7)
+        for week in range(3):
+            detector.record_action("check_news", timestamp=monday + timedelta(days=7 * week))
+            detector.record_action("check_news", timestamp=monday + timedelta(days=7 * week, minutes=5))
+        detector.record_action("open_mail", timestamp=monday + timedelta(minutes=10))
+
+        pattern, = [p for p in detector.detect_patterns() if p["type"] == "time_based"]
+        self.assertEqual((pattern["action"], pattern["hour"], pattern["weekday"]), ("check_news", 9, 0))
+        self.assertEqual(pattern["frequency"], 6)
+
+    def test_old_habits_decay(self):
+        """Test counts fade with the configured half-life."""
+        miner = StreamingPatternMiner(half_life_days=1)
+        now = time.time()
+        for _ in range(4):
+            miner.add("a", now - 86400, 9, 0)
+            miner.add("b", now - 86400, 9, 0)
+        self.assertEqual(miner.sequence_patterns(1, now - 86400)[0]["frequency"], 4)
+        self.assertEqual(miner.sequence_patterns(1, now)[0]["frequency"], 2)
+        self.assertEqual(miner.sequence_patterns(3, now), [])
+
+    def test_sketch_memory_is_bounded(self):
+        """Test Space-Saving keeps heavy hitters within its capacity."""
+        sketch = SpaceSaving(capacity=8)
+        for i in range(1000):
+            sketch.add("frequent")
+            sketch.add(f"noise_{i}")
+        self.assertEqual(len(sketch), 8)
+        item, count, error = sketch.top(1)[0]
+        self.assertEqual(item, "frequent")
+        self.assertGreaterEqual(count - error, 1000)
+
+    def test_evicted_noise_not_reported(self):
+        """Test counts inherited on eviction never make a pattern on their own."""
+        miner = StreamingPatternMiner(min_length=2, max_length=2, capacity=2)
+        now = time.time()
+        for i in range(30):
+            miner.add(f"action_{i}", now, 9, 0)
+        self.assertGreaterEqual(miner.sequences[2].top(1)[0][1], 3)  # Upper bound alone would pass
+        self.assertEqual(miner.sequence_patterns(3, now), [])
+        self.assertEqual(miner.time_patterns(3, now), [])
+
+        for _ in range(3):
+            miner.add("open_mail", now, 9, 0)
+        pattern, = miner.time_patterns(3, now)
+        self.assertEqual(pattern["action"], "open_mail")
+
+    def test_state_round_trip(self):
+        """Test sketches persist and resume, including the open window."""
+        state_path = os.path.join(self.temp_dir, "patterns.json")
+        detector = PatternDetector(state_path=state_path)
+        start = datetime.now() - timedelta(minutes=10)
+        for i, action in enumerate(["a", "b", "a", "b", "a"]):
+            detector.record_action(action, timestamp=start + timedelta(minutes=i))
+        detector.save()
+
+        restored = PatternDetector(state_path=state_path)
+        restored.record_action("b", timestamp=start + timedelta(minutes=5))
+        sequences = {tuple(p["actions"]): p["frequency"] for p in restored.detect_patterns()
+                     if p["type"] == "sequence"}
+        self.assertEqual(sequences[("a", "b")], 3)
+
+
+@patch('modules.smart_automation.SmartAutomationEngine._register_built_in_functions')
+class TestWorkflowExecution(unittest.TestCase):
+    """Test suite for dependency-aware parallel execution."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "engine.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _engine(self, **kwargs):
+        engine = SmartAutomationEngine(db_path=self.db_path, **kwargs)
+        self.addCleanup(engine.cleanup)
+        return engine
+
+    def _wait(self, engine, execution_id, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = engine.executions[execution_id].status
+            # Results are saved just before the run leaves running_workflows
+            if status != WorkflowStatus.RUNNING and execution_id not in engine.running_workflows:
+                return status
+            time.sleep(0.02)
+        return engine.executions[execution_id].status
+
+    def test_independent_tasks_run_in_parallel(self, _):
+        """Test tasks without dependencies between them overlap."""
+        engine = self._engine()
+        engine.register_function("slow", lambda value: time.sleep(0.3) or value)
+        engine.register_function("join", lambda a, b: a + b)
+        workflow_id = engine.create_workflow("Parallel", "", [
+            {"id": "a", "name": "A", "function": "slow", "parameters": {"value": 1}},
+            {"id": "b", "name": "B", "function": "slow", "parameters": {"value": 2}},
+            {"id": "c", "name": "C", "function": "join", "dependencies": ["a", "b"],
+             "parameters": {"a": "${results.a}", "b": "${results.b}"}},
+        ])
+
+        start = time.monotonic()
+        execution_id = engine.execute_workflow(workflow_id)
+        status = self._wait(engine, execution_id)
+
+        self.assertEqual(status, WorkflowStatus.COMPLETED)
+        self.assertEqual(engine.executions[execution_id].task_results["c"], 3)
+        self.assertLess(time.monotonic() - start, 0.55)
+
+    def test_task_timeout_is_enforced(self, _):
+        """Test a task exceeding its timeout fails the workflow."""
+        engine = self._engine()
+        engine.register_function("hang", lambda: time.sleep(2))
+        workflow_id = engine.create_workflow("Timeout", "", [
+            {"id": "a", "name": "Hang", "function": "hang", "timeout": 0.2, "max_retries": 0},
+        ])
+
+        execution_id = engine.execute_workflow(workflow_id)
+        status = self._wait(engine, execution_id, timeout=1.0)
+
+        self.assertEqual(status, WorkflowStatus.FAILED)
+        self.assertIn("timed out", engine.executions[execution_id].error_message)
+
+    def test_timeout_starts_when_task_runs(self, _):
+        """Test time spent queued for a worker does not count against a task's timeout."""
+        engine = self._engine(max_workers=1)
+        engine.register_function("slow", lambda: time.sleep(0.3))
+        engine.register_function("quick", lambda: time.sleep(0.05) or "done")
+        workflow_id = engine.create_workflow("Queued", "", [
+            {"id": "a", "name": "Slow", "function": "slow"},
+            {"id": "b", "name": "Quick", "function": "quick", "timeout": 0.2, "max_retries": 0},
+        ])
+
+        execution_id = engine.execute_workflow(workflow_id)
+
+        self.assertEqual(self._wait(engine, execution_id), WorkflowStatus.COMPLETED)
+        self.assertEqual(engine.executions[execution_id].task_results["b"], "done")
+
+    def test_retry_waits_for_timed_out_attempt(self, _):
+        """Test a retry never runs alongside the attempt that timed out."""
+        engine = self._engine()
+        attempts = []
+
+        def flaky():
+            attempts.append([time.monotonic(), None])
+            attempt = attempts[-1]
+            time.sleep(2.5 if len(attempts) == 1 else 0)
+            attempt[1] = time.monotonic()
+            return len(attempts)
+
+        engine.register_function("flaky", flaky)
+        workflow_id = engine.create_workflow("Retry", "", [
+            {"id": "a", "name": "Flaky", "function": "flaky", "timeout": 0.2, "max_retries": 1},
+        ])
+
+        execution_id = engine.execute_workflow(workflow_id)
+
+        self.assertEqual(self._wait(engine, execution_id), WorkflowStatus.COMPLETED)
+        self.assertEqual(len(attempts), 2)
+        self.assertGreaterEqual(attempts[1][0], attempts[0][1])
+
+    def test_task_concurrency_limit(self, _):
+        """Test max_concurrency limits overlapping runs of a task."""
+        engine = self._engine()
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def guarded():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.15)
+            with lock:
+                active[0] -= 1
+
+        engine.register_function("guarded", guarded)
+        workflow_id = engine.create_workflow("Limited", "", [
+            {"id": "a", "name": "Guarded", "function": "guarded", "max_concurrency": 1},
+        ])
+
+        executions = [engine.execute_workflow(workflow_id) for _ in range(3)]
+        statuses = [self._wait(engine, execution_id) for execution_id in executions]
+
+        self.assertEqual(statuses, [WorkflowStatus.COMPLETED] * 3)
+        self.assertEqual(peak[0], 1)
+
+    def test_cycle_is_rejected(self, _):
+        """Test circular dependencies fail before any task runs."""
+        engine = self._engine()
+        calls = []
+        engine.register_function("record", lambda: calls.append(1))
+        workflow_id = engine.create_workflow("Cycle", "", [
+            {"id": "a", "name": "A", "function": "record", "dependencies": ["b"]},
+            {"id": "b", "name": "B", "function": "record", "dependencies": ["a"]},
+        ])
+
+        status = self._wait(engine, engine.execute_workflow(workflow_id))
+
+        self.assertEqual(status, WorkflowStatus.FAILED)
+        self.assertEqual(calls, [])
+
+    def test_condition_task_and_trigger(self, _):
+        """Test condition tasks evaluate without eval and condition triggers start workflows."""
+        engine = self._engine()
+        engine.register_function("value", lambda: 7)
+        workflow_id = engine.create_workflow("Conditional", "", [
+            {"id": "a", "name": "Value", "function": "value"},
+            {"id": "b", "name": "Check", "type": "condition", "function": "",
+             "dependencies": ["a"], "parameters": {"condition": "results.a > 5"}},
+        ], triggers=[{"type": "condition", "condition": "cpu > 90"}])
+
+        self.assertEqual(engine.update_variables({"cpu": 50}), [])
+        self.assertEqual(engine.update_variables({"cpu": 95}), [f"{workflow_id}:0"])
+        execution_id = next(iter(engine.executions))
+        self.assertEqual(self._wait(engine, execution_id), WorkflowStatus.COMPLETED)
+        self.assertIs(engine.executions[execution_id].task_results["b"], True)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
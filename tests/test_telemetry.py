@@ -0,0 +1,145 @@
+"""
+Unit tests for the shared system telemetry sampler and its consumers.
+"""
+
+import unittest
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import telemetry
+from modules.telemetry import TelemetrySampler
+from modules.advanced_integration import HardwareMonitor
+
+
+class TestTelemetrySampler(unittest.TestCase):
+    """Test sampling cadence, derived rates and subscriptions"""
+
+    def setUp(self):
+        self.sampler = TelemetrySampler(interval=0.05, process_interval=0.2, history_size=20, idle_timeout=0.3)
+
+    def tearDown(self):
+        self.sampler.stop()
+
+    def test_concurrent_readers_share_samples(self):
+        """Test many dashboards reading at once do not trigger their own sweeps"""
+        readings = []
+
+        def dashboard():
+            for _ in range(50):
+                readings.append(self.sampler.latest()['cpu_percent'])
+                self.sampler.processes(5)
+
+        start = time.time()
+        threads = [threading.Thread(target=dashboard) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+
+        self.assertEqual(len(readings), 500)
+        # Only the sampling cadence decides how often psutil is swept
+        self.assertLessEqual(self.sampler.sample_count, elapsed / self.sampler.interval + 2)
+        self.assertLessEqual(self.sampler.process_sweeps, elapsed / self.sampler.process_interval + 2)
+
+    def test_ring_buffer_and_rates(self):
+        """Test history is bounded and rates come from consecutive samples"""
+        counters = iter(range(0, 10 ** 9, 1000))
+
+        def net_io_counters():
+            value = next(counters)
+            return type('NetIO', (), {'_asdict': lambda self: {'bytes_sent': value, 'bytes_recv': value * 2}})()
+
+        with patch('modules.telemetry.psutil.net_io_counters', side_effect=net_io_counters):
+            for _ in range(25):
+                self.sampler.sample()
+                time.sleep(0.001)
+
+        samples = list(self.sampler.history)
+        self.assertEqual(len(samples), 20)
+        last, previous = samples[-1], samples[-2]
+        elapsed = last['time'] - previous['time']
+        self.assertAlmostEqual(last['net_sent_bps'], 1000 / elapsed, delta=1)
+        self.assertAlmostEqual(last['net_recv_bps'], 2000 / elapsed, delta=1)
+        self.assertGreater(self.sampler.average('net_download_mbps'), 0)
+
+    def test_subscribers_receive_samples_until_unsubscribed(self):
+        """Test pushes go to subscribers only while subscribed"""
+        received = []
+        token = self.sampler.subscribe(received.append)
+        time.sleep(0.3)
+        self.sampler.unsubscribe(token)
+        count = len(received)
+
+        self.assertGreaterEqual(count, 2)
+        self.assertIn('memory_percent', received[-1])
+        time.sleep(0.2)
+        self.assertLessEqual(len(received), count + 1)
+        self.assertEqual(self.sampler.subscriber_count, 0)
+
+    def test_thread_idles_out_without_readers(self):
+        """Test the sampling thread stops when nobody reads, and restarts on demand"""
+        self.sampler.latest()
+        time.sleep(0.6)
+        self.assertFalse(self.sampler._thread.is_alive())
+        stopped_at = self.sampler.sample_count
+
+        self.sampler.latest()
+        time.sleep(0.15)
+        self.assertGreater(self.sampler.sample_count, stopped_at)
+
+    def test_read_after_idle_is_fresh(self):
+        """Test the first read after the thread idled out does not return an old sample"""
+        self.sampler.latest()
+        self.sampler.processes(5)
+        time.sleep(1.0)
+        self.assertFalse(self.sampler._thread.is_alive())
+
+        self.assertLess(time.time() - self.sampler.latest()['time'], 2 * self.sampler.interval)
+        self.sampler.processes(5)
+        self.assertLess(time.time() - self.sampler._processes_at, 2 * self.sampler.process_interval)
+
+
+class TestHardwareMonitor(unittest.TestCase):
+    """Test the hardware monitor is served by the shared sampler"""
+
+    def setUp(self):
+        self.sampler = TelemetrySampler(interval=0.05, process_interval=0.2)
+        patcher = patch.object(telemetry, '_sampler', self.sampler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.sampler.stop)
+
+    def test_system_info_and_processes_from_snapshot(self):
+        """Test repeated status calls reuse the latest sample and process sweep"""
+        self.sampler.process_interval = 60
+        monitor = HardwareMonitor()
+        for _ in range(5):
+            info = monitor.get_system_info()
+            processes = monitor.get_running_processes(10)
+
+        self.assertEqual(info['cpu']['usage_percent'], self.sampler.history[-1]['cpu_percent'])
+        self.assertLessEqual(len(processes), 10)
+        self.assertEqual(self.sampler.process_sweeps, 1)
+
+    def test_monitor_performance_subscribes(self):
+        """Test performance monitoring is a sampler subscription, not a new thread"""
+        monitor = HardwareMonitor()
+        stats = []
+        monitor.monitor_performance(stats.append, interval=0.1)
+        time.sleep(0.4)
+        monitor.stop_monitoring()
+
+        self.assertGreaterEqual(len(stats), 2)
+        self.assertEqual(set(stats[0]), {'timestamp', 'cpu_percent', 'memory', 'disk_io', 'network_io'})
+        self.assertEqual(self.sampler.subscriber_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,139 @@
+"""
+Unit tests for the Tool Executor Module
+Tests concurrent tool calls, enforced timeouts, memoization and latency stats.
+"""
+
+import unittest
+import json
+import os
+import sys
+import threading
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.tool_executor import ToolExecutor, execute_code, get_default_executor
+
+
+def tool_call(name, **arguments):
+    return {"id": f"call_{name}", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+class TestToolExecutor(unittest.TestCase):
+    """Test tool execution runtime"""
+
+    def setUp(self):
+        self.executor = ToolExecutor(max_history=5)
+        self.calls = []
+
+        def slow(seconds):
+            self.calls.append(seconds)
+            time.sleep(seconds)
+            return {"slept": seconds}
+
+        def square(x):
+            self.calls.append(x)
+            return {"result": x * x}
+
+        def hang():
+            threading.Event().wait(10)
+
+        self.executor.register_tool("slow", slow, "Sleep", {"seconds": {"type": "number"}}, ["seconds"])
+        self.executor.register_tool("square", square, "Square", {"x": {"type": "number"}}, ["x"],
+                                    cache_ttl=0.2)
+        self.executor.register_tool("hang", hang, "Never returns", {}, timeout=0.2)
+
+    def test_tool_calls_run_concurrently(self):
+        """Test a turn waits for the slowest tool, not the sum"""
+        start = time.time()
+        results = self.executor.execute_tool_calls([tool_call("slow", seconds=0.3) for _ in range(4)]
+                                                   + [tool_call("missing")])
+        elapsed = time.time() - start
+
+        self.assertLess(elapsed, 0.8)
+        self.assertTrue(all(r.success for r in results[:4]))
+        self.assertIn("not registered", results[4].error)
+
+    def test_timeout_is_enforced(self):
+        """Test a hung tool is abandoned at its timeout without stalling others"""
+        start = time.time()
+        hung, other = self.executor.execute_tool_calls([tool_call("hang"), tool_call("slow", seconds=0.05)])
+
+        self.assertLess(time.time() - start, 1.0)
+        self.assertFalse(hung.success)
+        self.assertTrue(hung.timed_out)
+        self.assertIn("timed out", hung.error)
+        self.assertTrue(other.success)
+        self.assertEqual(self.executor.get_tool_stats()["hang"]["timeouts"], 1)
+
+    def test_execute_code_kills_subprocess(self):
+        """Test runaway code is killed at the timeout"""
+        start = time.time()
+        result = execute_code("import time\nprint('started', flush=True)\ntime.sleep(30)", timeout=0.5)
+        self.assertLess(time.time() - start, 5)
+        self.assertIn("timed out", result["error"])
+
+        executor = get_default_executor()
+        result = executor.execute_tool("execute_code", {"code": "print(6 * 7)"})
+        self.assertTrue(result.success)
+        self.assertEqual(result.result["stdout"].strip(), "42")
+
+    def test_memoization_with_ttl(self):
+        """Test deterministic tools are memoized by arguments until the TTL expires"""
+        first = self.executor.execute_tool("square", {"x": 3})
+        second = self.executor.execute_tool("square", {"x": 3})
+        self.executor.execute_tool("square", {"x": 4})
+
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(second.result, {"result": 9})
+        self.assertEqual(self.calls, [3, 4])
+
+        time.sleep(0.25)
+        self.assertFalse(self.executor.execute_tool("square", {"x": 3}).cached)
+        self.assertEqual(self.calls, [3, 4, 3])
+
+        # Uncached tools always run
+        self.executor.execute_tool("slow", {"seconds": 0})
+        self.executor.execute_tool("slow", {"seconds": 0})
+        self.assertEqual(self.calls.count(0), 2)
+
+    def test_cache_is_bounded(self):
+        """Test memoized results are evicted least recently used first, and expired ones pruned"""
+        self.executor.max_cache_entries = 3
+        for x in (1, 2, 3):
+            self.executor.execute_tool("square", {"x": x})
+        self.assertTrue(self.executor.execute_tool("square", {"x": 1}).cached)
+        self.executor.execute_tool("square", {"x": 4})
+        self.assertEqual(len(self.executor._cache), 3)
+        self.assertFalse(self.executor.execute_tool("square", {"x": 2}).cached)  # Least recently used
+
+        time.sleep(0.25)
+        self.executor.execute_tool("square", {"x": 5})
+        self.assertEqual(len(self.executor._cache), 1)
+
+    def test_history_is_bounded_and_stats_recorded(self):
+        """Test history keeps only the newest results and latency is tracked per tool"""
+        for i in range(8):
+            self.executor.execute_tool("square", {"x": i % 2})
+
+        history = self.executor.get_execution_history(limit=10)
+        self.assertEqual(len(history), 5)
+        stats = self.executor.get_tool_stats()["square"]
+        self.assertEqual(stats["calls"], 8)
+        self.assertEqual(stats["cache_hits"], 6)
+        self.assertGreaterEqual(stats["max_time"], stats["avg_time"])
+
+    def test_default_calculator(self):
+        """Test the default calculator tool is memoized"""
+        executor = get_default_executor()
+        first = executor.execute_tool("calculator", {"expression": "2 + 3 * 4"})
+        second = executor.execute_tool("calculator", {"expression": "2 + 3 * 4"})
+        self.assertEqual(first.result["result"], 14)
+        self.assertTrue(second.cached)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
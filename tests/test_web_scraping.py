@@ -127,11 +127,21 @@ class TestWeatherFunctions(unittest.TestCase):
         self.assertIn("25", result)
 
 
+def _feed_response():
+    """Build a mocked HTTP response for a feed fetch"""
+    response = Mock()
+    response.status_code = 200
+    response.content = b'<rss></rss>'
+    response.headers = {}
+    return response
+
+
 class TestNewsFunctions(unittest.TestCase):
     """Test suite for news-related functions"""
     
+    @patch('modules.web_scraping.requests.Session.get', return_value=_feed_response())
     @patch('modules.web_scraping.feedparser.parse')
-    def test_get_latest_news_basic(self, mock_parse):
+    def test_get_latest_news_basic(self, mock_parse, mock_get):
         """Test news retrieval"""
         # Mock RSS feed response
         mock_feed = MagicMock()
@@ -157,8 +167,9 @@ class TestNewsFunctions(unittest.TestCase):
         self.assertIn("Latest", result)
         self.assertIn("News", result)
     
+    @patch('modules.web_scraping.requests.Session.get', return_value=_feed_response())
     @patch('modules.web_scraping.feedparser.parse')
-    def test_get_latest_news_technology(self, mock_parse):
+    def test_get_latest_news_technology(self, mock_parse, mock_get):
         """Test technology news retrieval"""
         mock_feed = MagicMock()
         mock_feed.feed.title = "Tech News"
@@ -176,8 +187,9 @@ class TestNewsFunctions(unittest.TestCase):
         
         self.assertIn("News", result)
     
+    @patch('modules.web_scraping.requests.Session.get', return_value=_feed_response())
     @patch('modules.web_scraping.feedparser.parse')
-    def test_get_latest_news_no_results(self, mock_parse):
+    def test_get_latest_news_no_results(self, mock_parse, mock_get):
         """Test news retrieval with no results"""
         mock_feed = MagicMock()
         mock_feed.entries = []
@@ -443,8 +455,9 @@ class TestTrendingFunctions(unittest.TestCase):
 class TestRSSFunctions(unittest.TestCase):
     """Test suite for RSS monitoring functions"""
     
+    @patch('modules.web_scraping.requests.Session.get', return_value=_feed_response())
     @patch('modules.web_scraping.feedparser.parse')
-    def test_monitor_rss_feeds_success(self, mock_parse):
+    def test_monitor_rss_feeds_success(self, mock_parse, mock_get):
         """Test monitoring RSS feeds"""
         mock_feed = MagicMock()
         mock_feed.feed.title = "Test Feed"
@@ -468,8 +481,9 @@ class TestRSSFunctions(unittest.TestCase):
         self.assertIn("RSS Feed Monitor", result)
         self.assertIn("Article", result)
     
+    @patch('modules.web_scraping.requests.Session.get', return_value=_feed_response())
     @patch('modules.web_scraping.feedparser.parse')
-    def test_monitor_rss_feeds_no_items(self, mock_parse):
+    def test_monitor_rss_feeds_no_items(self, mock_parse, mock_get):
         """Test RSS monitoring with no items"""
         mock_feed = MagicMock()
         mock_feed.entries = []
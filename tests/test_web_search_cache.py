@@ -0,0 +1,232 @@
+"""
+Unit tests for web search caching: query normalization, the two-tier
+WebSearchCache, SingleFlight deduplication, stale-while-revalidate and
+per-source cache metrics.
+"""
+
+import unittest
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import web_search_integration
+from modules.web_search_integration import (SearchResponse, SearchResult, SearchTriggerType,
+                                            SingleFlight, WebSearchCache, WebSearchIntegration,
+                                            normalize_query)
+
+
+def make_response(query, source="Google"):
+    """Build a one-result search response."""
+    return SearchResponse(
+        query=query,
+        results=[SearchResult(title=f"About {query}", url="http://example.com", snippet="", source=source)],
+        trigger_type=SearchTriggerType.MANUAL,
+        search_time=0.0,
+        total_results=1,
+        timestamp=""
+    )
+
+
+class TestNormalizeQuery(unittest.TestCase):
+    """Test cache keys"""
+
+    def test_case_whitespace_punctuation(self):
+        """Test re-phrased punctuation and spacing share a key"""
+        self.assertEqual(normalize_query("What's the  Weather?"), normalize_query("whats the weather"))
+        self.assertEqual(normalize_query("Hello, world."), "hello world")
+
+    def test_significant_symbols_kept(self):
+        """Test symbols that change the query are not stripped"""
+        self.assertNotEqual(normalize_query("C++ tutorial"), normalize_query("C tutorial"))
+        self.assertNotEqual(normalize_query("C# jobs"), normalize_query("C jobs"))
+        self.assertNotEqual(normalize_query("what is 2+2?"), normalize_query("what is 22"))
+        self.assertEqual(normalize_query("Flights under $500"), "flights under $500")
+        self.assertEqual(normalize_query("Python 3.12 release"), "python 3.12 release")
+
+
+class TestWebSearchCache(unittest.TestCase):
+    """Test the memory and SQLite tiers"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'search.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_normalized(self):
+        """Test a cached response is found under any equivalent phrasing"""
+        cache = WebSearchCache(db_path=self.db_path)
+        cache.set("Latest AI news?", make_response("Latest AI news?"))
+        self.assertEqual(cache.get("latest ai news").query, "Latest AI news?")
+        self.assertIsNone(cache.get("latest ml news"))
+
+    def test_persists_across_instances(self):
+        """Test entries survive a restart through the SQLite tier"""
+        WebSearchCache(db_path=self.db_path).set("weather", make_response("weather"))
+        restarted = WebSearchCache(db_path=self.db_path)
+        self.assertEqual(restarted.get("weather").source, "Google")
+        self.assertIn("weather", restarted.cache)
+
+    def test_memory_tier_bounded(self):
+        """Test the memory tier evicts least recently used entries"""
+        cache = WebSearchCache(max_entries=2, db_path=self.db_path)
+        for query in ("a", "b"):
+            cache.set(query, make_response(query))
+        cache.get("a")
+        cache.set("c", make_response("c"))
+        self.assertEqual(list(cache.cache), ["a", "c"])
+        self.assertEqual(cache.persistent_size(), 3)
+
+    def test_stale_window(self):
+        """Test entries past the TTL are served as stale, then dropped"""
+        cache = WebSearchCache(ttl_hours=0, stale_hours=1, db_path=None)
+        cache.set("weather", make_response("weather"))
+        response, is_stale = cache.lookup("weather")
+        self.assertIsNotNone(response)
+        self.assertTrue(is_stale)
+        self.assertIsNone(cache.get("weather"))
+
+        cache.stale_window = cache.ttl
+        self.assertEqual(cache.lookup("weather"), (None, False))
+        self.assertNotIn("weather", cache.cache)
+
+    def test_default_db_not_in_cwd(self):
+        """Test the default database sits beside the module, whatever the working directory"""
+        module_dir = os.path.dirname(os.path.abspath(web_search_integration.__file__))
+        default_path = os.path.join(module_dir, "web_search_cache.db")
+        existed = os.path.exists(default_path)
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        try:
+            cache = WebSearchCache()
+        finally:
+            os.chdir(cwd)
+            if not existed and os.path.exists(default_path):
+                os.remove(default_path)
+        self.assertEqual(cache.db_path, default_path)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test concurrent calls for one key share a result"""
+
+    def run_concurrently(self, fn, count):
+        results = [None] * count
+        barrier = threading.Barrier(count)
+
+        def worker(i):
+            barrier.wait()
+            try:
+                results[i] = fn()
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_concurrent_calls_run_once(self):
+        """Test followers share the leader's result"""
+        flight = SingleFlight()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return "result"
+
+        results = self.run_concurrently(lambda: flight.do("key", fetch), 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results, key=lambda r: r[1]), [("result", False)] + [("result", True)] * 3)
+        self.assertEqual(flight.coalesced, 3)
+        self.assertFalse(flight.in_flight("key"))
+
+    def test_error_shared(self):
+        """Test followers see the leader's error"""
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.2)
+            raise RuntimeError("search down")
+
+        results = self.run_concurrently(lambda: flight.do("key", fail), 3)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+
+class TestWebSearchIntegration(unittest.TestCase):
+    """Test search_web against fake backends"""
+
+    def make_search(self, results=True, delay=0.0, **kwargs):
+        search = WebSearchIntegration(cache_db_path=None, **kwargs)
+        search.fetches = 0
+
+        def google(query, max_results=5):
+            search.fetches += 1
+            time.sleep(delay)
+            return make_response(query) if results else None
+
+        search._search_google = google
+        search._search_duckduckgo = lambda query, max_results=5: None
+        return search
+
+    def test_hit_and_miss_metrics(self):
+        """Test misses fetch once and later lookups are hits"""
+        search = self.make_search()
+        search.search_web("python news")
+        search.search_web("Python news?")
+        self.assertEqual(search.fetches, 1)
+
+        stats = search.get_search_stats()["sources"]["Google"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_failed_search_counted_as_miss(self):
+        """Test searches returning nothing still count as misses"""
+        search = self.make_search(results=False)
+        self.assertIsNone(search.search_web("nothing here"))
+        self.assertEqual(search.get_search_stats()["sources"]["unknown"]["misses"], 1)
+
+    def test_concurrent_misses_coalesced(self):
+        """Test simultaneous identical searches share one fetch"""
+        search = self.make_search(delay=0.2)
+        barrier = threading.Barrier(3)
+
+        def worker():
+            barrier.wait()
+            search.search_web("election results")
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(search.fetches, 1)
+        self.assertEqual(search.get_search_stats()["sources"]["Google"]["coalesced"], 2)
+
+    def test_stale_while_revalidate(self):
+        """Test a stale entry is returned at once and refreshed in the background"""
+        search = self.make_search(delay=0.1, cache_ttl_hours=0)
+        search.cache.set("weather", make_response("old weather"))
+
+        start = time.monotonic()
+        response = search.search_web("weather")
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(response.query, "old weather")
+
+        search._refresher.shutdown(wait=True)
+        self.assertEqual(search.fetches, 1)
+        self.assertEqual(search.cache.lookup("weather")[0].query, "weather")
+        self.assertEqual(search.get_search_stats()["sources"]["Google"]["stale_hits"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,7 @@ This module provides advanced logging features including:
 - API request tracking
 - Error tracking with context
 - Custom log filters
-- Log aggregation utilities
+- Log aggregation utilities (incremental, indexed - see log_index.py)
 """
 
 import logging
@@ -22,6 +22,7 @@ import threading
 import json
 
 from .logging_config import get_logger
+from .log_index import LogIndex
 
 # Performance logging
 def log_performance(func_name: str = None, threshold_ms: float = 100):
@@ -224,26 +225,57 @@ class UserActivityLogger:
 class LogAggregator:
     """Aggregates and analyzes log data"""
     
-    def __init__(self):
+    def __init__(self, log_dir: str = 'logs', db_path: str = None):
         self.logger = get_logger('log_aggregator', log_category='system')
+        self.index = LogIndex(log_dir, db_path)
+    
+    def ingest(self) -> int:
+        """Index log lines written since the last call"""
+        return self.index.ingest()
+    
+    def get_rolling_stats(self, window_minutes: int = 60) -> Dict[str, Any]:
+        """
+        Error rates and latency percentiles per operation over a recent window
+        
+        Args:
+            window_minutes: Window length; aggregates are kept per 15 minutes,
+                so the window starts at a bucket boundary
+        """
+        self.ingest()
+        end = time.time()
+        return self.index.operation_stats(end - window_minutes * 60, end + 1)
     
     def generate_daily_summary(self, date: str = None) -> Dict[str, Any]:
         """Generate daily log summary"""
         if not date:
             date = datetime.now().strftime('%Y-%m-%d')
         
+        # Only lines appended since the last summary are parsed
+        self.ingest()
+        start = datetime.strptime(date, '%Y-%m-%d').timestamp()
+        end = start + 86400
+        stats = self.index.operation_stats(start, end)
+        
+        api = stats.get('api', {})
+        total_requests = sum(op['count'] for op in api.values())
+        timed_total = sum(op['avg_ms'] * op['count'] for op in api.values() if op['avg_ms'] is not None)
+        levels = self.index.level_counts(start, end)
+        
         summary = {
             'date': date,
-            'total_requests': 0,
-            'error_count': 0,
-            'average_response_time': 0,
-            'top_endpoints': [],
-            'error_types': {},
-            'user_activity_count': 0
+            'total_requests': total_requests,
+            'error_count': levels.get('ERROR', 0) + levels.get('CRITICAL', 0),
+            'average_response_time': round(timed_total / total_requests, 2) if total_requests else 0,
+            'top_endpoints': [
+                {'endpoint': name, **op}
+                for name, op in sorted(api.items(), key=lambda item: item[1]['count'], reverse=True)[:10]
+            ],
+            'error_types': {name: op['count'] for name, op in stats.get('exception', {}).items()},
+            'user_activity_count': sum(op['count'] for op in stats.get('user', {}).values()),
+            'slow_functions': stats.get('function', {}),
+            'level_counts': levels
         }
         
-        # This would normally parse log files and generate statistics
-        # For now, we'll log that summary generation was requested
         self.logger.info(f"DAILY_SUMMARY_GENERATED | {date} | {json.dumps(summary)}")
         
         return summary
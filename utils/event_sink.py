@@ -0,0 +1,268 @@
+"""
+Buffered Event Sink for YourDaddy Assistant
+==========================================
+
+Append-only storage for high-volume user data (queries, replies, actions,
+session activities). Callers only enqueue; a background thread appends
+batches to JSON Lines segments, rotates them by size and gzips the closed
+ones. Closed segments carry their time range in the file name, so reads by
+time range skip whole files.
+
+Usage:
+    from utils.event_sink import EventSink, read_events
+
+    sink = EventSink('logs/activities/events')
+    sink.put('voice_commands', {'command': 'play music'}, session_id='20240601_120000')
+    sink.flush()
+    for event in read_events('logs/activities/events', session_id='20240601_120000'):
+        print(event['type'], event['data'])
+"""
+
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+TimeBound = Union[float, datetime, None]
+
+
+def _to_timestamp(value: TimeBound) -> Optional[float]:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value
+
+
+def _segment_range(path: Path) -> Optional[tuple]:
+    """
+    (first_ts, last_ts) of a segment from its name; last_ts is None for a
+    segment that is still being written.
+
+    Names: events-<first_ms>-<pid>.jsonl (open) and
+    events-<first_ms>-<last_ms>-<pid>.jsonl.gz (closed)
+    """
+    name = path.name.split('.', 1)[0]
+    parts = name.split('-')
+    try:
+        if len(parts) == 4:
+            return int(parts[1]) / 1000, int(parts[2]) / 1000
+        if len(parts) == 3:
+            return int(parts[1]) / 1000, None
+    except ValueError:
+        pass
+    return None
+
+
+class EventSink:
+    """
+    Queues events in memory and appends them to rotating JSON Lines
+    segments from a background thread.
+
+    Args:
+        directory: Folder for the segment files
+        flush_interval: Seconds a burst may accumulate before it is written
+        max_batch: Queue size that triggers an immediate write
+        segment_max_bytes: Size at which the active segment is closed and gzipped
+        max_queue: Events held in memory before new ones are dropped
+    """
+
+    def __init__(self, directory: Union[str, Path], flush_interval: float = 1.0, max_batch: int = 500,
+                 segment_max_bytes: int = 8 * 1024 * 1024, max_queue: int = 100000):
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.segment_max_bytes = segment_max_bytes
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._segment: Optional[Path] = None
+        self._segment_first = 0.0
+        self._segment_last = 0.0
+        self._segment_size = 0
+        self._closed = False
+        atexit.register(self.close)
+
+    def put(self, event_type: str, data: Dict[str, Any], session_id: Optional[str] = None,
+            timestamp: Optional[float] = None):
+        """
+        Queue an event. Never blocks or touches the disk; if the writer
+        falls too far behind, the event is dropped and counted.
+        """
+        ts = timestamp if timestamp is not None else time.time()
+        event = {
+            'ts': ts,
+            'time': datetime.fromtimestamp(ts).isoformat(),
+            'session_id': session_id,
+            'type': event_type,
+            'data': data,
+        }
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._queue.qsize() >= self.max_batch:
+            self._wake.set()
+        self._ensure_thread()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is on disk"""
+        if self._queue.empty() and (self._thread is None or not self._thread.is_alive()):
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        self._wake.set()
+        self._ensure_thread()
+        return done.wait(timeout)
+
+    def close(self):
+        """Flush pending events and compress the active segment"""
+        if self._closed:
+            return
+        self.flush()
+        with self._lock:
+            self._close_segment()
+            self._closed = True
+
+    def query(self, session_id: Optional[str] = None, event_type: Optional[str] = None,
+              start: TimeBound = None, end: TimeBound = None) -> List[Dict[str, Any]]:
+        """Flush, then read matching events (see read_events)"""
+        self.flush()
+        with self._lock:
+            return list(read_events(self.directory, session_id, event_type, start, end))
+
+    def _ensure_thread(self):
+        with self._lock:
+            self._closed = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="event-sink")
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=30)
+            except queue.Empty:
+                # put() queues before checking the thread, so re-check under
+                # the lock or an event landing now would wait for the next put()
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return  # Idle; restarted by the next put()
+                continue
+            if not isinstance(first, threading.Event):
+                # Let a burst accumulate so it lands in one write
+                self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            items = [first]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            events = [item for item in items if not isinstance(item, threading.Event)]
+            if events:
+                with self._lock:
+                    self._write(events)
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write(self, events: List[Dict[str, Any]]):
+        try:
+            if self._segment is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._segment_first = events[0]['ts']
+                self._segment = self.directory / f"events-{int(self._segment_first * 1000)}-{os.getpid()}.jsonl"
+                self._segment_size = 0
+            payload = ''.join(json.dumps(event, default=str) + '\n' for event in events)
+            with open(self._segment, 'a', encoding='utf-8') as f:
+                f.write(payload)
+            self._segment_size += len(payload)
+            self._segment_last = max(self._segment_last, max(event['ts'] for event in events))
+            if self._segment_size >= self.segment_max_bytes:
+                self._close_segment()
+        except OSError as e:
+            print(f"Error writing {len(events)} events to {self.directory}: {e}")
+
+    def _close_segment(self):
+        """Gzip the active segment under a name recording its time range"""
+        if self._segment is None:
+            return
+        segment, self._segment = self._segment, None
+        closed = self.directory / (f"events-{int(self._segment_first * 1000)}-"
+                                   f"{int(self._segment_last * 1000)}-{os.getpid()}.jsonl.gz")
+        self._segment_last = 0.0
+        try:
+            with open(segment, 'rb') as source, gzip.open(closed, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            segment.unlink()
+        except OSError as e:
+            print(f"Error compressing event segment {segment}: {e}")
+
+
+def read_events(directory: Union[str, Path], session_id: Optional[str] = None,
+                event_type: Optional[str] = None, start: TimeBound = None,
+                end: TimeBound = None) -> Iterator[Dict[str, Any]]:
+    """
+    Read events from a sink directory, oldest segment first.
+
+    Args:
+        directory: Sink folder
+        session_id: Only events from this session
+        event_type: Only events of this type
+        start: Inclusive lower time bound (epoch seconds or datetime)
+        end: Exclusive upper time bound
+
+    Yields:
+        Event dicts with ts, time, session_id, type and data
+    """
+    directory = Path(directory)
+    if not directory.exists():
+        return
+    start, end = _to_timestamp(start), _to_timestamp(end)
+
+    segments = []
+    for path in directory.glob('events-*.jsonl*'):
+        time_range = _segment_range(path)
+        if time_range is None:
+            continue
+        first, last = time_range
+        # Skip segments entirely outside the window (timestamps are ms-truncated)
+        if end is not None and first >= end:
+            continue
+        if start is not None and last is not None and last + 0.001 < start:
+            continue
+        segments.append((first, path))
+
+    for _, path in sorted(segments):
+        opener = gzip.open if path.suffix == '.gz' else open
+        try:
+            with opener(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Partial line from an interrupted write
+                    if session_id is not None and event.get('session_id') != session_id:
+                        continue
+                    if event_type is not None and event.get('type') != event_type:
+                        continue
+                    if start is not None and event['ts'] < start:
+                        continue
+                    if end is not None and event['ts'] >= end:
+                        continue
+                    yield event
+        except (OSError, EOFError) as e:
+            print(f"Error reading event segment {path}: {e}")